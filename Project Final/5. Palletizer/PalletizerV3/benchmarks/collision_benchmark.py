@@ -0,0 +1,85 @@
+"""
+Measure the workspace and collision check on a long palletizing program.
+
+Builds a program that picks boxes from the conveyor and stacks them on the
+pallet in layers (eight rows per box), checks it, and prints the check time
+and any violations. With --unsafe-every N, every N-th box is carried across
+the stack without lifting it first, so the checker has collisions to find.
+
+Usage:
+    python benchmarks/collision_benchmark.py [--rows 500] [--sample-ms 50] [--repeat 5]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from palletizer.collision import check_timeline
+from palletizer.motion import SequenceTimeline
+
+PICK = (0, 6000, 7000)
+PALLET_ORIGIN = (4500, 13500)
+PALLET_GRID = (5, 6)
+BOX_PITCH = 1000
+LAYER_HEIGHT = 1500
+PLACE_Z = 7300  # Tool height for a box on the bare pallet
+TRAVEL_Z = 1000
+
+
+def palletizing_program(rows, unsafe_every=0):
+    """Row commands stacking boxes on the pallet, eight rows per box"""
+    commands = []
+    box = 0
+    per_layer = PALLET_GRID[0] * PALLET_GRID[1]
+    while len(commands) < rows:
+        layer, slot = divmod(box, per_layer)
+        x = PALLET_ORIGIN[0] + (slot % PALLET_GRID[0]) * BOX_PITCH
+        y = PALLET_ORIGIN[1] + (slot // PALLET_GRID[0]) * BOX_PITCH
+        z = PLACE_Z - layer * LAYER_HEIGHT
+        travel_z = PICK[2] if unsafe_every and box % unsafe_every == unsafe_every - 1 else TRAVEL_Z
+        commands += [
+            f"x({PICK[0]}), y({PICK[1]}), t(0)",
+            f"z({PICK[2]}), g(0)",
+            "g(1000)",
+            f"z({travel_z})",
+            f"x({x}), y({y}), t(900)",
+            f"z({z})",
+            "g(0)",
+            f"z({TRAVEL_Z})",
+        ]
+        box += 1
+    return commands[:rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collision checker benchmark")
+    parser.add_argument('--rows', type=int, default=500, help="Rows in the generated program")
+    parser.add_argument('--sample-ms', type=float, default=50, help="Time between sampled poses")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed checks")
+    parser.add_argument('--unsafe-every', type=int, default=0, help="Carry every N-th box through the stack")
+    args = parser.parse_args()
+
+    commands = palletizing_program(args.rows, args.unsafe_every)
+    start = time.perf_counter()
+    timeline = SequenceTimeline(commands)
+    timeline_time = time.perf_counter() - start
+
+    times = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        report = check_timeline(timeline, sample_s=args.sample_ms / 1000)
+        times.append(time.perf_counter() - start)
+
+    print(f"{len(commands)} rows, {report.duration / 60:.1f} min of motion, {report.samples} poses, "
+          f"{report.placed} boxes placed")
+    print(f"Timeline: {timeline_time * 1000:.1f} ms, check: best {min(times) * 1000:.1f} ms, "
+          f"worst {max(times) * 1000:.1f} ms")
+    print(f"{len(report.violations)} violations")
+    for violation in report.violations[:10]:
+        print("  " + report.describe(violation))
+
+
+if __name__ == "__main__":
+    main()
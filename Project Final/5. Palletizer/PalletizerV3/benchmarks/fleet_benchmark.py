@@ -0,0 +1,93 @@
+"""
+Run several simulated palletizers from one process and check that a slow link
+does not stall the others.
+
+Each machine gets a SimulatedSerialPort with a SimulatedMasterDevice that
+completes rows after their predicted motion time (scaled by --time-scale).
+The first machine is the slow one: its port takes --slow-open seconds to open
+and runs at --slow-baud. Reports rows/min per machine and the longest gap in
+the Qt event loop.
+
+Usage:
+    python benchmarks/fleet_benchmark.py [--machines 8] [--duration 10] [--slow-open 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication, QTimer
+
+from palletizer.machine import MachineController
+from palletizer.simulated_serial import SimulatedSerialPort, SimulatedMasterDevice
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_port_factory(baudrate, time_scale, open_delay):
+    def factory(port, baud):
+        time.sleep(open_delay)
+        return SimulatedSerialPort(SimulatedMasterDevice(time_scale), baudrate)
+    return factory
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fleet scaling benchmark")
+    parser.add_argument('--machines', type=int, default=8, help="Number of simulated machines")
+    parser.add_argument('--duration', type=float, default=10.0, help="Seconds to run")
+    parser.add_argument('--baud', type=int, default=115200, help="Baud rate of the normal machines")
+    parser.add_argument('--slow-baud', type=int, default=1200, help="Baud rate of the slow machine")
+    parser.add_argument('--slow-open', type=float, default=3.0, help="Seconds the slow port takes to open")
+    parser.add_argument('--time-scale', type=float, default=0.01, help="Scale applied to simulated motion time")
+    parser.add_argument('--sequence', default=os.path.join(PROJECT_DIR, 'RunningTest_1.yaml'))
+    args = parser.parse_args()
+
+    app = QCoreApplication(sys.argv[:1])
+
+    machines = []
+    for i in range(args.machines):
+        slow = i == 0
+        machine = MachineController(f"M{i + 1}{' (slow)' if slow else ''}", "sim://",
+                                    sequence_path=args.sequence, repeat=True)
+        machine.link.port_factory = make_port_factory(
+            args.slow_baud if slow else args.baud, args.time_scale, args.slow_open if slow else 0.0)
+        machine.link.connection_status.connect(lambda connected, msg, m=machine: connected and m.start())
+        machines.append(machine)
+
+    # Measure event loop responsiveness with a 5 ms heartbeat
+    gaps = []
+    last_beat = [time.perf_counter()]
+
+    def heartbeat():
+        now = time.perf_counter()
+        gaps.append(now - last_beat[0])
+        last_beat[0] = now
+
+    beat_timer = QTimer()
+    beat_timer.timeout.connect(heartbeat)
+    beat_timer.start(5)
+
+    start = time.perf_counter()
+    for machine in machines:
+        machine.connect_link()
+    connect_ms = (time.perf_counter() - start) * 1000
+
+    QTimer.singleShot(int(args.duration * 1000), app.quit)
+    app.exec_()
+    elapsed = time.perf_counter() - start
+
+    print(f"connect_link() for {args.machines} machines returned in {connect_ms:.2f} ms")
+    for machine in machines:
+        print(f"{machine.name:>10}: {machine.rows_completed:5d} rows, "
+              f"{machine.rows_completed * 60.0 / elapsed:8.1f} rows/min, "
+              f"{machine.cycles_completed} cycles, state {machine.state}")
+    print(f"Longest event loop gap: {max(gaps) * 1000:.1f} ms (heartbeat 5 ms)")
+
+    for machine in machines:
+        machine.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Measure serial I/O timing under GUI load, with the link in a thread and in a separate process.
+
+A device process opens a pseudo-terminal (POSIX only) and writes a timestamped
+line every --interval ms. The link reads the lines; for each one the time from
+the device write to the link read is recorded (read latency). Meanwhile the Qt
+event loop runs Python work for --load-ms out of every 16 ms, standing in for
+3D updates and log rendering. PAUSE is also sent through the priority lane
+every 100 ms to measure request-to-wire latency.
+
+Usage:
+    python benchmarks/link_jitter_benchmark.py [--duration 5] [--interval 5] [--load-ms 12]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import QCoreApplication, QTimer
+
+from palletizer.serial_communicator import SerialCommunicator
+from palletizer.link_process import ProcessSerialCommunicator
+
+
+def device_main(interval, duration, ready_queue):
+    """Write a line with its monotonic write time every interval seconds"""
+    import tty
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    ready_queue.put(os.ttyname(slave))
+    ready_queue.get()  # Wait until the link is connected
+
+    next_time = time.monotonic()
+    end_time = next_time + duration
+    while next_time < end_time:
+        delay = next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        os.write(master, f"T {time.monotonic():.9f}\n".encode())
+        try:
+            # Drain commands sent by the link
+            os.set_blocking(master, False)
+            os.read(master, 4096)
+        except (BlockingIOError, OSError):
+            pass
+        next_time += interval
+    os.close(master)
+
+
+def burn_cpu(milliseconds):
+    """Pure Python work holding the GIL, like a heavy slot in the GUI thread"""
+    end = time.perf_counter() + milliseconds / 1000
+    total = 0
+    while time.perf_counter() < end:
+        for i in range(1000):
+            total += i * i
+    return total
+
+
+def run_mode(mode, args):
+    app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    context = multiprocessing.get_context('spawn')
+    ready_queue = context.Queue()
+    device = context.Process(target=device_main, args=(args.interval / 1000, args.duration, ready_queue))
+    device.start()
+    port = ready_queue.get()
+
+    link = ProcessSerialCommunicator() if mode == 'process' else SerialCommunicator()
+    latencies = []
+    link.add_line_listener(lambda timestamp, line: line.startswith("T ") and
+                           latencies.append(timestamp - float(line[2:])))
+    link.start()
+    link.connect(port, 115200)
+
+    # Wait for the connection before the device starts writing
+    deadline = time.monotonic() + 10
+    while not link.is_connected and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    ready_queue.put(True)
+
+    load_timer = QTimer()
+    if args.load_ms > 0:
+        load_timer.timeout.connect(lambda: burn_cpu(args.load_ms))
+        load_timer.start(16)
+    pause_timer = QTimer()
+    pause_timer.timeout.connect(lambda: link.send_priority_command("PAUSE"))
+    pause_timer.start(100)
+
+    QTimer.singleShot(int(args.duration * 1000) + 300, app.quit)
+    app.exec_()
+    load_timer.stop()
+    pause_timer.stop()
+
+    priority = link.priority_latency_stats()
+    link.stop()
+    device.join()
+
+    latencies_ms = sorted(latency * 1000 for latency in latencies)
+    if not latencies_ms:
+        print(f"{mode:>8}: no lines received")
+        return
+
+    def pct(fraction):
+        return latencies_ms[min(len(latencies_ms) - 1, int(len(latencies_ms) * fraction))]
+
+    print(f"{mode:>8}: read latency p50={pct(0.5):.2f} p99={pct(0.99):.2f} max={latencies_ms[-1]:.2f} ms, "
+          f"stdev={statistics.pstdev(latencies_ms):.2f} ms (n={len(latencies_ms)}); "
+          f"PAUSE to wire p50={priority['p50_ms']:.2f} p99={priority['p99_ms']:.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial link jitter benchmark")
+    parser.add_argument('--duration', type=float, default=5.0, help="Seconds per mode")
+    parser.add_argument('--interval', type=float, default=5.0, help="Milliseconds between device lines")
+    parser.add_argument('--load-ms', type=float, default=12.0, help="GUI work per 16 ms frame (0 = idle)")
+    parser.add_argument('--modes', default='thread,process', help="Comma separated: thread, process")
+    args = parser.parse_args()
+
+    print(f"GUI load: {args.load_ms:.0f} ms of Python work every 16 ms")
+    for mode in args.modes.split(','):
+        run_mode(mode.strip(), args)
+
+
+if __name__ == "__main__":
+    main()
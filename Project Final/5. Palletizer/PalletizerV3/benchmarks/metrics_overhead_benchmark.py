@@ -0,0 +1,139 @@
+"""
+Measure the cost of the runtime metrics on the serial hot path.
+
+A fake port hands the link loop --lines received lines, --batch lines per read,
+while one queued command is written per loop pass. The fastest of --rounds
+rounds gives the time per line. POSIX only.
+
+On the hot path the link only adds the number of received lines to a plain
+attribute once per read; the registry reads it when collecting. Timing the
+loop with and without that one addition is far below the run-to-run noise of
+a shared machine, so the overhead is computed from its measured cost.
+
+Usage:
+    python benchmarks/metrics_overhead_benchmark.py [--lines 50000] [--batch 1] [--rounds 10]
+"""
+import argparse
+import fcntl
+import os
+import struct
+import termios
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from palletizer.serial_communicator import SerialCommunicator
+from palletizer.utils.metrics import METRICS, Histogram
+
+
+class FloodPort:
+    """
+    Port stand-in that always has the next batch of lines ready. It makes the
+    same system calls per pass as pyserial on POSIX (FIONREAD ioctl, read, write)
+    on a pipe, so the per-line time is close to a real link's.
+    """
+
+    def __init__(self, lines, batch):
+        self.chunk = b"".join(f"[SLAVE] x;POS {i}\n".encode() for i in range(batch))
+        self.remaining = lines // batch
+        self.baudrate = 115200
+        self.is_open = True
+        self.out_waiting = 0
+        self.read_fd, self.write_fd = os.pipe()
+        self.null_fd = os.open(os.devnull, os.O_WRONLY)
+        self.buffered = 0  # Chunks in the pipe
+
+    @property
+    def in_waiting(self):
+        if not self.buffered and self.remaining:
+            # Refill in bulk, so the device side costs little per line
+            self.buffered = min(self.remaining, max(1, 32768 // len(self.chunk)))
+            os.write(self.write_fd, self.chunk * self.buffered)
+        waiting = struct.unpack('I', fcntl.ioctl(self.read_fd, termios.FIONREAD, b'\0\0\0\0'))[0]
+        return min(waiting, len(self.chunk))
+
+    def read(self, size):
+        self.remaining -= 1
+        self.buffered -= 1
+        return os.read(self.read_fd, size)
+
+    def write(self, data):
+        return os.write(self.null_fd, data)
+
+    def reset_output_buffer(self):
+        pass
+
+    def close(self):
+        if self.is_open:
+            self.is_open = False
+            for fd in (self.read_fd, self.write_fd, self.null_fd):
+                os.close(fd)
+
+
+def run_once(args):
+    link = SerialCommunicator()
+    port = FloodPort(args.lines, args.batch)
+    link.attach(port, "flood")
+    for i in range(args.lines // args.batch):
+        link.tx_queue.append(f"x({i})")
+
+    total = (args.lines // args.batch) * args.batch
+    received = [0]
+
+    def on_line(timestamp, line):
+        received[0] += 1
+        if received[0] == total:
+            link.running = False
+
+    link.add_line_listener(on_line)
+    # Data is always ready, like select() on a busy port; skip the idle wait
+    link.wait_for_activity = lambda timeout: None
+
+    start = time.perf_counter()
+    link.run()  # On this thread, so scheduling noise does not enter the measurement
+    elapsed = time.perf_counter() - start
+    port.close()
+
+    rx_lines = METRICS.find("palletizer_serial_rx_lines_total").collect()
+    assert rx_lines == total, rx_lines
+    return elapsed / total
+
+
+class Holder:
+    count = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Metrics overhead benchmark")
+    parser.add_argument('--lines', type=int, default=50000, help="Lines per round")
+    parser.add_argument('--batch', type=int, default=1, help="Lines per read (1 is the worst case)")
+    parser.add_argument('--rounds', type=int, default=10, help="Rounds")
+    args = parser.parse_args()
+
+    line_us = min(run_once(args) for _ in range(args.rounds)) * 1e6
+    print(f"Link loop, {args.batch} line(s) per read: {line_us:.3f} us/line")
+
+    number = 1000000
+
+    def cost_ns(statement, setup="pass", globals=None):
+        # Net of the timing loop itself
+        empty = min(timeit.repeat("pass", setup, number=number, repeat=5, globals=globals))
+        timed = min(timeit.repeat(statement, setup, number=number, repeat=5, globals=globals))
+        return max(0.0, timed - empty) / number * 1e9
+
+    update_ns = cost_ns("holder.count += len(lines)", "lines = [b'']", globals={'holder': Holder()})
+    histogram = Histogram("benchmark_seconds", "", {})
+    record_ns = min(timeit.repeat(lambda: histogram.record(0.0123), number=number // 10,
+                                  repeat=5)) / (number // 10) * 1e9
+
+    # The loop adds the received lines once per read; written commands are derived from the queues
+    per_line_ns = update_ns / args.batch
+    print(f"Updates: line count {update_ns:.1f} ns per read, "
+          f"Histogram.record {record_ns:.0f} ns (rows and priority commands only)")
+    print(f"Instrumentation: {per_line_ns:.1f} ns/line = {per_line_ns / 10 / line_us:.2f}% of the line handling time")
+
+
+if __name__ == "__main__":
+    main()
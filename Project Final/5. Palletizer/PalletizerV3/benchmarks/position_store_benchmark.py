@@ -0,0 +1,98 @@
+"""
+Measure the position history store: the cost of recording an event on the
+calling (link/GUI) thread, the sustained write rate of the recorder thread,
+and range query latency over a long history.
+
+A history of --hours hours at --rate rows per second is written into a temporary
+directory, then random one-minute, one-hour and full-range queries are timed.
+Queries within one segment return views of the mapped files, so their cost does
+not depend on the number of rows.
+
+Usage:
+    python benchmarks/position_store_benchmark.py [--hours 8] [--rate 100] [--events 200000]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from palletizer.position_recorder import PositionRecorder, STATE_CODES
+from palletizer.position_store import PositionStore
+
+
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q)) * 1000
+
+
+def benchmark_recorder(directory, events):
+    """Queue lines the way the link thread does and wait for the recorder to write them"""
+    recorder = PositionRecorder([PositionStore(directory)])
+    axes = ['x', 'y', 'z', 't', 'g']
+    lines = []
+    for i in range(events // 2):
+        axis = axes[i % len(axes)]
+        lines.append((f"{axis}({i})", f"[SLAVE] {axis};SEQUENCE COMPLETED"))
+
+    start = time.perf_counter()
+    queue_time = 0.0
+    for command, line in lines:
+        t0 = time.perf_counter()
+        recorder.on_sent(command)
+        recorder.on_line(time.monotonic(), line)
+        queue_time += time.perf_counter() - t0
+    recorder.close()
+    elapsed = time.perf_counter() - start
+
+    print(f"Recorder: {events} events, {recorder.rows_written} rows in {elapsed:.2f} s "
+          f"({recorder.rows_written / elapsed:.0f} rows/s)")
+    print(f"  Caller cost per event: {queue_time / events * 1e6:.2f} us")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Position history store benchmark")
+    parser.add_argument('--hours', type=float, default=8.0, help="Hours of history to write")
+    parser.add_argument('--rate', type=float, default=100.0, help="Rows per second of history")
+    parser.add_argument('--events', type=int, default=200000, help="Events queued through the recorder")
+    parser.add_argument('--queries', type=int, default=200, help="Queries per range size")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        benchmark_recorder(os.path.join(directory, 'recorder'), args.events)
+
+        # Write the history directly, with timestamps spread over the hours
+        rows = int(args.hours * 3600 * args.rate)
+        store = PositionStore(os.path.join(directory, 'history'), segment_rows=int(3600 * args.rate) + 1)
+        start_time = time.time() - args.hours * 3600
+        positions = [0, 0, 0, 0, 0]
+        running = STATE_CODES['Running']
+        start = time.perf_counter()
+        for row in range(rows):
+            positions[row % 5] = row
+            store.append(start_time + row / args.rate, positions, running)
+        elapsed = time.perf_counter() - start
+        print(f"Store: {rows} rows in {elapsed:.2f} s ({rows / elapsed:.0f} rows/s, "
+              f"{elapsed / rows * 1e6:.2f} us/row), {len(store.segment_names())} segments")
+
+        end_time = start_time + rows / args.rate
+        for label, span in (("1 min", 60.0), ("1 h", 3600.0), ("all", end_time - start_time)):
+            samples = []
+            returned = 0
+            for _ in range(args.queries):
+                first = random.uniform(start_time, max(start_time, end_time - span))
+                t0 = time.perf_counter()
+                blocks = store.query(first, first + span)
+                samples.append(time.perf_counter() - t0)
+                returned += sum(len(block.timestamps) for block in blocks)
+            print(f"Query {label:<6}: p50 {percentile_ms(samples, 50):.3f} ms  "
+                  f"p99 {percentile_ms(samples, 99):.3f} ms  ({returned // args.queries} rows each)")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Measure latency of the priority lane while the normal queue is full.
+
+Connects a SerialCommunicator to a SimulatedSerialPort, which models the wire
+time of every byte at the chosen baud rate. The normal queue is filled with
+sequence rows, and PAUSE commands are sent through the priority lane at a fixed
+interval. Reports command-to-wire latency (time until the command is written to
+the port) and arrival latency (time until the device has received the full line).
+
+Usage:
+    python benchmarks/priority_latency_benchmark.py [--rows 500] [--baud 9600] [--count 20] [--flush]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from palletizer.serial_communicator import SerialCommunicator
+from palletizer.simulated_serial import SimulatedSerialPort, LineDevice
+
+ROW = "x(5700),y(15500),z(4000),t(-600),g(1000)"
+
+
+class RecordingDevice(LineDevice):
+    """Simulated device that timestamps every received line"""
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def handle_line(self, line, timestamp):
+        self.lines.append((timestamp, line))
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Priority lane latency benchmark")
+    parser.add_argument('--rows', type=int, default=500, help="Rows queued in the normal lane")
+    parser.add_argument('--baud', type=int, default=9600, help="Simulated wire speed")
+    parser.add_argument('--count', type=int, default=20, help="Number of priority commands")
+    parser.add_argument('--interval', type=float, default=0.1, help="Seconds between priority commands")
+    parser.add_argument('--flush', action='store_true', help="Flush pending output before each command")
+    args = parser.parse_args()
+
+    device = RecordingDevice()
+    link = SerialCommunicator()
+    link.attach(SimulatedSerialPort(device, args.baud), "sim://")
+    link.start()
+
+    for _ in range(args.rows):
+        link.send_command(ROW)
+
+    sent_at = []
+    for _ in range(args.count):
+        time.sleep(args.interval)
+        sent_at.append(time.perf_counter())
+        link.send_priority_command("PAUSE", flush_pending=args.flush)
+
+    time.sleep(0.5)
+    stats = link.priority_latency_stats()
+    queued = len(link.tx_queue)
+    link.stop()
+
+    arrivals = [t for t, line in device.lines if line == "PAUSE"]
+    arrival_ms = [(arrival - sent) * 1000 for sent, arrival in zip(sent_at, arrivals)]
+    row_wire_ms = len(ROW + '\n') * 10 / args.baud * 1000
+
+    print(f"Normal rows still queued: {queued} of {args.rows}")
+    print(f"Command-to-wire latency: p50={stats['p50_ms']:.3f} ms p99={stats['p99_ms']:.3f} ms "
+          f"max={stats['max_ms']:.3f} ms (n={stats['count']})")
+    if arrival_ms:
+        print(f"Received at device: p50={percentile(arrival_ms, 0.5):.1f} ms "
+              f"p99={percentile(arrival_ms, 0.99):.1f} ms max={max(arrival_ms):.1f} ms "
+              f"(n={len(arrival_ms)}, one row takes {row_wire_ms:.1f} ms on the wire)")
+
+
+if __name__ == "__main__":
+    main()
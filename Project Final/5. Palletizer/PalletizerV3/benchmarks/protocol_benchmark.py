@@ -0,0 +1,114 @@
+"""
+Compare the text protocol with the binary framed protocol of the host link.
+
+Reports the wire bytes per row of a palletizing program and the time they
+spend on the wire at --baud, the encode and decode throughput of both
+protocols (decoding in --chunk byte reads like the link loop), and the row
+round trip through a SerialCommunicator talking to the simulated master over
+a timed wire, with rows completing at once so only the link is measured.
+
+Usage:
+    python benchmarks/protocol_benchmark.py [--rows 400] [--baud 9600] [--chunk 16] [--round-trips 40]
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from collision_benchmark import palletizing_program
+from palletizer.binary_protocol import FrameDecoder, encode, encode_text
+from palletizer.serial_communicator import SerialCommunicator
+from palletizer.simulated_serial import SimulatedSerialPort, SimulatedMasterDevice
+from palletizer.utils.config import COMPLETE_FEEDBACK
+
+
+def row_commands(rows):
+    """Rows as the sequence panel sends them, with ", " between the axes"""
+    return [command.replace(",", ", ") for command in palletizing_program(rows)]
+
+
+def time_per_row(function, commands, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(commands)
+        best = min(best, time.perf_counter() - start)
+    return best / len(commands)
+
+
+def decode_all(stream, chunk):
+    decoder = FrameDecoder()
+    lines = 0
+    for offset in range(0, len(stream), chunk):
+        lines += len(decoder.feed(stream[offset:offset + chunk]))
+    return lines
+
+
+def round_trips(binary, commands, baud):
+    """Mean time from queuing a row to its completion feedback, in seconds"""
+    device = SimulatedMasterDevice(time_scale=0.0, binary_protocol=binary)
+    port = SimulatedSerialPort(device, baud)
+    link = SerialCommunicator()
+    link.binary_protocol = binary
+    link.attach(port, "sim://")
+
+    done = threading.Event()
+    sent = []
+    times = []
+
+    def send_next():
+        if len(sent) == len(commands):
+            done.set()
+            return
+        sent.append(time.perf_counter())
+        link.send_command(commands[len(sent) - 1])
+
+    def on_line(timestamp, line):
+        if line.endswith(COMPLETE_FEEDBACK):
+            times.append(time.perf_counter() - sent[-1])
+            send_next()
+
+    link.add_line_listener(on_line)
+    link.start()
+    # Let the negotiation settle before the measured rows
+    deadline = time.perf_counter() + 2
+    while binary and link.protocol != 'binary' and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    send_next()
+    done.wait(60)
+    link.stop()
+    return sum(times) / len(times), link.protocol
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Text vs binary link protocol benchmark")
+    parser.add_argument('--rows', type=int, default=400, help="Rows in the generated program")
+    parser.add_argument('--baud', type=int, default=9600, help="Wire speed for the wire time and round trips")
+    parser.add_argument('--chunk', type=int, default=16, help="Bytes per decoder read")
+    parser.add_argument('--round-trips', type=int, default=40, help="Rows sent through the simulated link")
+    args = parser.parse_args()
+
+    commands = row_commands(args.rows)
+    byte_time = 10 / args.baud
+    print(f"{len(commands)} rows, {args.baud} baud")
+
+    for name, encoder in (('text', encode_text), ('binary', encode)):
+        stream = b"".join(encoder(command) for command in commands)
+        per_row = len(stream) / len(commands)
+        encode_time = time_per_row(lambda rows: [encoder(row) for row in rows], commands)
+        decode_time = time_per_row(lambda rows: decode_all(stream, args.chunk), commands)
+        assert decode_all(stream, args.chunk) == len(commands)
+        print(f"{name:>7}: {per_row:5.1f} bytes/row, {per_row * byte_time * 1000:5.1f} ms/row on the wire, "
+              f"encode {encode_time * 1e6:5.1f} us/row, decode {decode_time * 1e6:5.1f} us/row "
+              f"({len(stream) / (decode_time * len(commands)) / 1e6:.1f} MB/s)")
+
+    for binary in (False, True):
+        mean, protocol = round_trips(binary, commands[:args.round_trips], args.baud)
+        print(f"{protocol:>7}: row round trip {mean * 1000:.1f} ms (row out, completion lines back)")
+
+
+if __name__ == "__main__":
+    main()
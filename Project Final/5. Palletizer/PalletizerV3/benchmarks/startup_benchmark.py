@@ -0,0 +1,63 @@
+"""
+Cold start regression benchmark for main.py.
+
+Starts the application in fresh processes with --startup-trace and
+--exit-after-startup, and fails (exit code 1) if the median cold start time
+exceeds the configured budget (STARTUP_BUDGET_MS in palletizer/utils/config.py).
+
+Usage:
+    python benchmarks/startup_benchmark.py [--runs 5] [--budget 3000]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+
+from palletizer.utils.config import STARTUP_BUDGET_MS
+
+
+def run_once(trace_path, timeout):
+    """Start main.py once and return the recorded startup trace"""
+    subprocess.run(
+        [sys.executable, os.path.join(PROJECT_DIR, 'main.py'),
+         '--startup-trace', trace_path, '--exit-after-startup'],
+        cwd=PROJECT_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        timeout=timeout, check=True
+    )
+    with open(trace_path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold start benchmark for main.py")
+    parser.add_argument('--runs', type=int, default=5, help="Number of cold starts to measure")
+    parser.add_argument('--budget', type=float, default=STARTUP_BUDGET_MS, help="Budget in milliseconds")
+    parser.add_argument('--timeout', type=float, default=60, help="Timeout per run in seconds")
+    args = parser.parse_args()
+
+    totals = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for i in range(args.runs):
+            trace = run_once(os.path.join(tmp_dir, f'trace_{i}.json'), args.timeout)
+            totals.append(trace['total_ms'])
+            print(f"Run {i + 1}: {trace['total_ms']:.1f} ms")
+
+    median = statistics.median(totals)
+    print(f"Median cold start: {median:.1f} ms (min {min(totals):.1f}, max {max(totals):.1f}), "
+          f"budget {args.budget:.0f} ms")
+
+    if median > args.budget:
+        print("FAIL: cold start exceeds budget")
+        sys.exit(1)
+
+    print("PASS")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Measure GUI thread time spent on 3D visualization updates.
+
+Feeds a burst of five-axis position rows into the VisualizationPanel, once with
+the legacy behaviour (one scene update per axis) and once with frame-coalesced
+updates, and prints the time spent in visualization for both runs.
+
+Usage:
+    python benchmarks/visualization_render_benchmark.py [--rows 200] [--rate 50] [--batched]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+from palletizer.utils.config import SLAVE_IDS
+
+
+def run_feed(panel, rows, rate, coalesce):
+    """Feed position rows at the given rate and return the measured statistics."""
+    app = QApplication.instance()
+    panel.render_scheduler.coalesce = coalesce
+    panel.render_scheduler.reset_stats()
+
+    interval = 1.0 / rate
+    update_time = 0.0
+    start = time.perf_counter()
+
+    for i in range(rows):
+        row_start = time.perf_counter()
+        for axis_index, axis in enumerate(SLAVE_IDS):
+            panel.update_position(axis, (i * 10 + axis_index * 50) % 900)
+        update_time += time.perf_counter() - row_start
+
+        # Let pending timers fire, as the event loop would between feedback lines
+        deadline = start + (i + 1) * interval
+        while time.perf_counter() < deadline:
+            app.processEvents()
+
+    # Drain the last scheduled frame
+    panel.render_scheduler.flush()
+    stats = panel.render_scheduler.stats()
+    stats['update_position_total_ms'] = update_time * 1000
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="3D visualization render benchmark")
+    parser.add_argument('--rows', type=int, default=200, help="Number of five-axis rows to feed")
+    parser.add_argument('--rate', type=float, default=50, help="Rows per second")
+    parser.add_argument('--batched', action='store_true', help="Render the mechanism as one batched mesh")
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv)
+
+    from palletizer.ui.visualization import VisualizationPanel
+    panel = VisualizationPanel()
+    panel.show()
+    panel.initialize_visualization()
+    panel.model_ctrl.set_batched_mesh(args.batched)
+    app.processEvents()
+
+    for label, coalesce in (("legacy (per update)", False), ("coalesced (per frame)", True)):
+        stats = run_feed(panel, args.rows, args.rate, coalesce)
+        gui_time = stats['update_position_total_ms'] + (stats['render_time_total_ms'] if coalesce else 0)
+        print(f"{label}:")
+        print(f"  requests={stats['requests']} frames={stats['frames']} hidden_skips={stats['hidden_skips']}")
+        print(f"  render avg={stats['render_time_avg_ms']:.3f} ms max={stats['render_time_max_ms']:.3f} ms")
+        print(f"  GUI thread time in visualization={gui_time:.1f} ms")
+
+    panel.close()
+
+
+if __name__ == "__main__":
+    main()
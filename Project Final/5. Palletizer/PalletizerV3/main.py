@@ -1,14 +1,81 @@
+import time
+STARTUP_START = time.perf_counter()
+
+import argparse
 import sys
-from PyQt5.QtWidgets import QApplication
-from palletizer.ui.main_window import PalletizerControlApp
+from palletizer.utils.startup_profiler import PROFILER
+
+
+def parse_arguments():
+    """Parse application arguments, leaving any Qt arguments untouched"""
+    parser = argparse.ArgumentParser(description="Palletizer Control System")
+    parser.add_argument('--startup-trace', nargs='?', const='startup_trace.json', metavar='PATH',
+                        help="Record per-phase and per-module startup timings and write a report")
+    parser.add_argument('--exit-after-startup', action='store_true',
+                        help="Quit as soon as startup has completed (used by the startup benchmark)")
+    parser.add_argument('--diagnose-stalls', nargs='?', const='stall_report.json', metavar='PATH',
+                        help="Time every GUI slot, capture the stack of event loop stalls and write a report on exit")
+    parser.add_argument('--stall-threshold-ms', type=float, metavar='MS',
+                        help="Event loop stall threshold for --diagnose-stalls")
+    parser.add_argument('--fleet', metavar='PATH',
+                        help="Drive several palletizers from one window, as listed in a fleet YAML file")
+    return parser.parse_known_args()
 
 
 def main():
     """Main entry point for the Palletizer Control application"""
-    app = QApplication(sys.argv)
-    window = PalletizerControlApp()
-    window.show()
-    sys.exit(app.exec_())
+    args, qt_args = parse_arguments()
+    if args.startup_trace:
+        PROFILER.start(STARTUP_START)
+
+    with PROFILER.phase("Import Qt and application modules"):
+        from PyQt5.QtWidgets import QApplication
+        from PyQt5.QtCore import QTimer
+        from palletizer.utils.loop_monitor import LOOP_MONITOR
+        if args.fleet:
+            from palletizer.machine import load_fleet_config
+            from palletizer.ui.fleet_panel import FleetWindow
+        else:
+            from palletizer.ui.main_window import PalletizerControlApp
+
+    if args.diagnose_stalls:
+        # Slots are wrapped when they are connected, so this has to happen before the window is built
+        LOOP_MONITOR.enable_diagnostics(args.stall_threshold_ms)
+
+    with PROFILER.phase("Create QApplication"):
+        app = QApplication(sys.argv[:1] + qt_args)
+
+    with PROFILER.phase("Create main window"):
+        if args.fleet:
+            window = FleetWindow(load_fleet_config(args.fleet))
+        else:
+            window = PalletizerControlApp()
+
+    with PROFILER.phase("Show main window"):
+        window.show()
+
+    def on_started():
+        # Runs once the event loop has started and the window is up
+        window.report_startup_time(STARTUP_START)
+
+        if args.startup_trace:
+            PROFILER.stop()
+            text_path = PROFILER.write_report(args.startup_trace)
+            print(PROFILER.format_report())
+            print(f"Startup trace written to {args.startup_trace} and {text_path}")
+
+        if args.exit_after_startup:
+            app.quit()
+
+    QTimer.singleShot(0, on_started)
+
+    exit_code = app.exec_()
+
+    if args.diagnose_stalls:
+        text_path = LOOP_MONITOR.write_report(args.diagnose_stalls)
+        print(f"Stall report written to {args.diagnose_stalls} and {text_path}")
+
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,570 @@
+"""
+asyncio implementation of the palletizer serial link.
+
+The same link as SerialCommunicator, but built on an asyncio transport and
+protocol instead of a QThread, so it can be used without Qt and one event
+loop can drive several links, timers and servers:
+
+    link = AsyncPalletizerLink()
+    await link.open("/dev/ttyUSB0", 115200)
+    await link.send("START")
+    result = await link.run_row("x(100), y(200)")
+
+    async for event in link.events():
+        ...
+
+In the GUI the asyncio loop runs inside the Qt event loop (see
+install_qt_event_loop), so no extra thread is needed.
+
+Headless use:
+    python -m palletizer.aio_link PORT --sequence RunningTest_1.yaml [--baud 115200] [--repeat 1]
+    python -m palletizer.aio_link sim:// --sequence RunningTest_1.yaml --simulate
+"""
+import argparse
+import asyncio
+import collections
+import time
+
+import serial
+
+try:
+    import qasync
+except ImportError:
+    qasync = None
+
+from palletizer.motion import estimate_row_durations, parse_targets, row_timeout
+from palletizer.serial_communicator import summarize_latencies
+from palletizer.utils.config import (DEFAULT_BAUDRATE, SERIAL_POLL_INTERVAL, SERIAL_AUTO_RECONNECT,
+                                     SERIAL_RECONNECT_INITIAL_DELAY, SERIAL_RECONNECT_MAX_DELAY,
+                                     SERIAL_RECONNECT_TIMEOUT, COMPLETE_FEEDBACK, SLAVE_COMPLETED_MESSAGE,
+                                     CMD_START, CMD_SPEED_FORMAT, MOTION_DEFAULT_SPEED, SLAVE_IDS,
+                                     ASYNCIO_QT_STEP_MS)
+
+EVENT_QUEUE_SIZE = 1000  # Events kept per subscriber; the oldest are dropped when a consumer falls behind
+
+# Event kinds
+EVENT_LINE = "line"
+EVENT_CONNECTED = "connected"
+EVENT_DISCONNECTED = "disconnected"
+EVENT_RECONNECTING = "reconnecting"
+EVENT_RECONNECT_FAILED = "reconnect_failed"
+EVENT_PRIORITY_SENT = "priority_sent"
+EVENT_ROW_STARTED = "row_started"
+EVENT_ROW_COMPLETED = "row_completed"
+EVENT_ROW_TIMEOUT = "row_timeout"
+
+# timestamp is time.monotonic() when the event happened (for lines: when they were read)
+LinkEvent = collections.namedtuple('LinkEvent', ['kind', 'data', 'timestamp'])
+
+RowResult = collections.namedtuple('RowResult', ['command', 'estimated_s', 'elapsed_s', 'axis_times'])
+
+
+class RowTimeoutError(Exception):
+    """A row did not report completion before its predicted deadline"""
+
+    def __init__(self, command, estimated_s, timeout_s, pending_axes, completed_axes):
+        self.command = command
+        self.estimated_s = estimated_s
+        self.timeout_s = timeout_s
+        self.pending_axes = pending_axes
+        self.completed_axes = completed_axes
+        missing = ", ".join(axis.upper() for axis in pending_axes) or "master feedback"
+        super().__init__(f"Row did not complete within {timeout_s:.1f} s "
+                         f"(estimated {estimated_s:.1f} s); no completion from: {missing}")
+
+
+class SerialTransport(asyncio.Transport):
+    """
+    asyncio transport over an open pyserial (or pyserial-like) port.
+    Ports with a file descriptor are watched with loop.add_reader; others, such as
+    SimulatedSerialPort or URL handlers, are polled every SERIAL_POLL_INTERVAL.
+    """
+
+    def __init__(self, loop, protocol, serial_port):
+        super().__init__()
+        self.loop = loop
+        self.protocol = protocol
+        self.serial_port = serial_port
+        self.closing = False
+        self.poll_handle = None
+
+        try:
+            self.fileno = serial_port.fileno()
+        except (AttributeError, NotImplementedError, OSError, ValueError, serial.SerialException):
+            self.fileno = None
+
+        self.loop.call_soon(self.protocol.connection_made, self)
+        if self.fileno is not None:
+            try:
+                self.loop.add_reader(self.fileno, self._read_ready)
+            except NotImplementedError:
+                # e.g. ProactorEventLoop on Windows
+                self.fileno = None
+        if self.fileno is None:
+            self.poll_handle = self.loop.call_later(SERIAL_POLL_INTERVAL, self._poll)
+
+    def _read_ready(self):
+        try:
+            data = self.serial_port.read(self.serial_port.in_waiting or 1)
+        except (OSError, serial.SerialException) as e:
+            self._fatal_error(e)
+            return
+        if data:
+            self.protocol.data_received(data)
+
+    def _poll(self):
+        self.poll_handle = None
+        try:
+            waiting = self.serial_port.in_waiting
+            data = self.serial_port.read(waiting) if waiting else b''
+        except (OSError, serial.SerialException) as e:
+            self._fatal_error(e)
+            return
+        if data:
+            self.protocol.data_received(data)
+        if not self.closing:
+            self.poll_handle = self.loop.call_later(SERIAL_POLL_INTERVAL, self._poll)
+
+    def write(self, data):
+        if self.closing:
+            return
+        try:
+            self.serial_port.write(data)
+        except (OSError, serial.SerialException) as e:
+            self._fatal_error(e)
+
+    def reset_output_buffer(self):
+        try:
+            self.serial_port.reset_output_buffer()
+        except (AttributeError, NotImplementedError, OSError, serial.SerialException):
+            pass
+
+    def get_write_buffer_size(self):
+        """Bytes written to the port but not yet on the wire"""
+        try:
+            return self.serial_port.out_waiting
+        except (AttributeError, NotImplementedError, OSError, serial.SerialException):
+            return 0
+
+    def can_write_eof(self):
+        return False
+
+    def is_closing(self):
+        return self.closing
+
+    def get_extra_info(self, name, default=None):
+        if name == 'serial':
+            return self.serial_port
+        return default
+
+    def _stop_reading(self):
+        if self.fileno is not None:
+            self.loop.remove_reader(self.fileno)
+        if self.poll_handle is not None:
+            self.poll_handle.cancel()
+            self.poll_handle = None
+
+    def _close(self, exc):
+        if self.closing:
+            return
+        self.closing = True
+        self._stop_reading()
+        try:
+            self.serial_port.close()
+        except (OSError, serial.SerialException):
+            pass
+        self.loop.call_soon(self.protocol.connection_lost, exc)
+
+    def _fatal_error(self, exc):
+        self._close(exc)
+
+    def close(self):
+        self._close(None)
+
+    def abort(self):
+        self._close(None)
+
+
+class PalletizerProtocol(asyncio.Protocol):
+    """Splits received bytes into lines and hands them to the link"""
+
+    def __init__(self, link):
+        self.link = link
+        self.rx_buffer = b''
+
+    def connection_made(self, transport):
+        self.link.on_connection_made(transport)
+
+    def data_received(self, data):
+        timestamp = time.monotonic()
+        self.rx_buffer += data
+        while b'\n' in self.rx_buffer:
+            raw_line, self.rx_buffer = self.rx_buffer.split(b'\n', 1)
+            line = raw_line.decode('utf-8', errors='ignore').strip()
+            if line:
+                self.link.on_line(line, timestamp)
+
+    def connection_lost(self, exc):
+        self.link.on_connection_lost(exc)
+
+
+class AsyncPalletizerLink:
+    """
+    Palletizer link on an asyncio event loop. Normal commands go out one line at a
+    time (at most one line in the output buffer, like SerialCommunicator), priority
+    commands go out immediately. Rows can be awaited until the master reports
+    ALL_SLAVES_COMPLETED, with a deadline from the motion estimate.
+    """
+
+    def __init__(self, port_factory=None, auto_reconnect=SERIAL_AUTO_RECONNECT):
+        self.port_factory = port_factory  # Callable(port, baudrate) returning an open port; None for pyserial
+        self.auto_reconnect = auto_reconnect
+        self.port_name = None
+        self.baudrate = DEFAULT_BAUDRATE
+        self.transport = None
+        self.protocol = None
+        self.user_disconnected = False
+        self.reconnect_task = None
+
+        self.send_lock = None  # Created on first use so the link can be built outside the loop
+        self.connected_event = None
+        self.subscribers = set()
+        self.line_listeners = []
+        self.priority_latencies = collections.deque(maxlen=256)
+
+        # Row in progress
+        self.row_future = None
+        self.row_pending_axes = set()
+        self.row_axis_times = {}
+        self.row_started_at = 0.0
+
+        # Motion estimate state, like the row watchdog
+        self.positions = {}
+        self.axis_speeds = {axis: MOTION_DEFAULT_SPEED for axis in SLAVE_IDS}
+
+    @property
+    def is_connected(self):
+        return self.transport is not None and not self.transport.is_closing()
+
+    def _ensure_primitives(self):
+        if self.send_lock is None:
+            self.send_lock = asyncio.Lock()
+            self.connected_event = asyncio.Event()
+
+    # Connection
+
+    def _open_port(self, port, baudrate):
+        if self.port_factory is not None:
+            return self.port_factory(port, baudrate)
+        return serial.serial_for_url(port, baudrate, timeout=0, write_timeout=SERIAL_RECONNECT_MAX_DELAY)
+
+    async def open(self, port, baudrate=DEFAULT_BAUDRATE):
+        """Open the port; opening can block (USB enumeration) so it runs in the default executor"""
+        self._ensure_primitives()
+        loop = asyncio.get_running_loop()
+        serial_port = await loop.run_in_executor(None, self._open_port, port, baudrate)
+        self.attach(serial_port, port)
+        await self.connected_event.wait()
+
+    def attach(self, serial_port, port=None):
+        """Use an already open port"""
+        self._ensure_primitives()
+        self.port_name = port
+        self.baudrate = getattr(serial_port, 'baudrate', self.baudrate)
+        self.user_disconnected = False
+        self.protocol = PalletizerProtocol(self)
+        self.transport = SerialTransport(asyncio.get_running_loop(), self.protocol, serial_port)
+        return self.transport
+
+    def close(self):
+        """User-initiated disconnect; no automatic reconnect"""
+        self.user_disconnected = True
+        if self.reconnect_task is not None:
+            self.reconnect_task.cancel()
+            self.reconnect_task = None
+        if self.transport is not None:
+            self.transport.close()
+
+    def on_connection_made(self, transport):
+        self.connected_event.set()
+        self.publish(EVENT_CONNECTED, self.port_name)
+
+    def on_connection_lost(self, exc):
+        self.transport = None
+        self.connected_event.clear()
+        self.publish(EVENT_DISCONNECTED, str(exc) if exc else "")
+        self._fail_row(ConnectionError(f"Link lost: {exc}" if exc else "Link closed"))
+
+        if exc is not None and self.auto_reconnect and not self.user_disconnected and self.port_name:
+            self.reconnect_task = asyncio.ensure_future(self.reconnect())
+
+    async def reconnect(self):
+        """Re-open the port with exponential backoff until SERIAL_RECONNECT_TIMEOUT"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + SERIAL_RECONNECT_TIMEOUT
+        delay = SERIAL_RECONNECT_INITIAL_DELAY
+        attempt = 0
+        while loop.time() < deadline:
+            attempt += 1
+            self.publish(EVENT_RECONNECTING, (attempt, delay))
+            await asyncio.sleep(delay)
+            try:
+                serial_port = await loop.run_in_executor(None, self._open_port, self.port_name, self.baudrate)
+            except (OSError, serial.SerialException):
+                delay = min(delay * 2, SERIAL_RECONNECT_MAX_DELAY)
+                continue
+            self.reconnect_task = None
+            self.attach(serial_port, self.port_name)
+            return True
+
+        self.reconnect_task = None
+        self.publish(EVENT_RECONNECT_FAILED, self.port_name)
+        return False
+
+    async def wait_connected(self, timeout=None):
+        self._ensure_primitives()
+        await asyncio.wait_for(self.connected_event.wait(), timeout)
+
+    # Sending
+
+    async def send(self, command):
+        """Send a command after the previous one has left the output buffer"""
+        self._ensure_primitives()
+        async with self.send_lock:
+            if not self.is_connected:
+                raise ConnectionError("Not connected")
+            await self._drain()
+            self.transport.write((command + '\n').encode())
+            self.track_speed_command(command)
+
+    async def _drain(self):
+        while self.is_connected and self.transport.get_write_buffer_size() > 0:
+            await asyncio.sleep(SERIAL_POLL_INTERVAL / 10)
+
+    def send_priority(self, command, flush_pending=False):
+        """
+        Write a command now, ahead of any normal command waiting in send().
+        With flush_pending the bytes still in the output buffer are dropped.
+        """
+        if not self.is_connected:
+            return False
+        queued_at = time.perf_counter()
+        payload = (command + '\n').encode()
+        if flush_pending:
+            self.transport.reset_output_buffer()
+            payload = b'\n' + payload
+        self.transport.write(payload)
+
+        latency = time.perf_counter() - queued_at
+        self.priority_latencies.append(latency)
+        self.publish(EVENT_PRIORITY_SENT, (command, latency * 1000))
+        return True
+
+    def priority_latency_stats(self):
+        return summarize_latencies(self.priority_latencies)
+
+    def track_speed_command(self, command):
+        """Keep the motion estimate in step with SPEED;slave_id;value commands"""
+        parts = command.split(';')
+        if len(parts) == 3 and parts[0] == CMD_SPEED_FORMAT.split(';')[0]:
+            try:
+                speed = int(parts[2])
+            except ValueError:
+                return
+            for axis in ([parts[1]] if parts[1] else SLAVE_IDS):
+                self.axis_speeds[axis] = speed
+
+    # Rows
+
+    async def run_row(self, command, timeout=None):
+        """
+        Send a row and wait until the master reports completion. Without a timeout
+        the deadline comes from the motion estimate; raises RowTimeoutError when it
+        passes, or ConnectionError if the link drops.
+        """
+        if self.row_future is not None and not self.row_future.done():
+            raise RuntimeError("A row is already running")
+
+        durations = estimate_row_durations(command, self.positions, self.axis_speeds)
+        estimated_s = max(durations.values(), default=0.0)
+        if timeout is None:
+            timeout = row_timeout(estimated_s)
+
+        self.row_future = asyncio.get_running_loop().create_future()
+        self.row_pending_axes = set(durations)
+        self.row_axis_times = {}
+        await self.send(command)
+        self.row_started_at = time.monotonic()
+        self.publish(EVENT_ROW_STARTED, command)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(self.row_future), timeout)
+        except asyncio.TimeoutError:
+            error = RowTimeoutError(command, estimated_s, timeout, sorted(self.row_pending_axes),
+                                    sorted(self.row_axis_times))
+            self.publish(EVENT_ROW_TIMEOUT, error)
+            raise error from None
+        finally:
+            self.row_future = None
+
+        self.positions.update(parse_targets(command))
+        result = RowResult(command, estimated_s, time.monotonic() - self.row_started_at, dict(self.row_axis_times))
+        self.publish(EVENT_ROW_COMPLETED, result)
+        return result
+
+    async def run_sequence(self, rows, start=True):
+        """Run row commands in order; rows may be strings or sequence file rows (axis -> command)"""
+        if start:
+            await self.send(CMD_START)
+        results = []
+        for row in rows:
+            command = ", ".join(row.values()) if isinstance(row, dict) else row
+            results.append(await self.run_row(command))
+        return results
+
+    def _fail_row(self, error):
+        if self.row_future is not None and not self.row_future.done():
+            self.row_future.set_exception(error)
+
+    # Receiving
+
+    def add_line_listener(self, listener):
+        """Register a callable(timestamp, line), called for every line on the loop thread"""
+        self.line_listeners.append(listener)
+
+    def on_line(self, line, timestamp):
+        for listener in self.line_listeners:
+            listener(timestamp, line)
+        self.publish(EVENT_LINE, line, timestamp)
+
+        if self.row_future is None or self.row_future.done():
+            return
+        if line.startswith("[SLAVE]") and SLAVE_COMPLETED_MESSAGE in line:
+            axis = line[len("[SLAVE]"):].split(';')[0].strip().lower()
+            self.row_pending_axes.discard(axis)
+            self.row_axis_times[axis] = timestamp - self.row_started_at
+        elif COMPLETE_FEEDBACK in line:
+            self.row_future.set_result(True)
+
+    def publish(self, kind, data=None, timestamp=None):
+        event = LinkEvent(kind, data, time.monotonic() if timestamp is None else timestamp)
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def events(self):
+        """Async iterator over link events from the moment of subscription"""
+        queue = asyncio.Queue(EVENT_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.subscribers.discard(queue)
+
+
+class QtAsyncioDriver:
+    """
+    Runs an asyncio loop inside the Qt event loop by stepping it from a QTimer.
+    Used when qasync is not installed; each step runs the callbacks that are ready
+    and polls the selector without blocking.
+    """
+
+    def __init__(self, loop, interval_ms=ASYNCIO_QT_STEP_MS, parent=None):
+        from PyQt5.QtCore import QTimer
+        self.loop = loop
+        self.timer = QTimer(parent)
+        self.timer.timeout.connect(self.step)
+        self.interval_ms = interval_ms
+
+    def start(self):
+        self.timer.start(self.interval_ms)
+
+    def stop(self):
+        self.timer.stop()
+
+    def step(self):
+        if self.loop.is_running() or self.loop.is_closed():
+            return
+        self.loop.call_soon(self.loop.stop)
+        self.loop.run_forever()
+
+
+_qt_event_loop = None  # The loop made by install_qt_event_loop, shared by every caller
+
+
+def install_qt_event_loop(app):
+    """
+    Make an asyncio loop that runs inside the Qt event loop and set it as the current loop.
+    Uses qasync when installed; otherwise a QtAsyncioDriver steps a plain loop.
+    Returns the loop. Schedule work with loop.create_task(), then run app.exec_() as usual.
+    Later calls return the same loop, so several servers share one loop.
+    """
+    global _qt_event_loop
+    if _qt_event_loop is not None and not _qt_event_loop.is_closed():
+        return _qt_event_loop
+
+    if qasync is not None:
+        loop = qasync.QEventLoop(app)
+    else:
+        loop = asyncio.new_event_loop()
+        loop.qt_driver = QtAsyncioDriver(loop, parent=app)
+        loop.qt_driver.start()
+    asyncio.set_event_loop(loop)
+    _qt_event_loop = loop
+    return loop
+
+
+async def run_headless(args):
+    import yaml
+
+    with open(args.sequence, 'r') as f:
+        rows = (yaml.safe_load(f) or {}).get('rows', [])
+
+    port_factory = None
+    if args.simulate:
+        from palletizer.simulated_serial import SimulatedSerialPort, SimulatedMasterDevice
+
+        def simulated_port(port, baudrate):
+            return SimulatedSerialPort(SimulatedMasterDevice(args.time_scale), baudrate)
+
+        port_factory = simulated_port
+
+    link = AsyncPalletizerLink(port_factory)
+
+    async def log_events():
+        async for event in link.events():
+            if event.kind == EVENT_LINE:
+                print(f"RX: {event.data}")
+            elif event.kind != EVENT_ROW_COMPLETED:
+                print(f"{event.kind}: {event.data}")
+
+    logger = asyncio.ensure_future(log_events()) if args.verbose else None
+    await link.open(args.port, args.baud)
+    try:
+        for cycle in range(args.repeat):
+            for index, result in enumerate(await link.run_sequence(rows)):
+                print(f"Cycle {cycle + 1} row {index + 1}: {result.elapsed_s:.2f} s "
+                      f"(estimated {result.estimated_s:.2f} s)")
+    finally:
+        link.close()
+        if logger is not None:
+            logger.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a sequence file without the GUI")
+    parser.add_argument('port', help="Serial port or pyserial URL")
+    parser.add_argument('--sequence', required=True, help="Sequence YAML file saved by the sequence panel")
+    parser.add_argument('--baud', type=int, default=DEFAULT_BAUDRATE)
+    parser.add_argument('--repeat', type=int, default=1, help="Number of cycles")
+    parser.add_argument('--simulate', action='store_true', help="Use a simulated master instead of a real port")
+    parser.add_argument('--time-scale', type=float, default=0.05, help="Simulated motion time scale")
+    parser.add_argument('--verbose', action='store_true', help="Print every link event")
+    args = parser.parse_args()
+    asyncio.run(run_headless(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Compact binary framing of the host link, negotiated over the text protocol.
+
+Frame layout (all frames, both directions):
+
+    SYNC (0xA5) | LEN | OPCODE | PAYLOAD (LEN - 1 bytes) | CRC-16 (big endian)
+
+LEN counts the opcode and payload. The CRC is CRC-16/CCITT-FALSE (poly 0x1021,
+init 0xFFFF) over LEN, OPCODE and PAYLOAD. Numbers in payloads are unsigned
+LEB128 varints; signed values are zigzag encoded first.
+
+A row such as "x(5700), y(15500), z(4000), t(-600), g(1000)" becomes an
+axis bit mask followed by, per axis, the number of steps and one varint per
+step holding the zigzag value shifted left by one with the low bit set for
+delays: 23 bytes instead of a 45 byte line, with an integrity check. Commands that have
+no compact form (manual commands, unusual formats) travel as TEXT frames,
+and text longer than a frame stays a plain line.
+
+The decoder accepts text lines and frames mixed in one stream; the firmware
+only sends ASCII, so the SYNC byte never appears in text. Both sides turn
+frames back into the equivalent text line, so everything above the link
+keeps working with lines (row axes come back in SLAVE_IDS order). The host
+switches to frames only after the device answers PROTOCOL_QUERY with
+PROTOCOL_ACK; a device that does not know the query ignores it and the link
+stays on text. A device that does know it keeps accepting text lines too, so
+nothing has to wait for the answer.
+"""
+import binascii
+
+from palletizer.motion import split_row_command, parse_axis_sequence
+from palletizer.utils.config import (SLAVE_IDS, CMD_START, CMD_ZERO, CMD_PAUSE, CMD_RESUME, CMD_RESET,
+                                     COMPLETE_FEEDBACK, SLAVE_COMPLETED_MESSAGE)
+
+SYNC = 0xA5
+MAX_FRAME_BODY = 255  # LEN is one byte
+
+PROTOCOL_QUERY = "PROTOCOL;BIN1"
+PROTOCOL_ACK = "PROTOCOL;BIN1;OK"
+
+# Host to device
+OP_ROW = 0x01
+OP_CONTROL = 0x02
+OP_SPEED = 0x03
+# Device to host
+OP_SLAVE_COMPLETED = 0x81
+OP_ALL_COMPLETED = 0x82
+# Either direction
+OP_TEXT = 0x7F
+
+CONTROL_COMMANDS = [CMD_START, CMD_ZERO, CMD_PAUSE, CMD_RESUME, CMD_RESET]
+CONTROL_CODES = {command: code for code, command in enumerate(CONTROL_COMMANDS)}
+AXIS_INDEX = {axis: index for index, axis in enumerate(SLAVE_IDS)}
+
+SLAVE_COMPLETED_PREFIX = "[SLAVE] "
+SLAVE_COMPLETED_SUFFIX = ";" + SLAVE_COMPLETED_MESSAGE
+ALL_COMPLETED_LINE = f"[FEEDBACK] {COMPLETE_FEEDBACK}"
+
+
+class FrameError(ValueError):
+    """A frame payload that does not decode"""
+
+
+def crc16(data):
+    """CRC-16/CCITT-FALSE of data"""
+    return binascii.crc_hqx(data, 0xFFFF)
+
+
+def zigzag(value):
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def write_varint(out, value):
+    """Append an unsigned LEB128 varint to a bytearray"""
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    """Unsigned LEB128 varint at offset; returns (value, next offset)"""
+    value = 0
+    shift = 0
+    while True:
+        if offset >= len(data):
+            raise FrameError("Truncated varint")
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def frame(opcode, payload=b""):
+    """Build a complete frame; payloads longer than a frame raise FrameError"""
+    if len(payload) + 1 > MAX_FRAME_BODY:
+        raise FrameError("Payload too long for one frame")
+    body = bytes((len(payload) + 1, opcode)) + payload
+    return bytes((SYNC,)) + body + crc16(body).to_bytes(2, 'big')
+
+
+def encode_row(command):
+    """ROW payload of a row command, or None if it has no exact compact form"""
+    parts = split_row_command(command)
+    axes = {}
+    for part in parts:
+        axis, steps = parse_axis_sequence(part)
+        if axis is None or axis in axes:
+            return None
+        axes[axis] = steps
+
+    # Only use the compact form when it reproduces every part (parse_axis_sequence skips bad values)
+    if sorted(part.replace(' ', '') for part in parts) != sorted(format_axis(axis, axes[axis]) for axis in axes):
+        return None
+
+    payload = bytearray((sum(1 << AXIS_INDEX[axis] for axis in axes),))
+    for axis in SLAVE_IDS:
+        if axis in axes:
+            write_varint(payload, len(axes[axis]))
+            for kind, value in axes[axis]:
+                write_varint(payload, zigzag(value) << 1 | (kind == 'delay'))
+    return bytes(payload)
+
+
+def format_axis(axis, steps):
+    return f"{axis}(" + ",".join(f"d{value}" if kind == 'delay' else str(value) for kind, value in steps) + ")"
+
+
+def decode_row(payload):
+    """Row command text of a ROW payload"""
+    mask = payload[0]
+    offset = 1
+    parts = []
+    for index, axis in enumerate(SLAVE_IDS):
+        if not mask & (1 << index):
+            continue
+        count, offset = read_varint(payload, offset)
+        steps = []
+        for _ in range(count):
+            value, offset = read_varint(payload, offset)
+            steps.append(('delay' if value & 1 else 'move', unzigzag(value >> 1)))
+        parts.append(format_axis(axis, steps))
+    if offset != len(payload):
+        raise FrameError("Trailing bytes in row")
+    return ",".join(parts)
+
+
+def encode(command):
+    """Wire bytes of a command or reply line: a frame, or a text line if it does not fit one"""
+    if command in CONTROL_CODES:
+        return frame(OP_CONTROL, bytes((CONTROL_CODES[command],)))
+
+    if command == ALL_COMPLETED_LINE:
+        return frame(OP_ALL_COMPLETED)
+
+    if command.startswith(SLAVE_COMPLETED_PREFIX) and command.endswith(SLAVE_COMPLETED_SUFFIX):
+        axis = command[len(SLAVE_COMPLETED_PREFIX):-len(SLAVE_COMPLETED_SUFFIX)]
+        if axis in AXIS_INDEX:
+            return frame(OP_SLAVE_COMPLETED, bytes((AXIS_INDEX[axis],)))
+
+    parts = command.split(';')
+    if len(parts) == 3 and parts[0] == "SPEED" and parts[1] in AXIS_INDEX and parts[2].isdigit():
+        payload = bytearray((AXIS_INDEX[parts[1]],))
+        write_varint(payload, int(parts[2]))
+        return frame(OP_SPEED, bytes(payload))
+
+    if '(' in command:
+        payload = encode_row(command)
+        if payload is not None and len(payload) < MAX_FRAME_BODY:
+            return frame(OP_ROW, payload)
+
+    text = command.encode()
+    if len(text) < MAX_FRAME_BODY:
+        return frame(OP_TEXT, text)
+    return text + b'\n'
+
+
+def decode_frame(opcode, payload):
+    """Text line equivalent of a frame"""
+    try:
+        if opcode == OP_ROW:
+            return decode_row(payload)
+        if opcode == OP_CONTROL:
+            return CONTROL_COMMANDS[payload[0]]
+        if opcode == OP_SPEED:
+            return f"SPEED;{SLAVE_IDS[payload[0]]};{read_varint(payload, 1)[0]}"
+        if opcode == OP_SLAVE_COMPLETED:
+            return f"{SLAVE_COMPLETED_PREFIX}{SLAVE_IDS[payload[0]]}{SLAVE_COMPLETED_SUFFIX}"
+        if opcode == OP_ALL_COMPLETED:
+            return ALL_COMPLETED_LINE
+        if opcode == OP_TEXT:
+            return payload.decode('utf-8', errors='ignore')
+    except IndexError:
+        raise FrameError("Truncated payload")
+    raise FrameError(f"Unknown opcode 0x{opcode:02x}")
+
+
+def encode_text(command):
+    """Wire bytes of a command on the text protocol"""
+    return (command + '\n').encode()
+
+
+class FrameDecoder:
+    """
+    Incremental decoder of a byte stream of text lines and frames.
+
+    feed() takes any chunk of received bytes and returns the complete lines in
+    it, frames converted to their text equivalent. A frame with a bad CRC is
+    dropped and decoding resumes at the next SYNC byte inside it, or right after
+    it when there is none. A frame cut short, e.g. by a flushed output buffer,
+    is dropped as soon as a complete valid frame follows it.
+    """
+
+    def __init__(self):
+        self.buffer = b""
+        self.text = b""  # Unterminated text before a frame
+        self.frames = 0
+        self.crc_errors = 0
+        self.bad_frames = 0  # Valid CRC but undecodable payload
+        self.dropped_bytes = 0
+
+    @property
+    def pending(self):
+        """Whether a partial line or frame is waiting for more bytes"""
+        return bool(self.buffer.strip() or self.text.strip())
+
+    def reset(self):
+        self.buffer = b""
+        self.text = b""
+
+    def _text_lines(self, data, lines):
+        *complete, rest = (self.text + data).split(b'\n')
+        self.text = rest
+        for line in complete:
+            line = line.decode('utf-8', errors='ignore').strip()
+            if line:
+                lines.append(line)
+
+    @staticmethod
+    def _frame_at(buffer, start):
+        """(end, body) of a complete frame at start, body None if its CRC fails; None if incomplete"""
+        if start + 2 > len(buffer):
+            return None
+        end = start + 4 + buffer[start + 1]
+        if end > len(buffer):
+            return None
+        body = buffer[start + 1:end - 2]
+        if body[0] == 0 or crc16(body) != int.from_bytes(buffer[end - 2:end], 'big'):
+            return end, None
+        return end, body
+
+    def feed(self, data):
+        """Decode received bytes; returns the list of complete lines"""
+        buffer = self.buffer + data
+        lines = []
+        position = 0
+        while True:
+            sync = buffer.find(SYNC, position)
+            if sync < 0:
+                self._text_lines(buffer[position:], lines)
+                position = len(buffer)
+                break
+
+            self._text_lines(buffer[position:sync], lines)
+            found = self._frame_at(buffer, sync)
+            if found is None:
+                # Incomplete; skip it only if a complete valid frame starts after it
+                following = self._next_valid_frame(buffer, sync + 1)
+                if following is None:
+                    position = sync
+                    break
+                self.crc_errors += 1
+                self.dropped_bytes += following - sync
+                position = following
+                continue
+
+            end, body = found
+            if body is None:
+                # Bad CRC: resume at a SYNC inside the broken frame, which may start a real one,
+                # else at its end, so the text after it is still decoded
+                self.crc_errors += 1
+                following = buffer.find(SYNC, sync + 1, end)
+                following = end if following < 0 else following
+                self.dropped_bytes += following - sync
+                position = following
+                continue
+
+            self.frames += 1
+            try:
+                line = decode_frame(body[1], body[2:])
+                if line:
+                    lines.append(line)
+            except FrameError:
+                self.bad_frames += 1
+            position = end
+
+        self.buffer = buffer[position:]
+        return lines
+
+    def _next_valid_frame(self, buffer, start):
+        sync = buffer.find(SYNC, start)
+        while sync >= 0:
+            found = self._frame_at(buffer, sync)
+            if found is not None and found[1] is not None:
+                return sync
+            sync = buffer.find(SYNC, sync + 1)
+        return None
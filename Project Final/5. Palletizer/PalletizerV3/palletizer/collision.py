@@ -0,0 +1,247 @@
+"""
+Workspace and collision check of whole sequences.
+
+A sequence is expanded into poses sampled every WORKSPACE_SAMPLE_S seconds
+(plus the start and end of every move) with the motion model of
+palletizer.motion, evaluated with NumPy for all samples at once. At every
+sample the gripper, the box it carries and the Z carriage column are tested
+as axis-aligned boxes against the axis limits, the fixed obstacles of the
+workspace (pallet, pick conveyor, ...) and the boxes placed so far. A box is
+placed where the gripper opens while holding one; it then stays in the stack
+for the rest of the sequence.
+
+Usage:
+    python -m palletizer.collision RunningTest_1.yaml
+    python -m palletizer.collision sequences/*.yaml --sample-ms 20
+"""
+import argparse
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import yaml
+
+from palletizer.motion import SequenceTimeline
+from palletizer.utils.config import (SLAVE_IDS, WORKSPACE_AXIS_LIMITS, WORKSPACE_T_STEPS_PER_DEGREE,
+                                     WORKSPACE_GRIP_CLOSED, WORKSPACE_GRIPPER_SIZE, WORKSPACE_CARRIAGE_SIZE,
+                                     WORKSPACE_BOX_SIZE, WORKSPACE_OBSTACLES, WORKSPACE_CONTACT_TOLERANCE,
+                                     WORKSPACE_SAMPLE_S)
+
+AXIS_INDEX = {axis: index for index, axis in enumerate(SLAVE_IDS)}
+
+# One contiguous stretch of samples in violation; positions are those at its first sample
+Violation = namedtuple('Violation', ['kind', 'body', 'obstacle', 'row', 'time', 'duration', 'positions'])
+
+
+class Workspace:
+    """Dimensions of the machine and its surroundings, in machine steps"""
+
+    def __init__(self, axis_limits=WORKSPACE_AXIS_LIMITS, obstacles=WORKSPACE_OBSTACLES,
+                 gripper_size=WORKSPACE_GRIPPER_SIZE, carriage_size=WORKSPACE_CARRIAGE_SIZE,
+                 box_size=WORKSPACE_BOX_SIZE, grip_closed=WORKSPACE_GRIP_CLOSED,
+                 t_steps_per_degree=WORKSPACE_T_STEPS_PER_DEGREE, tolerance=WORKSPACE_CONTACT_TOLERANCE):
+        self.axis_limits = axis_limits
+        self.obstacle_names = list(obstacles)
+        self.obstacle_min = np.array([obstacles[name][0] for name in self.obstacle_names], dtype=float).reshape(-1, 3)
+        self.obstacle_max = np.array([obstacles[name][1] for name in self.obstacle_names], dtype=float).reshape(-1, 3)
+        self.gripper_size = gripper_size
+        self.carriage_size = carriage_size
+        self.box_size = box_size
+        self.grip_closed = grip_closed
+        self.t_steps_per_degree = t_steps_per_degree
+        self.tolerance = tolerance
+
+
+def move_progress_array(distance, speed, acceleration, elapsed):
+    """motion.move_progress for arrays of moves, one elapsed time each"""
+    total = np.where(distance <= speed * speed / acceleration,
+                     2.0 * np.sqrt(distance / acceleration),
+                     2.0 * speed / acceleration + (distance - speed * speed / acceleration) / speed)
+    elapsed = np.clip(elapsed, 0.0, total)
+    ramp_time = np.minimum(speed / acceleration, total / 2.0)
+    remaining = total - elapsed
+    peak_speed = acceleration * ramp_time  # Lower than speed on triangular profiles
+    return np.where(elapsed <= ramp_time, 0.5 * acceleration * elapsed * elapsed,
+                    np.where(remaining <= ramp_time, distance - 0.5 * acceleration * remaining * remaining,
+                             0.5 * peak_speed * ramp_time + (elapsed - ramp_time) * peak_speed))
+
+
+def sample_times(timeline, step_s=WORKSPACE_SAMPLE_S):
+    """Regular samples over the sequence plus the start and end of every move"""
+    times = [np.arange(0.0, timeline.duration, step_s), [timeline.duration]]
+    for axis in SLAVE_IDS:
+        moves = timeline.moves[axis]
+        if moves:
+            bounds = np.array([(start, end) for start, end, *_ in moves])
+            times.append(bounds.ravel())
+    return np.unique(np.concatenate(times))
+
+
+def positions_at(timeline, times):
+    """Predicted positions of all axes at the given times, as an (axes, samples) array"""
+    positions = np.empty((len(SLAVE_IDS), len(times)))
+    for index, axis in enumerate(SLAVE_IDS):
+        moves = timeline.moves[axis]
+        positions[index] = timeline.start_positions[axis]
+        if not moves:
+            continue
+
+        start, end, origin, target, speed, acceleration = np.array(moves, dtype=float).T
+        move = np.searchsorted(start, times, 'right') - 1
+        moving = move >= 0
+        move = move[moving]
+        distance = np.abs(target[move] - origin[move])
+        covered = move_progress_array(distance, speed[move], acceleration[move], times[moving] - start[move])
+        positions[index, moving] = origin[move] + np.sign(target[move] - origin[move]) * covered
+    return positions
+
+
+def footprint_extents(size_x, size_y, angle_degrees):
+    """Half extents of the bounding box of a size_x by size_y footprint rotated by angle"""
+    radians = np.radians(angle_degrees)
+    cos_a, sin_a = np.abs(np.cos(radians)), np.abs(np.sin(radians))
+    return (size_x * cos_a + size_y * sin_a) / 2, (size_x * sin_a + size_y * cos_a) / 2
+
+
+def body_boxes(positions, workspace):
+    """
+    Bounding boxes (min, max) of the moving bodies at every sample, each (samples, 3),
+    and whether the gripper holds a box.
+    """
+    x, y, z = positions[AXIS_INDEX['x']], positions[AXIS_INDEX['y']], positions[AXIS_INDEX['z']]
+    angle = positions[AXIS_INDEX['t']] / workspace.t_steps_per_degree
+    holding = positions[AXIS_INDEX['g']] >= workspace.grip_closed
+
+    def box(half_x, half_y, top, bottom):
+        return np.stack([x - half_x, y - half_y, top], axis=1), np.stack([x + half_x, y + half_y, bottom], axis=1)
+
+    gripper_x, gripper_y, gripper_height = workspace.gripper_size
+    carriage_x, carriage_y = workspace.carriage_size
+    box_x, box_y, box_height = workspace.box_size
+
+    bodies = {
+        'gripper': box(*footprint_extents(gripper_x, gripper_y, angle), z - gripper_height, z),
+        'carriage': box(carriage_x / 2, carriage_y / 2, np.zeros_like(z), z - gripper_height),
+        'load': box(*footprint_extents(box_x, box_y, angle), z, z + box_height),
+    }
+    return bodies, holding
+
+
+def overlaps(body_min, body_max, obstacle_min, obstacle_max, tolerance):
+    """(samples, obstacles) mask of bodies penetrating obstacles by more than tolerance"""
+    return np.all((body_min[:, np.newaxis, :] < obstacle_max[np.newaxis, :, :] - tolerance)
+                  & (obstacle_min[np.newaxis, :, :] < body_max[:, np.newaxis, :] - tolerance), axis=2)
+
+
+def runs(mask):
+    """(first, last) sample indices of the stretches where mask is True"""
+    padded = np.concatenate(([False], mask, [False]))
+    edges = np.flatnonzero(padded[1:] != padded[:-1])
+    return zip(edges[0::2], edges[1::2] - 1)
+
+
+class CollisionReport:
+    """Result of a check: the violations and the size of the sampled motion"""
+
+    def __init__(self, violations, samples, duration, placed, elapsed):
+        self.violations = violations
+        self.samples = samples
+        self.duration = duration
+        self.placed = placed
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        return not self.violations
+
+    def describe(self, violation):
+        if violation.kind == 'limit':
+            what = f"{violation.body.upper()} outside its limits {violation.obstacle}"
+        else:
+            what = f"{violation.body} hits {violation.obstacle}"
+        pose = ", ".join(f"{axis}={value:.0f}" for axis, value in violation.positions.items())
+        return f"Row {violation.row + 1} at {violation.time:.2f} s ({violation.duration:.2f} s): {what} [{pose}]"
+
+
+def check_timeline(timeline, workspace=None, sample_s=WORKSPACE_SAMPLE_S):
+    """Check a SequenceTimeline against the workspace; returns a CollisionReport"""
+    started = time.perf_counter()
+    workspace = workspace or Workspace()
+    times = sample_times(timeline, sample_s)
+    positions = positions_at(timeline, times)
+    sample_rows = np.searchsorted(np.array(timeline.row_starts), times, 'right') - 1
+    tolerance = workspace.tolerance
+    found = []  # (first sample, last sample, kind, body, obstacle)
+
+    def collect(mask, kind, body, obstacle):
+        for first, last in runs(mask):
+            found.append((first, last, kind, body, obstacle))
+
+    for axis, (low, high) in workspace.axis_limits.items():
+        values = positions[AXIS_INDEX[axis]]
+        collect((values < low) | (values > high), 'limit', axis, (low, high))
+
+    bodies, holding = body_boxes(positions, workspace)
+    # A box is placed where the gripper opens; the load box only exists while one is held
+    released = np.flatnonzero(holding[:-1] & ~holding[1:]) + 1
+    placed_min, placed_max = bodies['load'][0][released], bodies['load'][1][released]
+    stack_min = placed_min.min(axis=0, initial=np.inf)[np.newaxis]
+    stack_max = placed_max.max(axis=0, initial=-np.inf)[np.newaxis]
+
+    for body, (body_min, body_max) in bodies.items():
+        active = holding if body == 'load' else np.ones(len(times), dtype=bool)
+        hits = overlaps(body_min, body_max, workspace.obstacle_min, workspace.obstacle_max, tolerance)
+        for index, name in enumerate(workspace.obstacle_names):
+            collect(hits[:, index] & active, 'collision', body, name)
+
+        if len(released):
+            # Broad phase: only samples that reach into the bounding box of the whole stack
+            near = overlaps(body_min, body_max, stack_min, stack_max, tolerance)[:, 0] & active
+            candidates = np.flatnonzero(near)
+            hits = overlaps(body_min[candidates], body_max[candidates], placed_min, placed_max, tolerance)
+            # Placed boxes only count from the sample after they were released
+            hits &= candidates[:, np.newaxis] > released[np.newaxis, :]
+            for index in np.flatnonzero(hits.any(axis=0)):
+                mask = np.zeros(len(times), dtype=bool)
+                mask[candidates[hits[:, index]]] = True
+                collect(mask, 'collision', body, f"placed box {index + 1}")
+
+    violations = []
+    for first, last, kind, body, obstacle in sorted(found, key=lambda item: (item[0], item[2], item[3])):
+        violations.append(Violation(kind, body, obstacle, int(sample_rows[first]), float(times[first]),
+                                    float(times[last] - times[first]),
+                                    {axis: float(positions[index, first]) for index, axis in enumerate(SLAVE_IDS)}))
+
+    return CollisionReport(violations, len(times), timeline.duration, len(released), time.perf_counter() - started)
+
+
+def check_rows(rows, workspace=None, sample_s=WORKSPACE_SAMPLE_S, **timeline_options):
+    """Check the rows of a sequence file"""
+    return check_timeline(SequenceTimeline.from_rows(rows, **timeline_options), workspace, sample_s)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check sequences against the workspace and collision model")
+    parser.add_argument('sequences', nargs='+', help="Sequence YAML files")
+    parser.add_argument('--sample-ms', type=float, default=WORKSPACE_SAMPLE_S * 1000,
+                        help="Time between sampled poses")
+    args = parser.parse_args()
+
+    failed = 0
+    for path in args.sequences:
+        with open(path, 'r') as f:
+            rows = (yaml.safe_load(f) or {}).get('rows', [])
+        report = check_rows(rows, sample_s=args.sample_ms / 1000)
+        status = "OK" if report.ok else f"{len(report.violations)} violations"
+        print(f"{path}: {status} ({len(rows)} rows, {report.duration:.1f} s of motion, {report.samples} poses, "
+              f"{report.placed} boxes placed, checked in {report.elapsed * 1000:.1f} ms)")
+        for violation in report.violations:
+            print("  " + report.describe(violation))
+        failed += not report.ok
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
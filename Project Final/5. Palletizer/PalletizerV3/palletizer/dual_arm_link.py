@@ -0,0 +1,380 @@
+"""
+Host link to the two arm controllers of the V1.3 palletizer on one RS485 bus.
+
+The same asyncio link as AsyncPalletizerLink, with the executor API of the
+single-arm link (send, send_priority, run_row, run_sequence, events,
+add_line_listener), for commands addressed to an arm:
+
+    link = DualArmLink()
+    await link.open("/dev/ttyUSB0", 9600)
+    await link.run_row("L#C")
+    await asyncio.gather(link.run_row("L#H(3870,390,3840,240,-30)"),
+                         link.run_row("R#C"))
+
+Commands are checked and framed with their checksum (palletizer.dual_arm_protocol).
+Each arm has one command in flight. The two arms run independently, so a
+command for one arm never waits for the other arm's motion, only for the bus.
+
+The V1.3 controllers cannot answer: their RS485 transceiver is wired
+receive-only. By default (DUAL_ARM_COMPLETION "open_loop") a command is sent
+once and taken as done after the time ArmMotionModel estimates for it,
+stretched by DUAL_ARM_OPEN_LOOP_MARGIN. With a bridge that puts the arm
+status on the bus ("status"), each command has a retry window like the
+central state machine: a frame the arm has not answered within
+DUAL_ARM_ACK_TIMEOUT_S is sent again, up to DUAL_ARM_MAX_RETRIES times, after
+which the arm is put in the error state. A READY for the command in flight
+answers it as well as a BUSY does; statuses quoting another command are left
+over and ignored.
+
+Headless use:
+    python -m palletizer.dual_arm_link PORT [--commands jobs.txt] [--cycles 2] [--completion status]
+    python -m palletizer.dual_arm_link sim:// --simulate [--completion status --loss 0.2 --status-loss 0.2]
+"""
+import argparse
+import asyncio
+import collections
+import time
+
+from palletizer import dual_arm_protocol as arm_protocol
+from palletizer.aio_link import AsyncPalletizerLink, EVENT_LINE, EVENT_ROW_STARTED, EVENT_ROW_COMPLETED
+from palletizer.dual_arm_scheduler import ArmMotionModel
+from palletizer.utils.config import (SERIAL_AUTO_RECONNECT, DUAL_ARM_BAUDRATE, DUAL_ARM_ACK_TIMEOUT_S,
+                                     DUAL_ARM_MAX_RETRIES, DUAL_ARM_RETRY_DELAY_S, DUAL_ARM_MOVE_TIMEOUT_S,
+                                     DUAL_ARM_COMPLETION, DUAL_ARM_OPEN_LOOP_MARGIN)
+
+# Event kinds, in addition to those of AsyncPalletizerLink
+EVENT_ARM_STATE = "arm_state"  # (arm, state)
+EVENT_ARM_RETRY = "arm_retry"  # (arm, attempt, frame)
+EVENT_ARM_ERROR = "arm_error"  # ArmError
+EVENT_FRAME_ERROR = "frame_error"  # (line, message)
+
+# Arm states as the host sees them
+ARM_IDLE = "Idle"
+ARM_WAITING = "Waiting"  # Frame sent, not answered yet
+ARM_BUSY = "Busy"
+ARM_ERROR = "Error"
+
+# How the link knows an arm finished a command
+COMPLETION_OPEN_LOOP = "open_loop"  # After its estimated time; the arms send nothing
+COMPLETION_STATUS = "status"        # On the READY frame of a status bridge
+COMPLETIONS = (COMPLETION_OPEN_LOOP, COMPLETION_STATUS)
+
+ArmRowResult = collections.namedtuple('ArmRowResult', ['command', 'arm', 'attempts', 'taken_s', 'elapsed_s'])
+
+# HOME and GLAD values from the V1.3 documentation, for the headless demo
+DEMO_CYCLE = ["{arm}#H(3870,390,3840,240,-30)", "{arm}#G(1620,2205,3975,240,60,270,750,3960,2340,240)"]
+
+
+class ArmError(Exception):
+    """An arm rejected a command, did not take it within its retry window, or did not finish it"""
+
+    def __init__(self, arm, command, reason, attempts=0):
+        self.arm = arm
+        self.command = command
+        self.reason = reason
+        self.attempts = attempts
+        super().__init__(f"ARM {arm}: {command}: {reason}")
+
+
+class ArmChannel:
+    """The command in flight on one arm"""
+
+    def __init__(self, arm):
+        self.arm = arm
+        self.state = ARM_IDLE
+        self.command = None
+        self.action = None
+        self.attempts = 0
+        self.reference = None  # Checksum of the command frame, quoted by its statuses
+        self.taken = None  # Future set by BUSY or READY
+        self.done = None   # Future set by READY
+
+    @property
+    def running(self):
+        return self.command is not None
+
+    def start(self, command, action, reference, loop):
+        self.command = command
+        self.action = action
+        self.reference = reference
+        self.attempts = 0
+        self.taken = loop.create_future()
+        self.done = loop.create_future()
+
+    def finish(self):
+        self.command = None
+        self.action = None
+        self.reference = None
+        self.taken = None
+        self.done = None
+
+    def fail(self, error):
+        for future in (self.taken, self.done):
+            if future is not None and not future.done():
+                future.set_exception(error)
+                future.exception()  # Marked retrieved; the waiting run_row raises it
+
+
+class DualArmLink(AsyncPalletizerLink):
+    """
+    AsyncPalletizerLink for the two-arm bus. Rows are arm commands such as
+    "R#G(...)"; run_row() sends one and waits until the arm is done with it, and
+    run_sequence() runs the rows of each arm in order with both arms working at
+    the same time. completion is COMPLETION_OPEN_LOOP or COMPLETION_STATUS;
+    open loop waits the estimated action time multiplied by duration_scale.
+    """
+
+    def __init__(self, port_factory=None, auto_reconnect=SERIAL_AUTO_RECONNECT, ack_timeout=DUAL_ARM_ACK_TIMEOUT_S,
+                 max_retries=DUAL_ARM_MAX_RETRIES, retry_delay=DUAL_ARM_RETRY_DELAY_S,
+                 completion=DUAL_ARM_COMPLETION, duration_scale=DUAL_ARM_OPEN_LOOP_MARGIN):
+        super().__init__(port_factory, auto_reconnect)
+        if completion not in COMPLETIONS:
+            raise ValueError(f"Unknown completion '{completion}', expected one of {', '.join(COMPLETIONS)}")
+        self.baudrate = DUAL_ARM_BAUDRATE
+        self.completion = completion
+        self.duration_scale = duration_scale
+        self.models = {arm: ArmMotionModel() for arm in arm_protocol.ARMS}  # Open loop: where each arm is
+        self.ack_timeout = ack_timeout
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.arms = {arm: ArmChannel(arm) for arm in arm_protocol.ARMS}
+        self.frame_errors = 0
+        self.retries = 0
+
+    def arm_states(self):
+        return {arm: channel.state for arm, channel in self.arms.items()}
+
+    def set_arm_state(self, channel, state):
+        if channel.state != state:
+            channel.state = state
+            self.publish(EVENT_ARM_STATE, (channel.arm, state))
+
+    @staticmethod
+    def frame(command):
+        """Frame line of a command; lines that already carry a checksum are sent as they are"""
+        return command if '*' in command else arm_protocol.command_frame(command)
+
+    # Sending
+
+    async def send(self, command):
+        await super().send(self.frame(command))
+
+    def send_priority(self, command, flush_pending=False):
+        return super().send_priority(self.frame(command), flush_pending)
+
+    # Rows
+
+    async def run_row(self, command, timeout=None):
+        """
+        Send an arm command and wait until the arm is done with it: for its
+        estimated time in open loop, until it reports READY with a status
+        bridge. Raises ArmError when the arm rejects it, does not take it within
+        the retry window or does not finish within timeout (default
+        DUAL_ARM_MOVE_TIMEOUT_S; status only), and ConnectionError if the link drops.
+        """
+        if timeout is None:
+            timeout = DUAL_ARM_MOVE_TIMEOUT_S
+        arm, action = arm_protocol.split_command(command)
+        channel = self.arms[arm]
+        if channel.running:
+            raise RuntimeError(f"ARM {arm} is already running {channel.command}")
+
+        line = arm_protocol.encode_frame(arm, action)
+        channel.start(command, action, arm_protocol.frame_reference(line), asyncio.get_running_loop())
+        started_at = time.monotonic()
+        self.publish(EVENT_ROW_STARTED, command)
+        try:
+            if self.completion == COMPLETION_STATUS:
+                await self._send_until_taken(channel, line)
+            else:
+                channel.attempts = 1
+                await super().send(line)
+            taken_s = time.monotonic() - started_at
+            self.set_arm_state(channel, ARM_BUSY)
+            if self.completion == COMPLETION_STATUS:
+                try:
+                    await asyncio.wait_for(asyncio.shield(channel.done), timeout)
+                except asyncio.TimeoutError:
+                    raise ArmError(arm, command, f"no READY within {timeout:.1f} s", channel.attempts) from None
+            else:
+                await self._wait_estimated(channel, command)
+        except ArmError as error:
+            self.set_arm_state(channel, ARM_ERROR)
+            self.publish(EVENT_ARM_ERROR, error)
+            raise
+        except BaseException:
+            self.set_arm_state(channel, ARM_IDLE)
+            raise
+        finally:
+            attempts = channel.attempts
+            channel.finish()
+
+        self.set_arm_state(channel, ARM_IDLE)
+        result = ArmRowResult(command, arm, attempts, taken_s, time.monotonic() - started_at)
+        self.publish(EVENT_ROW_COMPLETED, result)
+        return result
+
+    async def _send_until_taken(self, channel, line):
+        """Send the frame until the arm answers it; the retry window of the central state machine"""
+        self.set_arm_state(channel, ARM_WAITING)
+        while True:
+            channel.attempts += 1
+            await super().send(line)
+            try:
+                await asyncio.wait_for(asyncio.shield(channel.taken), self.ack_timeout)
+                return
+            except asyncio.TimeoutError:
+                pass
+            if channel.attempts > self.max_retries:
+                raise ArmError(channel.arm, channel.command,
+                               f"no answer after {channel.attempts} attempts", channel.attempts)
+            self.retries += 1
+            self.publish(EVENT_ARM_RETRY, (channel.arm, channel.attempts, line))
+            await asyncio.sleep(self.retry_delay)
+
+    async def _wait_estimated(self, channel, command):
+        """Wait the estimated time of a command; done only completes early when the link fails"""
+        model = self.models[channel.arm]
+        estimate = model.estimate(command)
+        try:
+            await asyncio.wait_for(asyncio.shield(channel.done), estimate.duration * self.duration_scale)
+        except asyncio.TimeoutError:
+            pass
+        model.positions = estimate.positions
+
+    async def run_sequence(self, rows, start=True):
+        """
+        Run arm commands, each arm's in the order given, both arms at once.
+        With start, each arm that has rows is calibrated first (C), which
+        brings it to READY. Results are returned in the order of rows. Rows
+        of different arms are not ordered against each other; where that
+        matters (one arm in the centre at a time) call run_row() per job.
+        """
+        rows = list(rows)
+        by_arm = collections.defaultdict(list)
+        for index, command in enumerate(rows):
+            by_arm[arm_protocol.split_command(command)[0]].append(index)
+
+        results = [None] * len(rows)
+
+        async def run_arm(arm, indices):
+            if start:
+                await self.run_row(arm_protocol.calibrate(arm))
+            for index in indices:
+                results[index] = await self.run_row(rows[index])
+
+        tasks = [asyncio.ensure_future(run_arm(arm, indices)) for arm, indices in by_arm.items()]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            # One arm failing stops the other as well
+            for task in tasks:
+                task.cancel()
+        return results
+
+    def _fail_row(self, error):
+        super()._fail_row(error)
+        for channel in self.arms.values():
+            channel.fail(error)
+
+    # Receiving
+
+    def on_line(self, line, timestamp):
+        super().on_line(line, timestamp)
+        if self.completion != COMPLETION_STATUS or '*' not in line:
+            return  # Debug output of a controller
+        try:
+            frame = arm_protocol.parse_frame(line)
+        except arm_protocol.FrameError as error:
+            self.frame_errors += 1
+            self.publish(EVENT_FRAME_ERROR, (line, str(error)), timestamp)
+            return  # The retry window covers a lost status
+
+        status = arm_protocol.status_of(frame)
+        channel = self.arms[frame.arm]
+        if status is None or not channel.running:
+            return
+        status, reason = status
+        if status == arm_protocol.STATUS_ERROR:
+            channel.fail(ArmError(frame.arm, channel.command, f"rejected: {reason}", channel.attempts))
+            return
+        if reason and reason.lower() != channel.reference:
+            return  # A repeated status of an earlier command
+        # READY also answers the frame when its BUSY was lost, so the frame is not sent again
+        if not channel.taken.done():
+            channel.taken.set_result(True)
+        if status == arm_protocol.STATUS_READY and not channel.done.done():
+            channel.done.set_result(True)
+
+
+def read_commands(path):
+    """Arm commands of a text file, one per line; blank lines and # comments are skipped"""
+    with open(path, 'r') as f:
+        lines = [line.split(' #')[0].strip() for line in f]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+async def run_headless(args):
+    port_factory = None
+    if args.simulate:
+        from palletizer.simulated_serial import SimulatedSerialPort, SimulatedDualArmDevice
+
+        def simulated_port(port, baudrate):
+            device = SimulatedDualArmDevice(args.time_scale, loss=args.loss, seed=args.seed,
+                                            status_loss=args.status_loss,
+                                            report_status=args.completion == COMPLETION_STATUS)
+            return SimulatedSerialPort(device, baudrate)
+
+        port_factory = simulated_port
+
+    if args.commands:
+        commands = read_commands(args.commands)
+    else:
+        commands = [step.format(arm=arm) for arm in arm_protocol.ARMS for step in DEMO_CYCLE]
+
+    duration_scale = DUAL_ARM_OPEN_LOOP_MARGIN * (args.time_scale if args.simulate else 1.0)
+    link = DualArmLink(port_factory, completion=args.completion, duration_scale=duration_scale)
+
+    async def log_events():
+        async for event in link.events():
+            if event.kind == EVENT_LINE:
+                print(f"RX: {event.data}")
+            elif event.kind != EVENT_ROW_COMPLETED:
+                print(f"{event.kind}: {event.data}")
+
+    logger = asyncio.ensure_future(log_events()) if args.verbose else None
+    await link.open(args.port, args.baud)
+    started = time.monotonic()
+    try:
+        for cycle in range(args.cycles):
+            for result in await link.run_sequence(commands, start=cycle == 0):
+                print(f"Cycle {cycle + 1} {result.command}: {result.elapsed_s:.2f} s "
+                      f"({result.attempts} attempt{'s' if result.attempts > 1 else ''})")
+    finally:
+        link.close()
+        if logger is not None:
+            logger.cancel()
+    print(f"{time.monotonic() - started:.2f} s, {link.retries} retries, {link.frame_errors} bad frames received")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run arm commands on the V1.3 dual-arm bus without the GUI")
+    parser.add_argument('port', help="Serial port or pyserial URL of the RS485 adapter")
+    parser.add_argument('--commands', help="Text file with one arm command per line, e.g. L#H(3870,390,3840,240,-30)")
+    parser.add_argument('--baud', type=int, default=DUAL_ARM_BAUDRATE)
+    parser.add_argument('--cycles', type=int, default=1, help="Number of times to run the commands")
+    parser.add_argument('--completion', choices=COMPLETIONS, default=DUAL_ARM_COMPLETION,
+                        help="Wait the estimated action time, or for the READY of a status bridge")
+    parser.add_argument('--simulate', action='store_true', help="Use two simulated arms instead of a real port")
+    parser.add_argument('--time-scale', type=float, default=0.05, help="Simulated action time scale")
+    parser.add_argument('--loss', type=float, default=0.0, help="Fraction of frames the simulated arms miss")
+    parser.add_argument('--status-loss', type=float, default=0.0,
+                        help="Fraction of status frames of the simulated arms lost on the way to the host")
+    parser.add_argument('--seed', type=int, default=None, help="Seed of the simulated frame loss")
+    parser.add_argument('--verbose', action='store_true', help="Print every link event")
+    args = parser.parse_args()
+    asyncio.run(run_headless(args))
+
+
+if __name__ == "__main__":
+    main()
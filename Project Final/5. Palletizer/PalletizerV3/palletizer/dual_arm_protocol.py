@@ -0,0 +1,179 @@
+"""
+Frames of the RS485 bus between the host and the two arm controllers of the
+V1.3 palletizer (PalletizerArmControl.ino), which the central state machine
+normally drives:
+
+    L#H(3870,390,3840,240,-30)*7f
+
+ARM '#' ACTION '*' CHECKSUM, one frame per line. ARM is L (ARM1) or R (ARM2);
+the checksum is the XOR of every character before '*', in hex as the central
+state machine prints it with String(checksum, HEX). Host actions:
+
+    H(x,y,z,t,g)                        HOME: move to the centre, READY -> RUNNING
+    G(xn,yn,zn,tn,dp,gp,za,zb,xa,ta)    GLAD: pick and place, RUNNING -> READY
+    P                                   PARK: zero the axes and sleep
+    C                                   CALIBRATION: zero the axes, then READY
+
+The controllers dispatch on the first letter after '#', so the long names of
+the documentation (HOME(...), GLAD(...), PARK, CALI) select the same actions.
+They also compare only the first character of the arm prefix, so the ARML#/ARMR#
+prefixes of the documentation would never match; they are rewritten to L#/R#.
+
+The controllers report busy on their COMMAND_ACTIVE pin, not on the bus. The
+host link expects that state as status frames in the same format, sent by the
+arm or by a bridge that reads the pins:
+
+    L#BUSY(ref)*cs        the arm took the command (a repeat of it is answered again)
+    L#READY(ref)*cs       the arm finished it
+    L#ERROR(reason)*cs    the arm rejected it
+
+ref is the checksum of the command frame the status answers, so a status left
+over from an earlier command is told apart; a status without it is taken to
+answer the command in flight. Each arm's BUSY or READY is repeated every
+DUAL_ARM_STATUS_REPEAT_S, which makes up for a status lost on the bus.
+"""
+import collections
+
+ARM_LEFT = "L"
+ARM_RIGHT = "R"
+ARMS = (ARM_LEFT, ARM_RIGHT)
+ARM_ALIASES = {"ARML": ARM_LEFT, "ARMR": ARM_RIGHT, "ARM1": ARM_LEFT, "ARM2": ARM_RIGHT}
+
+ACTION_HOME = "H"
+ACTION_GLAD = "G"
+ACTION_PARK = "P"
+ACTION_CALIBRATE = "C"
+ACTION_PARAMETERS = {ACTION_HOME: 5, ACTION_GLAD: 10, ACTION_PARK: 0, ACTION_CALIBRATE: 0}
+ACTION_NAMES = {ACTION_HOME: "HOME", ACTION_GLAD: "GLAD", ACTION_PARK: "PARK", ACTION_CALIBRATE: "CALIBRATION"}
+
+STATUS_BUSY = "BUSY"
+STATUS_READY = "READY"
+STATUS_ERROR = "ERROR"
+STATUSES = (STATUS_BUSY, STATUS_READY, STATUS_ERROR)
+
+MAX_FRAME_LENGTH = 63  # The controllers copy the command into a 64 byte buffer
+
+Frame = collections.namedtuple('Frame', ['arm', 'action'])
+
+
+class FrameError(ValueError):
+    """A line that is not a valid arm frame"""
+
+
+class ChecksumError(FrameError):
+    """A frame whose checksum does not match its content"""
+
+
+def checksum(text):
+    """XOR of the characters of text"""
+    value = 0
+    for byte in text.encode():
+        value ^= byte
+    return value
+
+
+def normalize_arm(arm):
+    """L or R for an arm prefix, accepting the ARML/ARMR/ARM1/ARM2 spellings"""
+    arm = arm.strip().upper()
+    arm = ARM_ALIASES.get(arm, arm)
+    if arm not in ARMS:
+        raise FrameError(f"Unknown arm '{arm}'")
+    return arm
+
+
+def split_command(command):
+    """(arm, action) of a command such as "L#H(1,2,3,4,5)" or "ARMR#PARK", checked against ACTION_PARAMETERS"""
+    arm, separator, action = command.strip().partition('#')
+    if not separator or not action:
+        raise FrameError(f"No '#' action in '{command}'")
+    action = action.replace(' ', '')
+    parse_action(action)
+    return normalize_arm(arm), action
+
+
+def parse_action(action):
+    """(action letter, parameters) of a host action; long names are accepted like the controllers do"""
+    letter = action[:1].upper()
+    if letter not in ACTION_PARAMETERS:
+        raise FrameError(f"Unknown action '{action}'")
+
+    parameters = []
+    if '(' in action:
+        if not action.endswith(')'):
+            raise FrameError(f"Unclosed parameters in '{action}'")
+        try:
+            parameters = [int(value) for value in action[action.index('(') + 1:-1].split(',')]
+        except ValueError:
+            raise FrameError(f"Non-integer parameter in '{action}'") from None
+
+    if len(parameters) != ACTION_PARAMETERS[letter]:
+        raise FrameError(f"{ACTION_NAMES[letter]} needs {ACTION_PARAMETERS[letter]} parameters, "
+                         f"got {len(parameters)}")
+    return letter, parameters
+
+
+def encode_frame(arm, action):
+    """Frame line (without line ending) of an action for an arm"""
+    body = f"{normalize_arm(arm)}#{action}"
+    line = f"{body}*{checksum(body):x}"
+    if len(line) > MAX_FRAME_LENGTH:
+        raise FrameError(f"Frame longer than {MAX_FRAME_LENGTH} characters: {line}")
+    return line
+
+
+def command_frame(command):
+    """Frame line of a command such as "L#H(1,2,3,4,5)", validated first"""
+    return encode_frame(*split_command(command))
+
+
+def parse_frame(line):
+    """Frame of a received line; raises ChecksumError or FrameError"""
+    body, separator, received = line.strip().rpartition('*')
+    if not separator:
+        raise FrameError(f"No checksum in '{line}'")
+    try:
+        received = int(received, 16)
+    except ValueError:
+        raise FrameError(f"Bad checksum '{received}'") from None
+    if checksum(body) != received:
+        raise ChecksumError(f"Checksum mismatch in '{line}': {checksum(body):02x} != {received:02x}")
+
+    arm, separator, action = body.partition('#')
+    if not separator:
+        raise FrameError(f"No '#' in '{line}'")
+    return Frame(normalize_arm(arm), action)
+
+
+def frame_reference(line):
+    """Checksum of a frame line, as status frames quote it"""
+    return line.strip().rpartition('*')[2].lower()
+
+
+def status_of(frame):
+    """(status, reason) of a status frame, or None for a host action"""
+    status, _, reason = frame.action.partition('(')
+    if status not in STATUSES:
+        return None
+    return status, reason.rstrip(')')
+
+
+def home(arm, x, y, z, t, g):
+    return f"{normalize_arm(arm)}#{ACTION_HOME}({x},{y},{z},{t},{g})"
+
+
+def glad(arm, xn, yn, zn, tn, dp, gp, za, zb, xa, ta):
+    values = (xn, yn, zn, tn, dp, gp, za, zb, xa, ta)
+    return f"{normalize_arm(arm)}#{ACTION_GLAD}(" + ",".join(str(value) for value in values) + ")"
+
+
+def park(arm):
+    return f"{normalize_arm(arm)}#{ACTION_PARK}"
+
+
+def calibrate(arm):
+    return f"{normalize_arm(arm)}#{ACTION_CALIBRATE}"
+
+
+def status_frame(arm, status, reason=None):
+    """Frame line of an arm status, as the simulator and a pin bridge send it"""
+    return encode_frame(arm, f"{status}({reason})" if reason else status)
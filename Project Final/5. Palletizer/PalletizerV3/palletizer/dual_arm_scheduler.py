@@ -0,0 +1,468 @@
+"""
+Dual-arm dispatcher for the V1.3 palletizer, with a discrete-event harness
+that compares dispatch policies on product arrival traces.
+
+Both arms serve one pick station in the centre of the conveyor. HOME sends an
+arm above the station, GLAD picks the product waiting there and places it on
+the arm's pallet, and only one arm may be in the centre at a time. The
+central state machine dispatches with fixed rules: the next HOME goes out once
+the centre sensor is clear, alternating between the arms. DualArmScheduler
+takes product arrivals and arm completions as events and decides which job
+(HOME, GLAD, CAL, PARK) each arm runs next, under one of these policies:
+
+    firmware     the rules of the central state machine
+    earliest     once the centre is clear, HOME the arm that reaches it first, waiting
+                 for a busy arm when it would still arrive before an idle one
+    anticipate   as earliest, but send HOME before the centre is clear, timed from the
+                 estimates so the arm arrives a safety margin after the other arm left
+
+Job durations are estimated from the motor steps PalletizerArmControl runs for
+each action, with the axis distances and speeds (palletizer.motion).
+
+The harness replays an arrival trace (one time in seconds per line, or the
+first column of a CSV, taken relative to the first arrival) or a generated
+one. Actual job times are spread around the estimates by --jitter. It reports
+per policy the throughput, product waiting time, arm utilisation and centre
+conflicts (an arm reaching the centre before the other one had left it).
+
+Usage:
+    python -m palletizer.dual_arm_scheduler [--trace arrivals.csv] [--products 96] [--interval 3.5]
+        [--poisson] [--jitter 0.1] [--safety 0.5] [--seed 1] [--policies firmware,earliest,anticipate] [--output report.json]
+"""
+import argparse
+import collections
+import heapq
+import json
+import math
+import random
+
+from palletizer import dual_arm_protocol as arm_protocol
+from palletizer.motion import estimate_step_sequence
+from palletizer.utils.config import (SLAVE_IDS, DUAL_ARM_AXIS_SPEED, DUAL_ARM_ACCELERATION_RATIO,
+                                     DUAL_ARM_HOMING_SPEED, DUAL_ARM_STEP_GAP_S, DUAL_ARM_DISPATCH_S,
+                                     DUAL_ARM_PARK_STEP_S, DUAL_ARM_LAYERS, DUAL_ARM_CALIBRATE_EVERY,
+                                     DUAL_ARM_CONVEYOR_OFF_S, DUAL_ARM_CENTRE_CLEARANCE_S,
+                                     DUAL_ARM_SCHEDULER_SAFETY_S)
+
+POLICIES = ('firmware', 'earliest', 'anticipate')
+
+# Default parameters of the central state machine (resetParametersToDefault) for ARM LEFT, in units of
+# MULTIPLIER steps. Tasks are (X, Y) place positions on odd and even layers.
+MULTIPLIER = 3
+DEFAULT_PARAMETERS = {
+    'x': 1305, 'y1': 130, 'y2': 410, 'z': 1280, 't': 80, 'g': -10,
+    'gp': 90, 'dp': 40, 'za': 250, 'zb': 1320, 'z1': 1325, 't90': 1680, 'h': 100,
+    'odd': [(645, 310), (250, 310), (645, 65), (250, 65), (785, 735), (545, 735), (245, 735), (5, 735)],
+    'even': [(645, 980), (250, 980), (645, 735), (250, 735), (785, 250), (545, 250), (245, 250), (5, 250)],
+    'y_pattern': [2, 1, 2, 1, 1, 1, 1, 1],
+}
+# ARM RIGHT differs by these offsets; 'task_x' applies to the X of every task
+RIGHT_ARM_OFFSETS = {'x': -20, 't': -30, 'g': 5, 'gp': 5, 'dp': 5, 't90': -30, 'task_x': -20}
+
+# GLAD holds the centre for its first steps: down to the product, grip, lift
+GLAD_CENTRE_STEPS = 3
+
+JobEstimate = collections.namedtuple('JobEstimate', ['duration', 'centre_s', 'positions'])
+# centre_s: HOME - from dispatch until the arm is over the station; GLAD - until the centre is clear
+Job = collections.namedtuple('Job', ['arm', 'command', 'action', 'estimate', 'product'])
+
+
+def arm_parameters(arm):
+    """Default parameters of an arm"""
+    parameters = dict(DEFAULT_PARAMETERS)
+    if arm_protocol.normalize_arm(arm) == arm_protocol.ARM_RIGHT:
+        offsets = dict(RIGHT_ARM_OFFSETS)
+        task_x = offsets.pop('task_x')
+        for key, offset in offsets.items():
+            parameters[key] += offset
+        for key in ('odd', 'even'):
+            parameters[key] = [(x + task_x, y) for x, y in parameters[key]]
+    return parameters
+
+
+def job_list(arm, layers=DUAL_ARM_LAYERS, start_layer=0, parameters=None):
+    """
+    Commands of one pallet for an arm as the central state machine generates
+    them (generateCommand): HOME and GLAD per product, CAL every
+    DUAL_ARM_CALIBRATE_EVERY commands and PARK at the end.
+    """
+    p = parameters or arm_parameters(arm)
+    m = MULTIPLIER
+    total = layers * 16
+    commands = []
+    for position in range(start_layer * 16, total):
+        layer, task = divmod(position // 2, 8)
+        if position % 2 == 0:
+            y = p['y1'] if p['y_pattern'][task] == 1 else p['y2']
+            commands.append(arm_protocol.home(arm, p['x'] * m, y * m, p['z'] * m, p['t'] * m, p['g'] * m))
+            continue
+
+        x, y = p['odd' if layer % 2 == 0 else 'even'][task]
+        t = p['t90'] if task < 4 else p['t']
+        zn = p['z1'] - layer * p['h']
+        commands.append(arm_protocol.glad(arm, x * m, y * m, zn * m, t * m, p['dp'] * m, p['gp'] * m, p['za'] * m,
+                                          p['zb'] * m, p['odd'][4][0] * m, p['t'] * m))
+        if (position + 1) % DUAL_ARM_CALIBRATE_EVERY == 0 and position + 1 < total:
+            commands.append(arm_protocol.calibrate(arm))
+    commands.append(arm_protocol.park(arm))
+    return commands
+
+
+class ArmMotionModel:
+    """
+    Predicted axis positions of one arm and the duration of its jobs, following
+    the motor steps of PalletizerArmControl (executeHomeStep, executeGladStep,
+    the PARK sequence and zeroing for CAL).
+    """
+
+    def __init__(self, speed=DUAL_ARM_AXIS_SPEED, homing_speed=DUAL_ARM_HOMING_SPEED,
+                 acceleration_ratio=DUAL_ARM_ACCELERATION_RATIO, step_gap_s=DUAL_ARM_STEP_GAP_S):
+        self.speeds = {axis: speed for axis in SLAVE_IDS}
+        self.homing_speeds = {axis: homing_speed for axis in SLAVE_IDS}
+        self.acceleration_ratio = acceleration_ratio
+        self.step_gap_s = step_gap_s
+        self.positions = {axis: 0 for axis in SLAVE_IDS}
+
+    @staticmethod
+    def steps(action, values):
+        """Motor steps (axis -> target) of an action"""
+        if action == arm_protocol.ACTION_HOME:
+            x, y, z, t, g = values
+            return [{'x': x, 'y': y, 't': t, 'g': g}, {'z': z}]
+        if action == arm_protocol.ACTION_GLAD:
+            xn, yn, zn, tn, dp, gp, za, zb, xa, ta = values
+            return [{'z': zb}, {'g': gp}, {'z': zn - za}, {'x': xn, 'y': yn, 't': tn},
+                    {'z': zn}, {'g': dp}, {'z': zn - za}, {'x': xa, 't': ta}]
+        if action == arm_protocol.ACTION_PARK:
+            return [{'z': 0}, {'x': 0, 't': 0, 'g': 0}, {'y': 0}]
+        return [{axis: 0 for axis in SLAVE_IDS}]
+
+    def estimate(self, command):
+        """JobEstimate of a command started from the current positions"""
+        _, action = arm_protocol.split_command(command)
+        action, values = arm_protocol.parse_action(action)
+        speeds = self.homing_speeds if action == arm_protocol.ACTION_CALIBRATE else self.speeds
+        durations, positions = estimate_step_sequence(self.steps(action, values), self.positions, speeds,
+                                                      self.acceleration_ratio, self.step_gap_s)
+        if action == arm_protocol.ACTION_PARK:
+            durations = [max(duration, DUAL_ARM_PARK_STEP_S) for duration in durations]
+
+        centre_s = None
+        if action == arm_protocol.ACTION_HOME:
+            centre_s = DUAL_ARM_DISPATCH_S + durations[0]
+        elif action == arm_protocol.ACTION_GLAD:
+            centre_s = DUAL_ARM_DISPATCH_S + sum(durations[:GLAD_CENTRE_STEPS]) + DUAL_ARM_CENTRE_CLEARANCE_S
+        return JobEstimate(DUAL_ARM_DISPATCH_S + sum(durations), centre_s, positions)
+
+
+class ArmSchedule:
+    """Jobs left for one arm and what it is doing"""
+
+    def __init__(self, arm, commands, model):
+        self.arm = arm
+        self.jobs = collections.deque(commands)
+        self.model = model
+        self.job = None  # Job running
+        self.busy_until = 0.0  # Estimated end of the running job
+        self.in_centre = False  # Over the station, waiting for a product
+        self.idle_since = 0.0
+
+    @property
+    def idle(self):
+        return self.job is None
+
+    @property
+    def next_action(self):
+        return self.jobs[0].split('#', 1)[1][:1] if self.jobs else None
+
+
+class DualArmScheduler:
+    """
+    Decides the jobs of both arms from product arrivals, job completions and
+    the centre sensor. Call product_arrived(), job_finished() and
+    centre_cleared() as those happen, then dispatch() for the jobs to send now;
+    when wakeup is set, call dispatch() again at that time even if nothing
+    else happens.
+    """
+
+    def __init__(self, policy='firmware', jobs=None, conveyor_off_s=DUAL_ARM_CONVEYOR_OFF_S,
+                 safety_s=DUAL_ARM_SCHEDULER_SAFETY_S):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown policy '{policy}', expected one of {', '.join(POLICIES)}")
+        self.policy = policy
+        self.conveyor_off_s = conveyor_off_s
+        self.safety_s = safety_s
+        jobs = jobs or {arm: job_list(arm) for arm in arm_protocol.ARMS}
+        self.arms = {arm: ArmSchedule(arm, commands, ArmMotionModel()) for arm, commands in jobs.items()}
+
+        self.products = collections.deque()  # Arrival times of products not picked yet
+        self.conveyor_on_at = 0.0  # The conveyor stops for a while after each pick
+        self.centre = None  # Arm sent HOME and not yet picking
+        self.leaving = None  # Arm picking, until the centre sensor is clear
+        self.leaving_clear_at = 0.0  # Estimated time the centre is clear
+        self.last_home = None
+        self.wakeup = None
+        self.placed = 0
+
+    # Events
+
+    def product_arrived(self, t):
+        self.products.append(t)
+
+    def job_finished(self, arm, t):
+        schedule = self.arms[arm]
+        job = schedule.job
+        schedule.job = None
+        schedule.idle_since = t
+        schedule.model.positions = dict(job.estimate.positions)
+        if job.action == arm_protocol.ACTION_HOME:
+            schedule.in_centre = True
+        elif job.action == arm_protocol.ACTION_GLAD:
+            self.placed += 1
+        return job
+
+    def centre_cleared(self, arm, t):
+        """The centre sensor reports the picking arm gone"""
+        if self.leaving == arm:
+            self.leaving = None
+
+    # Decisions
+
+    def product_ready_at(self):
+        """Time the first waiting product is at the station, None without products"""
+        if not self.products:
+            return None
+        return max(self.products[0], self.conveyor_on_at)
+
+    def dispatch(self, t):
+        """Jobs to send at time t"""
+        self.wakeup = None
+        started = []
+
+        # Pick with the arm over the station
+        if self.centre is not None:
+            holder = self.arms[self.centre]
+            ready_at = self.product_ready_at()
+            if holder.idle and holder.in_centre and ready_at is not None:
+                if ready_at <= t:
+                    started.append(self.start(holder, t, product=self.products.popleft()))
+                    self.conveyor_on_at = t + self.conveyor_off_s
+                    self.centre = None
+                    self.leaving = holder.arm
+                    self.leaving_clear_at = t + started[-1].estimate.centre_s
+                else:
+                    self.set_wakeup(ready_at)
+
+        # CAL and PARK do not need the centre
+        for schedule in self.arms.values():
+            if schedule.idle and not schedule.in_centre and schedule.next_action in (arm_protocol.ACTION_CALIBRATE,
+                                                                                    arm_protocol.ACTION_PARK):
+                started.append(self.start(schedule, t))
+
+        if self.centre is None:
+            home = self.choose_home(t)
+            if home is not None:
+                self.centre = home.arm
+                self.last_home = home.arm
+                started.append(self.start(home, t))
+        return started
+
+    def choose_home(self, t):
+        """Arm to send HOME now under the policy, or None"""
+        candidates = [schedule for schedule in self.arms.values()
+                      if schedule.next_action == arm_protocol.ACTION_HOME and not schedule.in_centre]
+        idle = [schedule for schedule in candidates if schedule.idle]
+
+        if self.policy == 'firmware':
+            if self.leaving is not None or not idle:
+                return None
+            if len(idle) > 1:
+                return next(schedule for schedule in idle if schedule.arm != self.last_home)
+            return idle[0]
+
+        # earliest arrival at the centre, counting arms that are still busy; anticipate also starts
+        # before the centre is clear
+        if self.policy == 'earliest' and self.leaving is not None:
+            return None
+        best = None
+        for schedule in candidates:
+            arrive_s = schedule.model.estimate(schedule.jobs[0]).centre_s
+            start = t if schedule.idle else max(t, schedule.busy_until)
+            if self.leaving is not None:
+                start = max(start, self.leaving_clear_at + self.safety_s - arrive_s)
+            if best is None or (start + arrive_s, schedule.idle_since) < (best[0] + best[1], best[2].idle_since):
+                best = (start, arrive_s, schedule)
+        if best is None:
+            return None
+        start, _, schedule = best
+        if schedule.idle and start <= t:
+            return schedule
+        if schedule.idle:
+            self.set_wakeup(start)
+        return None  # The busy arm reports its completion
+
+    def set_wakeup(self, t):
+        self.wakeup = t if self.wakeup is None else min(self.wakeup, t)
+
+    def start(self, schedule, t, product=None):
+        command = schedule.jobs.popleft()
+        estimate = schedule.model.estimate(command)
+        job = Job(schedule.arm, command, command.split('#', 1)[1][:1], estimate, product)
+        schedule.job = job
+        schedule.busy_until = t + estimate.duration
+        if job.action == arm_protocol.ACTION_GLAD:
+            schedule.in_centre = False
+        return job
+
+
+# Harness
+
+def read_arrivals(path):
+    """Arrival times of a trace file, relative to the first; lines that are not numbers are skipped"""
+    times = []
+    with open(path, 'r') as f:
+        for line in f:
+            field = line.replace(';', ',').split(',')[0].strip()
+            try:
+                times.append(float(field))
+            except ValueError:
+                continue
+    times.sort()
+    return [time - times[0] for time in times]
+
+
+def synthetic_arrivals(count, interval, poisson=False, seed=None):
+    """Arrival times every interval seconds, or with exponential gaps of that mean"""
+    rng = random.Random(seed)
+    times = []
+    time = 0.0
+    for _ in range(count):
+        times.append(time)
+        time += rng.expovariate(1.0 / interval) if poisson else interval
+    return times
+
+
+def simulate(policy, arrivals, jitter=0.0, seed=None, jobs=None, safety_s=DUAL_ARM_SCHEDULER_SAFETY_S):
+    """
+    Run the scheduler against an arrival trace with actual job times spread
+    uniformly by +-jitter around the estimates. Returns a report dictionary.
+    """
+    scheduler = DualArmScheduler(policy, jobs, safety_s=safety_s)
+    rng = random.Random(seed)
+    events = []
+    sequence = 0
+
+    def push(t, kind, arm=None):
+        nonlocal sequence
+        sequence += 1
+        heapq.heappush(events, (t, sequence, kind, arm))
+
+    for t in arrivals:
+        push(t, 'arrival')
+
+    busy_time = collections.defaultdict(float)
+    waits = []
+    conflicts = 0
+    not_cleared = set()  # Arms picking whose actual clear time has not come yet
+    last_placed = 0.0
+    wakeups = set()
+    actions = collections.Counter()
+
+    while events:
+        t, _, kind, arm = heapq.heappop(events)
+        if kind == 'arrival':
+            scheduler.product_arrived(t)
+        elif kind == 'done':
+            if scheduler.job_finished(arm, t).action == arm_protocol.ACTION_GLAD:
+                last_placed = t
+        elif kind == 'clear':
+            not_cleared.discard(arm)
+            scheduler.centre_cleared(arm, t)
+        elif kind == 'reach':
+            conflicts += bool(not_cleared - {arm})
+            continue
+        elif kind == 'wakeup':
+            wakeups.discard(t)
+
+        for job in scheduler.dispatch(t):
+            factor = 1.0 + rng.uniform(-jitter, jitter)
+            duration = job.estimate.duration * factor
+            busy_time[job.arm] += duration
+            actions[job.action] += 1
+            push(t + duration, 'done', job.arm)
+            if job.action == arm_protocol.ACTION_GLAD:
+                waits.append(t - job.product)
+                not_cleared.add(job.arm)
+                push(t + job.estimate.centre_s * factor, 'clear', job.arm)
+            elif job.action == arm_protocol.ACTION_HOME:
+                push(t + job.estimate.centre_s * factor, 'reach', job.arm)
+        if scheduler.wakeup is not None and scheduler.wakeup > t and scheduler.wakeup not in wakeups:
+            wakeups.add(scheduler.wakeup)
+            push(scheduler.wakeup, 'wakeup')
+
+    span = last_placed - (arrivals[0] if arrivals else 0.0)
+    return {
+        'policy': policy,
+        'products': len(arrivals),
+        'placed': scheduler.placed,
+        'span_s': round(span, 3),
+        'throughput_per_min': round(scheduler.placed / span * 60, 2) if span > 0 else 0.0,
+        'wait_mean_s': round(sum(waits) / len(waits), 3) if waits else 0.0,
+        'wait_max_s': round(max(waits), 3) if waits else 0.0,
+        'utilisation': {arm: round(busy_time[arm] / span, 3) if span > 0 else 0.0 for arm in scheduler.arms},
+        'calibrations': actions[arm_protocol.ACTION_CALIBRATE],
+        'conflicts': conflicts,
+    }
+
+
+def print_reports(reports):
+    print(f"{'policy':<11} {'placed':>7} {'span s':>8} {'per min':>8} {'wait mean':>10} {'wait max':>9} "
+          f"{'util L/R':>11} {'conflicts':>9}")
+    for report in reports:
+        utilisation = "/".join(f"{report['utilisation'][arm]:.0%}" for arm in sorted(report['utilisation']))
+        print(f"{report['policy']:<11} {report['placed']:>3}/{report['products']:<3} {report['span_s']:>8.1f} "
+              f"{report['throughput_per_min']:>8.2f} {report['wait_mean_s']:>9.2f}s {report['wait_max_s']:>8.2f}s "
+              f"{utilisation:>11} {report['conflicts']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dual-arm dispatch policies on product arrival traces")
+    parser.add_argument('--trace', help="Arrival times file (seconds, one per line or first CSV column)")
+    parser.add_argument('--products', type=int, default=96, help="Products in a generated trace")
+    parser.add_argument('--interval', type=float, default=3.5, help="Mean seconds between generated arrivals")
+    parser.add_argument('--poisson', action='store_true', help="Exponential gaps instead of a fixed interval")
+    parser.add_argument('--save-trace', help="Write the generated trace to this file")
+    parser.add_argument('--jitter', type=float, default=0.1, help="Actual job time spread around the estimate (0.1 = 10%%)")
+    parser.add_argument('--safety', type=float, default=DUAL_ARM_SCHEDULER_SAFETY_S,
+                        help="Seconds the 'anticipate' policy keeps between one arm leaving the centre and the next arriving")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--policies', default=",".join(POLICIES), help="Comma-separated policies to compare")
+    parser.add_argument('--output', help="Write the reports as JSON")
+    args = parser.parse_args()
+
+    if args.trace:
+        arrivals = read_arrivals(args.trace)
+    else:
+        arrivals = synthetic_arrivals(args.products, args.interval, args.poisson, args.seed)
+        if args.save_trace:
+            with open(args.save_trace, 'w') as f:
+                f.write("".join(f"{t:.3f}\n" for t in arrivals))
+
+    capacity = sum(DUAL_ARM_LAYERS * 8 for _ in arm_protocol.ARMS)
+    if len(arrivals) > capacity:
+        print(f"Only the first {capacity} arrivals fit on the pallets")
+        arrivals = arrivals[:capacity]
+
+    mean_gap = (arrivals[-1] - arrivals[0]) / (len(arrivals) - 1) if len(arrivals) > 1 else math.inf
+    print(f"{len(arrivals)} arrivals, one every {mean_gap:.2f} s on average, jitter {args.jitter:.0%}")
+    reports = [simulate(policy.strip(), arrivals, args.jitter, args.seed, safety_s=args.safety)
+               for policy in args.policies.split(',')]
+    print_reports(reports)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'arrivals': len(arrivals), 'jitter': args.jitter, 'reports': reports}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,380 @@
+"""
+Render sequences to PNG frames or a video file without showing a window.
+
+The axis positions of every frame come from motion.SequenceTimeline, the
+predicted motion of the rows. With an OpenGL context the frames are rendered
+from the ModelController scene of the 3D tab, off screen; without one (a
+headless server) the software wireframe renderer draws the same mechanism
+edges. Several sequences are rendered in parallel worker processes, each with
+its own off-screen Qt application.
+
+Usage:
+    python -m palletizer.headless_render RunningTest_1.yaml --out renders
+    python -m palletizer.headless_render sequences/*.yaml --video --speed 4 --workers 4
+"""
+import argparse
+import glob
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import subprocess
+import time
+
+import yaml
+
+from palletizer.motion import SequenceTimeline
+from palletizer.utils.config import (SLAVE_IDS, HEADLESS_RENDER_SIZE, HEADLESS_RENDER_FPS, HEADLESS_RENDER_SPEED,
+                                     HEADLESS_RENDER_BACKEND, HEADLESS_RENDER_VIEW, HEADLESS_RENDER_TRAIL,
+                                     HEADLESS_RENDER_FIT_CAMERA)
+
+BACKENDS = ['auto', 'gl', 'wireframe']
+PNG_QUALITY = 80  # Light zlib compression: about half the encoding time of the default, same file size
+DEFAULT_RAIL_LENGTHS = {'x': 1500, 'y': 500, 'z': 1200}
+DEFAULT_RELATIVE_POSITIONS = {'x_offset': 0, 'y_offset': 0, 'z_offset': 0}
+
+application = None  # Kept referenced, Qt crashes when painting text after the application is collected
+
+
+def ensure_application():
+    """Create an off-screen QApplication if there is none yet"""
+    global application
+    # The platform has to be chosen before Qt creates the application
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    from PyQt5.QtWidgets import QApplication
+    if QApplication.instance() is None:
+        application = QApplication(['headless_render'])
+    return QApplication.instance()
+
+
+def fit_camera(timeline, width, height, view=HEADLESS_RENDER_VIEW, fov=60, samples=200, margin=1.05):
+    """
+    Camera center and distance that keep the whole mechanism in the frame for
+    the entire sequence, from the component boxes at sampled times.
+    """
+    import numpy as np
+    from palletizer.ui.visualization import geometry
+    from palletizer.ui.visualization.camera_controls import VIEW_PRESETS
+    from palletizer.ui.visualization.wireframe import view_matrix
+
+    times = np.linspace(0.0, timeline.duration, samples)
+    positions = {axis: np.array([timeline.position_at(axis, t) for t in times]) for axis in SLAVE_IDS}
+    poses = geometry.compute_component_poses(positions, DEFAULT_RAIL_LENGTHS, DEFAULT_RELATIVE_POSITIONS)
+    corners = np.concatenate([geometry.box_corners(*poses[name]).reshape(-1, 3)
+                              for name in geometry.COMPONENT_NAMES])
+    center = (corners.min(axis=0) + corners.max(axis=0)) / 2
+
+    # Corners in camera orientation; a corner is in view once distance >= z + |x| * focal
+    # (and the same for y with the narrower vertical field of view)
+    _, elevation, azimuth = VIEW_PRESETS[view]
+    rotated = (corners - center) @ view_matrix(0, elevation, azimuth)[:3, :3].T
+    focal = 1.0 / np.tan(np.radians(fov) / 2)
+    needed = np.maximum(np.abs(rotated[:, 0]) * focal, np.abs(rotated[:, 1]) * focal * width / height)
+    distance = float((rotated[:, 2] + needed).max()) * margin
+    return tuple(float(value) for value in center), distance
+
+
+class GLFrameSource:
+    """Frames rendered by the ModelController scene into an off-screen framebuffer"""
+    name = 'gl'
+
+    def __init__(self, width, height, view, trail, fit=None):
+        from PyQt5.QtCore import Qt
+        from PyQt5.QtGui import QVector3D
+        from palletizer.ui.visualization_panel import VisualizationPanel
+
+        self.width = width
+        self.height = height
+        self.app = ensure_application()
+        self.panel = VisualizationPanel()
+        self.panel.setAttribute(Qt.WA_DontShowOnScreen)
+        self.panel.resize(width, height)
+        self.panel.show()
+
+        # The panel builds its scene shortly after it is shown
+        deadline = time.monotonic() + 5.0
+        while not self.panel.initialized and time.monotonic() < deadline:
+            self.app.processEvents()
+
+        self.model_ctrl = self.panel.model_ctrl
+        self.view = self.model_ctrl.view
+        if not self.panel.initialized or self.view is None or not self.view.isValid():
+            self.close()
+            raise RuntimeError("No OpenGL context available")
+
+        self.panel.camera_ctrl.set_view(view)
+        if fit is not None:
+            center, distance = fit
+            self.view.setCameraPosition(pos=QVector3D(*center), distance=distance)
+        if trail:
+            self.model_ctrl.set_trail_enabled(True)
+
+    def render(self, positions):
+        from PyQt5.QtGui import QImage
+
+        self.panel.positions.update(positions)
+        self.model_ctrl.update_visualization()
+        pixels = self.view.renderToArray((self.width, self.height))
+        # BGRA bytes are ARGB32 on little-endian machines
+        return QImage(pixels.data, self.width, self.height, 4 * self.width, QImage.Format_ARGB32).copy()
+
+    def close(self):
+        self.panel.close()
+        self.panel.deleteLater()
+
+
+class WireframeFrameSource:
+    """Frames drawn by the software wireframe renderer"""
+    name = 'wireframe'
+
+    def __init__(self, width, height, view, trail, fit=None):
+        from palletizer.ui.visualization.camera_controls import VIEW_PRESETS
+        from palletizer.ui.visualization.wireframe import WireframeRenderer
+        from palletizer.ui.visualization.motion_trail import MotionTrail
+        from palletizer.ui.visualization import geometry
+
+        self.app = ensure_application()
+        self.geometry = geometry
+        self.renderer = WireframeRenderer(width, height, DEFAULT_RAIL_LENGTHS, DEFAULT_RELATIVE_POSITIONS, view)
+        if fit is not None:
+            center, distance = fit
+            _, elevation, azimuth = VIEW_PRESETS[view]
+            self.renderer.set_camera(distance, elevation, azimuth, center)
+        self.trail = MotionTrail() if trail else None
+
+    def render(self, positions):
+        trail = None
+        if self.trail is not None:
+            poses = self.geometry.compute_component_poses(
+                positions, self.renderer.rail_lengths, self.renderer.relative_positions)
+            self.trail.add(self.geometry.gripper_tip_position(poses))
+            trail = self.trail.vertices()
+        return self.renderer.render(positions, trail)
+
+    def close(self):
+        pass
+
+
+def open_frame_source(backend, width, height, view=HEADLESS_RENDER_VIEW, trail=HEADLESS_RENDER_TRAIL, fit=None):
+    """
+    Frame source for a backend name; 'auto' falls back to the wireframe without
+    OpenGL. fit is a (center, distance) camera from fit_camera(), or None for the view preset.
+    """
+    if backend in ('auto', 'gl'):
+        try:
+            return GLFrameSource(width, height, view, trail, fit)
+        except Exception:
+            if backend == 'gl':
+                raise
+    return WireframeFrameSource(width, height, view, trail, fit)
+
+
+def draw_caption(image, text):
+    """Write the sequence name, row and time into the corner of a frame"""
+    from PyQt5.QtCore import Qt
+    from PyQt5.QtGui import QPainter
+
+    painter = QPainter(image)
+    painter.setPen(Qt.black)
+    painter.drawText(10, 20, text)
+    painter.end()
+
+
+class PngWriter:
+    """One numbered PNG file per frame; frames of an earlier render in the directory are removed"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.frames = 0
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, "frame_*.png")):
+            os.remove(path)
+
+    def write(self, image):
+        image.save(os.path.join(self.directory, f"frame_{self.frames:05d}.png"), 'PNG', PNG_QUALITY)
+        self.frames += 1
+
+    def close(self):
+        return self.directory
+
+    def abort(self):
+        pass
+
+
+class VideoWriter:
+    """Frames piped as raw BGRA to ffmpeg, encoded to H.264"""
+
+    def __init__(self, path, width, height, fps):
+        ffmpeg = shutil.which('ffmpeg')
+        if ffmpeg is None:
+            raise RuntimeError("ffmpeg was not found on PATH; render PNG frames instead")
+
+        self.path = path
+        self.process = subprocess.Popen(
+            [ffmpeg, '-loglevel', 'error', '-y', '-f', 'rawvideo', '-pix_fmt', 'bgra',
+             '-s', f"{width}x{height}", '-r', str(fps), '-i', '-',
+             '-c:v', 'libx264', '-pix_fmt', 'yuv420p', path],
+            stdin=subprocess.PIPE)
+
+    def write(self, image):
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        self.process.stdin.write(bytes(bits))
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg failed to encode {self.path}")
+        return self.path
+
+    def abort(self):
+        """Stop ffmpeg after a failed render, without raising over the original error"""
+        self.process.kill()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            pass
+        self.process.wait()
+
+
+def render_sequence(sequence_path, out_dir, size=HEADLESS_RENDER_SIZE, fps=HEADLESS_RENDER_FPS,
+                    speed=HEADLESS_RENDER_SPEED, video=False, backend=HEADLESS_RENDER_BACKEND,
+                    view=HEADLESS_RENDER_VIEW, trail=HEADLESS_RENDER_TRAIL, fit=HEADLESS_RENDER_FIT_CAMERA,
+                    output_name=None):
+    """
+    Render one sequence file; speed is sequence seconds per video second.
+    The frame folder or video is named output_name, by default the file name
+    without extension (the YAML name is only the caption, several files share it).
+    Returns a summary with the output path, frame count and timings.
+    """
+    started = time.perf_counter()
+    with open(sequence_path, 'r') as f:
+        sequence_data = yaml.safe_load(f) or {}
+    stem = os.path.splitext(os.path.basename(sequence_path))[0]
+    name = sequence_data.get('name', stem)
+    output_name = output_name or stem
+    rows = sequence_data.get('rows', [])
+    timeline = SequenceTimeline.from_rows(rows)
+
+    width, height = size
+    camera = fit_camera(timeline, width, height, view) if fit and rows else None
+    if video:
+        writer = VideoWriter(os.path.join(out_dir, f"{output_name}.mp4"), width, height, fps)
+    else:
+        writer = PngWriter(os.path.join(out_dir, output_name))
+
+    frames = int(math.ceil(timeline.duration / speed * fps)) + 1
+    source = None
+    try:
+        source = open_frame_source(backend, width, height, view, trail, camera)
+        for frame in range(frames):
+            t = min(frame * speed / fps, timeline.duration)
+            image = source.render(timeline.positions_at(t))
+            draw_caption(image, f"{name}  row {timeline.row_at(t) + 1}/{len(rows)}  t = {t:6.1f} s")
+            writer.write(image)
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if source is not None:
+            source.close()
+    output = writer.close()
+
+    return {
+        'sequence': sequence_path,
+        'name': name,
+        'rows': len(rows),
+        'duration_s': timeline.duration,
+        'frames': frames,
+        'backend': source.name,
+        'output': output,
+        'render_s': time.perf_counter() - started,
+    }
+
+
+def render_job(job):
+    """Worker process entry point: render one sequence and report errors instead of raising"""
+    sequence_path, options = job
+    try:
+        return render_sequence(sequence_path, **options)
+    except Exception as e:
+        return {'sequence': sequence_path, 'error': str(e)}
+
+
+def output_names(sequence_paths):
+    """Output name of each sequence file: its stem, with _2, _3... added to stems already taken"""
+    names = []
+    taken = set()
+    for path in sequence_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, count = stem, 1
+        while name in taken:
+            count += 1
+            name = f"{stem}_{count}"
+        taken.add(name)
+        names.append(name)
+    return names
+
+
+def render_many(sequence_paths, workers=1, **options):
+    """Render several sequences, in parallel processes when workers > 1; yields summaries as they finish"""
+    jobs = [(path, dict(options, output_name=name)) for path, name in zip(sequence_paths, output_names(sequence_paths))]
+    if workers <= 1 or len(jobs) <= 1:
+        for job in jobs:
+            yield render_job(job)
+        return
+
+    # Spawned workers, so no Qt state is inherited from this process
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(min(workers, len(jobs))) as pool:
+        yield from pool.imap_unordered(render_job, jobs)
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render sequences to images or video without a window")
+    parser.add_argument('sequences', nargs='+', help="Sequence YAML files")
+    parser.add_argument('--out', default='renders', help="Output directory")
+    parser.add_argument('--size', type=parse_size, default=HEADLESS_RENDER_SIZE, metavar='WxH',
+                        help="Frame size, e.g. 1280x720")
+    parser.add_argument('--fps', type=float, default=HEADLESS_RENDER_FPS, help="Frames per second of output")
+    parser.add_argument('--speed', type=float, default=HEADLESS_RENDER_SPEED,
+                        help="Playback speed (sequence seconds per output second)")
+    parser.add_argument('--video', action='store_true', help="Encode an MP4 per sequence with ffmpeg")
+    parser.add_argument('--backend', choices=BACKENDS, default=HEADLESS_RENDER_BACKEND,
+                        help="OpenGL, software wireframe, or OpenGL with wireframe fallback")
+    parser.add_argument('--view', default=HEADLESS_RENDER_VIEW, choices=['top', 'side', 'front', 'isometric'])
+    parser.add_argument('--no-trail', dest='trail', action='store_false', help="Do not draw the gripper path")
+    parser.add_argument('--no-fit', dest='fit', action='store_false',
+                        help="Use the view preset camera instead of framing the whole sequence")
+    parser.add_argument('--workers', type=int, default=1, help="Sequences rendered in parallel")
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    options = {'out_dir': args.out, 'size': args.size, 'fps': args.fps, 'speed': args.speed,
+               'video': args.video, 'backend': args.backend, 'view': args.view, 'trail': args.trail,
+               'fit': args.fit}
+
+    started = time.perf_counter()
+    summaries = []
+    for summary in render_many(args.sequences, args.workers, **options):
+        summaries.append(summary)
+        if 'error' in summary:
+            print(f"FAILED {summary['sequence']}: {summary['error']}")
+        else:
+            print(f"{summary['name']}: {summary['frames']} frames ({summary['backend']}) "
+                  f"in {summary['render_s']:.1f} s -> {summary['output']}")
+
+    report_path = os.path.join(args.out, 'render_report.json')
+    with open(report_path, 'w') as f:
+        json.dump({'options': {**options, 'size': list(args.size)}, 'sequences': summaries}, f, indent=2)
+    print(f"{len(summaries)} sequences in {time.perf_counter() - started:.1f} s, report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+"""
+Link throughput and loss benchmark with a baud rate sweep.
+
+Sends patterned probe lines through the SerialCommunicator the application
+uses to a device that echoes them, at every baud rate of the sweep. A probe is
+
+    LB000042 x(5700), y(15500), z(4000), t(-600), g(1000) *3F1A
+
+with a sequence number and the CRC-16 of everything before " *", so lost,
+corrupted, late (or duplicated) and reordered echoes can be told apart. The
+sequence number of an echo is only trusted when its CRC matches; any other
+line is a damaged echo, charged to the oldest probe in flight as the device
+echoes in order.
+Every rate runs two phases:
+
+- latency: one probe at a time, for the round-trip time percentiles;
+- throughput: LINK_BENCHMARK_WINDOW probes in flight, for the effective
+  commands per second and the loss and corruption counts.
+
+The time of a line is split into wire time (its bytes at 10 bits per byte),
+host CPU time (of the whole process, so including a simulated device) and
+turnaround (round trip beyond the wire time both ways: device parsing plus
+host wake-up latency); the largest is reported as the bottleneck. Simulated
+ports have no file descriptor, so the link polls them every
+SERIAL_POLL_INTERVAL, which shows up as turnaround.
+
+The device is either the built-in loopback fake (sim://), which can also
+model parse time, loss and corruption, or real hardware that echoes lines
+(echo firmware, or a TX-RX jumper on the adapter). The JSON report carries a
+label, e.g. the firmware revision, and two reports can be compared.
+
+Usage:
+    python -m palletizer.link_benchmark sim:// --label fw-1.2 --output link_fw12.json
+    python -m palletizer.link_benchmark /dev/ttyUSB0 --bauds 9600,115200 --pattern short
+    python -m palletizer.link_benchmark sim:// --loss 0.01 --corrupt 0.01 --turnaround-ms 5
+    python -m palletizer.link_benchmark --compare link_fw12.json link_fw13.json
+"""
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+
+from palletizer.binary_protocol import crc16
+from palletizer.serial_communicator import SerialCommunicator
+from palletizer.simulated_serial import SimulatedSerialPort, LineDevice
+from palletizer.utils.config import (BAUDRATES, LINK_BENCHMARK_LINES, LINK_BENCHMARK_LATENCY_LINES,
+                                     LINK_BENCHMARK_WINDOW, LINK_BENCHMARK_TIMEOUT_S,
+                                     LINK_BENCHMARK_SIM_TURNAROUND_S)
+
+SIM_TARGET = "sim://"
+PROBE_PREFIX = "LB"
+
+# Probe payloads, cycled through in order
+PATTERNS = {
+    'row': ["x(5700), y(15500), z(4000), t(-600), g(1000)", "x(0), y(6000), t(0)", "z(7000), g(0)", "g(1000)"],
+    'short': ["g(1000)", "z(1000)", "PAUSE", "RESUME"],
+    'long': ["x(100,d500,200,d500,300,d500,400), y(100,d500,200,d500,300,d500,400), z(100,d500,200,d500,300)"],
+    'stress': ["U" * 48, "*" * 48],  # 0x55 and 0x2A: alternating and repeated bits on the wire
+}
+
+
+def probe_line(sequence, payload):
+    body = f"{PROBE_PREFIX}{sequence:06d} {payload}"
+    return f"{body} *{crc16(body.encode()):04X}"
+
+
+def parse_probe(line):
+    """Sequence number of an intact echoed probe; None for a damaged probe or any other line"""
+    body, _, crc = line.rpartition(" *")
+    if not body.startswith(PROBE_PREFIX) or crc != f"{crc16(body.encode()):04X}":
+        return None
+    try:
+        return int(body[len(PROBE_PREFIX):len(PROBE_PREFIX) + 6])
+    except ValueError:
+        return None
+
+
+class LoopbackDevice(LineDevice):
+    """
+    Built-in fake device that echoes every line. Lines are handled one at a
+    time like the firmware loop: each takes turnaround_s after the previous
+    one, and can be dropped or get a flipped bit with the given probabilities.
+    """
+
+    def __init__(self, turnaround_s=LINK_BENCHMARK_SIM_TURNAROUND_S, loss=0.0, corrupt=0.0, seed=1,
+                 binary_protocol=False):
+        super().__init__(binary_protocol)
+        self.turnaround_s = turnaround_s
+        self.loss = loss
+        self.corrupt = corrupt
+        self.random = random.Random(seed)
+        self.busy_until = 0.0
+
+    def handle_line(self, line, timestamp):
+        self.busy_until = max(self.busy_until, timestamp) + self.turnaround_s
+        if self.random.random() < self.loss:
+            return
+        if line and self.random.random() < self.corrupt:
+            index = self.random.randrange(len(line))
+            line = line[:index] + chr(ord(line[index]) ^ 0x04) + line[index + 1:]
+        self.port.device_write(self.encode(line), at=self.busy_until)
+
+
+def latency_summary(latencies):
+    """Round-trip percentiles in ms of latencies in seconds"""
+    if not latencies:
+        return {'count': 0, 'min_ms': None, 'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'max_ms': None}
+
+    latencies = sorted(latencies)
+
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] * 1000
+
+    return {'count': len(latencies), 'min_ms': latencies[0] * 1000, 'p50_ms': percentile(0.5),
+            'p90_ms': percentile(0.9), 'p99_ms': percentile(0.99), 'max_ms': latencies[-1] * 1000}
+
+
+class ProbeSession:
+    """Sends probes on one connected link and matches the echoes on the link thread"""
+
+    def __init__(self, link, payloads, timeout_s):
+        self.link = link
+        self.payloads = payloads
+        self.timeout_s = timeout_s
+        self.next_sequence = 0
+        self.lock = threading.Lock()
+        self.phase = None
+        link.add_line_listener(self.on_line)
+
+    def run(self, count, window):
+        """Send count probes with up to window in flight; returns the phase counters"""
+        phase = {
+            'count': count, 'window': window, 'sent': 0, 'wire_bytes': 0, 'in_flight': {}, 'done': set(),
+            'rtts': [], 'lost': 0, 'corrupted': 0, 'late': 0, 'reordered': 0, 'last_sequence': -1,
+            'finished': threading.Event(),
+        }
+        start = time.monotonic()
+        cpu_start = time.process_time()
+        with self.lock:
+            self.phase = phase
+            self._send_more(phase)
+
+        while not phase['finished'].wait(0.02):
+            now = time.monotonic()
+            with self.lock:
+                for sequence, sent_at in list(phase['in_flight'].items()):
+                    if now - sent_at > self.timeout_s:
+                        del phase['in_flight'][sequence]
+                        phase['done'].add(sequence)
+                        phase['lost'] += 1
+                self._send_more(phase)
+
+        with self.lock:
+            self.phase = None
+        phase['elapsed'] = time.monotonic() - start
+        phase['cpu'] = time.process_time() - cpu_start
+        return phase
+
+    def _send_more(self, phase):
+        while len(phase['in_flight']) < phase['window'] and phase['sent'] < phase['count']:
+            line = probe_line(self.next_sequence, self.payloads[phase['sent'] % len(self.payloads)])
+            phase['in_flight'][self.next_sequence] = time.monotonic()
+            phase['wire_bytes'] += len(self.link.encode(line))
+            phase['sent'] += 1
+            self.next_sequence += 1
+            self.link.send_command(line)
+        if not phase['in_flight'] and phase['sent'] >= phase['count']:
+            phase['finished'].set()
+
+    def on_line(self, timestamp, line):
+        sequence = parse_probe(line)
+        with self.lock:
+            phase = self.phase
+            if phase is None:
+                return
+            if sequence is None:
+                # Damaged echo: its sequence number cannot be trusted, so it stands for the oldest probe
+                if not phase['in_flight']:
+                    phase['late'] += 1
+                    return
+                sequence = next(iter(phase['in_flight']))
+                phase['corrupted'] += 1
+            elif sequence not in phase['in_flight']:
+                # Echo of a probe already resolved (counted as lost, or a duplicate)
+                phase['late'] += 1
+                return
+            else:
+                phase['rtts'].append(timestamp - phase['in_flight'][sequence])
+                if sequence < phase['last_sequence']:
+                    phase['reordered'] += 1
+                phase['last_sequence'] = max(phase['last_sequence'], sequence)
+            del phase['in_flight'][sequence]
+            phase['done'].add(sequence)
+            self._send_more(phase)
+
+
+def open_link(target, baud, args):
+    """Connected SerialCommunicator for the target at baud, not started"""
+    link = SerialCommunicator(metrics_labels={'link': 'benchmark'})
+    link.binary_protocol = args.binary
+    if target == SIM_TARGET:
+        device = LoopbackDevice(args.turnaround_ms / 1000, args.loss, args.corrupt, args.seed, args.binary)
+        link.port_factory = lambda port, baudrate: SimulatedSerialPort(device, baudrate)
+    link.attach(link.open_port(target, baud), target)
+    return link
+
+
+def benchmark_baud(target, baud, args):
+    """Latency and throughput phases at one baud rate; returns the result dict"""
+    link = open_link(target, baud, args)
+    link.start()
+    try:
+        # Boards that reset when the port opens need a moment before they listen
+        time.sleep(args.settle)
+        deadline = time.monotonic() + 2.0
+        while args.binary and link.protocol != 'binary' and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        session = ProbeSession(link, PATTERNS[args.pattern], args.timeout)
+        latency = session.run(args.latency_lines, 1)
+        throughput = session.run(args.lines, args.window)
+        protocol = link.protocol
+    finally:
+        link.stop()
+
+    line_bytes = throughput['wire_bytes'] / max(throughput['sent'], 1)
+    wire_ms = line_bytes * 10 / baud * 1000
+    rtt = latency_summary(latency['rtts'])
+    turnaround_ms = max(0.0, rtt['p50_ms'] - 2 * wire_ms) if rtt['count'] else None
+    resolved = throughput['sent'] - len(throughput['in_flight'])
+    host_ms = throughput['cpu'] / max(resolved, 1) * 1000
+    received = len(throughput['rtts'])
+    commands_per_s = received / throughput['elapsed'] if throughput['elapsed'] else 0.0
+
+    shares = {'wire': wire_ms, 'host': host_ms, 'turnaround': turnaround_ms or 0.0}
+    return {
+        'baud': baud,
+        'protocol': protocol,
+        'line_bytes': line_bytes,
+        'wire_ms_per_line': wire_ms,
+        'latency': rtt,
+        'throughput_rtt': latency_summary(throughput['rtts']),
+        'commands_per_s': commands_per_s,
+        'wire_limit_per_s': 1000 / wire_ms,
+        'wire_efficiency': commands_per_s * wire_ms / 1000,
+        'host_cpu_ms_per_line': host_ms,
+        'turnaround_ms': turnaround_ms,
+        'bottleneck': max(shares, key=shares.get),
+        'sent': latency['sent'] + throughput['sent'],
+        'lost': latency['lost'] + throughput['lost'],
+        'corrupted': latency['corrupted'] + throughput['corrupted'],
+        'late': latency['late'] + throughput['late'],
+        'reordered': latency['reordered'] + throughput['reordered'],
+    }
+
+
+def format_result(result):
+    rtt = result['latency']
+    latency = (f"RTT p50 {rtt['p50_ms']:.1f} p99 {rtt['p99_ms']:.1f} ms" if rtt['count'] else "no echoes")
+    return (f"{result['baud']:>7} baud: {result['line_bytes']:.0f} B/line, wire {result['wire_ms_per_line']:.1f} ms"
+            f" | {latency} | {result['commands_per_s']:.1f} cmd/s ({result['wire_efficiency']:.0%} of wire)"
+            f" | lost {result['lost']}, corrupt {result['corrupted']}, late {result['late']}"
+            f" | bottleneck: {result['bottleneck']}")
+
+
+def run_sweep(args):
+    results = []
+    for baud in args.bauds:
+        result = benchmark_baud(args.target, baud, args)
+        print(format_result(result))
+        results.append(result)
+
+    return {
+        'label': args.label,
+        'target': args.target,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'options': {'pattern': args.pattern, 'lines': args.lines, 'latency_lines': args.latency_lines,
+                    'window': args.window, 'timeout_s': args.timeout, 'binary': args.binary,
+                    'turnaround_ms': args.turnaround_ms if args.target == SIM_TARGET else None,
+                    'loss': args.loss, 'corrupt': args.corrupt},
+        'results': results,
+    }
+
+
+def compare_reports(old_path, new_path):
+    """Print the change per baud rate between two reports"""
+    with open(old_path, 'r') as f:
+        old = json.load(f)
+    with open(new_path, 'r') as f:
+        new = json.load(f)
+
+    print(f"{old.get('label') or old_path} -> {new.get('label') or new_path}")
+    old_results = {result['baud']: result for result in old['results']}
+    for result in new['results']:
+        before = old_results.get(result['baud'])
+        if before is None:
+            print(f"{result['baud']:>7} baud: only in {new_path}")
+            continue
+
+        def change(key):
+            if not before[key]:
+                return ""
+            return f" ({(result[key] - before[key]) / before[key]:+.0%})"
+
+        def p99(entry):
+            return entry['latency']['p99_ms'] or 0.0
+
+        print(f"{result['baud']:>7} baud: {before['commands_per_s']:.1f} -> {result['commands_per_s']:.1f} cmd/s"
+              f"{change('commands_per_s')}, RTT p99 {p99(before):.1f} -> {p99(result):.1f} ms, "
+              f"lost {before['lost']} -> {result['lost']}, corrupt {before['corrupted']} -> {result['corrupted']}, "
+              f"bottleneck {before['bottleneck']} -> {result['bottleneck']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the serial link against an echoing device")
+    parser.add_argument('target', nargs='?', default=SIM_TARGET,
+                        help="Serial port or pyserial URL of an echoing device, or sim:// for the built-in fake")
+    parser.add_argument('--bauds', default=",".join(str(baud) for baud in BAUDRATES),
+                        help="Comma separated baud rates to sweep")
+    parser.add_argument('--pattern', choices=sorted(PATTERNS), default='row', help="Probe payloads")
+    parser.add_argument('--lines', type=int, default=LINK_BENCHMARK_LINES, help="Probes in the throughput phase")
+    parser.add_argument('--latency-lines', type=int, default=LINK_BENCHMARK_LATENCY_LINES,
+                        help="Probes sent one at a time")
+    parser.add_argument('--window', type=int, default=LINK_BENCHMARK_WINDOW, help="Probes in flight")
+    parser.add_argument('--timeout', type=float, default=LINK_BENCHMARK_TIMEOUT_S,
+                        help="Seconds before a probe counts as lost")
+    parser.add_argument('--binary', action='store_true', help="Negotiate the binary framed protocol")
+    parser.add_argument('--settle', type=float, default=None,
+                        help="Seconds to wait after opening the port (default 2 for real ports, 0 for sim://)")
+    parser.add_argument('--label', default="", help="Name of this run in the report, e.g. the firmware revision")
+    parser.add_argument('--output', default="link_benchmark.json", help="JSON report path")
+    parser.add_argument('--turnaround-ms', type=float, default=LINK_BENCHMARK_SIM_TURNAROUND_S * 1000,
+                        help="sim://: parse time per line")
+    parser.add_argument('--loss', type=float, default=0.0, help="sim://: probability of dropping a line")
+    parser.add_argument('--corrupt', type=float, default=0.0, help="sim://: probability of flipping a bit in a line")
+    parser.add_argument('--seed', type=int, default=1, help="sim://: random seed of loss and corruption")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two reports instead of running")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    args.bauds = [int(baud) for baud in args.bauds.split(',')]
+    if args.settle is None:
+        args.settle = 0.0 if args.target == SIM_TARGET else 2.0
+
+    try:
+        report = run_sweep(args)
+    except Exception as e:
+        print(f"Link benchmark failed: {e}")
+        sys.exit(1)
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+import multiprocessing
+import struct
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from palletizer.serial_communicator import SerialCommunicator, summarize_latencies
+from palletizer.utils.config import LINK_RING_CAPACITY
+from palletizer.utils.metrics import METRICS
+
+# Record types from the GUI to the link process
+TX_SEND = 1
+TX_PRIORITY = 2
+TX_CONNECT = 3
+TX_DISCONNECT = 4
+TX_CANCEL_RECONNECT = 5
+TX_STOP = 6
+
+# Record types from the link process to the GUI
+RX_LINE = 1
+RX_STATUS = 2
+RX_PRIORITY_SENT = 3
+RX_LINK_LOST = 4
+RX_RECONNECTING = 5
+RX_LINK_RESTORED = 6
+RX_RECONNECT_FAILED = 7
+
+RECORD_HEADER = struct.Struct('<Bd')  # (record type, time.monotonic() timestamp)
+FIELD_SEPARATOR = '\x1f'
+
+
+class SharedRingBuffer:
+    """
+    Single-producer single-consumer ring buffer of byte records in shared memory.
+    The producer only writes the head counter and the consumer only writes the
+    tail counter, so no lock is needed. Each record is a 4-byte length followed
+    by the payload; records may wrap around the end of the buffer.
+    """
+    HEAD_OFFSET = 0
+    TAIL_OFFSET = 64       # Separate cache line from the head
+    CAPACITY_OFFSET = 128
+    DATA_OFFSET = 192
+
+    def __init__(self, shm, capacity):
+        self.shm = shm
+        self.buf = shm.buf
+        self.capacity = capacity
+        self.dropped = 0  # Records the producer could not fit
+
+    @classmethod
+    def create(cls, capacity=LINK_RING_CAPACITY):
+        shm = shared_memory.SharedMemory(create=True, size=cls.DATA_OFFSET + capacity)
+        shm.buf[:cls.DATA_OFFSET] = bytes(cls.DATA_OFFSET)
+        struct.pack_into('<Q', shm.buf, cls.CAPACITY_OFFSET, capacity)
+        return cls(shm, capacity)
+
+    @classmethod
+    def attach(cls, name):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13 there is no track flag; the spawned link process shares the
+            # creator's resource tracker, so the block is still unlinked only once
+            shm = shared_memory.SharedMemory(name=name)
+        return cls(shm, struct.unpack_from('<Q', shm.buf, cls.CAPACITY_OFFSET)[0])
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def _head(self):
+        return struct.unpack_from('<Q', self.buf, self.HEAD_OFFSET)[0]
+
+    def _tail(self):
+        return struct.unpack_from('<Q', self.buf, self.TAIL_OFFSET)[0]
+
+    def used(self):
+        """Bytes of records not yet consumed"""
+        return self._head() - self._tail()
+
+    def _write(self, position, data):
+        start = position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buf[self.DATA_OFFSET + start:self.DATA_OFFSET + start + first] = data[:first]
+        if first < len(data):
+            self.buf[self.DATA_OFFSET:self.DATA_OFFSET + len(data) - first] = data[first:]
+
+    def _read(self, position, size):
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self.buf[self.DATA_OFFSET + start:self.DATA_OFFSET + start + first])
+        if first < size:
+            data += bytes(self.buf[self.DATA_OFFSET:self.DATA_OFFSET + size - first])
+        return data
+
+    def push(self, payload):
+        """Append a record; returns False if there is not enough free space"""
+        head = self._head()
+        needed = 4 + len(payload)
+        if needed > self.capacity - (head - self._tail()):
+            self.dropped += 1
+            return False
+
+        self._write(head, struct.pack('<I', len(payload)))
+        self._write(head + 4, payload)
+        # Publish the record only after its bytes are in place
+        struct.pack_into('<Q', self.buf, self.HEAD_OFFSET, head + needed)
+        return True
+
+    def pop(self):
+        """Remove and return the oldest record, or None if the buffer is empty"""
+        tail = self._tail()
+        if tail == self._head():
+            return None
+
+        size = struct.unpack('<I', self._read(tail, 4))[0]
+        payload = self._read(tail + 4, size)
+        struct.pack_into('<Q', self.buf, self.TAIL_OFFSET, tail + 4 + size)
+        return payload
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def encode_record(kind, text="", timestamp=None):
+    return RECORD_HEADER.pack(kind, time.monotonic() if timestamp is None else timestamp) + text.encode('utf-8')
+
+
+def decode_record(record):
+    kind, timestamp = RECORD_HEADER.unpack_from(record)
+    return kind, timestamp, record[RECORD_HEADER.size:].decode('utf-8', errors='ignore')
+
+
+def link_process_main(tx_name, rx_name, tx_doorbell, rx_doorbell):
+    """Entry point of the link process: runs a SerialCommunicator loop on its main thread"""
+    tx_ring = SharedRingBuffer.attach(tx_name)
+    rx_ring = SharedRingBuffer.attach(rx_name)
+    link = SerialCommunicator()
+
+    def publish(kind, text="", timestamp=None):
+        record = encode_record(kind, text, timestamp)
+        # Wait briefly for the GUI to make room rather than lose a record
+        deadline = time.monotonic() + 0.5
+        while not rx_ring.push(record) and time.monotonic() < deadline:
+            rx_doorbell.set()
+            time.sleep(0.001)
+        rx_doorbell.set()
+
+    # Signals are emitted on this thread, so they are delivered directly without an event loop
+    link.add_line_listener(lambda timestamp, line: publish(RX_LINE, line, timestamp))
+    link.connection_status.connect(lambda connected, message: publish(
+        RX_STATUS, f"{int(connected)}{FIELD_SEPARATOR}{message}"))
+    link.priority_sent.connect(lambda command, latency_ms: publish(
+        RX_PRIORITY_SENT, f"{command}{FIELD_SEPARATOR}{latency_ms}"))
+    link.link_lost.connect(lambda error: publish(RX_LINK_LOST, error))
+    link.reconnecting.connect(lambda attempt, delay: publish(
+        RX_RECONNECTING, f"{attempt}{FIELD_SEPARATOR}{delay}"))
+    link.link_restored.connect(lambda port: publish(RX_LINK_RESTORED, port))
+    link.reconnect_failed.connect(lambda port: publish(RX_RECONNECT_FAILED, port))
+
+    def command_loop():
+        # Only calls thread-safe request methods; the link loop does the work and the emitting
+        while link.running:
+            tx_doorbell.wait(0.1)
+            tx_doorbell.clear()
+            while True:
+                record = tx_ring.pop()
+                if record is None:
+                    break
+                kind, timestamp, text = decode_record(record)
+                if kind == TX_SEND:
+                    link.send_command(text)
+                elif kind == TX_PRIORITY:
+                    # Measure latency from the request in the GUI process
+                    queued_at = time.perf_counter() - (time.monotonic() - timestamp)
+                    link.send_priority_command(text[1:], flush_pending=text[0] == '1', queued_at=queued_at)
+                elif kind == TX_CONNECT:
+                    port, baudrate = text.split(FIELD_SEPARATOR)
+                    link.request_connect(port, int(baudrate))
+                elif kind == TX_DISCONNECT:
+                    link.request_disconnect()
+                elif kind == TX_CANCEL_RECONNECT:
+                    link.cancel_reconnect()
+                elif kind == TX_STOP:
+                    link.running = False
+                    link.reconnect_pending = False
+                    link.wake()
+                    return
+
+    command_thread = threading.Thread(target=command_loop, daemon=True)
+    command_thread.start()
+
+    link.run()
+    link.close_port()
+    command_thread.join(1.0)
+    tx_ring.close()
+    rx_ring.close()
+
+
+class ProcessSerialCommunicator(QThread):
+    """
+    Drop-in replacement for SerialCommunicator that runs the serial link in a
+    separate OS process, so GUI load cannot delay serial reads and writes.
+    Commands and received lines travel through shared-memory ring buffers;
+    this thread only drains the receive ring and emits the usual signals.
+    """
+    data_received = pyqtSignal(str)
+    connection_status = pyqtSignal(bool, str)
+    priority_sent = pyqtSignal(str, float)
+    link_lost = pyqtSignal(str)
+    reconnecting = pyqtSignal(int, float)
+    link_restored = pyqtSignal(str)
+    reconnect_failed = pyqtSignal(str)
+
+    def __init__(self, parent=None, metrics_labels=None):
+        super().__init__(parent)
+        self.running = True
+        self.is_connected = False
+        self.reconnect_pending = False
+        self.port_name = None
+        self.priority_latencies = deque(maxlen=256)
+        self.line_listeners = []
+
+        context = multiprocessing.get_context('spawn')
+        self.tx_ring = SharedRingBuffer.create()
+        self.rx_ring = SharedRingBuffer.create()
+        self.tx_doorbell = context.Event()
+        self.rx_doorbell = context.Event()
+        self.process = context.Process(
+            target=link_process_main,
+            args=(self.tx_ring.name, self.rx_ring.name, self.tx_doorbell, self.rx_doorbell),
+            daemon=True
+        )
+        self.bind_metrics(metrics_labels)
+
+    def bind_metrics(self, labels=None):
+        """Metrics as seen from this process; the link process keeps its own registry"""
+        self.rx_line_count = 0
+        self.tx_line_count = 0
+        METRICS.counter("palletizer_serial_rx_lines_total", "Lines received from the master", labels,
+                        function=lambda: self.rx_line_count)
+        METRICS.counter("palletizer_serial_tx_lines_total", "Commands sent to the link process", labels,
+                        function=lambda: self.tx_line_count)
+        self.dropped_tx_metric = METRICS.counter(
+            "palletizer_serial_dropped_lines_total", "Lines lost on link drops and output flushes",
+            {**(labels or {}), 'direction': 'tx'})
+        self.link_lost_metric = METRICS.counter(
+            "palletizer_serial_link_lost_total", "Unexpected link drops", labels)
+        self.priority_latency_metric = METRICS.histogram(
+            "palletizer_serial_priority_latency_seconds", "Priority command request-to-wire latency", labels)
+        for ring_name, ring in (("tx", self.tx_ring), ("rx", self.rx_ring)):
+            METRICS.gauge("palletizer_link_ring_bytes", "Bytes waiting in the link process ring buffers",
+                          {**(labels or {}), 'ring': ring_name}, function=lambda ring=ring: ring.used())
+
+    def start(self, *args):
+        self.process.start()
+        super().start(*args)
+
+    def _send(self, kind, text=""):
+        if not self.tx_ring.push(encode_record(kind, text)):
+            if kind in (TX_SEND, TX_PRIORITY):
+                self.dropped_tx_metric.inc()
+            return False
+        if kind in (TX_SEND, TX_PRIORITY):
+            self.tx_line_count += 1
+        self.tx_doorbell.set()
+        return True
+
+    def connect(self, port, baudrate):
+        self.request_connect(port, baudrate)
+        return True
+
+    def request_connect(self, port, baudrate):
+        """Open the port in the link process"""
+        self.port_name = port
+        self._send(TX_CONNECT, f"{port}{FIELD_SEPARATOR}{baudrate}")
+
+    def attach(self, serial_port, port):
+        """A port opened in this process cannot be shared; re-open it in the link process"""
+        baudrate = serial_port.baudrate
+        serial_port.close()
+        self.request_connect(port, baudrate)
+
+    def disconnect(self):
+        self.reconnect_pending = False
+        self.is_connected = False
+        self._send(TX_DISCONNECT)
+
+    def cancel_reconnect(self):
+        self.reconnect_pending = False
+        self._send(TX_CANCEL_RECONNECT)
+
+    def send_command(self, command):
+        if self.is_connected:
+            return self._send(TX_SEND, command)
+        return False
+
+    def send_priority_command(self, command, flush_pending=False):
+        if self.is_connected:
+            return self._send(TX_PRIORITY, f"{int(flush_pending)}{command}")
+        return False
+
+    def priority_latency_stats(self):
+        """Get request-to-wire latency statistics (ms), including the hop to the link process"""
+        return summarize_latencies(self.priority_latencies)
+
+    def add_line_listener(self, listener):
+        """Register a callable(timestamp, line); the timestamp is when the link process read the line"""
+        self.line_listeners.append(listener)
+
+    def run(self):
+        while self.running:
+            self.rx_doorbell.wait(0.1)
+            self.rx_doorbell.clear()
+            while True:
+                record = self.rx_ring.pop()
+                if record is None:
+                    break
+                self.dispatch(*decode_record(record))
+
+    def dispatch(self, kind, timestamp, text):
+        if kind == RX_LINE:
+            for listener in self.line_listeners:
+                listener(timestamp, text)
+            self.rx_line_count += 1
+            self.data_received.emit(text)
+        elif kind == RX_STATUS:
+            connected, message = text.split(FIELD_SEPARATOR, 1)
+            self.is_connected = connected == '1'
+            self.connection_status.emit(self.is_connected, message)
+        elif kind == RX_PRIORITY_SENT:
+            command, latency_ms = text.split(FIELD_SEPARATOR)
+            self.priority_latencies.append(float(latency_ms) / 1000)
+            self.priority_latency_metric.record(float(latency_ms) / 1000)
+            self.priority_sent.emit(command, float(latency_ms))
+        elif kind == RX_LINK_LOST:
+            self.reconnect_pending = True
+            self.link_lost_metric.inc()
+            self.link_lost.emit(text)
+        elif kind == RX_RECONNECTING:
+            attempt, delay = text.split(FIELD_SEPARATOR)
+            self.reconnecting.emit(int(attempt), float(delay))
+        elif kind == RX_LINK_RESTORED:
+            self.reconnect_pending = False
+            self.link_restored.emit(text)
+        elif kind == RX_RECONNECT_FAILED:
+            self.reconnect_pending = False
+            self.reconnect_failed.emit(text)
+
+    def stop(self):
+        if self.process.is_alive():
+            self._send(TX_STOP)
+            self.process.join(2.0)
+            if self.process.is_alive():
+                self.process.terminate()
+        self.running = False
+        self.is_connected = False
+        self.rx_doorbell.set()
+        self.wait()
+        for ring in (self.tx_ring, self.rx_ring):
+            ring.close()
+            ring.unlink()
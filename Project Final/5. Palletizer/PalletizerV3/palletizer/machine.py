@@ -0,0 +1,306 @@
+import os
+import time
+from collections import deque
+
+import yaml
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from palletizer.serial_communicator import SerialCommunicator
+from palletizer.ui.position_tracker import PositionTracker
+from palletizer.ui.sequence.sequence_row_manager import SequenceRowManager
+from palletizer.ui.sequence.sequence_executor import SequenceExecutor
+from palletizer.utils.config import *
+
+# Machine states shown in the fleet view
+STATE_DISCONNECTED = "Disconnected"
+STATE_CONNECTING = "Connecting"
+STATE_IDLE = "Idle"
+STATE_RUNNING = "Running"
+STATE_PAUSED = "Paused"
+STATE_RECONNECTING = "Reconnecting"
+STATE_STALLED = "Stalled"
+STATE_ERROR = "Error"
+
+
+class MachineController(QObject):
+    """
+    One palletizer without widgets: serial link, position tracker and sequence
+    executor. Several instances can run side by side in one process; each link
+    has its own thread, so a slow port only delays its own machine.
+    """
+    state_changed = pyqtSignal(str, str)  # (machine name, state)
+    alarm = pyqtSignal(str, str)          # (machine name, message)
+
+    def __init__(self, name, port, baudrate=DEFAULT_BAUDRATE, sequence_path=None, repeat=False, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.port = port
+        self.baudrate = baudrate
+        self.sequence_path = sequence_path
+        self.repeat = repeat  # Start the sequence again when it completes
+        self.auto_execution = True  # Read by the SequenceExecutor
+
+        # Core components, the same ones the main window uses
+        self.link = SerialCommunicator(metrics_labels={'machine': name})
+        self.position_tracker = PositionTracker(self)
+        self.row_manager = SequenceRowManager(self)
+        self.executor = SequenceExecutor(self, metrics_labels={'machine': name})
+        self.executor.set_row_manager(self.row_manager)
+        self.executor.watchdog.set_position_source(self.position_tracker.get_all_positions)
+
+        # Position history, one store directory per machine
+        self.position_recorder = None
+        if POSITION_STORE_ENABLED:
+            from palletizer.position_recorder import PositionRecorder
+            from palletizer.position_store import PositionStore
+            self.position_recorder = PositionRecorder([PositionStore(os.path.join(POSITION_STORE_DIR, name))])
+            self.link.add_line_listener(self.position_recorder.on_line)
+
+        # Summary statistics
+        self.state = STATE_DISCONNECTED
+        self.running_row = -1
+        self.row_done_while_paused = False  # The running row completed after PAUSE; resume() moves on
+        self.rows_completed = 0
+        self.cycles_completed = 0
+        self.row_completion_times = deque()
+        self.alarms = deque(maxlen=FLEET_ALARM_HISTORY)
+
+        self.init_connections()
+
+        if sequence_path:
+            self.load_sequence(sequence_path)
+
+    def init_connections(self):
+        self.link.data_received.connect(self.handle_received_data)
+        self.link.connection_status.connect(self.on_connection_status)
+        self.link.link_lost.connect(self.on_link_lost)
+        self.link.reconnecting.connect(lambda attempt, delay: self.set_state(STATE_RECONNECTING))
+        self.link.link_restored.connect(self.on_link_restored)
+        self.link.reconnect_failed.connect(self.on_reconnect_failed)
+
+        self.executor.sequence_command.connect(self.send_sequence_command)
+        self.executor.global_command.connect(self.send_global_command)
+        self.executor.watchdog.row_timeout.connect(self.on_row_timeout)
+
+        self.link.start()
+
+    # ========== Link ==========
+
+    def connect_link(self):
+        """Open the port on the machine's link thread"""
+        self.set_state(STATE_CONNECTING)
+        self.link.request_connect(self.port, self.baudrate)
+
+    def disconnect_link(self):
+        self.link.disconnect()
+
+    def shutdown(self):
+        self.executor.watchdog.cancel()
+        self.link.stop()
+        if self.position_recorder is not None:
+            self.position_recorder.close()
+
+    def on_connection_status(self, connected, message):
+        if connected:
+            if self.state in (STATE_DISCONNECTED, STATE_CONNECTING):
+                self.set_state(STATE_IDLE)
+        elif self.state == STATE_CONNECTING:
+            self.set_state(STATE_ERROR)
+            self.raise_alarm(message)
+        elif not self.link.reconnect_pending:
+            self.set_state(STATE_DISCONNECTED)
+
+    def on_link_lost(self, error):
+        self.raise_alarm(f"Link lost: {error}")
+        self.executor.on_link_lost()
+
+    def on_link_restored(self, port):
+        self.set_state(STATE_RUNNING if self.executor.interrupted else STATE_IDLE)
+        self.executor.on_link_restored()
+
+    def on_reconnect_failed(self, port):
+        self.set_state(STATE_DISCONNECTED)
+        self.raise_alarm(f"Could not reconnect to {port}")
+
+    # ========== Commands ==========
+
+    def send_sequence_command(self, command):
+        if self.link.send_command(command):
+            self.position_tracker.parse_command(command)
+            if self.position_recorder is not None:
+                self.position_recorder.on_sent(command)
+
+    def send_global_command(self, command):
+        if command in PRIORITY_COMMANDS:
+            flush_pending = command == CMD_RESET and PRIORITY_FLUSH_ON_RESET
+            self.link.send_priority_command(command, flush_pending=flush_pending)
+        else:
+            self.link.send_command(command)
+
+        # Hold the row deadline while the machine is paused
+        if command == CMD_PAUSE:
+            self.executor.watchdog.pause()
+        elif command == CMD_RESUME:
+            self.executor.watchdog.resume()
+        elif command == CMD_RESET:
+            self.executor.watchdog.cancel()
+        elif command == CMD_ZERO and self.position_recorder is not None:
+            self.position_recorder.on_home()
+
+    def load_sequence(self, path):
+        """Load a sequence file saved by the sequence panel"""
+        with open(path, 'r') as f:
+            sequence_data = yaml.safe_load(f) or {}
+        self.row_manager.sequence_rows = sequence_data.get('rows', [])
+        self.sequence_path = path
+
+    def start(self):
+        if not self.link.is_connected:
+            self.raise_alarm("Cannot start: not connected")
+            return False
+        if not self.row_manager.sequence_rows:
+            self.raise_alarm("Cannot start: no sequence loaded")
+            return False
+        self.set_state(STATE_RUNNING)
+        self.row_done_while_paused = False
+        return self.executor.start_run()
+
+    def pause(self):
+        self.send_global_command(CMD_PAUSE)
+        if self.state in (STATE_RUNNING, STATE_STALLED):
+            self.set_state(STATE_PAUSED)
+
+    def resume(self):
+        self.send_global_command(CMD_RESUME)
+        if self.state == STATE_PAUSED:
+            self.set_state(STATE_RUNNING)
+            if self.row_done_while_paused:
+                self.row_done_while_paused = False
+                self.executor.run_next_row()
+
+    def reset(self):
+        self.send_global_command(CMD_RESET)
+        self.executor.sequence_execution_active = False
+        self.executor.waiting_for_completion = False
+        self.executor.interrupted = False
+        self.executor.confirming_row = -1
+        self.executor.current_sequence_index = -1
+        self.executor.journal.clear()
+        self.running_row = -1
+        self.row_done_while_paused = False
+        if self.link.is_connected:
+            self.set_state(STATE_IDLE)
+
+    # ========== Feedback ==========
+
+    def handle_received_data(self, data):
+        if data.startswith("[FEEDBACK]"):
+            if data[11:].strip() == COMPLETE_FEEDBACK:
+                self.on_row_completed()
+        elif data.startswith("[SLAVE]"):
+            parts = data[7:].split(';', 1)
+            if len(parts) >= 2 and SLAVE_COMPLETED_MESSAGE in parts[1]:
+                self.executor.watchdog.axis_completed(parts[0].strip())
+
+    def on_row_completed(self):
+        if not self.executor.handle_slave_completion():
+            return
+
+        self.rows_completed += 1
+        self.row_completion_times.append(time.monotonic())
+        if self.state == STATE_STALLED:
+            self.set_state(STATE_RUNNING)
+
+        if self.state == STATE_RUNNING:
+            self.executor.run_next_row()
+        elif self.state == STATE_PAUSED:
+            # A pause taken mid-row: the next row is sent on resume
+            self.row_done_while_paused = True
+
+    def update_running_row_display(self, row_index=-1):
+        """Called by the SequenceExecutor when a row starts, or with -1 when the run ends"""
+        if row_index < 0 and self.running_row >= 0 and not self.executor.sequence_execution_active:
+            self.cycles_completed += 1
+            if self.repeat and self.state == STATE_RUNNING:
+                QTimer.singleShot(0, self.start)
+            elif self.state == STATE_RUNNING:
+                self.set_state(STATE_IDLE)
+        self.running_row = row_index
+
+    def on_row_timeout(self, event):
+        self.set_state(STATE_STALLED)
+        self.raise_alarm(str(event))
+        if ROW_WATCHDOG_AUTO_PAUSE:
+            self.pause()
+
+    # ========== Summary ==========
+
+    def set_state(self, state):
+        if state != self.state:
+            self.state = state
+            self.state_changed.emit(self.name, state)
+            if self.position_recorder is not None:
+                self.position_recorder.set_state(state)
+
+    def raise_alarm(self, message):
+        self.alarms.append((time.time(), message))
+        self.alarm.emit(self.name, message)
+
+    def throughput_per_min(self):
+        """Completed rows per minute over the throughput window"""
+        now = time.monotonic()
+        while self.row_completion_times and now - self.row_completion_times[0] > FLEET_THROUGHPUT_WINDOW_S:
+            self.row_completion_times.popleft()
+        if len(self.row_completion_times) < 2:
+            return 0.0
+        span = now - self.row_completion_times[0]
+        return len(self.row_completion_times) * 60.0 / max(span, 1.0)
+
+    def summary(self):
+        """Snapshot of the machine state for the fleet view"""
+        total_rows = len(self.row_manager.sequence_rows)
+        return {
+            'name': self.name,
+            'port': self.port,
+            'state': self.state,
+            'row': f"{self.running_row + 1}/{total_rows}" if self.running_row >= 0 else f"-/{total_rows}",
+            'rows_per_min': self.throughput_per_min(),
+            'rows_completed': self.rows_completed,
+            'cycles_completed': self.cycles_completed,
+            'alarm_count': len(self.alarms),
+            'last_alarm': self.alarms[-1][1] if self.alarms else "",
+        }
+
+
+def load_fleet_config(path):
+    """
+    Create a MachineController for each machine in a fleet file:
+
+        machines:
+          - name: Palletizer 1
+            port: COM3
+            baudrate: 9600
+            sequence: RunningTest_1.yaml
+            repeat: true
+
+    Sequence paths are relative to the fleet file.
+    """
+    with open(path, 'r') as f:
+        fleet_data = yaml.safe_load(f) or {}
+
+    base_dir = os.path.dirname(os.path.abspath(path))
+    machines = []
+    for i, entry in enumerate(fleet_data.get('machines', [])):
+        sequence_path = entry.get('sequence')
+        if sequence_path and not os.path.isabs(sequence_path):
+            sequence_path = os.path.join(base_dir, sequence_path)
+
+        machines.append(MachineController(
+            entry.get('name', f"Palletizer {i + 1}"),
+            entry['port'],
+            entry.get('baudrate', DEFAULT_BAUDRATE),
+            sequence_path,
+            entry.get('repeat', False)
+        ))
+
+    return machines
@@ -0,0 +1,256 @@
+import bisect
+import math
+
+from palletizer.utils.config import (SLAVE_IDS, MOTION_DEFAULT_SPEED, MOTION_ACCELERATION_RATIO,
+                                     ROW_WATCHDOG_MARGIN_RATIO, ROW_WATCHDOG_MARGIN_S,
+                                     ROW_WATCHDOG_MIN_TIMEOUT_S)
+
+
+def split_row_command(command):
+    """Split a row command like "x(100,d500,200), y(300)" into single-axis commands"""
+    parts = []
+    current_part = ""
+    paren_level = 0
+
+    for char in command:
+        if char == '(':
+            paren_level += 1
+        elif char == ')':
+            paren_level -= 1
+        elif char == ',' and paren_level == 0:
+            # This is a comma outside parentheses, split here
+            if current_part.strip():
+                parts.append(current_part.strip())
+            current_part = ""
+            continue
+        current_part += char
+
+    if current_part.strip():
+        parts.append(current_part.strip())
+
+    return parts
+
+
+def parse_axis_sequence(sequence):
+    """
+    Parse a single-axis sequence like "x(100,d500,200)".
+    Returns (axis, steps) where each step is ('move', position) or ('delay', ms),
+    or (None, []) if the sequence is not an axis command.
+    """
+    if '(' not in sequence or ')' not in sequence:
+        return None, []
+
+    axis = sequence.split('(')[0].strip().lower()
+    if axis not in SLAVE_IDS:
+        return None, []
+
+    steps = []
+    for value in sequence.split('(', 1)[1].rsplit(')', 1)[0].split(','):
+        value = value.strip()
+        try:
+            if value.startswith('d'):
+                steps.append(('delay', int(value[1:])))
+            elif value:
+                steps.append(('move', int(value)))
+        except ValueError:
+            # Skip values that are not positions or delays
+            continue
+
+    return axis, steps
+
+
+def parse_row_command(command):
+    """Parse a row command into a dictionary of axis -> steps"""
+    row = {}
+    for part in split_row_command(command):
+        axis, steps = parse_axis_sequence(part)
+        if axis is not None:
+            row[axis] = steps
+    return row
+
+
+def parse_targets(command):
+    """Final target position of each axis in a row command"""
+    targets = {}
+    for axis, steps in parse_row_command(command).items():
+        moves = [value for kind, value in steps if kind == 'move']
+        if moves:
+            targets[axis] = moves[-1]
+    return targets
+
+
+def move_time(distance, speed, acceleration):
+    """
+    Time (seconds) for a point-to-point move with a trapezoidal velocity profile,
+    the same profile AccelStepper uses on the slaves. Moves too short to reach
+    full speed use a triangular profile.
+    """
+    distance = abs(distance)
+    if distance == 0:
+        return 0.0
+    if speed <= 0 or acceleration <= 0:
+        return math.inf
+
+    ramp_distance = speed * speed / acceleration  # Distance to accelerate and decelerate
+    if distance <= ramp_distance:
+        return 2.0 * math.sqrt(distance / acceleration)
+
+    return 2.0 * speed / acceleration + (distance - ramp_distance) / speed
+
+
+def move_progress(distance, speed, acceleration, elapsed):
+    """Distance covered after elapsed seconds of a move_time() move, following the same profile"""
+    distance = abs(distance)
+    total = move_time(distance, speed, acceleration)
+    if elapsed >= total:
+        return distance
+    if elapsed <= 0:
+        return 0.0
+
+    ramp_time = speed / acceleration
+    if 2.0 * ramp_time >= total:
+        # Triangular profile: accelerate for half the time, then decelerate
+        ramp_time = total / 2.0
+    if elapsed <= ramp_time:
+        return 0.5 * acceleration * elapsed * elapsed
+    remaining = total - elapsed
+    if remaining <= ramp_time:
+        return distance - 0.5 * acceleration * remaining * remaining
+    return 0.5 * acceleration * ramp_time * ramp_time + (elapsed - ramp_time) * speed
+
+
+def estimate_axis_duration(steps, start_position=0, speed=MOTION_DEFAULT_SPEED, acceleration=None):
+    """Estimate the duration (seconds) of one axis sequence and the position it ends at"""
+    if acceleration is None:
+        acceleration = speed * MOTION_ACCELERATION_RATIO
+
+    duration = 0.0
+    position = start_position
+    for kind, value in steps:
+        if kind == 'delay':
+            duration += value / 1000.0
+        else:
+            duration += move_time(value - position, speed, acceleration)
+            position = value
+
+    return duration, position
+
+
+def estimate_row_durations(command, start_positions=None, speeds=None):
+    """
+    Estimate how long each axis in a row command takes.
+    Returns a dictionary of axis -> seconds.
+    """
+    start_positions = start_positions or {}
+    speeds = speeds or {}
+
+    durations = {}
+    for axis, steps in parse_row_command(command).items():
+        durations[axis], _ = estimate_axis_duration(
+            steps,
+            start_positions.get(axis, 0),
+            speeds.get(axis, MOTION_DEFAULT_SPEED)
+        )
+    return durations
+
+
+def estimate_step_sequence(steps, start_positions=None, speeds=None, acceleration_ratio=MOTION_ACCELERATION_RATIO,
+                           step_gap_s=0.0):
+    """
+    Estimate consecutive multi-axis moves, each a dictionary axis -> target whose
+    axes start together; a move starts step_gap_s after the slowest axis of the
+    previous one has finished. Returns (duration of each move, end positions).
+    """
+    positions = dict(start_positions or {})
+    speeds = speeds or {}
+
+    durations = []
+    for targets in steps:
+        duration = 0.0
+        for axis, target in targets.items():
+            speed = speeds.get(axis, MOTION_DEFAULT_SPEED)
+            duration = max(duration, move_time(target - positions.get(axis, 0), speed, speed * acceleration_ratio))
+            positions[axis] = target
+        durations.append(duration + step_gap_s)
+    return durations, positions
+
+
+def row_timeout(estimated_s, margin_ratio=ROW_WATCHDOG_MARGIN_RATIO, margin_s=ROW_WATCHDOG_MARGIN_S,
+                min_timeout_s=ROW_WATCHDOG_MIN_TIMEOUT_S):
+    """Deadline (seconds) for a row with the given predicted duration"""
+    return max(min_timeout_s, estimated_s * (1.0 + margin_ratio) + margin_s)
+
+
+def row_command_from_row(row):
+    """Row command of a sequence row as stored in the YAML files, e.g. {'x': 'x(100)', 'y': 'y(200)'}"""
+    return ", ".join(sequence for sequence in row.values() if sequence)
+
+
+class SequenceTimeline:
+    """
+    Predicted axis positions over time for a list of row commands, using the
+    same velocity profiles as the duration estimates. All axes of a row start
+    together and the next row starts once the slowest axis has finished, as
+    the master waits for every slave before it completes the row.
+    """
+
+    def __init__(self, commands, start_positions=None, speeds=None, row_gap_s=0.0):
+        speeds = speeds or {}
+        position = {axis: 0 for axis in SLAVE_IDS}
+        position.update(start_positions or {})
+        self.start_positions = dict(position)
+
+        # axis -> start times and (start, end, from, to, speed, acceleration) of its moves
+        self.move_starts = {axis: [] for axis in SLAVE_IDS}
+        self.moves = {axis: [] for axis in SLAVE_IDS}
+        self.row_starts = []
+
+        time = 0.0
+        for command in commands:
+            self.row_starts.append(time)
+            row_end = time
+            for axis, steps in parse_row_command(command).items():
+                speed = speeds.get(axis, MOTION_DEFAULT_SPEED)
+                acceleration = speed * MOTION_ACCELERATION_RATIO
+                axis_time = time
+                for kind, value in steps:
+                    if kind == 'delay':
+                        axis_time += value / 1000.0
+                        continue
+                    duration = move_time(value - position[axis], speed, acceleration)
+                    if duration:
+                        self.move_starts[axis].append(axis_time)
+                        self.moves[axis].append((axis_time, axis_time + duration, position[axis], value,
+                                                 speed, acceleration))
+                    axis_time += duration
+                    position[axis] = value
+                row_end = max(row_end, axis_time)
+            time = row_end + row_gap_s
+
+        self.duration = time
+        self.end_positions = position
+
+    @classmethod
+    def from_rows(cls, rows, **kwargs):
+        """Timeline of the rows of a sequence file"""
+        return cls([row_command_from_row(row) for row in rows], **kwargs)
+
+    def position_at(self, axis, t):
+        """Predicted position of one axis at t seconds into the sequence"""
+        index = bisect.bisect_right(self.move_starts[axis], t) - 1
+        if index < 0:
+            return self.start_positions[axis]
+
+        start, end, origin, target, speed, acceleration = self.moves[axis][index]
+        if t >= end:
+            return target
+        covered = move_progress(target - origin, speed, acceleration, t - start)
+        return origin + covered if target >= origin else origin - covered
+
+    def positions_at(self, t):
+        """Predicted position of every axis at t seconds into the sequence"""
+        return {axis: self.position_at(axis, t) for axis in SLAVE_IDS}
+
+    def row_at(self, t):
+        """Index of the row running at t seconds, or -1 before the first row"""
+        return bisect.bisect_right(self.row_starts, t) - 1
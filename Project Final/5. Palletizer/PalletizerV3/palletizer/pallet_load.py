@@ -0,0 +1,47 @@
+"""
+Boxes put down on the pallet, worked out from completed rows.
+
+A box is placed where the gripper opens after holding one (the same rule as
+palletizer.collision). Only confirmed positions count: the caller feeds the
+positions of a row once the master reports it completed, so a place row that
+is sent but never finishes adds no box. The load keeps the axis positions of
+every placement in plain lists, so the main window can follow it from startup
+without the 3D stack; the 3D view turns them into box corners when it draws.
+"""
+from palletizer.utils.config import WORKSPACE_GRIP_CLOSED
+
+
+class PalletLoad:
+    """Axis positions of every box the gripper has put down, in placement order"""
+
+    def __init__(self, grip_closed=WORKSPACE_GRIP_CLOSED):
+        self.grip_closed = grip_closed
+        self.placements = []  # {axis: position} of each placement
+        self.holding = None   # Whether the gripper was closed at the last pose; None before the first
+        self.generation = 0   # Bumped by clear(), so a view can tell a new load from a grown one
+
+    def __len__(self):
+        return len(self.placements)
+
+    def update(self, positions):
+        """Follow the confirmed axis positions; returns True when the gripper just put a box down"""
+        closed = positions['g'] >= self.grip_closed
+        placed = bool(self.holding) and not closed
+        self.holding = closed
+        if placed:
+            self.add(positions)
+        return placed
+
+    def add(self, positions):
+        """Append a box placed at the given axis positions"""
+        self.placements.append(dict(positions))
+
+    def forget_gripper(self):
+        """Forget whether a box is held, e.g. after homing, so the next opening adds no box"""
+        self.holding = None
+
+    def clear(self):
+        """Remove all boxes and forget the gripper state"""
+        self.placements = []
+        self.holding = None
+        self.generation += 1
@@ -0,0 +1,118 @@
+import os
+import threading
+from collections import deque
+import serial
+import serial.tools.list_ports
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from palletizer.utils.config import PORT_HOTPLUG_POLL_MS
+
+try:
+    import winreg
+except ImportError:
+    winreg = None
+
+# Device name prefixes in /dev that can be serial ports (Linux and macOS)
+DEV_SERIAL_PREFIXES = ('tty', 'cu.', 'rfcomm')
+
+
+class PortWorker(QThread):
+    """Thread untuk enumerasi dan membuka port serial tanpa memblokir GUI"""
+    ports_updated = pyqtSignal(list)              # List of port metadata dicts
+    port_opened = pyqtSignal(object, str, int)    # (serial object, port, baudrate)
+    port_open_failed = pyqtSignal(str, str)       # (port, error message)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.running = True
+        self.requests = deque()
+        self.wake_event = threading.Event()
+        self.port_cache = {}          # device -> metadata dict
+        self.device_signature = None  # Cheap snapshot used to detect hotplug events
+
+    def request_scan(self, force=False):
+        """Ask for the port list; without force the cached list is used if nothing changed"""
+        self.requests.append(('scan', force))
+        self.wake_event.set()
+
+    def request_open(self, port, baudrate):
+        """Ask the worker to open a serial port"""
+        self.requests.append(('open', port, baudrate))
+        self.wake_event.set()
+
+    def run(self):
+        while self.running:
+            while self.requests:
+                request = self.requests.popleft()
+                if request[0] == 'scan':
+                    self.scan_ports(force=request[1])
+                elif request[0] == 'open':
+                    self.open_port(request[1], request[2])
+
+            # Check for hotplug events between requests
+            if self.running and self.device_signature is not None:
+                signature = self.read_device_signature()
+                if signature is None or signature != self.device_signature:
+                    self.scan_ports(force=True)
+
+            self.wake_event.wait(PORT_HOTPLUG_POLL_MS / 1000)
+            self.wake_event.clear()
+
+    def read_device_signature(self):
+        """
+        Read a cheap snapshot of the serial devices present, without querying
+        each port's metadata. Returns None when the platform has no cheap source.
+        """
+        try:
+            if os.path.isdir('/dev'):
+                return frozenset(name for name in os.listdir('/dev') if name.startswith(DEV_SERIAL_PREFIXES))
+
+            if winreg is not None:
+                names = set()
+                with winreg.OpenKey(winreg.HKEY_LOCAL_MACHINE, r"HARDWARE\DEVICEMAP\SERIALCOMM") as key:
+                    index = 0
+                    while True:
+                        try:
+                            names.add(winreg.EnumValue(key, index)[1])
+                        except OSError:
+                            break
+                        index += 1
+                return frozenset(names)
+        except OSError:
+            pass
+
+        return None
+
+    def scan_ports(self, force=False):
+        """Enumerate the serial ports and update the metadata cache"""
+        signature = self.read_device_signature()
+
+        if force or signature is None or signature != self.device_signature or not self.port_cache:
+            ports = {}
+            for port in serial.tools.list_ports.comports():
+                ports[port.device] = {
+                    'device': port.device,
+                    'description': port.description,
+                    'hwid': port.hwid,
+                    'vid': port.vid,
+                    'pid': port.pid,
+                    'serial_number': port.serial_number,
+                }
+            self.port_cache = ports
+
+        # Without a cheap signature the list is only refreshed on request
+        self.device_signature = signature
+        self.ports_updated.emit(sorted(self.port_cache.values(), key=lambda p: p['device']))
+
+    def open_port(self, port, baudrate):
+        """Open a serial port on the worker thread"""
+        try:
+            serial_port = serial.Serial(port, baudrate, timeout=0.5)
+            self.port_opened.emit(serial_port, port, baudrate)
+        except Exception as e:
+            self.port_open_failed.emit(port, str(e))
+
+    def stop(self):
+        self.running = False
+        self.wake_event.set()
+        self.wait()
@@ -0,0 +1,159 @@
+"""
+In-memory position history for plotting, with min/max decimation levels.
+
+PositionHistory is a sink of the PositionRecorder: rows are appended on the
+recorder thread and read by the history plot on the GUI thread. Besides a ring
+of the last raw rows it keeps a pyramid of time buckets (POSITION_HISTORY_BUCKET_S
+wide at the first level, POSITION_HISTORY_LEVEL_FACTOR times wider at each next
+level) holding the minimum and maximum of every axis. An append updates one
+bucket per level, and a plot asks for about one bucket per pixel, so drawing
+eight hours costs the same as drawing eight seconds.
+
+The buffers are plain arrays, so recording does not need NumPy; the queries
+read them as NumPy views.
+"""
+import threading
+from array import array
+
+from palletizer.utils.config import (SLAVE_IDS, POSITION_HISTORY_RAW_ROWS, POSITION_HISTORY_BUCKET_S,
+                                     POSITION_HISTORY_LEVEL_FACTOR, POSITION_HISTORY_LEVELS,
+                                     POSITION_HISTORY_LEVEL_BUCKETS)
+
+
+class DecimationLevel:
+    """Ring of time buckets with the min and max of every axis"""
+
+    def __init__(self, width, buckets, axes):
+        self.width = width
+        self.buckets = buckets
+        self.axes = axes
+        self.ids = array('q', [-1]) * buckets  # Bucket number held in each slot, -1 when empty
+        self.mins = array('i', [0]) * (buckets * axes)
+        self.maxs = array('i', [0]) * (buckets * axes)
+        self.newest = -1
+
+    def add(self, timestamp, positions):
+        bucket = int(timestamp // self.width)
+        slot = bucket % self.buckets
+        base = slot * self.axes
+        if self.ids[slot] != bucket:
+            self.ids[slot] = bucket
+            for axis, position in enumerate(positions):
+                self.mins[base + axis] = position
+                self.maxs[base + axis] = position
+        else:
+            for axis, position in enumerate(positions):
+                if position < self.mins[base + axis]:
+                    self.mins[base + axis] = position
+                elif position > self.maxs[base + axis]:
+                    self.maxs[base + axis] = position
+        self.newest = bucket
+
+    def oldest_time(self):
+        """Start of the oldest bucket still in the ring"""
+        return (self.newest - self.buckets + 1) * self.width
+
+
+class PositionHistory:
+    """Raw ring of the last rows plus the decimation levels; safe to read while it is written"""
+
+    def __init__(self, axes=SLAVE_IDS, raw_rows=POSITION_HISTORY_RAW_ROWS, bucket_s=POSITION_HISTORY_BUCKET_S,
+                 level_factor=POSITION_HISTORY_LEVEL_FACTOR, levels=POSITION_HISTORY_LEVELS,
+                 level_buckets=POSITION_HISTORY_LEVEL_BUCKETS):
+        self.axes = list(axes)
+        self.lock = threading.Lock()
+        self.version = 0  # Incremented on every append, so a plot can skip redraws
+
+        axis_count = len(self.axes)
+        self.raw_rows = raw_rows
+        self.raw_times = array('d', [0.0]) * raw_rows
+        self.raw_positions = array('i', [0]) * (raw_rows * axis_count)
+        self.count = 0  # Rows appended so far; the ring holds the last raw_rows of them
+        self.levels = [DecimationLevel(bucket_s * level_factor ** level, level_buckets, axis_count)
+                       for level in range(levels)]
+
+        self.first_time = None
+        self.last_time = None
+        self.last_positions = [0] * axis_count
+
+    def append(self, timestamp, positions, state=None):
+        """Add a row; timestamps have to be non-decreasing"""
+        with self.lock:
+            if self.last_time is not None and timestamp < self.last_time:
+                timestamp = self.last_time
+            slot = self.count % self.raw_rows
+            self.raw_times[slot] = timestamp
+            base = slot * len(positions)
+            for axis, position in enumerate(positions):
+                self.raw_positions[base + axis] = position
+            for level in self.levels:
+                level.add(timestamp, positions)
+
+            self.count += 1
+            if self.first_time is None:
+                self.first_time = timestamp
+            self.last_time = timestamp
+            self.last_positions = list(positions)
+            self.version += 1
+
+    def decimated(self, start, end, pixels):
+        """
+        Points to draw the range start..end at a width of pixels: (times, values, source)
+        with times of shape (n,), values of shape (axes, n) and source naming the raw
+        ring or the decimation level used. Each bucket gives two points, its min and max.
+        """
+        import numpy as np
+
+        pixel_s = (end - start) / max(1, pixels)
+        with self.lock:
+            if self.count == 0:
+                return np.empty(0), np.empty((len(self.axes), 0), dtype=np.int32), "empty"
+
+            raw_complete = self.count <= self.raw_rows
+            raw_oldest = self.raw_times[0 if raw_complete else self.count % self.raw_rows]
+            if pixel_s < self.levels[0].width and (raw_complete or start >= raw_oldest):
+                return self._raw_range(np, start, end) + ("raw",)
+
+            # Finest level with buckets no wider than a pixel, coarser if it no longer holds the start
+            index = 0
+            while index + 1 < len(self.levels) and self.levels[index + 1].width <= pixel_s:
+                index += 1
+            while index + 1 < len(self.levels) and start < self.levels[index].oldest_time() \
+                    and self.first_time < self.levels[index].oldest_time():
+                index += 1
+            level = self.levels[index]
+            return self._level_range(np, level, start, end) + (f"level {index} ({level.width:g} s)",)
+
+    def _raw_range(self, np, start, end):
+        rows = min(self.count, self.raw_rows)
+        times = np.frombuffer(self.raw_times, dtype=np.float64)
+        positions = np.frombuffer(self.raw_positions, dtype=np.int32).reshape(-1, len(self.axes))
+        if self.count > self.raw_rows:
+            # Put the ring in time order; only the zoomed-in view reads the raw rows
+            split = self.count % self.raw_rows
+            times = np.concatenate((times[split:], times[:split]))
+            positions = np.concatenate((positions[split:], positions[:split]))
+
+        # Include the row before the range so the line enters from the left edge
+        first = max(0, int(np.searchsorted(times[:rows], start, 'right')) - 1)
+        last = int(np.searchsorted(times[:rows], end, 'right'))
+        return times[first:last].copy(), positions[first:last].T.copy()
+
+    def _level_range(self, np, level, start, end):
+        first_bucket = max(int(start // level.width), level.newest - level.buckets + 1)
+        last_bucket = min(int(end // level.width), level.newest)
+        if last_bucket < first_bucket:
+            return np.empty(0), np.empty((len(self.axes), 0), dtype=np.int32)
+
+        buckets = np.arange(first_bucket, last_bucket + 1)
+        slots = buckets % level.buckets
+        valid = np.frombuffer(level.ids, dtype=np.int64)[slots] == buckets
+        buckets, slots = buckets[valid], slots[valid]
+
+        mins = np.frombuffer(level.mins, dtype=np.int32).reshape(-1, len(self.axes))[slots]
+        maxs = np.frombuffer(level.maxs, dtype=np.int32).reshape(-1, len(self.axes))[slots]
+        times = np.repeat((buckets + 0.5) * level.width, 2)
+        values = np.empty((len(self.axes), 2 * len(buckets)), dtype=np.int32)
+        values[:, 0::2] = mins.T
+        values[:, 1::2] = maxs.T
+        return times, values
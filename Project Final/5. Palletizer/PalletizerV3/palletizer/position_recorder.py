@@ -0,0 +1,128 @@
+"""
+Confirmed axis positions and machine state, worked out from the link traffic.
+
+The firmware does not report positions. A commanded target becomes the position
+of an axis when that axis reports SEQUENCE COMPLETED (or the master reports that
+every slave has completed), and ZERO moves every axis to 0.
+"""
+import queue
+import threading
+import time
+
+from palletizer.motion import parse_targets
+from palletizer.utils.config import SLAVE_IDS, COMPLETE_FEEDBACK, SLAVE_COMPLETED_MESSAGE
+
+# Machine states as stored codes (same names as palletizer.machine.STATE_*)
+STATES = ("Disconnected", "Connecting", "Idle", "Running", "Paused", "Reconnecting", "Stalled", "Error")
+STATE_CODES = {name: code for code, name in enumerate(STATES)}
+STATE_UNKNOWN = 255
+
+
+def state_name(code):
+    return STATES[code] if code < len(STATES) else "Unknown"
+
+
+class PositionRecorder:
+    """
+    Follows the link traffic and hands every change of the confirmed positions
+    or of the machine state to its sinks (a PositionStore on disk, a
+    PositionHistory ring for the plot). on_line() is a line listener for the
+    link thread and on_sent()/on_home()/set_state() are called where commands
+    are sent; all of them only queue the event. Parsing and writing happen on
+    the recorder's own thread, so neither the GUI nor the link thread waits
+    for the sinks.
+    """
+
+    def __init__(self, sinks, axes=SLAVE_IDS, completion_feedback=COMPLETE_FEEDBACK):
+        self.sinks = list(sinks)
+        self.axis_index = {axis: index for index, axis in enumerate(axes)}
+        self.completion_feedback = completion_feedback
+        self.events = queue.SimpleQueue()
+        # Line listeners get time.monotonic() timestamps; the sinks keep wall-clock time
+        self.clock_offset = time.time() - time.monotonic()
+
+        self.positions = [0] * len(self.axis_index)
+        self.pending_targets = {}  # axis -> commanded position not yet confirmed
+        self.state = STATE_UNKNOWN
+        self.rows_written = 0
+        self.errors = 0
+
+        self.thread = threading.Thread(target=self.run, name="position-recorder", daemon=True)
+        self.thread.start()
+
+    def on_line(self, timestamp, line):
+        self.events.put(('line', timestamp + self.clock_offset, line))
+
+    def on_sent(self, command):
+        self.events.put(('sent', time.time(), command))
+
+    def on_home(self):
+        self.events.put(('home', time.time(), None))
+
+    def set_state(self, state):
+        self.events.put(('state', time.time(), state))
+
+    def close(self):
+        """Write the queued events and close the sinks that need closing"""
+        self.events.put(None)
+        self.thread.join()
+        for sink in self.sinks:
+            if hasattr(sink, 'close'):
+                sink.close()
+
+    def run(self):
+        while True:
+            event = self.events.get()
+            if event is None:
+                break
+            try:
+                if self.handle_event(*event):
+                    for sink in self.sinks:
+                        sink.append(event[1], self.positions, self.state)
+                    self.rows_written += 1
+            except Exception as e:
+                # Never let a bad line or a full disk stop the recorder
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"Position recorder error: {e}")
+
+    def handle_event(self, kind, timestamp, data):
+        """Apply an event; returns True when a row has to be written"""
+        if kind == 'line':
+            return self.handle_line(data)
+        if kind == 'sent':
+            for axis, position in parse_targets(data).items():
+                if axis in self.axis_index:
+                    self.pending_targets[axis] = position
+            return False
+        if kind == 'home':
+            self.pending_targets.clear()
+            changed = any(self.positions)
+            self.positions = [0] * len(self.positions)
+            return changed
+        if kind == 'state':
+            code = STATE_CODES.get(data, STATE_UNKNOWN)
+            changed = code != self.state
+            self.state = code
+            return changed
+        return False
+
+    def handle_line(self, line):
+        if line.startswith("[SLAVE]"):
+            slave_id, _, message = line[7:].partition(';')
+            axis = slave_id.strip().lower()
+            if SLAVE_COMPLETED_MESSAGE in message and axis in self.pending_targets:
+                return self.confirm(axis)
+        elif line.startswith("[FEEDBACK]") and line[10:].strip() == self.completion_feedback:
+            changed = False
+            for axis in list(self.pending_targets):
+                changed = self.confirm(axis) or changed
+            return changed
+        return False
+
+    def confirm(self, axis):
+        position = self.pending_targets.pop(axis)
+        index = self.axis_index[axis]
+        changed = self.positions[index] != position
+        self.positions[index] = position
+        return changed
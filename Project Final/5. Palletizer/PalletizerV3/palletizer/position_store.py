@@ -0,0 +1,322 @@
+"""
+Append-only history of axis positions and machine state.
+
+Rows are stored column by column in memory-mapped segment files, one file per
+hour (POSITION_STORE_SEGMENT_S). A segment has a fixed capacity and is laid out as
+
+    header | timestamp float64[capacity] | position int32[axes][capacity] | state uint8[capacity]
+
+so every column, and all axes together as an (axes, rows) array, can be read as
+a NumPy view of the mapped file without copying. The row count in the header is
+written after the row itself, so a reader (another thread, or another process
+opening the directory) never sees a half-written row. Files are created sparse,
+so an hour that only holds a few rows only takes the disk space of those rows.
+
+The store is filled by a palletizer.position_recorder.PositionRecorder, which
+works out the confirmed axis positions from the link traffic.
+
+Usage:
+    python -m palletizer.position_store position_history
+    python -m palletizer.position_store position_history --last 3600
+"""
+import argparse
+import calendar
+import mmap
+import os
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from palletizer.position_recorder import state_name
+from palletizer.utils.config import SLAVE_IDS, POSITION_STORE_SEGMENT_S, POSITION_STORE_SEGMENT_ROWS
+
+MAGIC = b'PALPOS01'
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([('magic', 'S8'), ('axes', '<u4'), ('reserved', '<u4'), ('capacity', '<u8'),
+                         ('count', '<u8'), ('start', '<f8')])
+
+SEGMENT_PREFIX = "positions-"
+SEGMENT_SUFFIX = ".seg"
+SEGMENT_TIME_FORMAT = "%Y%m%dT%H%M%S"
+
+# Rows of one segment within a query range; every field is a view of the mapped file
+PositionBlock = namedtuple('PositionBlock', ['timestamps', 'positions', 'states'])
+
+
+def segment_file_name(start, part=0):
+    return f"{SEGMENT_PREFIX}{time.strftime(SEGMENT_TIME_FORMAT, time.gmtime(start))}-{part:02d}{SEGMENT_SUFFIX}"
+
+
+def parse_segment_file_name(name):
+    """(start time, part) of a segment file name, or None for other files"""
+    if not (name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)):
+        return None
+    try:
+        stamp, part = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].rsplit('-', 1)
+        return calendar.timegm(time.strptime(stamp, SEGMENT_TIME_FORMAT)), int(part)
+    except ValueError:
+        return None
+
+
+class Segment:
+    """One memory-mapped segment file"""
+
+    def __init__(self, path, writable=False, start=None, capacity=POSITION_STORE_SEGMENT_ROWS, axes=len(SLAVE_IDS)):
+        self.path = path
+        self.writable = writable
+
+        if writable and not os.path.exists(path):
+            # Sparse file: only the pages that rows are written to take disk space
+            with open(path, 'wb') as f:
+                f.truncate(HEADER_SIZE + capacity * (8 + 4 * axes + 1))
+            created = True
+        else:
+            created = False
+
+        self.file = open(path, 'r+b' if writable else 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        self.header = np.frombuffer(self.map, HEADER_DTYPE, 1)
+        if created:
+            self.header[0] = (MAGIC, axes, 0, capacity, 0, start or 0.0)
+        elif self.header['magic'][0] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a position history segment")
+
+        self.axes = int(self.header['axes'][0])
+        self.capacity = int(self.header['capacity'][0])
+        self.start = float(self.header['start'][0])
+
+        offset = HEADER_SIZE
+        self.timestamps = np.frombuffer(self.map, '<f8', self.capacity, offset)
+        offset += 8 * self.capacity
+        self.positions = np.frombuffer(self.map, '<i4', self.axes * self.capacity, offset).reshape(self.axes, -1)
+        offset += 4 * self.axes * self.capacity
+        self.states = np.frombuffer(self.map, 'u1', self.capacity, offset)
+
+        # The writer keeps its own count; readers always read it from the header
+        self.rows = self.count
+
+    @property
+    def count(self):
+        return int(self.header['count'][0])
+
+    @property
+    def full(self):
+        return self.rows >= self.capacity
+
+    def append(self, timestamp, positions, state):
+        row = self.rows
+        self.timestamps[row] = timestamp
+        self.positions[:, row] = positions
+        self.states[row] = state
+        self.rows = row + 1
+        self.header['count'] = self.rows  # Publish the row only once it is complete
+
+    def last_timestamp(self):
+        count = self.count
+        return float(self.timestamps[count - 1]) if count else None
+
+    def slice(self, start=None, end=None):
+        """Rows with start <= timestamp < end, as views"""
+        count = self.count
+        timestamps = self.timestamps[:count]
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, 'left'))
+        last = count if end is None else int(np.searchsorted(timestamps, end, 'left'))
+        return PositionBlock(timestamps[first:last], self.positions[:, first:last], self.states[first:last])
+
+    def flush(self):
+        if self.writable:
+            self.map.flush()
+
+    def close(self):
+        self.flush()
+        self.header = self.timestamps = self.positions = self.states = None
+        try:
+            self.map.close()
+        except BufferError:
+            # A caller still holds a view; the mapping is released with the last view
+            pass
+        self.file.close()
+
+
+class PositionStore:
+    """
+    Directory of hourly segments. One writer appends rows; queries may run on
+    other threads (or processes, with writable=False) at the same time.
+    """
+
+    def __init__(self, directory, writable=True, segment_s=POSITION_STORE_SEGMENT_S,
+                 segment_rows=POSITION_STORE_SEGMENT_ROWS, axes=SLAVE_IDS):
+        self.directory = directory
+        self.writable = writable
+        self.segment_s = segment_s
+        self.segment_rows = segment_rows
+        self.axes = list(axes)
+        self.lock = threading.Lock()
+        self.segments = {}  # file name -> open Segment
+        self.writer = None
+        self.writer_key = None  # (segment start, part)
+        self.last_timestamp = None
+
+        if writable:
+            os.makedirs(directory, exist_ok=True)
+
+    def segment_names(self):
+        """Segment file names in time order"""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        keyed = [(key, name) for name in names for key in [parse_segment_file_name(name)] if key is not None]
+        return [name for key, name in sorted(keyed)]
+
+    def open_segment(self, name):
+        with self.lock:
+            segment = self.segments.get(name)
+            if segment is None:
+                segment = Segment(os.path.join(self.directory, name))
+                self.segments[name] = segment
+            return segment
+
+    def append(self, timestamp, positions, state):
+        """Append one row; timestamp is wall-clock time (time.time())"""
+        # Keep every segment sorted by time, even if the clock is set back
+        if self.last_timestamp is not None and timestamp < self.last_timestamp:
+            timestamp = self.last_timestamp
+
+        start = timestamp - timestamp % self.segment_s
+        if self.writer is None or self.writer_key[0] != start or self.writer.full:
+            self.roll(start)
+            # A segment continued after a restart may already hold later rows
+            last = self.writer.last_timestamp()
+            if last is not None and timestamp < last:
+                timestamp = last
+
+        self.last_timestamp = timestamp
+        self.writer.append(timestamp, positions, state)
+
+    def roll(self, start):
+        """Switch the writer to the segment for the hour starting at start"""
+        if self.writer is not None:
+            self.writer.flush()
+
+        part = 0
+        if self.writer_key is not None and self.writer_key[0] == start:
+            part = self.writer_key[1] + 1
+        else:
+            # Continue the last part of this hour after a restart
+            for name in self.segment_names():
+                key = parse_segment_file_name(name)
+                if key[0] == start:
+                    part = key[1]
+
+        while True:
+            name = segment_file_name(start, part)
+            segment = Segment(os.path.join(self.directory, name), writable=True, start=start,
+                              capacity=self.segment_rows, axes=len(self.axes))
+            if not segment.full and segment.axes == len(self.axes):
+                break
+            segment.close()
+            part += 1
+
+        with self.lock:
+            old = self.segments.get(name)
+            self.segments[name] = segment
+        if old is not None:
+            old.close()
+        self.writer = segment
+        self.writer_key = (start, part)
+
+    def query(self, start=None, end=None):
+        """
+        Rows with start <= timestamp < end (None for open ends) as a list of
+        PositionBlock, one per segment, in time order. The arrays are views of
+        the mapped files; copy them to keep them past close().
+        """
+        blocks = []
+        for name in self.segment_names():
+            segment_start, _ = parse_segment_file_name(name)
+            if end is not None and segment_start >= end:
+                break
+            if start is not None and segment_start + self.segment_s <= start:
+                continue
+            block = self.open_segment(name).slice(start, end)
+            if len(block.timestamps):
+                blocks.append(block)
+        return blocks
+
+    def query_concatenated(self, start=None, end=None):
+        """Like query() but as one PositionBlock; copies when the range spans segments"""
+        blocks = self.query(start, end)
+        if len(blocks) == 1:
+            return blocks[0]
+        if not blocks:
+            return PositionBlock(np.empty(0, '<f8'), np.empty((len(self.axes), 0), '<i4'), np.empty(0, 'u1'))
+        return PositionBlock(np.concatenate([block.timestamps for block in blocks]),
+                             np.concatenate([block.positions for block in blocks], axis=1),
+                             np.concatenate([block.states for block in blocks]))
+
+    def flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+
+    def close(self):
+        with self.lock:
+            segments, self.segments = self.segments, {}
+        for segment in segments.values():
+            segment.close()
+        self.writer = None
+        self.writer_key = None
+
+
+def summarize(blocks, axes=SLAVE_IDS):
+    """Row count, time in each state and per-axis range of a query result"""
+    rows = sum(len(block.timestamps) for block in blocks)
+    if not rows:
+        return {'rows': 0}
+
+    state_seconds = {}
+    for block in blocks:
+        durations = np.diff(block.timestamps)
+        for code in np.unique(block.states[:-1]):
+            seconds = float(durations[block.states[:-1] == code].sum())
+            state_seconds[state_name(code)] = state_seconds.get(state_name(code), 0.0) + seconds
+
+    return {
+        'rows': rows,
+        'first': float(blocks[0].timestamps[0]),
+        'last': float(blocks[-1].timestamps[-1]),
+        'state_seconds': state_seconds,
+        'axis_range': {axis: (int(min(block.positions[index].min() for block in blocks)),
+                              int(max(block.positions[index].max() for block in blocks)))
+                       for index, axis in enumerate(axes)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a position history directory")
+    parser.add_argument('directory')
+    parser.add_argument('--last', type=float, metavar='SECONDS', help="Only the last SECONDS of history")
+    args = parser.parse_args()
+
+    store = PositionStore(args.directory, writable=False)
+    names = store.segment_names()
+    print(f"{len(names)} segments in {args.directory}")
+    start = time.time() - args.last if args.last else None
+    summary = summarize(store.query(start))
+    if not summary['rows']:
+        print("No rows")
+        return
+
+    print(f"{summary['rows']} rows from {time.ctime(summary['first'])} to {time.ctime(summary['last'])}")
+    for state, seconds in sorted(summary['state_seconds'].items(), key=lambda item: -item[1]):
+        print(f"  {state:<14} {seconds / 3600:8.2f} h")
+    for axis, (low, high) in summary['axis_range'].items():
+        print(f"  {axis.upper()}: {low} .. {high}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,364 @@
+import os
+import select
+import threading
 import time
+from collections import deque
 import serial
 import serial.tools.list_ports
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from palletizer.binary_protocol import FrameDecoder, encode, encode_text, PROTOCOL_QUERY, PROTOCOL_ACK
+from palletizer.utils.config import (SERIAL_POLL_INTERVAL, SERIAL_AUTO_RECONNECT,
+                                     SERIAL_RECONNECT_INITIAL_DELAY, SERIAL_RECONNECT_MAX_DELAY,
+                                     SERIAL_RECONNECT_TIMEOUT, SERIAL_BINARY_PROTOCOL)
+from palletizer.utils.metrics import METRICS
+
+
+def summarize_latencies(latencies):
+    """Latency statistics in ms for a sequence of latencies in seconds"""
+    if not latencies:
+        return {'count': 0, 'p50_ms': 0.0, 'p99_ms': 0.0, 'max_ms': 0.0}
+
+    latencies = sorted(latencies)
+    return {
+        'count': len(latencies),
+        'p50_ms': latencies[len(latencies) // 2] * 1000,
+        'p99_ms': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        'max_ms': latencies[-1] * 1000,
+    }
+
 
 class SerialCommunicator(QThread):
     """Thread class untuk menangani komunikasi serial"""
     data_received = pyqtSignal(str)
     connection_status = pyqtSignal(bool, str)
+    priority_sent = pyqtSignal(str, float)  # (command, command-to-wire latency in ms)
+    link_lost = pyqtSignal(str)             # Link dropped unexpectedly (error message)
+    reconnecting = pyqtSignal(int, float)   # (attempt number, seconds until the attempt)
+    link_restored = pyqtSignal(str)         # Link re-opened after a drop (port)
+    reconnect_failed = pyqtSignal(str)      # Gave up reconnecting (port)
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, metrics_labels=None):
         super().__init__(parent)
         self.serial_port = None
         self.is_connected = False
         self.running = True
-        self.tx_queue = []
+        self.tx_queue = deque()
+        self.priority_queue = deque()  # High-priority lane for safety and state commands
+        self.wake_event = threading.Event()
+        # On POSIX the loop sleeps in select() on the port and this pipe, so received data wakes it at once
+        self.wake_pipe = os.pipe() if os.name == 'posix' else None
+        if self.wake_pipe:
+            for fd in self.wake_pipe:
+                os.set_blocking(fd, False)
+        self.decoder = FrameDecoder()  # Text lines and binary frames
+        self.priority_latencies = deque(maxlen=256)  # Recent command-to-wire latencies (seconds)
+
+        # Reconnect state
+        self.auto_reconnect = SERIAL_AUTO_RECONNECT
+        self.port_name = None
+        self.baudrate = None
+        self.port_factory = None  # Optional callable(port, baudrate) used to re-open the port
+        self.reconnect_pending = False
+        self.user_disconnected = False
+        self.pending_connect = None  # (port, baudrate) to open on the link thread
+        self.pending_disconnect = False
+        self.line_listeners = []  # Called on the link thread with (monotonic timestamp, line)
+
+        # Wire protocol: text until the device accepts binary frames
+        self.binary_protocol = SERIAL_BINARY_PROTOCOL
+        self.protocol = 'text'
+        self.encode = encode_text
+        self.negotiate_pending = False
+        self.bind_metrics(metrics_labels)
+
+    def bind_metrics(self, labels=None):
+        """Get this link's metrics from the registry; labels tell links apart, e.g. machine="M1" """
+        # Counts are plain attributes that the registry reads when collecting. The link loop only
+        # adds the received lines once per read; written commands are derived from the queues.
+        self.rx_line_count = 0
+        self.tx_queued_count = 0
+        self.tx_dropped_count = 0
+        METRICS.counter("palletizer_serial_rx_lines_total", "Lines received from the master", labels,
+                        function=lambda: self.rx_line_count)
+        METRICS.counter("palletizer_serial_tx_lines_total", "Commands written to the port", labels,
+                        function=lambda: (self.tx_queued_count - self.tx_dropped_count
+                                          - len(self.tx_queue) - len(self.priority_queue)))
+        self.dropped_rx_metric = METRICS.counter(
+            "palletizer_serial_dropped_lines_total", "Lines lost on link drops and output flushes",
+            {**(labels or {}), 'direction': 'rx'})
+        METRICS.counter("palletizer_serial_dropped_lines_total", "Lines lost on link drops and output flushes",
+                        {**(labels or {}), 'direction': 'tx'}, function=lambda: self.tx_dropped_count)
+        self.link_lost_metric = METRICS.counter(
+            "palletizer_serial_link_lost_total", "Unexpected link drops", labels)
+        self.priority_latency_metric = METRICS.histogram(
+            "palletizer_serial_priority_latency_seconds", "Priority command request-to-wire latency", labels)
+        METRICS.counter("palletizer_serial_frame_errors_total", "Received frames dropped for a bad CRC or payload",
+                        labels, function=lambda: self.decoder.crc_errors + self.decoder.bad_frames)
+        METRICS.gauge("palletizer_serial_tx_queue_depth", "Commands waiting to be written", labels,
+                      function=lambda: len(self.tx_queue) + len(self.priority_queue))
+
+    def wake(self):
+        """Wake the link loop, e.g. when a command is queued; safe to call from any thread"""
+        self.wake_event.set()
+        if self.wake_pipe:
+            try:
+                os.write(self.wake_pipe[1], b'\0')
+            except (BlockingIOError, OSError):
+                pass  # Pipe already full, the loop will wake anyway
+
+    def wait_for_activity(self, timeout):
+        """Sleep until data arrives, the loop is woken or the timeout passes"""
+        port_fd = None
+        if self.wake_pipe and self.is_connected:
+            try:
+                port_fd = self.serial_port.fileno()
+            except Exception:
+                port_fd = None  # Port types without a file descriptor, e.g. URL handlers
+
+        if port_fd is None:
+            self.wake_event.wait(timeout)
+            return
+
+        try:
+            readable, _, _ = select.select([port_fd, self.wake_pipe[0]], [], [], timeout)
+            if self.wake_pipe[0] in readable:
+                os.read(self.wake_pipe[0], 4096)
+        except (OSError, ValueError):
+            # The port was closed while waiting
+            pass
+
+    def open_port(self, port, baudrate):
+        """Open a port by device name or pyserial URL"""
+        if self.port_factory is not None:
+            return self.port_factory(port, baudrate)
+        return serial.serial_for_url(port, baudrate, timeout=0.5)
 
     def connect(self, port, baudrate):
         try:
-            self.serial_port = serial.Serial(port, baudrate, timeout=0.5)
-            self.is_connected = True
-            self.connection_status.emit(True, f"Terhubung ke {port}")
-            return True
+            serial_port = self.open_port(port, baudrate)
         except Exception as e:
             self.connection_status.emit(False, f"Error: {str(e)}")
             return False
 
-    def disconnect(self):
-        if self.serial_port and self.serial_port.is_open:
-            self.serial_port.close()
+        self.attach(serial_port, port)
+        return True
+
+    def request_connect(self, port, baudrate):
+        """Open the port on the link thread, so a slow port does not block the caller"""
+        self.cancel_reconnect()
+        self.pending_connect = (port, baudrate)
+        self.wake()
+
+    def request_disconnect(self):
+        """Disconnect on the link thread; safe to call from any thread"""
+        self.pending_disconnect = True
+        self.wake()
+
+    def add_line_listener(self, listener):
+        """
+        Register a callable(timestamp, line) that is called on the link thread for
+        every received line, with the time.monotonic() time it was read. Listeners
+        must be fast and must not touch widgets.
+        """
+        self.line_listeners.append(listener)
+
+    def attach(self, serial_port, port):
+        """Use a serial port that was already opened, e.g. by the PortWorker"""
+        self.serial_port = serial_port
+        self.port_name = port
+        self.baudrate = serial_port.baudrate
+        self.decoder.reset()
+        self.set_protocol('text')
+        self.negotiate_pending = self.binary_protocol
+        self.reconnect_pending = False
+        self.user_disconnected = False
+        self.is_connected = True
+        self.connection_status.emit(True, f"Terhubung ke {port}")
+
+    def close_port(self):
+        try:
+            if self.serial_port and self.serial_port.is_open:
+                self.serial_port.close()
+        except Exception:
+            pass
         self.is_connected = False
+
+    def disconnect(self):
+        """Disconnect on request; no reconnect is attempted"""
+        self.user_disconnected = True
+        self.cancel_reconnect()
+        self.close_port()
         self.connection_status.emit(False, "Terputus")
 
+    def cancel_reconnect(self):
+        """Stop a pending reconnect, e.g. when the user connects to another port"""
+        self.reconnect_pending = False
+        self.wake()
+
+    def handle_link_lost(self, error):
+        """Close the broken port and schedule a reconnect"""
+        self.close_port()
+        self.link_lost_metric.inc()
+        self.tx_dropped_count += len(self.tx_queue) + len(self.priority_queue)
+        if self.decoder.pending:
+            self.dropped_rx_metric.inc()  # Partial line or frame
+        self.tx_queue.clear()
+        self.priority_queue.clear()
+        self.connection_status.emit(False, f"Error komunikasi: {error}")
+        self.link_lost.emit(error)
+        self.reconnect_pending = (self.auto_reconnect and self.port_name is not None
+                                  and not self.user_disconnected)
+
+    def reconnect(self):
+        """Re-open the last port with exponential backoff; runs on the link thread"""
+        delay = SERIAL_RECONNECT_INITIAL_DELAY
+        deadline = time.monotonic() + SERIAL_RECONNECT_TIMEOUT
+        attempt = 0
+
+        while self.running and self.reconnect_pending:
+            attempt += 1
+            self.reconnecting.emit(attempt, delay)
+            self.wake_event.wait(delay)
+            self.wake_event.clear()
+            if not (self.running and self.reconnect_pending):
+                return
+
+            try:
+                serial_port = self.open_port(self.port_name, self.baudrate)
+            except Exception:
+                if time.monotonic() + delay > deadline:
+                    self.reconnect_pending = False
+                    self.reconnect_failed.emit(self.port_name)
+                    return
+                delay = min(delay * 2, SERIAL_RECONNECT_MAX_DELAY)
+                continue
+
+            self.attach(serial_port, self.port_name)
+            self.link_restored.emit(self.port_name)
+            return
+
+    def set_protocol(self, protocol):
+        """Encode further commands as 'text' lines or 'binary' frames"""
+        self.protocol = protocol
+        self.encode = encode if protocol == 'binary' else encode_text
+
     def send_command(self, command):
         if self.is_connected and self.serial_port and self.serial_port.is_open:
+            self.tx_queued_count += 1
             self.tx_queue.append(command)
+            self.wake()
             return True
         return False
 
+    def send_priority_command(self, command, flush_pending=False, queued_at=None):
+        """
+        Send a command ahead of all queued traffic. With flush_pending the queued
+        normal commands and any bytes still waiting in the output buffer are dropped,
+        so the command goes out at the next byte instead of the next line.
+        queued_at (perf_counter time) is the start of the latency measurement.
+        """
+        if not (self.is_connected and self.serial_port and self.serial_port.is_open):
+            return False
+
+        if flush_pending:
+            self.tx_dropped_count += len(self.tx_queue)
+            self.tx_queue.clear()
+        self.tx_queued_count += 1
+        self.priority_queue.append((command, flush_pending, queued_at or time.perf_counter()))
+        self.wake()
+        return True
+
+    def priority_latency_stats(self):
+        """Get command-to-wire latency statistics (ms) for recent priority commands"""
+        return summarize_latencies(self.priority_latencies)
+
+    def _write_priority_commands(self):
+        while self.priority_queue:
+            command, flush_pending, queued_at = self.priority_queue.popleft()
+            payload = self.encode(command)
+            if flush_pending:
+                # Drop bytes not yet on the wire and terminate any partially sent line;
+                # the device decoder drops a partial frame by itself once the next frame is complete
+                self.serial_port.reset_output_buffer()
+                if self.protocol == 'text':
+                    payload = b'\n' + payload
+            self.serial_port.write(payload)
+
+            latency = time.perf_counter() - queued_at
+            self.priority_latencies.append(latency)
+            self.priority_latency_metric.record(latency)
+            self.priority_sent.emit(command, latency * 1000)
+
+    def _output_idle(self):
+        # Keep at most one normal line in the output buffer so priority commands never wait behind a backlog
+        try:
+            return self.serial_port.out_waiting == 0
+        except (AttributeError, NotImplementedError, serial.SerialException):
+            return True
+
     def run(self):
         while self.running:
+            self.wake_event.clear()
+
+            # Tutup atau buka port yang diminta lewat request_disconnect/request_connect
+            if self.pending_disconnect:
+                self.pending_disconnect = False
+                self.disconnect()
+
+            if self.pending_connect:
+                port, baudrate = self.pending_connect
+                self.pending_connect = None
+                self.connect(port, baudrate)
+
             # Membaca data dari serial port
             if self.is_connected and self.serial_port and self.serial_port.is_open:
                 try:
+                    # Ask for binary frames once per connection; commands keep going out as text meanwhile
+                    if self.negotiate_pending:
+                        self.negotiate_pending = False
+                        self.serial_port.write(encode_text(PROTOCOL_QUERY))
+
+                    # Kirim perintah prioritas terlebih dahulu
+                    self._write_priority_commands()
+
                     # Kirim perintah dari queue
-                    if self.tx_queue:
-                        command = self.tx_queue.pop(0)
-                        self.serial_port.write((command + '\n').encode())
-
-                    # Baca response
-                    if self.serial_port.in_waiting > 0:
-                        data = self.serial_port.readline().decode('utf-8', errors='ignore').strip()
-                        if data:
+                    if self.tx_queue and self._output_idle():
+                        try:
+                            command = self.tx_queue.popleft()
+                        except IndexError:
+                            pass  # Flushed by send_priority_command on the GUI thread in between
+                        else:
+                            self.serial_port.write(self.encode(command))
+
+                    # Baca response tanpa menunggu baris lengkap
+                    waiting = self.serial_port.in_waiting
+                    if waiting > 0:
+                        # Complete lines and frames; the unterminated rest stays in the decoder
+                        lines = self.decoder.feed(self.serial_port.read(waiting))
+                        timestamp = time.monotonic()
+                        self.rx_line_count += len(lines)
+                        for data in lines:
+                            if data == PROTOCOL_ACK and self.binary_protocol:
+                                self.set_protocol('binary')
+                            for listener in self.line_listeners:
+                                listener(timestamp, data)
                             self.data_received.emit(data)
                 except Exception as e:
-                    self.connection_status.emit(False, f"Error komunikasi: {str(e)}")
-                    self.disconnect()
+                    self.handle_link_lost(str(e))
+
+            # Coba sambung kembali jika koneksi terputus tanpa diminta
+            if self.reconnect_pending:
+                self.reconnect()
+                continue
 
-            # Tunggu sedikit untuk mengurangi beban CPU
-            time.sleep(0.01)
+            # Tunggu data masuk atau perintah baru; batas waktu untuk pacing dan reconnect
+            if not self.priority_queue:
+                self.wait_for_activity(SERIAL_POLL_INTERVAL)
 
     def stop(self):
         self.running = False
+        self.reconnect_pending = False
+        self.wake()
         self.disconnect()
         self.wait()
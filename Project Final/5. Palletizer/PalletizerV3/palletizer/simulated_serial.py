@@ -0,0 +1,332 @@
+import random
+import threading
+import time
+from collections import deque
+
+from palletizer import dual_arm_protocol as arm_protocol
+from palletizer.binary_protocol import FrameDecoder, encode, encode_text, PROTOCOL_QUERY, PROTOCOL_ACK
+from palletizer.dual_arm_scheduler import ArmMotionModel
+from palletizer.motion import estimate_row_durations, parse_targets
+from palletizer.utils.config import DUAL_ARM_STATUS_REPEAT_S
+
+
+class SimulatedSerialPort:
+    """
+    pyserial-compatible port connected to a simulated device over a timed wire.
+    Bytes take 10 bit times each to cross the wire in both directions, so
+    out_waiting, in_waiting and reset_output_buffer behave like a real UART.
+    """
+
+    def __init__(self, device=None, baudrate=9600, bits_per_byte=10):
+        self.baudrate = baudrate
+        self.bits_per_byte = bits_per_byte
+        self.port = "sim://"
+        self.timeout = 0.5
+        self.is_open = True
+        self.failed = False  # Set by unplug() to simulate a dropped link
+        self.device = device
+        self._lock = threading.RLock()
+        self._tx = bytearray()       # Host bytes not yet on the other end of the wire
+        self._tx_clock = 0.0         # Time the next host byte finishes transmitting
+        self._rx = bytearray()       # Device bytes that have arrived at the host
+        self._rx_pending = deque()   # (arrival time, byte) in flight towards the host
+        self._rx_clock = 0.0
+
+        if self.device is not None:
+            self.device.attach(self)
+
+    @property
+    def byte_time(self):
+        return self.bits_per_byte / self.baudrate
+
+    def _advance(self):
+        """Move bytes whose wire time has elapsed to the other side"""
+        if self.failed:
+            raise OSError("Simulated device disconnected")
+
+        now = time.perf_counter()
+
+        if self._tx:
+            count = min(len(self._tx), int((now - self._tx_clock) / self.byte_time))
+            if count > 0:
+                data = bytes(self._tx[:count])
+                del self._tx[:count]
+                self._tx_clock += count * self.byte_time
+                if self.device is not None:
+                    self.device.receive(data, self._tx_clock)
+
+        while self._rx_pending and self._rx_pending[0][0] <= now:
+            self._rx.append(self._rx_pending.popleft()[1])
+
+    # ---- Host side (pyserial API) ----
+
+    def write(self, data):
+        with self._lock:
+            self._advance()
+            if not self._tx:
+                self._tx_clock = time.perf_counter()
+            self._tx += data
+            return len(data)
+
+    @property
+    def out_waiting(self):
+        with self._lock:
+            self._advance()
+            return len(self._tx)
+
+    @property
+    def in_waiting(self):
+        with self._lock:
+            self._advance()
+            return len(self._rx)
+
+    def read(self, size=1):
+        deadline = time.perf_counter() + (self.timeout or 0)
+        while True:
+            with self._lock:
+                self._advance()
+                if len(self._rx) >= size or time.perf_counter() >= deadline:
+                    data = bytes(self._rx[:size])
+                    del self._rx[:size]
+                    return data
+            time.sleep(self.byte_time)
+
+    def readline(self):
+        deadline = time.perf_counter() + (self.timeout or 0)
+        while True:
+            with self._lock:
+                self._advance()
+                index = self._rx.find(b'\n')
+                if index >= 0 or time.perf_counter() >= deadline:
+                    end = index + 1 if index >= 0 else len(self._rx)
+                    data = bytes(self._rx[:end])
+                    del self._rx[:end]
+                    return data
+            time.sleep(self.byte_time)
+
+    def flush(self):
+        while self.out_waiting:
+            time.sleep(self.byte_time)
+
+    def reset_output_buffer(self):
+        with self._lock:
+            self._advance()
+            self._tx.clear()
+
+    def reset_input_buffer(self):
+        with self._lock:
+            self._advance()
+            self._rx.clear()
+            self._rx_pending.clear()
+
+    def close(self):
+        self.is_open = False
+
+    def unplug(self):
+        """Simulate a cable pull: every further host call fails"""
+        self.failed = True
+
+    # ---- Device side ----
+
+    def device_write(self, data, at=None):
+        """Send bytes from the simulated device towards the host, starting at perf_counter time at"""
+        with self._lock:
+            self._rx_clock = max(self._rx_clock, at or time.perf_counter())
+            for byte in data:
+                self._rx_clock += self.byte_time
+                self._rx_pending.append((self._rx_clock, byte))
+
+
+class LineDevice:
+    """
+    Base class for simulated devices that handle newline-terminated commands.
+    With binary_protocol the device also answers the protocol query and then
+    replies in binary frames; it accepts text lines and frames either way.
+    """
+
+    def __init__(self, binary_protocol=False):
+        self.port = None
+        self.decoder = FrameDecoder()
+        self.binary_protocol = binary_protocol
+        self.encode = encode_text
+
+    def attach(self, port):
+        self.port = port
+
+    def receive(self, data, timestamp):
+        """Called with host bytes as they come off the wire"""
+        for line in self.decoder.feed(data):
+            if line == PROTOCOL_QUERY and self.binary_protocol:
+                self.send_line(PROTOCOL_ACK)
+                self.encode = encode
+                continue
+            self.handle_line(line, timestamp)
+
+    def handle_line(self, line, timestamp):
+        """Override to handle a complete command line"""
+        pass
+
+    def send_line(self, line):
+        """Reply to the host with a line, as text or as a frame once binary frames were negotiated"""
+        self.port.device_write(self.encode(line))
+
+
+class EchoDevice(LineDevice):
+    """Simulated device that echoes every line back to the host"""
+
+    def handle_line(self, line, timestamp):
+        if line:
+            self.send_line(line)
+
+
+class SimulatedMasterDevice(LineDevice):
+    """
+    Simulated palletizer master. Row commands complete after their predicted
+    motion time (scaled by time_scale); each axis reports SEQUENCE COMPLETED
+    and the master then reports ALL_SLAVES_COMPLETED, like the real firmware.
+    """
+
+    def __init__(self, time_scale=1.0, completion_feedback="ALL_SLAVES_COMPLETED", binary_protocol=False):
+        super().__init__(binary_protocol)
+        self.time_scale = time_scale
+        self.completion_feedback = completion_feedback
+        self.positions = {}
+        self.rows_received = 0
+        self.timer = None
+
+    def handle_line(self, line, timestamp):
+        if '(' not in line:
+            return
+
+        durations = estimate_row_durations(line, self.positions)
+        self.rows_received += 1
+        self.positions.update(parse_targets(line))
+
+        if self.timer is not None:
+            self.timer.cancel()
+        delay = max(durations.values(), default=0.0) * self.time_scale
+        self.timer = threading.Timer(delay, self.complete_row, args=(sorted(durations),))
+        self.timer.daemon = True
+        self.timer.start()
+
+    def complete_row(self, axes):
+        if self.port is None or not self.port.is_open or self.port.failed:
+            return
+        for axis in axes:
+            self.send_line(f"[SLAVE] {axis};SEQUENCE COMPLETED")
+        self.send_line(f"[FEEDBACK] {self.completion_feedback}")
+
+
+class SimulatedDualArmDevice(LineDevice):
+    """
+    The two V1.3 arm controllers on one RS485 bus. Each arm checks the checksum
+    and its prefix and, like PalletizerArmControl, starts asleep, takes HOME only
+    when READY and GLAD only when RUNNING, and goes READY after CALIBRATION and
+    to sleep after PARK. An action takes the time ArmMotionModel estimates for
+    it (or durations, per action letter), scaled by time_scale.
+
+    Like the real controllers, the arms send nothing with report_status off.
+    With it, they stand for a status bridge: an arm answers BUSY when it takes
+    a command and READY when the action is done, and a repeat of the command
+    in progress is answered BUSY again. Both quote the checksum of the command
+    and are repeated every status_repeat_s. With loss, that fraction of the
+    host frames is dropped, and with status_loss that fraction of the status
+    frames (seeded), to exercise the host retries.
+    """
+    SLEEPING = "SLEEPING"
+    READY = "READY"
+    RUNNING = "RUNNING"
+
+    def __init__(self, time_scale=1.0, durations=None, loss=0.0, seed=None, status_loss=0.0,
+                 status_repeat_s=DUAL_ARM_STATUS_REPEAT_S, report_status=True):
+        super().__init__()
+        self.time_scale = time_scale
+        self.durations = durations or {}
+        self.models = {arm: ArmMotionModel() for arm in arm_protocol.ARMS}
+        self.report_status = report_status
+        self.loss = loss
+        self.status_loss = status_loss
+        self.status_repeat_s = status_repeat_s
+        self.random = random.Random(seed)
+        self.states = {arm: self.SLEEPING for arm in arm_protocol.ARMS}
+        self.current = {arm: None for arm in arm_protocol.ARMS}  # Action in progress
+        self.statuses = {}  # arm -> (status, reference) repeated until the next one
+        self.timers = {}
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.statuses_dropped = 0
+        self.checksum_errors = 0
+
+    def attach(self, port):
+        super().attach(port)
+        if self.report_status and self.status_repeat_s:
+            threading.Thread(target=self.repeat_statuses, daemon=True).start()
+
+    def repeat_statuses(self):
+        port = self.port
+        while port.is_open:
+            time.sleep(self.status_repeat_s)
+            for arm, (status, reference) in list(self.statuses.items()):
+                self.send_status(arm, status, reference)
+
+    def handle_line(self, line, timestamp):
+        if self.loss and self.random.random() < self.loss:
+            self.frames_dropped += 1
+            return
+        try:
+            frame = arm_protocol.parse_frame(line)
+        except arm_protocol.ChecksumError:
+            self.checksum_errors += 1  # The controller logs "CRC mismatch" and stays silent
+            return
+        except arm_protocol.FrameError:
+            return
+        self.frames_received += 1
+
+        arm, action = frame
+        reference = arm_protocol.frame_reference(line)
+        if action == self.current[arm]:
+            self.send_status(arm, arm_protocol.STATUS_BUSY, reference)
+            return
+        if self.current[arm] is not None:
+            self.send_status(arm, arm_protocol.STATUS_ERROR, "BUSY")
+            return
+
+        try:
+            letter, _ = arm_protocol.parse_action(action)
+        except arm_protocol.FrameError:
+            self.send_status(arm, arm_protocol.STATUS_ERROR, "FORMAT")
+            return
+        if letter == arm_protocol.ACTION_HOME and self.states[arm] != self.READY:
+            self.send_status(arm, arm_protocol.STATUS_ERROR, "HOME only valid in READY")
+            return
+        if letter == arm_protocol.ACTION_GLAD and self.states[arm] != self.RUNNING:
+            self.send_status(arm, arm_protocol.STATUS_ERROR, "GLAD only valid in RUNNING")
+            return
+
+        estimate = self.models[arm].estimate(f"{arm}#{action}")
+        self.models[arm].positions = estimate.positions
+        self.current[arm] = action
+        self.set_status(arm, arm_protocol.STATUS_BUSY, reference)
+        timer = threading.Timer(self.durations.get(letter, estimate.duration) * self.time_scale, self.complete,
+                                args=(arm, letter, reference))
+        timer.daemon = True
+        self.timers[arm] = timer
+        timer.start()
+
+    def complete(self, arm, letter, reference):
+        self.states[arm] = {arm_protocol.ACTION_HOME: self.RUNNING,
+                            arm_protocol.ACTION_PARK: self.SLEEPING}.get(letter, self.READY)
+        self.current[arm] = None
+        self.set_status(arm, arm_protocol.STATUS_READY, reference)
+
+    def set_status(self, arm, status, reference):
+        self.statuses[arm] = (status, reference)
+        self.send_status(arm, status, reference)
+
+    def send_status(self, arm, status, reason=None):
+        if not self.report_status or self.port is None or not self.port.is_open or self.port.failed:
+            return
+        if self.status_loss and self.random.random() < self.status_loss:
+            self.statuses_dropped += 1
+            return
+        self.send_line(arm_protocol.status_frame(arm, status, reason))
@@ -0,0 +1,443 @@
+"""
+WebSocket telemetry stream for dashboards (e.g. the PalletizerOTGroup web app).
+
+Clients connect to ws://host:port/?rate=N and receive JSON text messages:
+
+    {"type": "snapshot", "seq": 1, "data": {"positions.x": 0, "state": "Idle", ...}}
+    {"type": "delta", "seq": 7, "data": {"positions.x": 1200, "row.index": 3}}
+
+The first message is the full state; later messages only carry the keys that
+changed since the previous message to that client (removed keys are null).
+Each client is sent at most N messages per second. Updates are never queued:
+a client that has not read its previous messages is skipped, and when it
+catches up it gets one delta covering everything it missed.
+
+Producers call TelemetryState.update(), which only stores values under a lock,
+so the serial path does not depend on the number or speed of clients.
+
+Demo running a sequence on a machine, or on a simulated one:
+    python -m palletizer.telemetry_server /dev/ttyUSB0 --sequence RunningTest_1.yaml
+    python -m palletizer.telemetry_server --simulate --sequence RunningTest_1.yaml
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import struct
+import threading
+import time
+from urllib.parse import urlsplit, parse_qs
+
+from palletizer.utils.config import (DEFAULT_BAUDRATE, TELEMETRY_HOST, TELEMETRY_PORT, TELEMETRY_DEFAULT_RATE_HZ,
+                                     TELEMETRY_MAX_RATE_HZ, TELEMETRY_MAX_CLIENTS,
+                                     TELEMETRY_MAX_CLIENT_BUFFER)
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_HANDSHAKE_SIZE = 8192
+MAX_CLIENT_FRAME_SIZE = 4096  # Clients only send small control messages
+
+OPCODE_TEXT = 0x1
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+MISSING = object()
+
+
+def websocket_accept_key(key):
+    return base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+
+
+def encode_frame(opcode, payload, mask=False):
+    """Build a single final WebSocket frame; clients must mask, servers must not"""
+    header = bytes([0x80 | opcode])
+    mask_bit = 0x80 if mask else 0
+    length = len(payload)
+    if length < 126:
+        header += bytes([mask_bit | length])
+    elif length < 1 << 16:
+        header += bytes([mask_bit | 126]) + struct.pack('>H', length)
+    else:
+        header += bytes([mask_bit | 127]) + struct.pack('>Q', length)
+
+    if mask:
+        key = os.urandom(4)
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+        header += key
+    return header + payload
+
+
+async def read_frame(reader, max_size):
+    """Read one frame; returns (opcode, payload). Fragmented messages are not used by either side."""
+    first, second = await reader.readexactly(2)
+    opcode = first & 0x0F
+    length = second & 0x7F
+    if length == 126:
+        length = struct.unpack('>H', await reader.readexactly(2))[0]
+    elif length == 127:
+        length = struct.unpack('>Q', await reader.readexactly(8))[0]
+    if length > max_size:
+        raise ValueError(f"Frame of {length} bytes is too large")
+
+    key = await reader.readexactly(4) if second & 0x80 else None
+    payload = await reader.readexactly(length)
+    if key is not None:
+        payload = bytes(b ^ key[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+def compute_delta(previous, current):
+    """Keys of current whose values differ from previous; keys that disappeared map to None"""
+    delta = {key: value for key, value in current.items() if previous.get(key, MISSING) != value}
+    for key in previous.keys() - current.keys():
+        delta[key] = None
+    return delta
+
+
+class TelemetryState:
+    """
+    Latest telemetry values as a flat dictionary with dotted keys
+    ("positions.x", "row.index", ...). Thread-safe; update() is cheap enough
+    to call from the serial thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.version = 0  # Increases whenever a value changes
+
+    def update(self, values=None, **fields):
+        """Set values, e.g. update({"positions.x": 100}) or update(state="Running")"""
+        if values:
+            fields.update(values)
+        with self.lock:
+            for key, value in fields.items():
+                if self.values.get(key, MISSING) != value:
+                    self.values[key] = value
+                    self.version += 1
+
+    def remove(self, *keys):
+        with self.lock:
+            for key in keys:
+                if self.values.pop(key, MISSING) is not MISSING:
+                    self.version += 1
+
+    def snapshot(self):
+        """(version, copy of the values)"""
+        with self.lock:
+            return self.version, dict(self.values)
+
+
+class TelemetryClient:
+    """Server-side state of one connected client"""
+
+    def __init__(self, writer, rate_hz, peer):
+        self.writer = writer
+        self.rate_hz = rate_hz
+        self.peer = peer
+        self.task = None  # Connection handler task
+        self.sent_values = None  # State as last sent to this client
+        self.sent_version = -1
+        self.seq = 0
+        self.messages_sent = 0
+        self.updates_skipped = 0  # Ticks skipped because the client was not reading
+
+
+class TelemetryServer:
+    """asyncio WebSocket server streaming a TelemetryState to its clients"""
+
+    def __init__(self, state=None, host=TELEMETRY_HOST, port=TELEMETRY_PORT,
+                 default_rate_hz=TELEMETRY_DEFAULT_RATE_HZ, max_rate_hz=TELEMETRY_MAX_RATE_HZ,
+                 max_clients=TELEMETRY_MAX_CLIENTS, max_client_buffer=TELEMETRY_MAX_CLIENT_BUFFER):
+        self.state = state or TelemetryState()
+        self.host = host
+        self.port = port
+        self.default_rate_hz = default_rate_hz
+        self.max_rate_hz = max_rate_hz
+        self.max_clients = max_clients
+        self.max_client_buffer = max_client_buffer
+        self.clients = set()
+        self.server = None
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        if self.port == 0:
+            self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve(self):
+        """Start the server and run until cancelled"""
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def close(self):
+        for client in list(self.clients):
+            client.task.cancel()
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def handshake(self, reader, writer):
+        """Read the HTTP upgrade request; returns the query parameters, or None if rejected"""
+        request = await reader.readuntil(b'\r\n\r\n')
+        if len(request) > MAX_HANDSHAKE_SIZE:
+            return None
+        lines = request.decode('latin-1').split('\r\n')
+        try:
+            method, target, _ = lines[0].split(' ', 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+        key = headers.get('sec-websocket-key')
+        if method != 'GET' or headers.get('upgrade', '').lower() != 'websocket' or not key:
+            writer.write(b"HTTP/1.1 426 Upgrade Required\r\nUpgrade: websocket\r\nContent-Length: 0\r\n\r\n")
+            return None
+        if len(self.clients) >= self.max_clients:
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+            return None
+
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                      "Upgrade: websocket\r\n"
+                      "Connection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {websocket_accept_key(key)}\r\n\r\n").encode())
+        return parse_qs(urlsplit(target).query)
+
+    def client_rate(self, query):
+        try:
+            rate = float(query.get('rate', [self.default_rate_hz])[0])
+        except ValueError:
+            rate = self.default_rate_hz
+        return min(max(rate, 0.1), self.max_rate_hz)
+
+    async def handle_connection(self, reader, writer):
+        try:
+            query = await self.handshake(reader, writer)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            query = None
+        if query is None:
+            writer.close()
+            return
+
+        # Keep the kernel buffer small too, so a client that stops reading is noticed
+        # after max_client_buffer bytes rather than after megabytes of stale updates
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, self.max_client_buffer)
+
+        client = TelemetryClient(writer, self.client_rate(query), writer.get_extra_info('peername'))
+        client.task = asyncio.current_task()
+        self.clients.add(client)
+        sender = asyncio.ensure_future(self.send_loop(client))
+        try:
+            await self.receive_loop(reader, client)
+        except asyncio.CancelledError:
+            # Server is closing; this is the top of the connection task
+            pass
+        finally:
+            sender.cancel()
+            self.clients.discard(client)
+            writer.close()
+
+    async def receive_loop(self, reader, client):
+        """Handle control frames; a text frame {"rate": N} changes the client's rate"""
+        while True:
+            try:
+                opcode, payload = await read_frame(reader, MAX_CLIENT_FRAME_SIZE)
+            except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+                return
+            if opcode == OPCODE_CLOSE:
+                if not client.writer.is_closing():
+                    client.writer.write(encode_frame(OPCODE_CLOSE, payload[:2]))
+                return
+            elif opcode == OPCODE_PING:
+                client.writer.write(encode_frame(OPCODE_PONG, payload))
+            elif opcode == OPCODE_TEXT:
+                try:
+                    message = json.loads(payload)
+                    client.rate_hz = self.client_rate({'rate': [message['rate']]})
+                except (ValueError, TypeError, KeyError):
+                    pass
+
+    async def send_loop(self, client):
+        while not client.writer.is_closing():
+            self.send_update(client)
+            await asyncio.sleep(1.0 / client.rate_hz)
+
+    def send_update(self, client):
+        """Send the changes since the last message to this client, unless it is not keeping up"""
+        version, values = self.state.snapshot()
+        if version == client.sent_version:
+            return
+        if client.writer.transport.get_write_buffer_size() > self.max_client_buffer:
+            # Don't queue stale updates; the next delta will cover what this one would have
+            client.updates_skipped += 1
+            return
+
+        if client.sent_values is None:
+            message = {'type': 'snapshot', 'data': values}
+        else:
+            delta = compute_delta(client.sent_values, values)
+            client.sent_version = version
+            if not delta:
+                return
+            message = {'type': 'delta', 'data': delta}
+
+        client.seq += 1
+        message['seq'] = client.seq
+        message['time'] = time.time()
+        client.writer.write(encode_frame(OPCODE_TEXT, json.dumps(message, separators=(',', ':')).encode()))
+        client.sent_values = values
+        client.sent_version = version
+        client.messages_sent += 1
+
+
+class TelemetryClientStub:
+    """
+    Minimal WebSocket client that rebuilds the telemetry state from the stream.
+    Used to check the server without a browser.
+    """
+
+    def __init__(self):
+        self.reader = None
+        self.writer = None
+        self.values = {}
+        self.last_seq = 0
+        self.messages = 0
+
+    async def connect(self, host=TELEMETRY_HOST, port=TELEMETRY_PORT, rate_hz=None):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        key = base64.b64encode(os.urandom(16)).decode()
+        path = "/" if rate_hz is None else f"/?rate={rate_hz}"
+        self.writer.write((f"GET {path} HTTP/1.1\r\nHost: {host}:{port}\r\n"
+                           "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                           f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+        response = (await self.reader.readuntil(b'\r\n\r\n')).decode('latin-1')
+        if " 101 " not in response.split('\r\n')[0] or websocket_accept_key(key) not in response:
+            raise ConnectionError(f"WebSocket handshake failed: {response.splitlines()[0]}")
+
+    async def receive(self):
+        """Wait for the next telemetry message, apply it and return it"""
+        while True:
+            opcode, payload = await read_frame(self.reader, 1 << 24)
+            if opcode == OPCODE_PING:
+                self.writer.write(encode_frame(OPCODE_PONG, payload, mask=True))
+            elif opcode == OPCODE_CLOSE:
+                raise ConnectionError("Server closed the connection")
+            elif opcode == OPCODE_TEXT:
+                message = json.loads(payload)
+                if message['type'] == 'snapshot':
+                    self.values = dict(message['data'])
+                else:
+                    for key, value in message['data'].items():
+                        if value is None:
+                            self.values.pop(key, None)
+                        else:
+                            self.values[key] = value
+                self.last_seq = message['seq']
+                self.messages += 1
+                return message
+
+    def set_rate(self, rate_hz):
+        self.writer.write(encode_frame(OPCODE_TEXT, json.dumps({'rate': rate_hz}).encode(), mask=True))
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.write(encode_frame(OPCODE_CLOSE, struct.pack('>H', 1000), mask=True))
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def publish_link_events(link, state):
+    """Keep a TelemetryState in step with an AsyncPalletizerLink"""
+    from palletizer.aio_link import (EVENT_CONNECTED, EVENT_DISCONNECTED, EVENT_ROW_STARTED,
+                                     EVENT_ROW_COMPLETED, EVENT_ROW_TIMEOUT)
+    from palletizer.motion import parse_targets
+
+    state.update(connected=link.is_connected)
+    async for event in link.events():
+        if event.kind == EVENT_CONNECTED:
+            state.update(connected=True)
+        elif event.kind == EVENT_DISCONNECTED:
+            state.update({'connected': False, 'state': "Disconnected"})
+        elif event.kind == EVENT_ROW_STARTED:
+            state.update({'state': "Running", 'row.command': event.data,
+                          'row.started': time.time()})
+        elif event.kind == EVENT_ROW_COMPLETED:
+            state.update({f"positions.{axis}": position
+                          for axis, position in parse_targets(event.data.command).items()})
+            state.update({'row.elapsed_s': round(event.data.elapsed_s, 3),
+                          'row.estimated_s': round(event.data.estimated_s, 3)})
+        elif event.kind == EVENT_ROW_TIMEOUT:
+            state.update({'state': "Stalled", 'alarm': str(event.data)})
+
+
+async def run_demo(args):
+    import yaml
+    from palletizer.aio_link import AsyncPalletizerLink
+
+    with open(args.sequence, 'r') as f:
+        rows = (yaml.safe_load(f) or {}).get('rows', [])
+
+    server = TelemetryServer(host=args.host, port=args.port)
+    await server.start()
+    print(f"Telemetry on ws://{server.host}:{server.port}/")
+
+    port_factory = None
+    if args.simulate:
+        from palletizer.simulated_serial import SimulatedSerialPort, SimulatedMasterDevice
+
+        def simulated_port(port, baudrate):
+            return SimulatedSerialPort(SimulatedMasterDevice(args.time_scale), baudrate)
+
+        port_factory = simulated_port
+
+    link = AsyncPalletizerLink(port_factory)
+    publisher = asyncio.ensure_future(publish_link_events(link, server.state))
+    await link.open("sim://" if args.simulate else args.serial_port, args.baud)
+    server.state.update({'row.total': len(rows)})
+    cycle = 0
+    while True:
+        cycle += 1
+        server.state.update(cycle=cycle)
+        for index, row in enumerate(rows):
+            server.state.update({'row.index': index})
+            await link.run_row(", ".join(row.values()))
+        if args.once:
+            break
+    server.state.update(state="Idle")
+    await asyncio.sleep(0.5)
+    publisher.cancel()
+    link.close()
+    await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Telemetry WebSocket server demo")
+    parser.add_argument('--host', default=TELEMETRY_HOST)
+    parser.add_argument('--port', type=int, default=TELEMETRY_PORT)
+    parser.add_argument('serial_port', nargs='?', help="Serial port or pyserial URL of the machine")
+    parser.add_argument('--baud', type=int, default=DEFAULT_BAUDRATE)
+    parser.add_argument('--simulate', action='store_true', help="Stream a simulated machine instead of a real port")
+    parser.add_argument('--sequence', required=True, help="Sequence YAML file saved by the sequence panel")
+    parser.add_argument('--time-scale', type=float, default=0.2, help="Simulated motion time scale")
+    parser.add_argument('--once', action='store_true', help="Stop after one cycle instead of repeating")
+    args = parser.parse_args()
+    if not args.simulate and not args.serial_port:
+        parser.error("give the serial port of the machine, or --simulate for a simulated one")
+    asyncio.run(run_demo(args))
+
+
+if __name__ == "__main__":
+    main()
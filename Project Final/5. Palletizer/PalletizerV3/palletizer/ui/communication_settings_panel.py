@@ -20,7 +20,7 @@ class CommunicationSettingsPanel(QWidget):
             'RESUME': 'RESUME',
             'RESET': 'RESET',
             'SPEED_FORMAT': 'SPEED;{};{}',
-            'COMPLETE_FEEDBACK': 'ALL_SLAVES_COMPLETED'
+            'COMPLETE_FEEDBACK': COMPLETE_FEEDBACK
         }
 
         self.setup_ui()
@@ -189,7 +189,7 @@ class CommunicationSettingsPanel(QWidget):
         self.command_inputs["RESUME"].setText(CMD_RESUME)
         self.command_inputs["RESET"].setText(CMD_RESET)
         self.speed_format_input.setText(CMD_SPEED_FORMAT)
-        self.complete_feedback_input.setText("ALL_SLAVES_COMPLETED")
+        self.complete_feedback_input.setText(COMPLETE_FEEDBACK)
 
         self.update_command_settings()
 
@@ -224,7 +224,7 @@ class CommunicationSettingsPanel(QWidget):
             self.command_inputs["RESUME"].setText(CMD_RESUME)
             self.command_inputs["RESET"].setText(CMD_RESET)
             self.speed_format_input.setText(CMD_SPEED_FORMAT)
-            self.complete_feedback_input.setText("ALL_SLAVES_COMPLETED")
+            self.complete_feedback_input.setText(COMPLETE_FEEDBACK)
 
             self.update_command_settings()
             self.config_updated.emit()
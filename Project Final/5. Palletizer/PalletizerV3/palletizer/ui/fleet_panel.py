@@ -0,0 +1,161 @@
+import time
+from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
+                             QLabel, QPushButton, QTableWidget, QTableWidgetItem,
+                             QTextEdit, QHeaderView, QAbstractItemView)
+from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QColor
+
+from palletizer.machine import (STATE_RUNNING, STATE_IDLE, STATE_PAUSED, STATE_STALLED,
+                                STATE_RECONNECTING, STATE_ERROR)
+from palletizer.utils.config import WINDOW_TITLE, WINDOW_GEOMETRY, FLEET_REFRESH_MS
+from palletizer.utils.loop_monitor import LOOP_MONITOR
+
+FLEET_COLUMNS = ["Machine", "Port", "State", "Row", "Rows/min", "Rows", "Cycles", "Alarms", "Last Alarm"]
+
+STATE_COLORS = {
+    STATE_RUNNING: "#e0ffe0",
+    STATE_IDLE: "#e0e0ff",
+    STATE_PAUSED: "#ffffcc",
+    STATE_RECONNECTING: "#ffe0b0",
+    STATE_STALLED: "#ffd0d0",
+    STATE_ERROR: "#ffd0d0",
+}
+
+
+class FleetPanel(QWidget):
+    """Panel untuk memantau dan mengendalikan beberapa palletizer sekaligus"""
+
+    def __init__(self, machines, parent=None):
+        super().__init__(parent)
+        self.machines = machines
+
+        self.setup_ui()
+
+        for machine in self.machines:
+            machine.alarm.connect(self.on_alarm)
+
+        # The table is refreshed on a timer instead of on every event, so a busy link can't flood the GUI
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(FLEET_REFRESH_MS)
+        self.refresh()
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+        layout.setSpacing(5)
+
+        # Fleet controls; actions apply to the selected machines, or to all when none are selected
+        control_layout = QHBoxLayout()
+        for text, handler in [("Connect", lambda m: m.connect_link()),
+                              ("Disconnect", lambda m: m.disconnect_link()),
+                              ("Start", lambda m: m.start()),
+                              ("Pause", lambda m: m.pause()),
+                              ("Resume", lambda m: m.resume()),
+                              ("Reset", lambda m: m.reset())]:
+            button = QPushButton(text)
+            button.clicked.connect(lambda checked, h=handler: self.apply_to_selected(h))
+            control_layout.addWidget(button)
+        control_layout.addStretch()
+        self.selection_label = QLabel("Actions apply to all machines")
+        control_layout.addWidget(self.selection_label)
+        layout.addLayout(control_layout)
+
+        # Machine summary table
+        self.table = QTableWidget(len(self.machines), len(FLEET_COLUMNS))
+        self.table.setHorizontalHeaderLabels(FLEET_COLUMNS)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.itemSelectionChanged.connect(self.on_selection_changed)
+        for row in range(len(self.machines)):
+            for column in range(len(FLEET_COLUMNS)):
+                self.table.setItem(row, column, QTableWidgetItem())
+        layout.addWidget(self.table, 2)
+
+        # Alarm log for all machines
+        alarm_group = QGroupBox("Alarms")
+        alarm_layout = QVBoxLayout()
+        self.alarm_text = QTextEdit()
+        self.alarm_text.setReadOnly(True)
+        alarm_layout.addWidget(self.alarm_text)
+        alarm_group.setLayout(alarm_layout)
+        layout.addWidget(alarm_group, 1)
+
+    def selected_machines(self):
+        rows = sorted({index.row() for index in self.table.selectionModel().selectedRows()})
+        if not rows:
+            return self.machines
+        return [self.machines[row] for row in rows]
+
+    def apply_to_selected(self, handler):
+        for machine in self.selected_machines():
+            handler(machine)
+        self.refresh()
+
+    def on_selection_changed(self):
+        count = len(self.table.selectionModel().selectedRows())
+        if count:
+            self.selection_label.setText(f"Actions apply to {count} selected machine(s)")
+        else:
+            self.selection_label.setText("Actions apply to all machines")
+
+    def refresh(self):
+        """Update the summary table from each machine's current state"""
+        for row, machine in enumerate(self.machines):
+            summary = machine.summary()
+            values = [summary['name'], summary['port'], summary['state'], summary['row'],
+                      f"{summary['rows_per_min']:.1f}", str(summary['rows_completed']),
+                      str(summary['cycles_completed']), str(summary['alarm_count']),
+                      summary['last_alarm']]
+            color = QColor(STATE_COLORS.get(summary['state'], "#f0f0f0"))
+            for column, value in enumerate(values):
+                item = self.table.item(row, column)
+                if item.text() != value:
+                    item.setText(value)
+                if column == 2:
+                    item.setBackground(color)
+
+    def on_alarm(self, name, message):
+        timestamp = time.strftime("%H:%M:%S")
+        self.alarm_text.append(f"<span style='color:red'>[{timestamp}] {name}: {message}</span>")
+
+    def on_stall(self, stall):
+        self.on_alarm("GUI", LOOP_MONITOR.describe_stall(stall))
+
+    def shutdown(self):
+        self.refresh_timer.stop()
+        for machine in self.machines:
+            machine.shutdown()
+
+
+class FleetWindow(QMainWindow):
+    """Window for the fleet view, used when the application is started with --fleet"""
+
+    def __init__(self, machines):
+        super().__init__()
+        self.setWindowTitle(f"{WINDOW_TITLE} - Fleet ({len(machines)} machines)")
+        self.setGeometry(*WINDOW_GEOMETRY)
+
+        self.fleet_panel = FleetPanel(machines)
+        self.setCentralWidget(self.fleet_panel)
+        self.statusBar().showMessage("Ready")
+
+        if LOOP_MONITOR.diagnostics:
+            LOOP_MONITOR.add_stall_listener(self.fleet_panel.on_stall)
+            LOOP_MONITOR.start(self)
+
+    def report_startup_time(self, start_time):
+        """Report the time from process start until the window is up and the event loop runs"""
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        message = f"Startup completed in {elapsed_ms:.0f} ms"
+        print(message)
+        self.statusBar().showMessage(message)
+
+    def closeEvent(self, event):
+        """Stop every machine's link thread"""
+        self.fleet_panel.shutdown()
+        LOOP_MONITOR.stop()
+        event.accept()
@@ -0,0 +1,39 @@
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QLabel
+from PyQt5.QtCore import Qt, pyqtSignal
+
+
+class LazyPanel(QWidget):
+    """
+    Lightweight placeholder tab that constructs the real panel on first use.
+    The factory is only called (and its imports only loaded) when load() runs.
+    """
+    loaded = pyqtSignal(QWidget)  # Emits the real panel once it has been created
+
+    def __init__(self, factory, placeholder_text="Loading...", parent=None):
+        super().__init__(parent)
+        self.factory = factory
+        self.widget = None
+
+        self.layout = QVBoxLayout(self)
+        self.layout.setContentsMargins(0, 0, 0, 0)
+
+        self.placeholder = QLabel(placeholder_text)
+        self.placeholder.setAlignment(Qt.AlignCenter)
+        self.placeholder.setStyleSheet("background-color: #f0f0f0; color: #666666;")
+        self.layout.addWidget(self.placeholder)
+
+    def is_loaded(self):
+        """Check whether the real panel has been created"""
+        return self.widget is not None
+
+    def load(self):
+        """Create the real panel if needed and return it"""
+        if self.widget is None:
+            self.widget = self.factory()
+            self.layout.removeWidget(self.placeholder)
+            self.placeholder.deleteLater()
+            self.placeholder = None
+            self.layout.addWidget(self.widget)
+            self.loaded.emit(self.widget)
+
+        return self.widget
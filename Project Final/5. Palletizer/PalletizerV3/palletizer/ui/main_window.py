@@ -1,17 +1,24 @@
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
                              QLabel, QPushButton, QComboBox, QTabWidget,
                              QMessageBox, QScrollArea, QGridLayout, QSizePolicy)
-from PyQt5.QtCore import Qt
-import serial.tools.list_ports
+from PyQt5.QtCore import Qt, QTimer
+import time
 
 from palletizer.serial_communicator import SerialCommunicator
+from palletizer.port_worker import PortWorker
 from palletizer.ui.slave_control_panel import SlaveControlPanel
 from palletizer.ui.sequence import SequencePanel
+from palletizer.ui.sequence.sequence_file_operations import SequenceFileManager
 from palletizer.ui.monitor_panel import MonitorPanel
 from palletizer.ui.position_tracker import PositionTracker
-from palletizer.ui.visualization_panel import VisualizationPanel
+from palletizer.ui.lazy_panel import LazyPanel
 from palletizer.ui.communication_settings_panel import CommunicationSettingsPanel  # Import the new settings panel
+from palletizer.position_history import PositionHistory
+from palletizer.pallet_load import PalletLoad
 from palletizer.utils.config import *
+from palletizer.utils.startup_profiler import PROFILER
+from palletizer.utils.metrics import METRICS
+from palletizer.utils.loop_monitor import LOOP_MONITOR
 
 
 class PalletizerControlApp(QMainWindow):
@@ -19,10 +26,30 @@ class PalletizerControlApp(QMainWindow):
 
     def __init__(self):
         super().__init__()
-        self.serial_thread = SerialCommunicator()
+        if SERIAL_LINK_PROCESS:
+            from palletizer.link_process import ProcessSerialCommunicator
+            self.serial_thread = ProcessSerialCommunicator()
+        else:
+            self.serial_thread = SerialCommunicator()
+        self.port_worker = PortWorker()
         self.available_ports = []
         self.slave_panels = {}
 
+        # 3D visualization is created on first activation of its tab
+        self.visualization_panel = None
+
+        # Boxes put down on the pallet; kept here so placements count before the 3D tab is opened
+        self.pallet_load = PalletLoad()
+
+        # Telemetry WebSocket server, started in init_connections when enabled
+        self.telemetry = None
+        self.telemetry_task = None
+
+        # Position history: the recorder is started in init_connections, the plot tab is built on first use
+        self.position_recorder = None
+        self.position_history = PositionHistory() if POSITION_HISTORY_ENABLED else None
+        self.history_tab = None
+
         # Initialize position tracker
         self.position_tracker = PositionTracker(self)
 
@@ -34,18 +61,26 @@ class PalletizerControlApp(QMainWindow):
             'RESUME': CMD_RESUME,
             'RESET': CMD_RESET,
             'SPEED_FORMAT': CMD_SPEED_FORMAT,
-            'COMPLETE_FEEDBACK': 'ALL_SLAVES_COMPLETED'
+            'COMPLETE_FEEDBACK': COMPLETE_FEEDBACK
         }
 
-        self.setup_ui()
-        self.init_connections()
+        # Functions that run inside many slots are timed on their own in stall diagnostics
+        LOOP_MONITOR.instrument_method(MonitorPanel, 'add_log')
+        LOOP_MONITOR.instrument_method(SlaveControlPanel, 'update_status')
+        LOOP_MONITOR.instrument_method(SequenceFileManager, 'load_sequence_from_file')
+
+        with PROFILER.phase("setup_ui"):
+            self.setup_ui()
+        with PROFILER.phase("init_connections"):
+            self.init_connections()
 
     def setup_ui(self):
         self.setWindowTitle(WINDOW_TITLE)
         self.setGeometry(*WINDOW_GEOMETRY)
 
         # Set window to start maximized
-        self.showMaximized()
+        with PROFILER.phase("showMaximized"):
+            self.showMaximized()
 
         # Main widget and layout
         central_widget = QWidget()
@@ -60,7 +95,8 @@ class PalletizerControlApp(QMainWindow):
 
         connection_layout.addWidget(QLabel("Port:"))
         self.port_combo = QComboBox()
-        self.refresh_ports()
+        with PROFILER.phase("Port enumeration"):
+            self.refresh_ports()
         connection_layout.addWidget(self.port_combo)
 
         connection_layout.addWidget(QLabel("Baudrate:"))
@@ -99,7 +135,8 @@ class PalletizerControlApp(QMainWindow):
 
         # Create control panels for each slave
         for i, slave_id in enumerate(SLAVE_IDS):
-            panel = SlaveControlPanel(slave_id)
+            with PROFILER.phase(f"SlaveControlPanel {slave_id.upper()}"):
+                panel = SlaveControlPanel(slave_id)
             self.slave_panels[slave_id] = panel
             row, col = divmod(i, 3)  # 3 panels per row
             control_layout.addWidget(panel, row, col)
@@ -120,25 +157,38 @@ class PalletizerControlApp(QMainWindow):
         self.tab_widget.addTab(slave_scroll, "Individual Control")
 
         # Sequence control panel
-        self.sequence_panel = SequencePanel()
+        with PROFILER.phase("SequencePanel"):
+            self.sequence_panel = SequencePanel()
         self.sequence_panel.sequence_command.connect(self.handle_sequence_command)
         self.sequence_panel.global_command.connect(self.handle_global_command)
+        self.sequence_panel.row_timeout.connect(self.on_row_timeout)
+        self.row_watchdog = self.sequence_panel.sequence_executor.watchdog
+        self.row_watchdog.set_position_source(self.position_tracker.get_all_positions)
         self.tab_widget.addTab(self.sequence_panel, "Sequence Control")
 
-        # Visualization panel (NEW)
-        self.visualization_panel = VisualizationPanel()
-        self.tab_widget.addTab(self.visualization_panel, "3D Visualization")
+        # Visualization panel - NumPy, pyqtgraph and PyOpenGL are only loaded when the tab is opened
+        self.visualization_tab = LazyPanel(self.create_visualization_panel,
+                                           "3D visualization will load when this tab is opened")
+        self.tab_widget.addTab(self.visualization_tab, "3D Visualization")
 
         # Monitor panel
-        self.monitor_panel = MonitorPanel()
+        with PROFILER.phase("MonitorPanel"):
+            self.monitor_panel = MonitorPanel()
         self.monitor_panel.send_command.connect(self.handle_manual_command)
         self.tab_widget.addTab(self.monitor_panel, "Monitor")
 
         # Communication settings panel (NEW)
-        self.comm_settings_panel = CommunicationSettingsPanel(self)
+        with PROFILER.phase("CommunicationSettingsPanel"):
+            self.comm_settings_panel = CommunicationSettingsPanel(self)
         self.comm_settings_panel.config_updated.connect(self.on_comm_settings_updated)
         self.tab_widget.addTab(self.comm_settings_panel, "Communication Settings")
 
+        # Position history plot - pyqtgraph is only loaded when the tab is opened
+        if self.position_history is not None:
+            self.history_tab = LazyPanel(self.create_position_history_panel,
+                                         "Position history will load when this tab is opened")
+            self.tab_widget.addTab(self.history_tab, "Position History")
+
         # Add main components to layout
         main_layout.addLayout(connection_layout)
         main_layout.addWidget(self.tab_widget)
@@ -146,10 +196,47 @@ class PalletizerControlApp(QMainWindow):
         # Setup status bar
         self.statusBar().showMessage("Ready")
 
+    def create_visualization_panel(self):
+        """Import and construct the 3D visualization panel"""
+        from palletizer.ui.visualization_panel import VisualizationPanel
+        from palletizer.ui.visualization.model_controls import ModelController
+        LOOP_MONITOR.instrument_method(ModelController, 'update_visualization')
+
+        start = time.perf_counter()
+        self.visualization_panel = VisualizationPanel(pallet_load=self.pallet_load)
+        self.visualization_panel.dry_run.set_sequence_source(lambda: self.sequence_panel.row_manager.sequence_rows)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.monitor_panel.add_log(f"3D visualization loaded in {elapsed_ms:.0f} ms", "INFO")
+        return self.visualization_panel
+
+    def create_position_history_panel(self):
+        """Import and construct the position history plot"""
+        from palletizer.ui.position_history_panel import PositionHistoryPanel
+        return PositionHistoryPanel(self.position_history)
+
+    def report_startup_time(self, start_time):
+        """Report the time from process start until the window is up and the event loop runs"""
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        message = f"Startup completed in {elapsed_ms:.0f} ms"
+        print(message)
+        self.monitor_panel.add_log(message, "INFO")
+        self.statusBar().showMessage(message)
+
     def init_connections(self):
         # Connect serial thread signals
         self.serial_thread.data_received.connect(self.handle_received_data)
         self.serial_thread.connection_status.connect(self.update_connection_status)
+        self.serial_thread.priority_sent.connect(self.on_priority_sent)
+        self.serial_thread.link_lost.connect(self.on_link_lost)
+        self.serial_thread.reconnecting.connect(self.on_reconnecting)
+        self.serial_thread.link_restored.connect(self.on_link_restored)
+        self.serial_thread.reconnect_failed.connect(self.on_reconnect_failed)
+
+        # Resume interrupted runs after a reconnect
+        executor = self.sequence_panel.sequence_executor
+        executor.run_interrupted.connect(self.on_run_interrupted)
+        executor.run_resumed.connect(self.on_run_resumed)
+        executor.resume_confirming.connect(self.on_resume_confirming)
 
         # Connect position tracker signals
         self.position_tracker.position_updated.connect(self.on_tracker_position_updated)
@@ -157,15 +244,145 @@ class PalletizerControlApp(QMainWindow):
         # Connect tab change signal to update positions
         self.tab_widget.currentChanged.connect(self.on_tab_changed)
 
-        # Start the thread
+        # Connect port worker signals
+        self.port_worker.ports_updated.connect(self.on_ports_updated)
+        self.port_worker.port_opened.connect(self.on_port_opened)
+        self.port_worker.port_open_failed.connect(self.on_port_open_failed)
+
+        if POSITION_STORE_ENABLED or self.position_history is not None:
+            self.start_position_recorder()
+
+        # Start the threads
         self.serial_thread.start()
+        self.port_worker.start()
+
+        if TELEMETRY_ENABLED:
+            self.start_telemetry()
+        if METRICS_ENABLED or LOOP_MONITOR.diagnostics:
+            LOOP_MONITOR.add_stall_listener(self.on_gui_stall)
+            LOOP_MONITOR.start(self)
+        if METRICS_ENABLED:
+            self.start_metrics()
+
+    def start_position_recorder(self):
+        """Follow confirmed positions and machine state for the history plot and the position store"""
+        from palletizer.position_recorder import PositionRecorder
+
+        sinks = []
+        if self.position_history is not None:
+            sinks.append(self.position_history)
+        if POSITION_STORE_ENABLED:
+            from palletizer.position_store import PositionStore
+            sinks.append(PositionStore(POSITION_STORE_DIR))
+            self.monitor_panel.add_log(f"Recording position history to {POSITION_STORE_DIR}", "INFO")
+
+        # Lines are only queued on the link thread; the recorder parses them on its own thread
+        self.position_recorder = PositionRecorder(sinks)
+        self.serial_thread.add_line_listener(self.position_recorder.on_line)
+
+    def record_command(self, command):
+        """Give a sent command to the position history recorder"""
+        if self.position_recorder is not None:
+            self.position_recorder.on_sent(command)
+
+    def start_telemetry(self):
+        """Serve positions, machine state and row progress over WebSocket from the Qt event loop"""
+        from PyQt5.QtWidgets import QApplication
+        from palletizer.aio_link import install_qt_event_loop
+        from palletizer.telemetry_server import TelemetryServer
+
+        loop = install_qt_event_loop(QApplication.instance())
+        self.telemetry = TelemetryServer()
+        self.telemetry.state.update({f"positions.{axis_id}": position
+                                     for axis_id, position in self.position_tracker.get_all_positions().items()})
+        self.telemetry.state.update({'connected': False, 'state': "Disconnected"})
+        self.telemetry_task = loop.create_task(self.telemetry.serve())
+        self.monitor_panel.add_log(f"Telemetry on ws://{TELEMETRY_HOST}:{TELEMETRY_PORT}/", "INFO")
+
+    def start_metrics(self):
+        """Status bar summary, periodic JSON dump and the scrape endpoint"""
+        self.metrics_label = QLabel()
+        self.statusBar().addPermanentWidget(self.metrics_label)
+        self.metrics_timer = QTimer(self)
+        self.metrics_timer.timeout.connect(self.update_metrics_summary)
+        self.metrics_timer.start(METRICS_STATUS_INTERVAL_MS)
+
+        if METRICS_DUMP_PATH:
+            self.metrics_dump_timer = QTimer(self)
+            self.metrics_dump_timer.timeout.connect(lambda: METRICS.dump_json(METRICS_DUMP_PATH))
+            self.metrics_dump_timer.start(int(METRICS_DUMP_INTERVAL_S * 1000))
+
+        if METRICS_HTTP_ENABLED:
+            from PyQt5.QtWidgets import QApplication
+            from palletizer.aio_link import install_qt_event_loop
+            from palletizer.utils.metrics import MetricsHttpServer
+
+            loop = install_qt_event_loop(QApplication.instance())
+            self.metrics_server = MetricsHttpServer(METRICS, METRICS_HTTP_HOST, METRICS_HTTP_PORT)
+            self.metrics_server_task = loop.create_task(self.metrics_server.serve())
+            self.monitor_panel.add_log(f"Metrics on http://{METRICS_HTTP_HOST}:{METRICS_HTTP_PORT}/metrics", "INFO")
+
+    def on_gui_stall(self, stall):
+        """Log a GUI stall found by the loop monitor; its full stack goes to the stall report"""
+        self.monitor_panel.add_log(LOOP_MONITOR.describe_stall(stall), "ERROR")
+        if stall['slots']:
+            self.monitor_panel.add_log("Slots: " + " > ".join(stall['slots']), "ERROR")
+
+    def update_metrics_summary(self):
+        """Show line rates, queue depth, row latency and GUI lag in the status bar"""
+        METRICS.sample_rates()
+        parts = [f"RX {METRICS.rate('palletizer_serial_rx_lines_total'):.1f}/s",
+                 f"TX {METRICS.rate('palletizer_serial_tx_lines_total'):.1f}/s"]
+
+        queue_depth = METRICS.find("palletizer_serial_tx_queue_depth")
+        if queue_depth is not None:
+            parts.append(f"Queue {queue_depth.collect()}")
+
+        row_latency = METRICS.find("palletizer_row_latency_seconds")
+        if row_latency is not None and row_latency.count:
+            parts.append(f"Row p50 {row_latency.quantile(0.5):.2f} s")
+
+        dropped = METRICS.total("palletizer_serial_dropped_lines_total")
+        if dropped:
+            parts.append(f"Dropped {dropped}")
+
+        parts.append(f"Lag p99 {LOOP_MONITOR.lag_metric.quantile(0.99) * 1000:.1f} ms")
+        if LOOP_MONITOR.stall_count:
+            parts.append(f"Stalls {LOOP_MONITOR.stall_count}")
+        self.metrics_label.setText("  |  ".join(parts))
+
+    def publish_telemetry(self, values):
+        """Update the telemetry state; only stores the values, clients are served from the event loop"""
+        if self.telemetry is not None:
+            self.telemetry.state.update(values)
+        # Machine state changes are also kept in the position history
+        if self.position_recorder is not None and 'state' in values:
+            self.position_recorder.set_state(values['state'])
 
     def refresh_ports(self):
+        """Request a port rescan; the list is filled in when the worker reports back"""
+        if not self.available_ports:
+            self.port_combo.clear()
+            self.port_combo.addItem("Scanning ports...")
+        self.port_worker.request_scan(force=True)
+
+    def on_ports_updated(self, ports):
+        """Fill the port list with the ports found by the port worker"""
+        devices = [port['device'] for port in ports]
+        if devices == self.available_ports and self.port_combo.count() == len(devices):
+            return
+
+        # Keep the current selection if the port is still present
+        current_port = self.port_combo.currentText()
+
         self.port_combo.clear()
-        self.available_ports = [port.device for port in serial.tools.list_ports.comports()]
-        if self.available_ports:
-            for port in self.available_ports:
-                self.port_combo.addItem(port)
+        self.available_ports = devices
+        if ports:
+            for port in ports:
+                self.port_combo.addItem(port['device'])
+                self.port_combo.setItemData(self.port_combo.count() - 1, port['description'], Qt.ToolTipRole)
+            if current_port in devices:
+                self.port_combo.setCurrentText(current_port)
         else:
             self.port_combo.addItem("No ports available")
 
@@ -184,27 +401,117 @@ class PalletizerControlApp(QMainWindow):
             port = self.port_combo.currentText()
             baudrate = int(self.baudrate_combo.currentText())
 
-            if self.serial_thread.connect(port, baudrate):
-                self.connect_btn.setText("Disconnect")
-                self.statusBar().showMessage(f"Connected to {port} at {baudrate} baud")
+            # Open the port on the worker thread so slow adapters don't freeze the window
+            self.serial_thread.cancel_reconnect()
+            self.connect_btn.setEnabled(False)
+            self.connect_btn.setText("Connecting...")
+            self.statusBar().showMessage(f"Connecting to {port}...")
+            if SERIAL_LINK_PROCESS:
+                # The port must be opened by the link process that uses it
+                self.serial_thread.request_connect(port, baudrate)
+            else:
+                self.port_worker.request_open(port, baudrate)
+
+    def on_port_opened(self, serial_port, port, baudrate):
+        """Handle a port opened by the port worker"""
+        self.serial_thread.attach(serial_port, port)
+        self.connect_btn.setEnabled(True)
+        self.connect_btn.setText("Disconnect")
+        self.statusBar().showMessage(f"Connected to {port} at {baudrate} baud")
+
+        # A run interrupted by a link drop resumes after a manual reconnect as well
+        self.sequence_panel.sequence_executor.on_link_restored()
+
+    def on_link_lost(self, error):
+        """Handle an unexpected link drop"""
+        self.monitor_panel.add_log(f"Link lost: {error}", "ERROR")
+        self.sequence_panel.sequence_executor.on_link_lost()
+
+    def on_reconnecting(self, attempt, delay):
+        """Show reconnect progress"""
+        self.statusBar().showMessage(f"Link lost - reconnect attempt {attempt} in {delay:.2f} s...")
+
+    def on_link_restored(self, port):
+        """Handle a link restored by the automatic reconnect"""
+        self.connect_btn.setText("Disconnect")
+        self.monitor_panel.add_log(f"Link restored on {port}", "INFO")
+        self.statusBar().showMessage(f"Reconnected to {port}")
+        self.sequence_panel.sequence_executor.on_link_restored()
+
+    def on_reconnect_failed(self, port):
+        """Handle giving up on the automatic reconnect"""
+        self.monitor_panel.add_log(f"Could not reconnect to {port}; connect manually to resume", "ERROR")
+        self.statusBar().showMessage(f"Reconnect to {port} failed")
+
+    def on_run_interrupted(self, row_index):
+        """Log where an interrupted run will continue"""
+        self.monitor_panel.add_log(f"Run interrupted; will resume from row {row_index + 1}", "INFO")
+
+    def on_resume_confirming(self, row_index):
+        """Log the state check before an interrupted run resumes"""
+        self.monitor_panel.add_log(f"Link back; sending row {row_index + 1} again to confirm the machine state", "INFO")
+
+    def on_run_resumed(self, row_index):
+        """Log a resumed run"""
+        self.monitor_panel.add_log(f"Resuming run from row {row_index + 1}", "INFO")
+
+    def on_port_open_failed(self, port, error):
+        """Handle a port that could not be opened"""
+        self.connect_btn.setEnabled(True)
+        self.update_connection_status(False, f"Error: {error}")
+        self.statusBar().showMessage(f"Failed to connect to {port}")
 
     def update_connection_status(self, connected, message):
+        self.connect_btn.setEnabled(True)
+        self.publish_telemetry({'connected': connected, 'state': "Idle" if connected else "Disconnected"})
         if connected:
             self.status_label.setText(f"Status: {message}")
             self.status_label.setStyleSheet("color: green; font-weight: bold;")
+            self.connect_btn.setText("Disconnect")
         else:
             self.status_label.setText(f"Status: {message}")
             self.status_label.setStyleSheet("color: red;")
             self.connect_btn.setText("Connect")
 
+    def send_serial_command(self, logical_command, command):
+        """Send a command, using the priority lane for safety and state commands"""
+        if logical_command in PRIORITY_COMMANDS:
+            flush_pending = logical_command == CMD_RESET and PRIORITY_FLUSH_ON_RESET
+            return self.serial_thread.send_priority_command(command, flush_pending=flush_pending)
+        return self.serial_thread.send_command(command)
+
+    def on_priority_sent(self, command, latency_ms):
+        """Log the command-to-wire latency of a priority command"""
+        self.monitor_panel.add_log(f"Priority command {command} on wire after {latency_ms:.2f} ms", "INFO")
+
+    def track_speed_command(self, command):
+        """Keep the row watchdog's motion estimate in step with SPEED;slave_id;value commands"""
+        parts = command.split(';')
+        if len(parts) == 3 and parts[0] == CMD_SPEED_FORMAT.split(';')[0]:
+            try:
+                self.row_watchdog.set_axis_speed(parts[1], int(parts[2]))
+            except ValueError:
+                pass
+
+    def on_row_timeout(self, event):
+        """Handle a row that did not complete before its predicted deadline"""
+        self.monitor_panel.add_log(str(event), "ERROR")
+        self.statusBar().showMessage(str(event))
+        self.publish_telemetry({'state': "Stalled", 'alarm': str(event)})
+
+        if ROW_WATCHDOG_AUTO_PAUSE:
+            self.handle_global_command(CMD_PAUSE)
+
     def handle_slave_command(self, command):
         """Handle commands from individual slave panels"""
         if self.serial_thread.is_connected:
-            self.serial_thread.send_command(command)
+            self.send_serial_command(command, command)
             self.monitor_panel.add_log(command, "TX")
+            self.track_speed_command(command)
 
             # Update position tracker with the command
             self.position_tracker.parse_command(command)
+            self.record_command(command)
 
     def handle_sequence_command(self, command):
         """Handle commands from sequence panel"""
@@ -214,6 +521,12 @@ class PalletizerControlApp(QMainWindow):
 
             # Update position tracker with the command
             self.position_tracker.parse_command(command)
+            self.record_command(command)
+
+            executor = self.sequence_panel.sequence_executor
+            self.publish_telemetry({'state': "Running", 'row.index': executor.current_sequence_index,
+                                    'row.total': len(self.sequence_panel.row_manager.sequence_rows),
+                                    'row.command': command})
 
     def handle_global_command(self, command):
         """Handle global commands like START, ZERO, PAUSE, etc."""
@@ -232,15 +545,31 @@ class PalletizerControlApp(QMainWindow):
             elif command == CMD_RESET:
                 translated_command = self.command_settings['RESET']
 
-            self.serial_thread.send_command(translated_command)
+            self.send_serial_command(command, translated_command)
             self.monitor_panel.add_log(f"Global command: {command} → {translated_command}", "TX")
             self.statusBar().showMessage(f"Sent global command: {translated_command}")
+            self.track_speed_command(translated_command)
+
+            # Hold the row deadline while the machine is paused
+            if command == CMD_PAUSE:
+                self.row_watchdog.pause()
+                self.publish_telemetry({'state': "Paused"})
+            elif command == CMD_RESUME:
+                self.row_watchdog.resume()
+                self.publish_telemetry({'state': "Running"})
+            elif command == CMD_RESET:
+                self.row_watchdog.cancel()
+                self.publish_telemetry({'state': "Idle", 'row.index': -1})
 
             # Handle ZERO command specially - reset positions
             if command == CMD_ZERO:
                 self.position_tracker.reset_all_positions()
                 # Also reset positions in visualization panel
-                self.visualization_panel.reset_all_positions()
+                if self.visualization_panel is not None:
+                    self.visualization_panel.reset_all_positions()
+                if self.position_recorder is not None:
+                    self.position_recorder.on_home()
+                self.pallet_load.forget_gripper()
                 self.monitor_panel.add_log("Position tracker: All positions reset to zero", "INFO")
 
     def handle_manual_command(self, command):
@@ -251,6 +580,7 @@ class PalletizerControlApp(QMainWindow):
 
             # Update position tracker with the command
             self.position_tracker.parse_command(command)
+            self.record_command(command)
 
     def on_position_changed(self, axis_id, position):
         """Handle position changes from UI operations"""
@@ -261,7 +591,8 @@ class PalletizerControlApp(QMainWindow):
         self.sequence_panel.update_position(axis_id, position)
 
         # Update the visualization panel
-        self.visualization_panel.update_position(axis_id, position)
+        if self.visualization_panel is not None:
+            self.visualization_panel.update_position(axis_id, position)
 
         # Log the update
         self.monitor_panel.add_log(f"Position update: {axis_id.upper()} to {position}", "INFO")
@@ -276,10 +607,19 @@ class PalletizerControlApp(QMainWindow):
         self.sequence_panel.update_position(axis_id, position)
 
         # Update visualization panel
-        self.visualization_panel.update_position(axis_id, position)
+        if self.visualization_panel is not None:
+            self.visualization_panel.update_position(axis_id, position)
+
+        self.publish_telemetry({f"positions.{axis_id}": position})
 
     def on_tab_changed(self, index):
         """Handle tab changed event"""
+        # Build the 3D visualization the first time its tab is opened
+        if index == 2:
+            self.visualization_tab.load()
+        elif self.history_tab is not None and self.tab_widget.widget(index) is self.history_tab:
+            self.history_tab.load()
+
         # When switching to the sequence or visualization panel, update all position displays
         if index == 1 or index == 2:  # Sequence Control or 3D Visualization tab
             for axis_id, position in self.position_tracker.get_all_positions().items():
@@ -288,6 +628,11 @@ class PalletizerControlApp(QMainWindow):
                 elif index == 2:
                     self.visualization_panel.update_position(axis_id, position)
 
+    def update_pallet_load(self):
+        """A row completed, so its positions are confirmed; a gripper opening in it put a box down"""
+        if self.pallet_load.update(self.position_tracker.get_all_positions()) and self.visualization_panel is not None:
+            self.visualization_panel.model_ctrl.pallet_load_changed()
+
     def handle_received_data(self, data):
         """Handle data received from serial port"""
         self.monitor_panel.add_log(data, "RX")
@@ -299,8 +644,13 @@ class PalletizerControlApp(QMainWindow):
 
             # Check for configured completion feedback and handle it
             if feedback_msg == self.command_settings['COMPLETE_FEEDBACK']:
+                # Before the next row is sent, while the tracker still holds the completed row
+                self.update_pallet_load()
+
                 # Notify the sequence panel that all slaves have completed
                 self.sequence_panel.handle_slave_completion()
+                if not self.sequence_panel.sequence_executor.sequence_execution_active:
+                    self.publish_telemetry({'state': "Idle", 'row.index': -1})
 
         # Determine message type and route to appropriate handler
         if data.startswith("[FEEDBACK]"):
@@ -311,12 +661,16 @@ class PalletizerControlApp(QMainWindow):
             # Format should be: [SLAVE] slave_id;message
             parts = data[7:].split(';', 1)
             if len(parts) >= 2:
-                slave_id = parts[0].lower()
+                slave_id = parts[0].strip().lower()
                 message = parts[1]
 
                 if slave_id in self.slave_panels:
                     self.slave_panels[slave_id].update_status(message)
 
+                # Per-axis completion for the row watchdog
+                if SLAVE_COMPLETED_MESSAGE in message:
+                    self.row_watchdog.axis_completed(slave_id)
+
     def on_set_global_speed(self):
         """Handle global speed setting"""
         speed_value = self.global_speed_spinbox.value()
@@ -337,8 +691,14 @@ class PalletizerControlApp(QMainWindow):
 
     def closeEvent(self, event):
         """Handle window close event"""
-        # Stop the serial thread properly
+        # Stop the serial and port threads properly
         self.serial_thread.stop()
+        self.port_worker.stop()
+        if self.position_recorder is not None:
+            self.position_recorder.close()
+        if self.telemetry_task is not None:
+            self.telemetry_task.cancel()
+        LOOP_MONITOR.stop()
         event.accept()
 
     def resizeEvent(self, event):
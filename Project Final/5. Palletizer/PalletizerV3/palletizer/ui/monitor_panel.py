@@ -72,6 +72,8 @@ class MonitorPanel(QWidget):
             formatted = f"<span style='color:blue'>[{timestamp}] TX: {message}</span>"
         elif direction == "RX":
             formatted = f"<span style='color:green'>[{timestamp}] RX: {message}</span>"
+        elif direction == "ERROR":
+            formatted = f"<span style='color:red'>[{timestamp}] ERROR: {message}</span>"
         else:
             formatted = f"<span style='color:black'>[{timestamp}] {message}</span>"
 
@@ -0,0 +1,136 @@
+"""
+Plot of the axis positions over time, drawn from the PositionHistory ring.
+"""
+import time
+
+import numpy as np
+import pyqtgraph as pg
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QComboBox, QCheckBox
+from PyQt5.QtCore import QTimer
+
+from ..utils.config import SLAVE_IDS, POSITION_HISTORY_REFRESH_MS
+
+AXIS_COLORS = {'x': (220, 50, 50), 'y': (40, 150, 40), 'z': (40, 80, 220), 't': (210, 140, 0), 'g': (140, 60, 180)}
+
+# Visible time span choices; None shows everything since the application started
+SPANS = [("1 min", 60), ("10 min", 600), ("1 hour", 3600), ("8 hours", 8 * 3600), ("All", None)]
+
+
+class PositionHistoryPanel(QWidget):
+    """
+    Positions of all axes over time. Each redraw asks the history for about one
+    min/max bucket per pixel of the visible range, so the cost does not depend
+    on how long the range is. While Follow is checked the range scrolls with
+    the current time; panning or zooming with the mouse stops following.
+    """
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.drawn_key = None
+
+        self.setup_ui()
+
+        # Coalesce range changes from panning and zooming into one redraw
+        self.redraw_timer = QTimer(self)
+        self.redraw_timer.setSingleShot(True)
+        self.redraw_timer.setInterval(30)
+        self.redraw_timer.timeout.connect(self.refresh)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh)
+        self.refresh_timer.start(POSITION_HISTORY_REFRESH_MS)
+
+    def setup_ui(self):
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(5, 5, 5, 5)
+        layout.setSpacing(5)
+
+        controls = QHBoxLayout()
+        controls.addWidget(QLabel("Span:"))
+        self.span_combo = QComboBox()
+        for label, _ in SPANS:
+            self.span_combo.addItem(label)
+        self.span_combo.setCurrentIndex(1)
+        self.span_combo.currentIndexChanged.connect(self.on_span_changed)
+        controls.addWidget(self.span_combo)
+
+        self.follow_check = QCheckBox("Follow")
+        self.follow_check.setChecked(True)
+        self.follow_check.toggled.connect(self.request_redraw)
+        controls.addWidget(self.follow_check)
+
+        controls.addStretch()
+        self.info_label = QLabel()
+        self.info_label.setStyleSheet("color: #666666;")
+        controls.addWidget(self.info_label)
+        layout.addLayout(controls)
+
+        self.plot = pg.PlotWidget(axisItems={'bottom': pg.DateAxisItem()})
+        self.plot.setBackground('w')
+        self.plot.showGrid(x=True, y=True, alpha=0.3)
+        self.plot.setLabel('left', "Position (steps)")
+        self.plot.addLegend()
+        self.curves = {
+            axis: self.plot.plot(name=axis.upper(), pen=pg.mkPen(AXIS_COLORS.get(axis, (0, 0, 0)), width=1))
+            for axis in SLAVE_IDS
+        }
+
+        view_box = self.plot.getViewBox()
+        view_box.sigRangeChangedManually.connect(self.on_range_changed_manually)
+        self.plot.sigXRangeChanged.connect(self.request_redraw)
+        layout.addWidget(self.plot)
+
+    def on_span_changed(self, index):
+        self.follow_check.setChecked(True)
+        self.request_redraw()
+
+    def on_range_changed_manually(self, *args):
+        # The user took over the view
+        self.follow_check.setChecked(False)
+
+    def request_redraw(self, *args):
+        if not self.redraw_timer.isActive():
+            self.redraw_timer.start()
+
+    def follow_range(self, now):
+        """Visible range when following the current time"""
+        span = SPANS[self.span_combo.currentIndex()][1]
+        if span is None:
+            first = self.history.first_time
+            return (first if first is not None and first < now else now - 60), now
+        return now - span, now
+
+    def refresh(self):
+        """Redraw the visible range if the history or the range changed"""
+        if not self.isVisible():
+            return
+
+        now = time.time()
+        if self.follow_check.isChecked():
+            start, end = self.follow_range(now)
+            self.plot.setXRange(start, end, padding=0)
+        else:
+            start, end = self.plot.getViewBox().viewRange()[0]
+
+        pixels = max(1, int(self.plot.getViewBox().width()))
+        key = (self.history.version, start, end, pixels)
+        if key == self.drawn_key:
+            return
+        self.drawn_key = key
+
+        times, values, source = self.history.decimated(start, end, pixels)
+        if times.size == 0:
+            for curve in self.curves.values():
+                curve.setData([], [])
+            self.info_label.setText("No position changes recorded yet")
+            return
+
+        # Positions hold until the next change, so extend the lines to now
+        if times[-1] < now:
+            times = np.append(times, min(now, max(end, times[-1])))
+            values = np.concatenate((values, values[:, -1:]), axis=1)
+
+        for index, axis in enumerate(SLAVE_IDS):
+            self.curves[axis].setData(times, values[index], skipFiniteCheck=True)
+        self.info_label.setText(f"{times.size} points per axis from {source}, {self.history.count} rows recorded")
@@ -0,0 +1,42 @@
+import time
+
+
+class RowJournal:
+    """
+    Records which rows of a run have been sent and acknowledged (all slaves
+    completed), so an interrupted run can resume from the first row that was
+    not completed. Rows are absolute positions, so sending a row again is safe.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.total_rows = 0
+        self.sent = {}          # row index -> time sent
+        self.acknowledged = {}  # row index -> time acknowledged
+        self.interruptions = 0
+
+    def start_run(self, total_rows):
+        """Start a new journal for a run of total_rows rows"""
+        self.clear()
+        self.total_rows = total_rows
+
+    def row_sent(self, row_index):
+        self.sent[row_index] = time.time()
+
+    def row_acknowledged(self, row_index):
+        self.acknowledged[row_index] = time.time()
+
+    def record_interruption(self):
+        self.interruptions += 1
+
+    def first_unacknowledged(self):
+        """Index of the first row that has not been acknowledged, or -1 if the run is complete"""
+        for row_index in range(self.total_rows):
+            if row_index not in self.acknowledged:
+                return row_index
+        return -1
+
+    def is_active(self):
+        return self.total_rows > 0
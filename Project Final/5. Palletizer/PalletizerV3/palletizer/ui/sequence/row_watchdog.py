@@ -0,0 +1,143 @@
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+from ...motion import estimate_row_durations, row_timeout
+from ...utils.config import (SLAVE_IDS, MOTION_DEFAULT_SPEED, ROW_WATCHDOG_ENABLED,
+                             ROW_WATCHDOG_MARGIN_RATIO, ROW_WATCHDOG_MARGIN_S,
+                             ROW_WATCHDOG_MIN_TIMEOUT_S)
+
+
+class RowTimeoutEvent:
+    """Raised by the RowWatchdog when a row does not complete before its deadline"""
+
+    def __init__(self, row_index, estimated_s, timeout_s, elapsed_s, pending_axes, completed_axes):
+        self.row_index = row_index            # -1 for commands that are not part of a row
+        self.estimated_s = estimated_s        # Predicted motion time of the slowest axis
+        self.timeout_s = timeout_s            # Deadline relative to the row start
+        self.elapsed_s = elapsed_s
+        self.pending_axes = pending_axes      # Axes that did not report completion
+        self.completed_axes = completed_axes
+
+    def __str__(self):
+        row = f"Row {self.row_index + 1}" if self.row_index >= 0 else "Command"
+        if self.pending_axes:
+            missing = "no completion from: " + ", ".join(axis.upper() for axis in self.pending_axes)
+        else:
+            missing = "all axes reported, no completion feedback from master"
+        return (f"{row} timed out after {self.elapsed_s:.1f} s "
+                f"(estimated {self.estimated_s:.1f} s, deadline {self.timeout_s:.1f} s); {missing}")
+
+
+class RowWatchdog(QObject):
+    """
+    Sets a deadline for each running row from the predicted motion time and
+    reports the axes that have not completed when the deadline passes.
+    """
+    row_timeout = pyqtSignal(object)  # RowTimeoutEvent
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.enabled = ROW_WATCHDOG_ENABLED
+        self.margin_ratio = ROW_WATCHDOG_MARGIN_RATIO
+        self.margin_s = ROW_WATCHDOG_MARGIN_S
+        self.min_timeout_s = ROW_WATCHDOG_MIN_TIMEOUT_S
+
+        self.position_source = None  # Callable returning the current axis positions
+        self.axis_speeds = {slave_id: MOTION_DEFAULT_SPEED for slave_id in SLAVE_IDS}
+
+        self.row_index = -1
+        self.started_at = None
+        self.estimated_s = 0.0
+        self.timeout_s = 0.0
+        self.pending_axes = set()
+        self.completed_axes = set()
+        self.paused_remaining_ms = None  # Time left on the deadline while the machine is paused
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.on_timeout)
+
+    def set_position_source(self, position_source):
+        """Set the callable used to get the axis positions at the start of a row"""
+        self.position_source = position_source
+
+    def set_axis_speed(self, axis_id, speed):
+        """Update the speed used for estimates; an empty axis_id sets all axes"""
+        if not axis_id:
+            for slave_id in SLAVE_IDS:
+                self.axis_speeds[slave_id] = speed
+        elif axis_id.lower() in self.axis_speeds:
+            self.axis_speeds[axis_id.lower()] = speed
+
+    def timeout_for(self, estimated_s):
+        """Deadline (seconds) for a row with the given predicted duration"""
+        return row_timeout(estimated_s, self.margin_ratio, self.margin_s, self.min_timeout_s)
+
+    def start_row(self, row_index, command):
+        """Arm the watchdog for a command that is about to be sent"""
+        self.cancel()
+        if not self.enabled:
+            return
+
+        start_positions = self.position_source() if self.position_source else {}
+        durations = estimate_row_durations(command, start_positions, self.axis_speeds)
+        if not durations:
+            return
+
+        self.row_index = row_index
+        self.started_at = time.monotonic()
+        self.estimated_s = max(durations.values())
+        self.timeout_s = self.timeout_for(self.estimated_s)
+        self.pending_axes = set(durations)
+        self.completed_axes = set()
+        self.timer.start(int(self.timeout_s * 1000))
+
+    def axis_completed(self, axis_id):
+        """Record a per-axis completion report"""
+        axis_id = axis_id.lower()
+        if axis_id in self.pending_axes:
+            self.pending_axes.discard(axis_id)
+            self.completed_axes.add(axis_id)
+
+    def row_completed(self):
+        """Disarm the watchdog when the master reports that all slaves completed"""
+        self.cancel()
+
+    def pause(self):
+        """Hold the deadline while the machine is paused"""
+        if self.timer.isActive():
+            self.paused_remaining_ms = self.timer.remainingTime()
+            self.timer.stop()
+
+    def resume(self):
+        """Continue the deadline after a pause"""
+        if self.paused_remaining_ms is not None and self.started_at is not None:
+            # Elapsed time is measured against the deadline, so move the start forward by the pause
+            self.started_at = time.monotonic() - (self.timeout_s - self.paused_remaining_ms / 1000.0)
+            self.timer.start(self.paused_remaining_ms)
+        self.paused_remaining_ms = None
+
+    def cancel(self):
+        """Disarm the watchdog"""
+        self.timer.stop()
+        self.started_at = None
+        self.pending_axes = set()
+        self.paused_remaining_ms = None
+
+    def is_armed(self):
+        return self.timer.isActive()
+
+    def on_timeout(self):
+        if self.started_at is None:
+            return
+
+        event = RowTimeoutEvent(
+            self.row_index,
+            self.estimated_s,
+            self.timeout_s,
+            time.monotonic() - self.started_at,
+            sorted(self.pending_axes, key=SLAVE_IDS.index),
+            sorted(self.completed_axes, key=SLAVE_IDS.index)
+        )
+        self.started_at = None
+        self.row_timeout.emit(event)
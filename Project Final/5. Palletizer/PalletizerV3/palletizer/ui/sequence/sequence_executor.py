@@ -1,6 +1,10 @@
+import time
 from PyQt5.QtWidgets import QMessageBox
-from PyQt5.QtCore import QObject, pyqtSignal
-from ...utils.config import CMD_START
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from .row_watchdog import RowWatchdog
+from .row_journal import RowJournal
+from ...utils.config import CMD_START, SEQUENCE_AUTO_RESUME, SEQUENCE_RESUME_SETTLE_MS
+from ...utils.metrics import METRICS
 
 
 class SequenceExecutor(QObject):
@@ -8,13 +12,46 @@ class SequenceExecutor(QObject):
     global_command = pyqtSignal(str)
     sequence_command = pyqtSignal(str)
     execution_state_changed = pyqtSignal(bool)  # Signal emitted when execution state changes
+    run_interrupted = pyqtSignal(int)  # Link dropped during a run; index of the row to resume from
+    run_resumed = pyqtSignal(int)      # Run continues from this row after the link came back
+    resume_confirming = pyqtSignal(int)  # Acknowledged row sent again to confirm the controller state
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, metrics_labels=None):
         super().__init__(parent)
         self.current_sequence_index = -1  # Index of the current row being executed
         self.sequence_execution_active = False  # Flag to track if sequence execution is in progress
         self.row_manager = None  # Will be set from SequencePanel
         self.waiting_for_completion = False  # Flag to track if we're waiting for ALL_SLAVES_COMPLETED
+        self.watchdog = RowWatchdog(self)  # Detects rows that never report completion
+        self.journal = RowJournal()  # Rows sent and acknowledged in the current run
+        self.interrupted = False  # Run was interrupted by a link drop and waits to resume
+        self.confirming_row = -1  # Acknowledged row sent again to confirm the state before resuming
+        self.row_sent_at = None  # perf_counter time the running row was sent
+        self.bind_metrics(metrics_labels)
+        self.watchdog.row_timeout.connect(lambda event: self.row_timeouts_metric.inc())
+
+        # The link must stay up for the settle time before an interrupted run resumes
+        self.resume_timer = QTimer(self)
+        self.resume_timer.setSingleShot(True)
+        self.resume_timer.timeout.connect(self.resume_interrupted_run)
+
+    def bind_metrics(self, labels=None):
+        """Get the sequence metrics from the registry; labels tell machines apart"""
+        self.rows_sent_metric = METRICS.counter(
+            "palletizer_rows_sent_total", "Row commands sent", labels)
+        self.rows_completed_metric = METRICS.counter(
+            "palletizer_rows_completed_total", "Rows acknowledged by the master", labels)
+        self.row_timeouts_metric = METRICS.counter(
+            "palletizer_row_timeouts_total", "Rows that missed their predicted deadline", labels)
+        self.row_latency_metric = METRICS.histogram(
+            "palletizer_row_latency_seconds", "Time from sending a row to its completion feedback", labels)
+
+    def send_row(self, row_index, command):
+        """Arm the row watchdog, note the send time and emit the row command"""
+        self.watchdog.start_row(row_index, command)
+        self.row_sent_at = time.perf_counter()
+        self.rows_sent_metric.inc()
+        self.sequence_command.emit(command)
 
     def set_row_manager(self, row_manager):
         """Set the reference to the row manager"""
@@ -34,6 +71,9 @@ class SequenceExecutor(QObject):
 
             self.sequence_execution_active = False
             self.waiting_for_completion = False
+            self.interrupted = False
+            self.watchdog.cancel()
+            self.journal.clear()
             self.current_sequence_index = -1
             self.execution_state_changed.emit(False)
             # Update running row display to show completion
@@ -56,7 +96,10 @@ class SequenceExecutor(QObject):
             self.sequence_execution_active = True
 
         # Send row command
-        self.sequence_command.emit(row_command)
+        if not self.journal.is_active():
+            self.journal.start_run(len(self.row_manager.sequence_rows))
+        self.journal.row_sent(row_index)
+        self.send_row(row_index, row_command)
 
         # Set waiting flag
         self.waiting_for_completion = True
@@ -89,16 +132,26 @@ class SequenceExecutor(QObject):
         )
 
         if reply == QMessageBox.Yes:
-            # Reset sequence execution state
-            self.current_sequence_index = -1
-            self.sequence_execution_active = False
-            self.waiting_for_completion = False
-
-            # Start with the first row
-            return self.run_next_row()
+            return self.start_run()
 
         return False
 
+    def start_run(self):
+        """Start running the sequence from the first row without confirmation"""
+        if not self.row_manager or not self.row_manager.sequence_rows:
+            return False
+
+        # Reset sequence execution state
+        self.current_sequence_index = -1
+        self.sequence_execution_active = False
+        self.waiting_for_completion = False
+        self.interrupted = False
+        self.confirming_row = -1
+        self.journal.start_run(len(self.row_manager.sequence_rows))
+
+        # Start with the first row
+        return self.run_next_row()
+
     def run_selected_row(self, row_index):
         """Run only the selected row"""
         if not self.row_manager:
@@ -118,7 +171,7 @@ class SequenceExecutor(QObject):
         self.global_command.emit(CMD_START)
 
         # Then send row command
-        self.sequence_command.emit(row_command)
+        self.send_row(row_index, row_command)
 
         # Not setting sequence_execution_active to True because this is not part of sequenced execution
         # But we are waiting for completion
@@ -153,7 +206,7 @@ class SequenceExecutor(QObject):
         self.global_command.emit(CMD_START)
 
         # Then send axis command
-        self.sequence_command.emit(row[axis])
+        self.send_row(row_index, row[axis])
 
         # Not setting sequence_execution_active to True because this is only a single axis
         # But we are waiting for completion
@@ -177,10 +230,90 @@ class SequenceExecutor(QObject):
 
         # Reset the waiting flag
         self.waiting_for_completion = False
+        self.watchdog.row_completed()
+
+        if self.confirming_row >= 0:
+            # The controller is back at the last acknowledged row: resend the interrupted one
+            self.confirming_row = -1
+            self.row_sent_at = None
+            self.continue_interrupted_run(started=True)
+            return False
+
+        self.rows_completed_metric.inc()
+        if self.row_sent_at is not None:
+            self.row_latency_metric.record(time.perf_counter() - self.row_sent_at)
+            self.row_sent_at = None
 
         # Re-enable the Next button if we're in sequence execution mode
         if self.sequence_execution_active:
+            self.journal.row_acknowledged(self.current_sequence_index)
             self.execution_state_changed.emit(True)
             return True
 
         return False
+
+    def on_link_lost(self):
+        """Called when the serial link drops; keeps the run so it can resume"""
+        self.resume_timer.stop()
+        if not self.sequence_execution_active and not self.interrupted:
+            return
+
+        if not self.interrupted:
+            self.interrupted = True
+            self.journal.record_interruption()
+        self.waiting_for_completion = False
+        self.confirming_row = -1
+        self.row_sent_at = None
+        self.watchdog.cancel()
+        self.run_interrupted.emit(self.journal.first_unacknowledged())
+
+    def on_link_restored(self):
+        """Called when the serial link is back; resumes after the settle time"""
+        if self.interrupted:
+            self.resume_timer.start(SEQUENCE_RESUME_SETTLE_MS)
+
+    def resume_interrupted_run(self):
+        """
+        Confirm the controller state, then continue an interrupted run. The master
+        has no position query, so the last acknowledged row is sent again: rows are
+        absolute positions, so it only moves an axis that is not where the run left
+        it, and its completion feedback shows the controller is up, takes rows and
+        is at that position. The run continues when it is acknowledged.
+        """
+        if not self.interrupted or not self.row_manager or self.confirming_row >= 0:
+            return
+
+        row_index = self.journal.first_unacknowledged()
+        if row_index < 0:
+            row_index = len(self.row_manager.sequence_rows)
+
+        confirm_command = self.row_manager.get_row_command(row_index - 1) if row_index > 0 else None
+        if not confirm_command:
+            # Nothing was acknowledged yet, so there is no known state to return to
+            self.continue_interrupted_run()
+            return
+
+        # The controller may have restarted with the link, so START is sent again with the row
+        self.confirming_row = row_index - 1
+        self.global_command.emit(CMD_START)
+        self.send_row(self.confirming_row, confirm_command)
+        self.waiting_for_completion = True
+        self.resume_confirming.emit(self.confirming_row)
+
+    def continue_interrupted_run(self, started=False):
+        """Continue an interrupted run from the first row that was not acknowledged; started if START was resent"""
+        self.interrupted = False
+        row_index = self.journal.first_unacknowledged()
+        if row_index < 0:
+            row_index = len(self.row_manager.sequence_rows)
+
+        # Without a confirmation row, START is sent again with the next row
+        self.current_sequence_index = row_index - 1
+        self.sequence_execution_active = started
+        self.run_resumed.emit(row_index)
+
+        if self.parent().auto_execution and SEQUENCE_AUTO_RESUME:
+            self.run_next_row()
+        else:
+            # Manual mode: the operator continues with Next Row
+            self.execution_state_changed.emit(True)
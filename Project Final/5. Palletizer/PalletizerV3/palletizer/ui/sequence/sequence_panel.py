@@ -17,6 +17,7 @@ class SequencePanel(QWidget):
     sequence_command = pyqtSignal(str)
     global_command = pyqtSignal(str)
     speed_command = pyqtSignal(str)
+    row_timeout = pyqtSignal(object)  # RowTimeoutEvent from the row watchdog
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -36,6 +37,7 @@ class SequencePanel(QWidget):
         # Forward signals
         self.sequence_executor.global_command.connect(self.global_command)
         self.sequence_executor.sequence_command.connect(self.sequence_command)
+        self.sequence_executor.watchdog.row_timeout.connect(self.on_row_timeout)
 
         # Connect internal signals
         self.row_manager.row_updated.connect(self.on_rows_updated)
@@ -544,6 +546,11 @@ class SequencePanel(QWidget):
             self.running_row_value.setText("-")
             self.running_row_frame.setStyleSheet("background-color: #f0f0f0; border-radius: 3px;")
 
+    def on_row_timeout(self, event):
+        """Mark the running row as stalled and forward the timeout event"""
+        self.running_row_frame.setStyleSheet("background-color: #ffd0d0; border-radius: 3px;")
+        self.row_timeout.emit(event)
+
     # ========== Methods for Position Handling ==========
 
     def update_position(self, axis_id, position):
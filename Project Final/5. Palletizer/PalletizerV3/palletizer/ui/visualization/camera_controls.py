@@ -4,6 +4,14 @@ Camera controller for 3D visualization.
 import numpy as np
 from PyQt5.QtGui import QVector3D
 
+# Predefined views: (distance, elevation, azimuth)
+VIEW_PRESETS = {
+    'top': (2000, 90, 0),
+    'side': (2000, 0, 0),
+    'front': (2000, 0, 90),
+    'isometric': (2000, 30, 45),
+}
+
 
 class CameraController:
     """Controls camera movement and positioning in the 3D view."""
@@ -118,29 +126,9 @@ class CameraController:
         self.parent.ui_builder.isometric_view_cb.setChecked(False)
 
         # Set camera parameters based on view type
-        if view_type == 'top':
-            self.parent.ui_builder.top_view_cb.setChecked(True)
-            self.camera_distance = 2000
-            self.camera_elevation = 90
-            self.camera_azimuth = 0
-            self.reset_camera_pan()
-        elif view_type == 'side':
-            self.parent.ui_builder.side_view_cb.setChecked(True)
-            self.camera_distance = 2000
-            self.camera_elevation = 0
-            self.camera_azimuth = 0
-            self.reset_camera_pan()
-        elif view_type == 'front':
-            self.parent.ui_builder.front_view_cb.setChecked(True)
-            self.camera_distance = 2000
-            self.camera_elevation = 0
-            self.camera_azimuth = 90
-            self.reset_camera_pan()
-        elif view_type == 'isometric':
-            self.parent.ui_builder.isometric_view_cb.setChecked(True)
-            self.camera_distance = 2000
-            self.camera_elevation = 30
-            self.camera_azimuth = 45
+        if view_type in VIEW_PRESETS:
+            getattr(self.parent.ui_builder, f'{view_type}_view_cb').setChecked(True)
+            self.camera_distance, self.camera_elevation, self.camera_azimuth = VIEW_PRESETS[view_type]
             self.reset_camera_pan()
 
         # Block signals while updating sliders to avoid recursive callbacks
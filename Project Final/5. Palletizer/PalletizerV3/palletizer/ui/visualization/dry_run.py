@@ -0,0 +1,162 @@
+"""
+Dry-run controller that plays a sequence through the 3D view without the machine.
+"""
+import time
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtWidgets import QMessageBox
+
+from ...motion import SequenceTimeline
+from ...pallet_load import PalletLoad
+from ...utils.config import SLAVE_IDS, VISUALIZATION_FRAME_INTERVAL_MS
+
+
+class DryRunController:
+    """
+    Animates the predicted motion of a sequence (motion.SequenceTimeline) in the
+    3D view. A fixed frame timer advances the sequence time by the elapsed wall
+    time times the playback speed, so the animation stays time-accurate even
+    when frames are late. Nothing is sent to the machine; live position updates
+    received meanwhile are kept and shown again when the dry run stops. The
+    dry run builds up its own pallet load; the live load is left as it is and
+    drawn again when the dry run stops.
+    """
+
+    def __init__(self, parent):
+        """Initialize the dry-run controller with reference to the parent panel."""
+        self.parent = parent
+        self.sequence_source = None  # Callable returning the rows of the loaded sequence
+        self.timeline = None
+        self.row_count = 0
+        self.active = False
+        self.playing = False
+        self.time = 0.0
+        self.speed = 1
+        self.last_tick = None
+        self.live_positions = {}
+        self.pallet_load = PalletLoad()
+
+        self.timer = QTimer(parent)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(VISUALIZATION_FRAME_INTERVAL_MS)
+        self.timer.timeout.connect(self.tick)
+
+    def set_sequence_source(self, source):
+        """Set the callable that returns the rows to play, e.g. those of the sequence panel."""
+        self.sequence_source = source
+
+    def load(self):
+        """Build the timeline of the current sequence, starting from the current positions."""
+        rows = self.sequence_source() if self.sequence_source is not None else []
+        if not rows:
+            QMessageBox.information(self.parent, "Dry Run", "There is no sequence loaded to play.")
+            return False
+
+        if not self.active:
+            self.live_positions = dict(self.parent.positions)
+            self.parent.model_ctrl.show_pallet_load(self.pallet_load)
+        self.timeline = SequenceTimeline.from_rows(rows, start_positions=self.live_positions)
+        self.row_count = len(rows)
+        self.active = True
+        self.parent.ui_builder.set_dry_run_loaded(self.row_count, self.timeline.duration)
+        self.seek(0.0)
+        return True
+
+    def toggle_play(self):
+        """Start or pause playback, loading the sequence first if needed."""
+        if self.playing:
+            self.pause()
+        elif self.active or self.load():
+            self.play()
+
+    def play(self):
+        if self.time >= self.timeline.duration:
+            self.seek(0.0)
+        self.playing = True
+        self.last_tick = time.perf_counter()
+        self.timer.start()
+        self.parent.ui_builder.set_dry_run_playing(True)
+
+    def pause(self):
+        self.playing = False
+        self.timer.stop()
+        self.parent.ui_builder.set_dry_run_playing(False)
+
+    def stop(self):
+        """Leave dry-run mode and show the live positions again."""
+        if not self.active:
+            return
+
+        self.pause()
+        self.active = False
+        self.timeline = None
+        self.parent.positions.update(self.live_positions)
+        for axis in SLAVE_IDS:
+            self.parent.ui_builder.pos_labels[axis].setText(str(self.parent.positions[axis]))
+        self.parent.model_ctrl.trail.clear()
+        self.parent.model_ctrl.show_pallet_load(self.parent.model_ctrl.live_load)
+        self.parent.ui_builder.set_dry_run_loaded(0, 0.0)
+        self.render()
+
+    def set_speed(self, speed):
+        self.speed = speed
+
+    def seek(self, seconds):
+        """Show the sequence at the given time; the trail restarts when jumping backwards."""
+        if self.timeline is None:
+            return
+        seconds = min(max(seconds, 0.0), self.timeline.duration)
+        if seconds < self.time:
+            self.parent.model_ctrl.trail.clear()
+        self.time = seconds
+        self.last_tick = time.perf_counter()
+        self._rebuild_pallet_load()
+        self.show_frame()
+
+    def _rebuild_pallet_load(self):
+        """Put down the boxes placed before the current time, which a jump would skip."""
+        load = self.pallet_load
+        load.clear()
+        self.parent.model_ctrl.load_dirty = True
+
+        g_now = self.timeline.position_at('g', self.time)
+        for start, end, origin, target, *_ in self.timeline.moves['g']:
+            if start >= self.time:
+                break
+            # A gripper opening that has finished, or has already passed the closed threshold
+            if origin >= load.grip_closed > target and (end <= self.time or g_now < load.grip_closed):
+                load.add(self.timeline.positions_at(end))
+        load.holding = g_now >= load.grip_closed
+
+    def jump_to_row(self, row_number):
+        """Show the start of a row (1-based, as numbered in the sequence table)."""
+        if self.timeline is not None and 1 <= row_number <= self.row_count:
+            self.seek(self.timeline.row_starts[row_number - 1])
+
+    def tick(self):
+        """Advance the sequence time by the wall time since the last frame."""
+        now = time.perf_counter()
+        self.time += (now - self.last_tick) * self.speed
+        self.last_tick = now
+        if self.time >= self.timeline.duration:
+            self.time = self.timeline.duration
+            self.pause()
+        self.show_frame()
+
+    def show_frame(self):
+        """Put the predicted positions at the current time into the scene and draw it."""
+        positions = self.timeline.positions_at(self.time)
+        self.parent.positions.update(positions)
+        if self.pallet_load.update(positions):
+            self.parent.model_ctrl.load_dirty = True
+        for axis, position in positions.items():
+            self.parent.ui_builder.pos_labels[axis].setText(str(round(position)))
+
+        row = self.timeline.row_at(self.time)
+        self.parent.ui_builder.show_dry_run_time(self.time, self.timeline.duration, max(row, 0) + 1, self.row_count)
+        self.render()
+
+    def render(self):
+        # One frame per tick; while the tab is hidden the scheduler keeps it until shown
+        self.parent.render_scheduler.dirty = True
+        self.parent.render_scheduler.render_frame()
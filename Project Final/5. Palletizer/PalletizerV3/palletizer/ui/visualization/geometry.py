@@ -0,0 +1,184 @@
+"""
+Forward transforms of the palletizer mechanism used by the 3D visualization.
+
+All functions accept either scalar axis positions or NumPy arrays of positions,
+so the same math drives the live view and whole-sequence computations.
+"""
+import numpy as np
+
+# Component dimensions (width, depth, height)
+Z_RAIL_WIDTH = 50
+Z_RAIL_DEPTH = 50
+CARRIAGE_SIZE = 80
+CARRIAGE_HEIGHT = 60
+T_SIZE = 180
+T_HEIGHT = 40
+GRIPPER_THICKNESS = 30
+GRIPPER_LENGTH = 200
+GRIPPER_HEIGHT = 100
+LOAD_SIZE = (100, 160, 100)  # Box carried between the fingers
+
+# Mechanical components in drawing order
+COMPONENT_NAMES = ['x_rail', 'y_rail', 'z_rail', 'z_carriage', 't_part', 'g_left', 'g_right']
+
+# RGBA colors matching the individual GLBoxItem colors
+COMPONENT_COLORS = {
+    'x_rail': (128, 128, 128, 255),
+    'y_rail': (150, 150, 150, 255),
+    'z_rail': (100, 100, 255, 255),
+    'z_carriage': (180, 180, 180, 255),
+    't_part': (200, 200, 200, 255),
+    'g_left': (220, 220, 220, 255),
+    'g_right': (220, 220, 220, 255),
+}
+
+# Corners of a unit box and the 12 edges drawn by GLBoxItem
+BOX_CORNERS = np.array([
+    [0, 0, 0], [1, 0, 0], [1, 1, 0], [0, 1, 0],
+    [0, 0, 1], [1, 0, 1], [1, 1, 1], [0, 1, 1],
+], dtype=float)
+BOX_EDGES = np.array([
+    [0, 1], [1, 2], [2, 3], [3, 0],
+    [4, 5], [5, 6], [6, 7], [7, 4],
+    [0, 4], [1, 5], [2, 6], [3, 7],
+])
+# Two triangles per face of the unit box, wound outwards
+BOX_FACES = np.array([
+    [0, 2, 1], [0, 3, 2], [4, 5, 6], [4, 6, 7],
+    [0, 1, 5], [0, 5, 4], [1, 2, 6], [1, 6, 5],
+    [2, 3, 7], [2, 7, 6], [3, 0, 4], [3, 4, 7],
+])
+
+
+def _stack(x, y, z):
+    """Stack broadcastable coordinate values into a (..., 3) array."""
+    x, y, z = np.broadcast_arrays(np.asarray(x, dtype=float),
+                                  np.asarray(y, dtype=float),
+                                  np.asarray(z, dtype=float))
+    return np.stack([x, y, z], axis=-1)
+
+
+def y_end_position(y_pos, y_length, y_offset):
+    """Calculate where the Z-rail hangs on the Y-rail."""
+    y_normalized = np.clip((np.asarray(y_pos, dtype=float) / 1000) * y_length, 0, y_length)
+    return y_offset - y_normalized
+
+
+def z_carriage_position(z_pos, z_length):
+    """Calculate the Z carriage vertical position."""
+    z_carriage_pos = -CARRIAGE_HEIGHT + (np.asarray(z_pos, dtype=float) / 1000) * (-z_length + CARRIAGE_HEIGHT + 50)
+    return np.clip(z_carriage_pos, -z_length + CARRIAGE_HEIGHT, -CARRIAGE_HEIGHT)
+
+
+def gripper_spacing(g_pos):
+    """Calculate the gap between the gripper fingers from the G position."""
+    return np.maximum(30, 150 - np.asarray(g_pos, dtype=float) / 10)
+
+
+def compute_component_poses(positions, rail_lengths, relative_positions):
+    """
+    Compute the pose of every mechanical component.
+
+    Returns a dict mapping component name to (size, angle, translation), where the
+    box spanning [0, size] is rotated by angle degrees around Z and then translated.
+    """
+    x_pos = np.asarray(positions['x'], dtype=float)
+    t_pos = np.asarray(positions['t'], dtype=float)
+
+    x_length = rail_lengths['x']
+    y_length = rail_lengths['y']
+    z_length = rail_lengths['z']
+
+    x_offset = relative_positions['x_offset']
+    y_offset = relative_positions['y_offset']
+    z_offset = relative_positions['z_offset']
+
+    y_end_pos = y_end_position(positions['y'], y_length, y_offset)
+    z_carriage_pos = z_carriage_position(positions['z'], z_length)
+    spacing = gripper_spacing(positions['g'])
+    angle = t_pos / 10
+    zero = np.zeros_like(x_pos)
+    gripper_z = z_carriage_pos - T_HEIGHT - GRIPPER_HEIGHT + z_offset
+
+    return {
+        'x_rail': ((x_length, 50, 50), zero,
+                   _stack(x_length/2 + x_offset + zero, 0, 0)),
+        'y_rail': ((50, y_length, 50), zero,
+                   _stack(-x_pos + x_offset, -y_length/2 + y_offset, 0)),
+        'z_rail': ((Z_RAIL_WIDTH, Z_RAIL_DEPTH, z_length), zero,
+                   _stack(-x_pos - Z_RAIL_WIDTH/2 + x_offset, y_end_pos, -z_length + z_offset)),
+        'z_carriage': ((CARRIAGE_SIZE, CARRIAGE_SIZE, CARRIAGE_HEIGHT), zero,
+                       _stack(-x_pos - CARRIAGE_SIZE/2 + x_offset, y_end_pos - CARRIAGE_SIZE/2,
+                              z_carriage_pos + z_offset)),
+        't_part': ((T_SIZE, T_SIZE, T_HEIGHT), angle,
+                   _stack(-x_pos - T_SIZE/2 + x_offset, y_end_pos - T_SIZE/2,
+                          z_carriage_pos - T_HEIGHT + z_offset)),
+        'g_left': ((GRIPPER_THICKNESS, GRIPPER_LENGTH, GRIPPER_HEIGHT), angle,
+                   _stack(-x_pos - spacing/2 - GRIPPER_THICKNESS + x_offset, y_end_pos - GRIPPER_LENGTH/2,
+                          gripper_z)),
+        'g_right': ((GRIPPER_THICKNESS, GRIPPER_LENGTH, GRIPPER_HEIGHT), angle,
+                    _stack(-x_pos + spacing/2 + x_offset, y_end_pos - GRIPPER_LENGTH/2, gripper_z)),
+    }
+
+
+def box_corners(size, angle, translation):
+    """Get the world-space corners of a posed box as a (..., 8, 3) array."""
+    corners = BOX_CORNERS * np.asarray(size, dtype=float)[..., np.newaxis, :]
+    radians = np.radians(np.asarray(angle, dtype=float))[..., np.newaxis]
+    cos_a = np.cos(radians)
+    sin_a = np.sin(radians)
+
+    x = corners[..., 0] * cos_a - corners[..., 1] * sin_a
+    y = corners[..., 0] * sin_a + corners[..., 1] * cos_a
+    z = np.broadcast_to(corners[..., 2], x.shape)
+
+    return np.stack([x, y, z], axis=-1) + np.asarray(translation, dtype=float)[..., np.newaxis, :]
+
+
+def gripper_tip_position(poses):
+    """Get the point between the gripper fingers at their bottom face."""
+    left = box_corners(*poses['g_left'])
+    right = box_corners(*poses['g_right'])
+    # Corners 0-3 form the bottom face of each box
+    return np.concatenate([left[..., :4, :], right[..., :4, :]], axis=-2).mean(axis=-2)
+
+
+def load_box_corners(poses):
+    """Get the corners of the box held by the gripper, centered on the tip and standing on it."""
+    angle = np.asarray(poses['g_left'][1], dtype=float)
+    radians = np.radians(angle)
+    cos_a = np.cos(radians)
+    sin_a = np.sin(radians)
+    half_x = LOAD_SIZE[0] / 2
+    half_y = LOAD_SIZE[1] / 2
+
+    # box_corners rotates around the first corner; shift it so the rotated box is centered
+    corner = gripper_tip_position(poses) - _stack(half_x * cos_a - half_y * sin_a,
+                                                  half_x * sin_a + half_y * cos_a, 0)
+    return box_corners(LOAD_SIZE, angle, corner)
+
+
+def mechanism_edge_vertices(poses, names=COMPONENT_NAMES, out=None):
+    """
+    Build line-segment vertices for the box edges of all components in one pass.
+
+    Returns an (len(names) * 24, 3) array suitable for a single GLLinePlotItem in
+    'lines' mode. Pass a preallocated array as out to avoid reallocating per frame.
+    """
+    sizes = np.array([poses[name][0] for name in names], dtype=float)
+    angles = np.array([poses[name][1] for name in names], dtype=float)
+    translations = np.array([poses[name][2] for name in names], dtype=float)
+
+    corners = box_corners(sizes, angles, translations)
+    edges = corners[:, BOX_EDGES.ravel(), :].reshape(-1, 3)
+
+    if out is None:
+        return edges
+    out[:] = edges
+    return out
+
+
+def mechanism_edge_colors(names=COMPONENT_NAMES):
+    """Build per-vertex RGBA colors (0-1 floats) matching mechanism_edge_vertices."""
+    colors = np.array([COMPONENT_COLORS[name] for name in names], dtype=float) / 255
+    return np.repeat(colors, len(BOX_EDGES) * 2, axis=0)
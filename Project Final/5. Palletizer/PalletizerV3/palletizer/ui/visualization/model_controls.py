@@ -7,17 +7,33 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QVector3D, QColor
 import pyqtgraph.opengl as gl
 
-from ...utils.config import SLAVE_IDS
+from ...utils.config import (SLAVE_IDS, VISUALIZATION_BATCHED_MESH, VISUALIZATION_MOTION_TRAIL,
+                             VISUALIZATION_PALLET_LOAD)
+from . import geometry
+from .motion_trail import MotionTrail
+from .pallet_load import PalletLoadMesh
+from ...pallet_load import PalletLoad
 
 
 class ModelController:
     """Controls the 3D model visualization and manipulation."""
 
-    def __init__(self, parent):
-        """Initialize the model controller with reference to the parent panel."""
+    def __init__(self, parent, pallet_load=None):
+        """Initialize the model controller; pallet_load is the live load to draw, e.g. the main window's."""
         self.parent = parent
         self.line_width = 3
         self.view = None
+        self.batched_mesh = VISUALIZATION_BATCHED_MESH
+        self.mesh_vertices = None
+        self.trail = MotionTrail()
+        self.trail_enabled = VISUALIZATION_MOTION_TRAIL
+        self.trail_dirty = False
+        self.trail_drawn_count = 0
+        self.live_load = pallet_load if pallet_load is not None else PalletLoad()
+        self.pallet_load = self.live_load  # The load drawn: the live one, or that of a dry run
+        self.load_mesh = PalletLoadMesh()
+        self.load_enabled = VISUALIZATION_PALLET_LOAD
+        self.load_dirty = False
 
     def initialize_gl_view(self):
         """Initialize the OpenGL view and create 3D objects."""
@@ -52,6 +68,12 @@ class ModelController:
         # Create rails, carriage and other components
         self._create_mechanical_components()
 
+        # Gripper path overlay
+        self._create_trail()
+
+        # Boxes placed on the pallet
+        self._create_pallet_load()
+
     def _create_grid(self):
         """Create a grid for the 3D view."""
         grid = gl.GLGridItem()
@@ -103,6 +125,10 @@ class ModelController:
 
     def _create_mechanical_components(self):
         """Create the palletizer mechanical components (rails, carriage, etc.)."""
+        if self.batched_mesh:
+            self._create_mechanism_mesh()
+            return
+
         x_length = self.parent.rail_lengths['x']
         y_length = self.parent.rail_lengths['y']
         z_length = self.parent.rail_lengths['z']
@@ -163,6 +189,136 @@ class ModelController:
         self.view.addItem(g_right)
         self.parent.gl_items['g_right'] = g_right
 
+    def _create_mechanism_mesh(self):
+        """Create the whole mechanism as a single line mesh with one vertex buffer."""
+        names = geometry.COMPONENT_NAMES
+        self.mesh_vertices = np.zeros((len(names) * len(geometry.BOX_EDGES) * 2, 3))
+
+        poses = geometry.compute_component_poses(
+            self.parent.positions, self.parent.rail_lengths, self.parent.relative_positions)
+        geometry.mechanism_edge_vertices(poses, out=self.mesh_vertices)
+
+        mechanism = gl.GLLinePlotItem(pos=self.mesh_vertices, color=geometry.mechanism_edge_colors(),
+                                      mode='lines', width=self.line_width)
+        self.view.addItem(mechanism)
+        self.parent.gl_items['mechanism'] = mechanism
+
+    def _create_trail(self):
+        """Create the motion trail as one line strip, hidden until it has points."""
+        trail = gl.GLLinePlotItem(pos=np.zeros((2, 3), dtype=np.float32), color=(0.9, 0.4, 0.0, 1.0),
+                                  mode='line_strip', width=2, antialias=True, glOptions='translucent')
+        trail.setVisible(False)
+        self.view.addItem(trail)
+        self.parent.gl_items['trail'] = trail
+        self.trail_drawn_count = 0
+        self.trail_dirty = True
+
+    def _create_pallet_load(self):
+        """Create the placed boxes as one face mesh and one outline item, hidden until a box is placed."""
+        vertices, faces = self.load_mesh.mesh()
+        load_mesh = gl.GLMeshItem(vertexes=vertices, faces=faces, color=(0.8, 0.62, 0.4, 1.0),
+                                  shader='shaded', smooth=False, glOptions='opaque')
+        load_mesh.setVisible(False)
+        self.view.addItem(load_mesh)
+        self.parent.gl_items['load_mesh'] = load_mesh
+
+        load_edges = gl.GLLinePlotItem(pos=np.zeros((2, 3), dtype=np.float32), color=(0.45, 0.3, 0.15, 1.0),
+                                       mode='lines', width=1)
+        load_edges.setVisible(False)
+        self.view.addItem(load_edges)
+        self.parent.gl_items['load_edges'] = load_edges
+        self.load_mesh.source = None  # Upload the whole load to the new items
+        self.load_dirty = True
+
+    def set_trail_enabled(self, enabled):
+        """Show or hide the gripper motion trail; a shown trail starts from the current pose."""
+        self.trail_enabled = enabled
+        self.trail.clear()
+        self.trail_dirty = True
+        if not self.parent.initialized or self.view is None:
+            return
+
+        self.parent.gl_items['trail'].setVisible(False)
+        if enabled:
+            self.update_visualization()
+
+    def set_pallet_load_enabled(self, enabled):
+        """Show or hide the placed boxes; placements are tracked either way."""
+        self.load_enabled = enabled
+        self.pallet_load_changed()
+
+    def clear_pallet_load(self):
+        """Remove all placed boxes, e.g. when a new pallet is started."""
+        self.pallet_load.clear()
+        self.pallet_load_changed()
+
+    def show_pallet_load(self, load):
+        """Draw another load, e.g. the one a dry run builds; show_pallet_load(self.live_load) goes back."""
+        self.pallet_load = load
+        self.pallet_load_changed()
+
+    def pallet_load_changed(self):
+        """Redraw the pallet load in the next frame, e.g. after a place row completed."""
+        self.load_dirty = True
+        self.parent.render_scheduler.request_update()
+
+    def record_trail_point(self, poses=None):
+        """Add the current gripper tip to the trail, e.g. while the 3D tab is hidden."""
+        if not self.trail_enabled:
+            return
+        if poses is None:
+            poses = geometry.compute_component_poses(
+                self.parent.positions, self.parent.rail_lengths, self.parent.relative_positions)
+        if self.trail.add(geometry.gripper_tip_position(poses)):
+            self.trail_dirty = True
+
+    def _update_trail(self):
+        """Hand the trail ring to its line item if points were added since the last frame."""
+        if not self.trail_dirty or not self.trail_enabled or self.trail.count < 2:
+            return
+
+        self.trail_dirty = False
+        trail = self.parent.gl_items['trail']
+        if self.trail.count != self.trail_drawn_count:
+            # The color ramp only changes length until the ring is full
+            trail.setData(pos=self.trail.vertices(), color=self.trail.vertex_colors())
+            self.trail_drawn_count = self.trail.count
+        else:
+            trail.setData(pos=self.trail.vertices())
+        trail.setVisible(True)
+
+    def _update_pallet_load(self):
+        """Upload the load mesh after boxes were placed or removed or the rails changed; nothing to do otherwise."""
+        load_mesh = self.parent.gl_items['load_mesh']
+        load_edges = self.parent.gl_items['load_edges']
+        shown = self.load_enabled and len(self.pallet_load) > 0
+        if shown and self.load_mesh.sync(self.pallet_load, self.parent.rail_lengths, self.parent.relative_positions):
+            vertices, faces = self.load_mesh.mesh()
+            load_mesh.setMeshData(vertexes=vertices, faces=faces)
+            load_edges.setData(pos=self.load_mesh.edges())
+
+        if self.load_dirty:
+            self.load_dirty = False
+            load_mesh.setVisible(shown)
+            load_edges.setVisible(shown)
+
+    def set_batched_mesh(self, enabled):
+        """Switch between one batched mesh and individual GLBoxItems for the mechanism."""
+        if enabled == self.batched_mesh:
+            return
+
+        self.batched_mesh = enabled
+        if not self.parent.initialized or self.view is None:
+            return
+
+        # Remove the current mechanism items and rebuild them in the new mode
+        for name in geometry.COMPONENT_NAMES + ['mechanism']:
+            if name in self.parent.gl_items:
+                self.view.removeItem(self.parent.gl_items.pop(name))
+
+        self._create_mechanical_components()
+        self.update_visualization()
+
     def on_line_width_changed(self, value):
         """Handle changes to the line width value."""
         if not self.parent.initialized:
@@ -201,6 +357,9 @@ class ModelController:
                 self.view.addItem(new_line)
                 self.parent.gl_items[axis_key] = new_line
 
+        if 'mechanism' in self.parent.gl_items:
+            self.parent.gl_items['mechanism'].setData(width=self.line_width)
+
         # Force redraw
         self.view.update()
 
@@ -217,13 +376,13 @@ class ModelController:
         # Update position label
         self.parent.ui_builder.pos_labels[axis].setText(str(self.parent.positions[axis]))
 
-        # Update 3D visualization
-        self.update_visualization()
+        # Schedule a 3D visualization update for the next frame
+        self.parent.render_scheduler.request_update()
 
     def on_invert_changed(self, axis, state):
         """Handle changes to axis inversion checkboxes."""
         self.parent.axis_inverted[axis] = (state == Qt.Checked)
-        self.update_visualization()
+        self.parent.render_scheduler.request_update()
 
     def on_rail_length_changed(self, axis, value):
         """Handle changes to rail length inputs."""
@@ -262,7 +421,7 @@ class ModelController:
                 self.parent.axis_inverted[axis_lower] = True
                 self.parent.ui_builder.invert_checkboxes[axis_lower].setChecked(True)
 
-        self.update_visualization()
+        self.parent.render_scheduler.request_update()
 
     def apply_rail_lengths(self):
         """Apply the current rail length settings to the 3D model."""
@@ -445,73 +604,25 @@ class ModelController:
             return
 
         try:
-            # Get current axis positions
-            x_pos = self.parent.positions['x']
-            y_pos = self.parent.positions['y']
-            z_pos = self.parent.positions['z']
-            t_pos = self.parent.positions['t']
-            g_pos = self.parent.positions['g']
-
-            # Get offset values
-            x_offset = self.parent.relative_positions['x_offset']
-            y_offset = self.parent.relative_positions['y_offset']
-            z_offset = self.parent.relative_positions['z_offset']
-
-            # Get rail lengths
-            z_length = self.parent.rail_lengths['z']
-            y_length = self.parent.rail_lengths['y']
-
-            # Component dimensions
-            z_width = 50
-            z_depth = 50
-            carriage_size = 80
-            carriage_height = 60
-            t_size = 180
-            t_height = 40
-            gripper_thickness = 30
-            gripper_length = 200
-            gripper_height = 100
-
-            # Apply Y-axis inversion if necessary
-            y_direction = -1 if self.parent.axis_inverted['y'] else 1
-
-            # Calculate normalized Y position (0 to y_length)
-            y_normalized = (y_pos / 1000) * y_length
-            y_normalized = max(0, min(y_length, y_normalized))
-
-            # Calculate Y-axis position
-            y_axis_pos = y_direction * y_normalized
-
-            # Update Y-axis if needed
-            self._update_y_axis_position(y_length)
-
-            # Update Y-rail position
-            self._position_y_rail(x_pos, x_offset, y_length, y_offset)
-
-            # Calculate end position on Y rail
-            if self.parent.axis_inverted['y']:
-                y_end_pos = y_offset - y_normalized
+            # Compute all component poses from the current axis positions
+            poses = geometry.compute_component_poses(
+                self.parent.positions, self.parent.rail_lengths, self.parent.relative_positions)
+
+            if self.batched_mesh:
+                # Recompute every vertex in one pass and upload them as one buffer
+                geometry.mechanism_edge_vertices(poses, out=self.mesh_vertices)
+                self.parent.gl_items['mechanism'].setData(pos=self.mesh_vertices)
             else:
-                y_end_pos = y_offset - y_normalized
-
-            # Update Z-rail position (attached to Y-rail end)
-            self._position_z_rail(x_pos, x_offset, y_end_pos, z_length, z_offset, z_width)
+                # Update Y-axis if needed
+                self._update_y_axis_position(self.parent.rail_lengths['y'])
 
-            # Calculate Z carriage position
-            z_carriage_pos = self._calculate_z_carriage_position(z_pos, z_length, carriage_height)
+                # Reposition each moving component (the X-rail is placed when it is created)
+                for name in geometry.COMPONENT_NAMES[1:]:
+                    self._apply_pose(name, poses[name])
 
-            # Update Z carriage position
-            self._position_z_carriage(x_pos, x_offset, y_end_pos, z_carriage_pos, z_offset, carriage_size)
-
-            # Update T part position and rotation
-            self._position_t_part(x_pos, x_offset, y_end_pos, z_carriage_pos, z_offset, t_pos, t_size, t_height)
-
-            # Calculate gripper spacing based on G position
-            gripper_spacing = max(30, 150 - g_pos / 10)
-
-            # Update gripper positions and rotations
-            self._position_grippers(x_pos, x_offset, y_end_pos, z_carriage_pos, z_offset, t_pos, t_height,
-                                    gripper_spacing, gripper_thickness, gripper_length, gripper_height)
+            self.record_trail_point(poses)
+            self._update_trail()
+            self._update_pallet_load()
 
             # Force redraw
             self.view.update()
@@ -535,75 +646,12 @@ class ModelController:
                 self.view.addItem(y_label)
                 self.parent.gl_items['y_label'] = y_label
 
-    def _position_y_rail(self, x_pos, x_offset, y_length, y_offset):
-        """Position the Y-rail based on X position."""
-        if 'y_rail' in self.parent.gl_items:
-            self.parent.gl_items['y_rail'].resetTransform()
-            self.parent.gl_items['y_rail'].translate(
-                -x_pos + x_offset,
-                -y_length/2 + y_offset,
-                0
-            )
-
-    def _position_z_rail(self, x_pos, x_offset, y_end_pos, z_length, z_offset, z_width):
-        """Position the Z-rail based on X and Y positions."""
-        if 'z_rail' in self.parent.gl_items:
-            self.parent.gl_items['z_rail'].resetTransform()
-            self.parent.gl_items['z_rail'].translate(
-                -x_pos-z_width/2 + x_offset,
-                y_end_pos,
-                -z_length + z_offset
-            )
-
-    def _calculate_z_carriage_position(self, z_pos, z_length, carriage_height):
-        """Calculate the Z carriage vertical position."""
-        z_carriage_pos = -carriage_height + (z_pos / 1000) * (-z_length + carriage_height + 50)
-        z_carriage_pos = max(-z_length + carriage_height, min(-carriage_height, z_carriage_pos))
-        return z_carriage_pos
-
-    def _position_z_carriage(self, x_pos, x_offset, y_end_pos, z_carriage_pos, z_offset, carriage_size):
-        """Position the Z carriage based on X, Y, Z positions."""
-        if 'z_carriage' in self.parent.gl_items:
-            self.parent.gl_items['z_carriage'].resetTransform()
-            self.parent.gl_items['z_carriage'].translate(
-                -x_pos-carriage_size/2 + x_offset,
-                y_end_pos-carriage_size/2,
-                z_carriage_pos + z_offset
-            )
-
-    def _position_t_part(self, x_pos, x_offset, y_end_pos, z_carriage_pos, z_offset, t_pos, t_size, t_height):
-        """Position and rotate the T part based on X, Y, Z, T positions."""
-        if 't_part' in self.parent.gl_items:
-            self.parent.gl_items['t_part'].resetTransform()
-            self.parent.gl_items['t_part'].rotate(t_pos / 10, 0, 0, 1)
-            self.parent.gl_items['t_part'].translate(
-                -x_pos-t_size/2 + x_offset,
-                y_end_pos-t_size/2,
-                z_carriage_pos-t_height + z_offset
-            )
-
-    def _position_grippers(self, x_pos, x_offset, y_end_pos, z_carriage_pos, z_offset, t_pos, t_height,
-                           gripper_spacing, gripper_thickness, gripper_length, gripper_height):
-        """Position and rotate the gripper parts based on all axis positions."""
-        if 'g_left' in self.parent.gl_items and 'g_right' in self.parent.gl_items:
-            # Reset transforms
-            self.parent.gl_items['g_left'].resetTransform()
-            self.parent.gl_items['g_right'].resetTransform()
-
-            # Apply rotation from T-axis
-            self.parent.gl_items['g_left'].rotate(t_pos / 10, 0, 0, 1)
-            self.parent.gl_items['g_right'].rotate(t_pos / 10, 0, 0, 1)
-
-            # Position left gripper
-            self.parent.gl_items['g_left'].translate(
-                -x_pos-gripper_spacing/2-gripper_thickness + x_offset,
-                y_end_pos-gripper_length/2,
-                z_carriage_pos-t_height-gripper_height + z_offset
-            )
-
-            # Position right gripper
-            self.parent.gl_items['g_right'].translate(
-                -x_pos+gripper_spacing/2 + x_offset,
-                y_end_pos-gripper_length/2,
-                z_carriage_pos-t_height-gripper_height + z_offset
-            )
+    def _apply_pose(self, name, pose):
+        """Reset the transform of a GL item and apply the given pose."""
+        if name in self.parent.gl_items:
+            size, angle, translation = pose
+            item = self.parent.gl_items[name]
+            item.resetTransform()
+            if angle:
+                item.rotate(float(angle), 0, 0, 1)
+            item.translate(*translation)
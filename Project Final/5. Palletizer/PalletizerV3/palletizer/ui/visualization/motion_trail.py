@@ -0,0 +1,55 @@
+"""
+Ring buffer of gripper tip positions for the motion trail overlay.
+"""
+import numpy as np
+
+from ...utils.config import VISUALIZATION_TRAIL_POINTS
+
+
+class MotionTrail:
+    """
+    Last capacity gripper tip positions, oldest first, as one contiguous array.
+
+    Every point is written twice, at i and i + capacity, so the newest capacity
+    points are always the slice points[start:start + capacity] without copying
+    or rolling. The arrays are float32 like the GL vertex buffers, so a
+    GLLinePlotItem takes the slice as is and, once the trail is full, rewrites
+    its buffer in place instead of reallocating it.
+    """
+
+    def __init__(self, capacity=VISUALIZATION_TRAIL_POINTS):
+        """Initialize an empty trail holding up to capacity points."""
+        self.capacity = capacity
+        self.points = np.zeros((2 * capacity, 3), dtype=np.float32)
+        self.head = 0   # Index the next point is written to
+        self.count = 0
+
+        # Per-vertex colors fading from transparent (oldest) to opaque (newest)
+        self.colors = np.zeros((capacity, 4), dtype=np.float32)
+        self.colors[:, :3] = (0.9, 0.4, 0.0)
+        self.colors[:, 3] = np.linspace(0.05, 1.0, capacity, dtype=np.float32)
+
+    def add(self, point):
+        """Append a tip position; returns False when it equals the last point."""
+        if self.count and np.array_equal(self.points[self.head - 1], point):
+            return False
+
+        self.points[self.head] = point
+        self.points[self.head + self.capacity] = point
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return True
+
+    def clear(self):
+        """Forget all points."""
+        self.head = 0
+        self.count = 0
+
+    def vertices(self):
+        """Points oldest first, as a view of the ring."""
+        start = (self.head - self.count) % self.capacity
+        return self.points[start:start + self.count]
+
+    def vertex_colors(self):
+        """Colors for vertices(), the newest point getting the opaque end."""
+        return self.colors[self.capacity - self.count:]
@@ -0,0 +1,65 @@
+"""
+Boxes placed on the pallet, merged into one mesh for the 3D view.
+"""
+import numpy as np
+
+from ...utils.config import VISUALIZATION_PALLET_LOAD_BOXES
+from . import geometry
+
+
+class PalletLoadMesh:
+    """
+    Corners of every box of a palletizer.pallet_load.PalletLoad, in one growable float32 array.
+
+    All boxes share one vertex array and one face index array, so the whole load
+    is drawn by a single mesh item however many boxes it holds. sync() only
+    computes the corners of boxes placed since the last call, in one NumPy pass;
+    everything is rebuilt when another load is shown, the load was cleared or the
+    rail geometry changed.
+    """
+
+    def __init__(self, capacity=VISUALIZATION_PALLET_LOAD_BOXES):
+        """Initialize an empty mesh with room for capacity boxes."""
+        self.count = 0
+        self.source = None  # (load, its generation, rail geometry) the corners were computed for
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        corners = np.zeros((capacity, 8, 3), dtype=np.float32)
+        if self.count:
+            corners[:self.count] = self.corners[:self.count]
+        self.corners = corners
+        self.capacity = capacity
+
+        # Face indices of box i are those of the unit box offset by its 8 vertices
+        offsets = np.arange(capacity, dtype=np.int32)[:, np.newaxis, np.newaxis] * 8
+        self.faces = (geometry.BOX_FACES[np.newaxis].astype(np.int32) + offsets).reshape(-1, 3)
+
+    def sync(self, load, rail_lengths, relative_positions):
+        """Add the corners of the boxes placed since the last call; returns True when the mesh changed."""
+        source = (load, load.generation, tuple(rail_lengths.items()), tuple(relative_positions.items()))
+        changed = source != self.source
+        if changed:
+            self.source = source
+            self.count = 0
+
+        placements = load.placements[self.count:]
+        if not placements:
+            return changed
+
+        positions = {axis: np.array([placement[axis] for placement in placements], dtype=float)
+                     for axis in placements[0]}
+        poses = geometry.compute_component_poses(positions, rail_lengths, relative_positions)
+        while self.count + len(placements) > self.capacity:
+            self._allocate(self.capacity * 2)
+        self.corners[self.count:self.count + len(placements)] = geometry.load_box_corners(poses)
+        self.count += len(placements)
+        return True
+
+    def mesh(self):
+        """(vertices, faces) of all boxes, as views of the mesh arrays."""
+        return self.corners[:self.count].reshape(-1, 3), self.faces[:self.count * len(geometry.BOX_FACES)]
+
+    def edges(self):
+        """Line-segment vertices of the box outlines, for a GLLinePlotItem in 'lines' mode."""
+        return self.corners[:self.count][:, geometry.BOX_EDGES.ravel()].reshape(-1, 3)
@@ -11,13 +11,15 @@ from .ui_builder import UIBuilder
 from .camera_controls import CameraController
 from .model_controls import ModelController
 from .config_manager import ConfigManager
+from .render_scheduler import RenderScheduler
+from .dry_run import DryRunController
 
 
 class VisualizationPanel(QWidget):
     """Panel for 3D visualization of the palletizer system."""
 
-    def __init__(self, parent=None):
-        """Initialize the visualization panel."""
+    def __init__(self, parent=None, pallet_load=None):
+        """Initialize the visualization panel; pallet_load is the live load to draw, if it is kept elsewhere."""
         super().__init__(parent)
 
         # Initialize state variables
@@ -49,8 +51,10 @@ class VisualizationPanel(QWidget):
         # Create controllers
         self.ui_builder = UIBuilder(self)
         self.camera_ctrl = CameraController(self)
-        self.model_ctrl = ModelController(self)
+        self.model_ctrl = ModelController(self, pallet_load)
         self.config_mgr = ConfigManager(self)
+        self.render_scheduler = RenderScheduler(self)
+        self.dry_run = DryRunController(self)
 
         # Set up the UI
         self.setup_ui()
@@ -77,6 +81,12 @@ class VisualizationPanel(QWidget):
 
     def update_position(self, axis_id, position):
         """Update the position of a specific axis."""
+        if self.dry_run.active:
+            # The scene shows the dry run; keep the live position for when it stops
+            if axis_id.lower() in self.dry_run.live_positions:
+                self.dry_run.live_positions[axis_id.lower()] = position
+            return
+
         if axis_id.lower() in self.positions:
             self.positions[axis_id.lower()] = position
             if hasattr(self.ui_builder, 'pos_labels'):
@@ -103,13 +113,18 @@ class VisualizationPanel(QWidget):
                     self.model_ctrl.apply_all_ranges()
                     self.ui_builder.sliders[axis_id.lower()].setValue(slider_value)
 
-            self.model_ctrl.update_visualization()
+            self.render_scheduler.request_update()
 
     def reset_all_positions(self):
         """Reset all axis positions to zero."""
         for axis_id in SLAVE_IDS:
             self.update_position(axis_id, 0)
 
+    def showEvent(self, event):
+        """Render any update that arrived while the tab was hidden."""
+        super().showEvent(event)
+        self.render_scheduler.flush()
+
     def resizeEvent(self, event):
         """Handle window resize events."""
         super().resizeEvent(event)
@@ -0,0 +1,83 @@
+"""
+Render scheduler that coalesces visualization updates into display frames.
+"""
+import time
+from PyQt5.QtCore import QTimer
+
+from ...utils.config import VISUALIZATION_FRAME_INTERVAL_MS, VISUALIZATION_COALESCE_UPDATES
+
+
+class RenderScheduler:
+    """Marks the 3D scene dirty and redraws it at most once per display frame."""
+
+    def __init__(self, parent):
+        """Initialize the render scheduler with reference to the parent panel."""
+        self.parent = parent
+        self.coalesce = VISUALIZATION_COALESCE_UPDATES
+        self.dirty = False
+
+        # Single-shot timer so a burst of requests collapses into one frame
+        self.timer = QTimer(parent)
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(VISUALIZATION_FRAME_INTERVAL_MS)
+        self.timer.timeout.connect(self.render_frame)
+
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Reset the render statistics counters."""
+        self.request_count = 0
+        self.frame_count = 0
+        self.hidden_skip_count = 0
+        self.render_time_total = 0.0
+        self.render_time_max = 0.0
+
+    def request_update(self):
+        """Mark the scene dirty and schedule a redraw for the next frame."""
+        self.request_count += 1
+        self.dirty = True
+
+        if not self.coalesce:
+            # Legacy behaviour: redraw immediately for every request
+            self.render_frame()
+        elif not self.timer.isActive():
+            self.timer.start()
+
+    def flush(self):
+        """Render a pending frame right away, e.g. when the tab becomes visible."""
+        if self.dirty:
+            self.timer.stop()
+            self.render_frame()
+
+    def render_frame(self):
+        """Recompute the scene transforms if anything changed since the last frame."""
+        if not self.dirty:
+            return
+
+        # Nothing to draw while the 3D tab is hidden; keep the scene dirty until shown
+        if not self.parent.isVisible():
+            self.hidden_skip_count += 1
+            # The trail still follows every pose so it has no gaps when the tab is shown
+            self.parent.model_ctrl.record_trail_point()
+            return
+
+        self.dirty = False
+        start = time.perf_counter()
+        self.parent.model_ctrl.update_visualization()
+        elapsed = time.perf_counter() - start
+
+        self.frame_count += 1
+        self.render_time_total += elapsed
+        self.render_time_max = max(self.render_time_max, elapsed)
+
+    def stats(self):
+        """Get a dictionary with the GUI thread time spent on visualization."""
+        average = self.render_time_total / self.frame_count if self.frame_count else 0.0
+        return {
+            'requests': self.request_count,
+            'frames': self.frame_count,
+            'hidden_skips': self.hidden_skip_count,
+            'render_time_total_ms': self.render_time_total * 1000,
+            'render_time_avg_ms': average * 1000,
+            'render_time_max_ms': self.render_time_max * 1000,
+        }
@@ -7,7 +7,7 @@ from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout, QGr
 from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
 
-from ...utils.config import SLAVE_IDS
+from ...utils.config import SLAVE_IDS, VISUALIZATION_DRY_RUN_MAX_SPEED
 
 
 class UIBuilder:
@@ -273,6 +273,10 @@ class UIBuilder:
         view_group = self._create_view_controls_group()
         control_layout.addWidget(view_group)
 
+        # Add sequence dry run section
+        dry_run_group = self._create_dry_run_group()
+        control_layout.addWidget(dry_run_group)
+
         # Add stretch to push everything to the top
         control_layout.addStretch()
 
@@ -535,4 +539,106 @@ class UIBuilder:
         view_layout.addWidget(self.front_view_cb)
         view_layout.addWidget(self.isometric_view_cb)
 
+        self.batched_mesh_cb = QCheckBox("Batched Mesh Rendering")
+        self.batched_mesh_cb.setToolTip("Draw the whole mechanism as one mesh instead of separate boxes")
+        self.batched_mesh_cb.setChecked(self.parent.model_ctrl.batched_mesh)
+        self.batched_mesh_cb.toggled.connect(self.parent.model_ctrl.set_batched_mesh)
+        view_layout.addWidget(self.batched_mesh_cb)
+
+        self.motion_trail_cb = QCheckBox("Show Motion Trail")
+        self.motion_trail_cb.setToolTip("Draw the path of the gripper tip over the last moves")
+        self.motion_trail_cb.setChecked(self.parent.model_ctrl.trail_enabled)
+        self.motion_trail_cb.toggled.connect(self.parent.model_ctrl.set_trail_enabled)
+        view_layout.addWidget(self.motion_trail_cb)
+
+        load_layout = QHBoxLayout()
+        self.pallet_load_cb = QCheckBox("Show Pallet Load")
+        self.pallet_load_cb.setToolTip("Draw the boxes put down by the gripper")
+        self.pallet_load_cb.setChecked(self.parent.model_ctrl.load_enabled)
+        self.pallet_load_cb.toggled.connect(self.parent.model_ctrl.set_pallet_load_enabled)
+        clear_load_btn = QPushButton("Clear")
+        clear_load_btn.clicked.connect(self.parent.model_ctrl.clear_pallet_load)
+        load_layout.addWidget(self.pallet_load_cb)
+        load_layout.addWidget(clear_load_btn)
+        view_layout.addLayout(load_layout)
+
         return view_group
+
+    def _create_dry_run_group(self):
+        """Create the sequence dry run group."""
+        dry_run = self.parent.dry_run
+        dry_run_group = QGroupBox("Sequence Dry Run")
+        dry_run_group.setToolTip("Play the loaded sequence in the 3D view; nothing is sent to the machine")
+        dry_run_layout = QVBoxLayout(dry_run_group)
+        dry_run_layout.setSpacing(5)
+
+        buttons_layout = QHBoxLayout()
+        self.dry_run_load_btn = QPushButton("Load Sequence")
+        self.dry_run_load_btn.clicked.connect(dry_run.load)
+        self.dry_run_play_btn = QPushButton("Play")
+        self.dry_run_play_btn.setStyleSheet("background-color: #ccffcc;")
+        self.dry_run_play_btn.clicked.connect(dry_run.toggle_play)
+        self.dry_run_stop_btn = QPushButton("Stop")
+        self.dry_run_stop_btn.setStyleSheet("background-color: #ffcccc;")
+        self.dry_run_stop_btn.clicked.connect(dry_run.stop)
+        buttons_layout.addWidget(self.dry_run_load_btn)
+        buttons_layout.addWidget(self.dry_run_play_btn)
+        buttons_layout.addWidget(self.dry_run_stop_btn)
+        dry_run_layout.addLayout(buttons_layout)
+
+        speed_layout = QHBoxLayout()
+        speed_layout.addWidget(QLabel("Speed:"))
+        self.dry_run_speed_input = QSpinBox()
+        self.dry_run_speed_input.setRange(1, VISUALIZATION_DRY_RUN_MAX_SPEED)
+        self.dry_run_speed_input.setSuffix("\u00d7")
+        self.dry_run_speed_input.setValue(dry_run.speed)
+        self.dry_run_speed_input.valueChanged.connect(dry_run.set_speed)
+        speed_layout.addWidget(self.dry_run_speed_input)
+        speed_layout.addStretch()
+        dry_run_layout.addLayout(speed_layout)
+
+        # Scrub slider in milliseconds of sequence time
+        self.dry_run_slider = QSlider(Qt.Horizontal)
+        self.dry_run_slider.setRange(0, 0)
+        self.dry_run_slider.valueChanged.connect(lambda v: dry_run.seek(v / 1000))
+        dry_run_layout.addWidget(self.dry_run_slider)
+
+        self.dry_run_time_label = QLabel("No sequence loaded")
+        self.dry_run_time_label.setStyleSheet("font-family: monospace;")
+        dry_run_layout.addWidget(self.dry_run_time_label)
+
+        row_layout = QHBoxLayout()
+        row_layout.addWidget(QLabel("Row:"))
+        self.dry_run_row_input = QSpinBox()
+        self.dry_run_row_input.setRange(1, 1)
+        row_layout.addWidget(self.dry_run_row_input)
+        self.dry_run_row_btn = QPushButton("Go to Row")
+        self.dry_run_row_btn.clicked.connect(lambda: dry_run.jump_to_row(self.dry_run_row_input.value()))
+        row_layout.addWidget(self.dry_run_row_btn)
+        dry_run_layout.addLayout(row_layout)
+
+        self.set_dry_run_loaded(0, 0.0)
+        return dry_run_group
+
+    def set_dry_run_loaded(self, row_count, duration):
+        """Size the dry run controls for a loaded sequence, or disable them with none loaded."""
+        loaded = row_count > 0
+        self.dry_run_slider.blockSignals(True)
+        self.dry_run_slider.setRange(0, int(duration * 1000))
+        self.dry_run_slider.setValue(0)
+        self.dry_run_slider.blockSignals(False)
+        self.dry_run_row_input.setRange(1, max(row_count, 1))
+        for widget in (self.dry_run_slider, self.dry_run_stop_btn, self.dry_run_row_input, self.dry_run_row_btn):
+            widget.setEnabled(loaded)
+        if not loaded:
+            self.dry_run_time_label.setText("No sequence loaded")
+
+    def set_dry_run_playing(self, playing):
+        self.dry_run_play_btn.setText("Pause" if playing else "Play")
+
+    def show_dry_run_time(self, seconds, duration, row, row_count):
+        """Show the dry run position without feeding it back into a seek."""
+        self.dry_run_slider.blockSignals(True)
+        self.dry_run_slider.setValue(int(seconds * 1000))
+        self.dry_run_slider.blockSignals(False)
+        self.dry_run_time_label.setText(f"{seconds:6.1f} / {duration:.1f} s   row {row}/{row_count}")
@@ -0,0 +1,136 @@
+"""
+Software wireframe renderer of the mechanism, for machines without an OpenGL context.
+
+Projects the same box edges as the batched mesh with the camera model of
+GLViewWidget and draws them with QPainter onto a QImage.
+"""
+import numpy as np
+from PyQt5.QtCore import Qt, QLineF
+from PyQt5.QtGui import QImage, QPainter, QPen, QColor
+
+from . import geometry
+from .camera_controls import VIEW_PRESETS
+
+GRID_SIZE = 2000
+GRID_SPACING = 100
+GRID_COLOR = (215, 215, 215, 255)
+TRAIL_COLOR = (230, 100, 0, 255)
+
+
+def rotation_matrix(angle, axis):
+    """4x4 rotation by angle degrees around axis, like QMatrix4x4.rotate"""
+    x, y, z = np.asarray(axis, dtype=float) / np.linalg.norm(axis)
+    c, s = np.cos(np.radians(angle)), np.sin(np.radians(angle))
+    matrix = np.identity(4)
+    matrix[:3, :3] = [
+        [x * x * (1 - c) + c, x * y * (1 - c) - z * s, x * z * (1 - c) + y * s],
+        [y * x * (1 - c) + z * s, y * y * (1 - c) + c, y * z * (1 - c) - x * s],
+        [z * x * (1 - c) - y * s, z * y * (1 - c) + x * s, z * z * (1 - c) + c],
+    ]
+    return matrix
+
+
+def translation_matrix(x, y, z):
+    matrix = np.identity(4)
+    matrix[:3, 3] = (x, y, z)
+    return matrix
+
+
+def view_matrix(distance, elevation, azimuth, center=(0, 0, 0)):
+    """World to eye transform, the same as GLViewWidget.viewMatrix with euler rotation"""
+    return (translation_matrix(0, 0, -distance)
+            @ rotation_matrix(elevation - 90, (1, 0, 0))
+            @ rotation_matrix(azimuth + 90, (0, 0, -1))
+            @ translation_matrix(-center[0], -center[1], -center[2]))
+
+
+class WireframeRenderer:
+    """Draws grid, axes and mechanism edges for given axis positions at a fixed image size."""
+
+    def __init__(self, width, height, rail_lengths, relative_positions, view='isometric', fov=60,
+                 background=(255, 255, 255)):
+        self.width = width
+        self.height = height
+        self.rail_lengths = rail_lengths
+        self.relative_positions = relative_positions
+        self.background = QColor(*background)
+        self.fov = fov
+        self.set_camera(*VIEW_PRESETS[view])
+
+        self.mechanism_pens = [QPen(QColor(*geometry.COMPONENT_COLORS[name]), 1)
+                               for name in geometry.COMPONENT_NAMES]
+        # Component outlines are light grays meant for a GL view; darken them for a flat image
+        for pen in self.mechanism_pens:
+            pen.setColor(pen.color().darker(160))
+        self.static_lines = self._static_lines()
+
+    def set_camera(self, distance, elevation, azimuth, center=(0, 0, 0)):
+        self.view = view_matrix(distance, elevation, azimuth, center)
+        self.near = distance * 0.001
+        self.focal = 1.0 / np.tan(np.radians(self.fov) / 2)
+
+    def project(self, points):
+        """Pixel coordinates of (N, 3) world points and whether they are in front of the camera"""
+        points = np.asarray(points, dtype=float)
+        eye = points @ self.view[:3, :3].T + self.view[:3, 3]
+        depth = -eye[:, 2]
+        visible = depth > self.near
+        depth = np.where(visible, depth, 1.0)
+
+        # Horizontal field of view, as in GLViewWidget.projectionMatrix
+        x = eye[:, 0] / depth * self.focal
+        y = eye[:, 1] / depth * self.focal * self.width / self.height
+        pixels = np.empty((len(points), 2))
+        pixels[:, 0] = (x + 1) * 0.5 * self.width
+        pixels[:, 1] = (1 - y) * 0.5 * self.height
+        return pixels, visible
+
+    def _static_lines(self):
+        """(vertices, pen) pairs of the grid and the axis lines"""
+        half = GRID_SIZE / 2
+        ticks = np.arange(-half, half + GRID_SPACING, GRID_SPACING)
+        grid = []
+        for tick in ticks:
+            grid += [(tick, -half, 0), (tick, half, 0), (-half, tick, 0), (half, tick, 0)]
+
+        x_length = self.rail_lengths['x']
+        y_length = self.rail_lengths['y']
+        z_length = self.rail_lengths['z']
+        return [
+            (np.array(grid), QPen(QColor(*GRID_COLOR), 1)),
+            (np.array([[0, 0, 0], [-x_length / 2, 0, 0]]), QPen(Qt.red, 2)),
+            (np.array([[0, 0, 0], [0, -y_length, 0]]), QPen(Qt.green, 2)),
+            (np.array([[0, 0, 0], [0, 0, z_length / 2]]), QPen(Qt.blue, 2)),
+        ]
+
+    def _draw_segments(self, painter, vertices, pen):
+        """Draw vertex pairs as line segments, skipping those behind the camera"""
+        pixels, visible = self.project(vertices)
+        pixels = pixels.reshape(-1, 4)
+        keep = visible.reshape(-1, 2).all(axis=1)
+        painter.setPen(pen)
+        painter.drawLines([QLineF(*segment) for segment in pixels[keep]])
+
+    def render(self, positions, trail=None):
+        """QImage of the mechanism at the given axis positions; trail is an (N, 3) array of tip points"""
+        image = QImage(self.width, self.height, QImage.Format_ARGB32)
+        image.fill(self.background)
+        painter = QPainter(image)
+        painter.setRenderHint(QPainter.Antialiasing)
+
+        for vertices, pen in self.static_lines:
+            self._draw_segments(painter, vertices, pen)
+
+        poses = geometry.compute_component_poses(positions, self.rail_lengths, self.relative_positions)
+        edges = geometry.mechanism_edge_vertices(poses)
+        per_component = len(geometry.BOX_EDGES) * 2
+        for index, pen in enumerate(self.mechanism_pens):
+            self._draw_segments(painter, edges[index * per_component:(index + 1) * per_component], pen)
+
+        if trail is not None and len(trail) > 1:
+            # Line strip as segments between consecutive points
+            segments = np.repeat(trail, 2, axis=0)[1:-1]
+            self._draw_segments(painter, segments, QPen(QColor(*TRAIL_COLOR), 2))
+
+        painter.end()
+        return image
@@ -6,6 +6,62 @@ DEFAULT_BAUDRATE = 9600
 # Available baudrates
 BAUDRATES = [9600, 19200, 38400, 57600, 115200]
 
+# Serial link loop interval (seconds) when there is nothing to send
+SERIAL_POLL_INTERVAL = 0.01
+
+# Automatic reconnect after the link drops (exponential backoff, seconds)
+SERIAL_AUTO_RECONNECT = True
+SERIAL_RECONNECT_INITIAL_DELAY = 0.25
+SERIAL_RECONNECT_MAX_DELAY = 5.0
+SERIAL_RECONNECT_TIMEOUT = 120.0  # Give up after this long without a link
+
+# Binary framed protocol (see palletizer/binary_protocol.py); negotiated on connect, text if the device does not answer
+SERIAL_BINARY_PROTOCOL = False
+
+# Link benchmark (python -m palletizer.link_benchmark)
+LINK_BENCHMARK_LINES = 200  # Probe lines per baud rate in the throughput phase
+LINK_BENCHMARK_LATENCY_LINES = 50  # Probe lines sent one at a time for the round-trip latency
+LINK_BENCHMARK_WINDOW = 4  # Probe lines in flight in the throughput phase
+LINK_BENCHMARK_TIMEOUT_S = 2.0  # A probe not echoed within this time counts as lost
+LINK_BENCHMARK_SIM_TURNAROUND_S = 0.002  # Parse time of the built-in loopback device per line
+
+# Run the serial link in a separate process, exchanging data through shared-memory ring buffers
+SERIAL_LINK_PROCESS = False
+LINK_RING_CAPACITY = 1 << 20  # Bytes per direction
+
+# asyncio link: step interval when the asyncio loop is driven by a Qt timer (qasync not installed)
+ASYNCIO_QT_STEP_MS = 5
+
+# Dual-arm RS485 link to the V1.3 arm controllers (see palletizer/dual_arm_protocol.py); the retry
+# window matches the central state machine (BUSY_RESPONSE_TIMEOUT, MAX_RETRY_COUNT, RETRY_DELAY)
+DUAL_ARM_BAUDRATE = 9600
+# The controllers keep RS485 receive-only (RE/DE tied to GND), so by default a command is taken as done
+# after its estimated time ("open_loop"); "status" waits for BUSY/READY frames from a bridge on the bus
+DUAL_ARM_COMPLETION = "open_loop"
+DUAL_ARM_OPEN_LOOP_MARGIN = 1.25  # Open loop: the estimated action time is stretched by this factor
+DUAL_ARM_ACK_TIMEOUT_S = 0.5  # An arm that has not answered BUSY by then gets the frame again
+DUAL_ARM_MAX_RETRIES = 7  # Resends before the arm is put in the error state
+DUAL_ARM_RETRY_DELAY_S = 0.2  # Pause before a resend
+DUAL_ARM_MOVE_TIMEOUT_S = 15.0  # A taken command must report READY within this time (MOVE_TIMEOUT)
+DUAL_ARM_STATUS_REPEAT_S = 0.4  # Status frames are repeated this often, within DUAL_ARM_ACK_TIMEOUT_S
+
+# Dual-arm dispatcher (python -m palletizer.dual_arm_scheduler). Arm motion as PalletizerArmDriver and
+# PalletizerArmControl run it, cell timing as the central state machine
+DUAL_ARM_AXIS_SPEED = 4000  # Steps/s of every axis (MOVE_MAX_SPEED with the fast speed jumper)
+DUAL_ARM_ACCELERATION_RATIO = 0.5  # MOVE_ACCELERATION = MOVE_MAX_SPEED * 0.5
+DUAL_ARM_HOMING_SPEED = 300  # Steps/s while zeroing for CALIBRATION (MOVE_HOME_SPEED)
+DUAL_ARM_STEP_GAP_S = 0.15  # Between the motor steps of an action (MOTOR_STABILIZE_MS, MIN_COMMAND_INTERVAL_MS)
+DUAL_ARM_DISPATCH_S = 0.1  # Frame on the bus until the arm starts moving
+DUAL_ARM_PARK_STEP_S = 2.0  # Each PARK step takes at least this long (PARK_SEQUENCE_DELAY_MS)
+DUAL_ARM_LAYERS = 11  # Layers per pallet, 8 products each per arm (Ly)
+DUAL_ARM_CALIBRATE_EVERY = 64  # Commands between calibrations (32 products)
+DUAL_ARM_CONVEYOR_OFF_S = 3.0  # Conveyor stop after each pick (CONVEYOR_OFF_DURATION)
+DUAL_ARM_CENTRE_CLEARANCE_S = 0.5  # From the start of the move away with a product until the centre is clear
+DUAL_ARM_SCHEDULER_SAFETY_S = 0.5  # 'anticipate' policy: reach the centre this long after it is expected clear
+
+# Interval for checking serial port hotplug events
+PORT_HOTPLUG_POLL_MS = 1000
+
 # Default slave IDs
 SLAVE_IDS = ['x', 'y', 'z', 't', 'g']
 
@@ -13,6 +69,9 @@ SLAVE_IDS = ['x', 'y', 'z', 't', 'g']
 WINDOW_TITLE = "Palletizer Control System"
 WINDOW_GEOMETRY = (100, 100, 1280, 720)
 
+# Startup settings
+STARTUP_BUDGET_MS = 3000  # Cold start budget enforced by benchmarks/startup_benchmark.py
+
 # Speed settings
 MIN_SPEED = 1000
 MAX_SPEED = 10000
@@ -32,6 +91,109 @@ CMD_RESUME = "RESUME"
 CMD_RESET = "RESET"
 CMD_SPEED_FORMAT = "SPEED;{};{}"  # SPEED;slave_id;speed_value
 
+# Feedback from the master when every slave has completed the current row
+COMPLETE_FEEDBACK = "ALL_SLAVES_COMPLETED"
+
+# Commands sent through the high-priority transmit lane, ahead of queued rows
+PRIORITY_COMMANDS = [CMD_PAUSE, CMD_RESET]
+PRIORITY_FLUSH_ON_RESET = True  # Drop queued rows when RESET/STOP is sent
+
+# Motion model used to estimate row durations (matches the slave firmware)
+MOTION_DEFAULT_SPEED = DEFAULT_SPEED  # steps/s until a SPEED command is sent
+MOTION_ACCELERATION_RATIO = 0.6  # acceleration = speed * ratio (SPEED_RATIO in StepperSlave.h)
+
+# Row completion watchdog: deadline = estimate * (1 + ratio) + margin, at least the minimum
+SLAVE_COMPLETED_MESSAGE = "SEQUENCE COMPLETED"
+ROW_WATCHDOG_ENABLED = True
+ROW_WATCHDOG_MARGIN_RATIO = 0.5
+ROW_WATCHDOG_MARGIN_S = 2.0
+ROW_WATCHDOG_MIN_TIMEOUT_S = 3.0
+ROW_WATCHDOG_AUTO_PAUSE = False  # Send PAUSE when a row times out
+
+# Resume an interrupted run from the first unacknowledged row once the link is back
+SEQUENCE_AUTO_RESUME = True
+SEQUENCE_RESUME_SETTLE_MS = 1500  # Link must stay up this long before the run resumes
+
+# Fleet view (several machines in one process)
+FLEET_REFRESH_MS = 500  # Summary table refresh interval
+FLEET_THROUGHPUT_WINDOW_S = 300  # Rows/min is averaged over this window
+FLEET_ALARM_HISTORY = 50  # Alarms kept per machine
+
+# Telemetry WebSocket server (positions, machine state and row progress for dashboards)
+TELEMETRY_ENABLED = False
+TELEMETRY_HOST = "127.0.0.1"  # Local only; use "0.0.0.0" to serve other machines
+TELEMETRY_PORT = 8765
+TELEMETRY_DEFAULT_RATE_HZ = 10  # Updates per second per client; clients may ask for ?rate=N
+TELEMETRY_MAX_RATE_HZ = 50
+TELEMETRY_MAX_CLIENTS = 16
+TELEMETRY_MAX_CLIENT_BUFFER = 64 * 1024  # Bytes unsent to a client before its updates are skipped
+
+# Runtime metrics (see palletizer/utils/metrics.py)
+METRICS_ENABLED = True
+METRICS_HISTOGRAM_SUB_BUCKET_BITS = 6  # 32 linear sub-buckets per power of two, < 3.2% error
+METRICS_STATUS_INTERVAL_MS = 1000  # Status bar summary refresh
+METRICS_LAG_INTERVAL_MS = 100  # GUI event loop lag probe interval
+METRICS_HTTP_ENABLED = False  # Serve /metrics and /metrics.json for scraping
+METRICS_HTTP_HOST = "127.0.0.1"
+METRICS_HTTP_PORT = 9108
+METRICS_DUMP_PATH = None  # e.g. "metrics.json" to write all metrics periodically
+METRICS_DUMP_INTERVAL_S = 60
+
+# Position history: confirmed axis positions and machine state in hourly memory-mapped files
+# (see palletizer/position_store.py)
+POSITION_STORE_ENABLED = False
+POSITION_STORE_DIR = "position_history"  # Per-machine subdirectories in the fleet view
+POSITION_STORE_SEGMENT_S = 3600  # One segment file per hour
+POSITION_STORE_SEGMENT_ROWS = 360000  # Rows per segment (100 per second for an hour); more continue in a new file
+
+# Position history plot: in-memory ring with min/max decimation levels (see palletizer/position_history.py)
+POSITION_HISTORY_ENABLED = True
+POSITION_HISTORY_RAW_ROWS = 65536  # Last rows kept at full resolution
+POSITION_HISTORY_BUCKET_S = 0.1  # Bucket width of the finest decimation level
+POSITION_HISTORY_LEVEL_FACTOR = 4  # Each level has buckets this many times wider
+POSITION_HISTORY_LEVELS = 9  # 0.1 s up to 1.8 h buckets
+POSITION_HISTORY_LEVEL_BUCKETS = 4096  # Per level: 7 minutes at 0.1 s, 300 days at the coarsest
+POSITION_HISTORY_REFRESH_MS = 250  # Plot redraw interval while new rows arrive
+
+# GUI event loop stall diagnostics (see palletizer/utils/loop_monitor.py, or run main.py --diagnose-stalls)
+LOOP_MONITOR_DIAGNOSTICS = False  # Time every slot connected in the panels and capture the stack of stalls
+LOOP_MONITOR_STALL_THRESHOLD_MS = 250  # Heartbeat silence that counts as a stall
+LOOP_MONITOR_STALL_HISTORY = 50  # Stalls kept for the report
+
+# 3D visualization settings
+VISUALIZATION_FRAME_INTERVAL_MS = 16  # Redraw the scene at most once per display frame (~60 FPS)
+VISUALIZATION_COALESCE_UPDATES = True  # False redraws on every position update (legacy behaviour)
+VISUALIZATION_BATCHED_MESH = False  # Draw the mechanism as one batched mesh instead of separate boxes
+VISUALIZATION_MOTION_TRAIL = False  # Show the path of the gripper tip
+VISUALIZATION_TRAIL_POINTS = 2048  # Gripper tip positions kept in the trail
+VISUALIZATION_PALLET_LOAD = True  # Show the boxes placed by the gripper
+VISUALIZATION_PALLET_LOAD_BOXES = 256  # Boxes allocated up front; the mesh grows beyond that as needed
+VISUALIZATION_DRY_RUN_MAX_SPEED = 50  # Fastest dry-run playback, as a multiple of real time
+
+# Headless sequence rendering (python -m palletizer.headless_render)
+HEADLESS_RENDER_SIZE = (1280, 720)  # Frame size in pixels
+HEADLESS_RENDER_FPS = 30  # Frames per second of output
+HEADLESS_RENDER_SPEED = 1.0  # Sequence seconds per output second
+HEADLESS_RENDER_BACKEND = 'auto'  # 'gl', 'wireframe', or 'auto' (OpenGL with wireframe fallback)
+HEADLESS_RENDER_VIEW = 'isometric'  # Camera preset of the rendered frames
+HEADLESS_RENDER_TRAIL = True  # Draw the gripper path in the rendered frames
+HEADLESS_RENDER_FIT_CAMERA = True  # Frame the whole sequence instead of using the view preset distance
+
+# Workspace model for the collision checker (python -m palletizer.collision), in machine steps.
+# X and Y are horizontal, Z grows downward from the top of the Z rail, T steps / 10 = degrees
+WORKSPACE_AXIS_LIMITS = {'x': (0, 20000), 'y': (0, 20000), 'z': (0, 9000), 't': (-3600, 3600), 'g': (0, 1000)}
+WORKSPACE_T_STEPS_PER_DEGREE = 10
+WORKSPACE_GRIP_CLOSED = 500  # G position from which the gripper holds a box
+WORKSPACE_GRIPPER_SIZE = (1200, 600, 1500)  # Gripper footprint around the tool point and height above it
+WORKSPACE_CARRIAGE_SIZE = (800, 800)  # Footprint of the Z carriage column above the gripper
+WORKSPACE_BOX_SIZE = (1000, 1000, 1500)  # Carried box footprint and height below the tool point
+WORKSPACE_OBSTACLES = {  # name -> ((min x, min y, min z), (max x, max y, max z))
+    'pallet': ((4000, 13000, 8800), (9000, 19000, 9500)),
+    'pick_conveyor': ((-1000, 5000, 8500), (1000, 7000, 9500)),
+}
+WORKSPACE_CONTACT_TOLERANCE = 1  # Overlap (steps) that still counts as touching, e.g. a box set on the pallet
+WORKSPACE_SAMPLE_S = 0.05  # Time between sampled poses of a move
+
 # Style sheets
 STATUS_IDLE = "color: blue; font-weight: bold;"
 STATUS_MOVING = "color: green; font-weight: bold;"
@@ -0,0 +1,370 @@
+# GUI event loop monitor: heartbeat lag, stall detection with stack capture and per-slot timings
+import collections
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+from palletizer.utils.config import (METRICS_LAG_INTERVAL_MS, LOOP_MONITOR_DIAGNOSTICS,
+                                     LOOP_MONITOR_STALL_THRESHOLD_MS, LOOP_MONITOR_STALL_HISTORY)
+from palletizer.utils.metrics import METRICS
+
+
+def slot_name(slot):
+    """Readable name of a slot: Class.method, a function name, or a lambda with its line"""
+    if isinstance(slot, functools.partial):
+        return slot_name(slot.func)
+    func = getattr(slot, '__func__', slot)
+    owner = getattr(slot, '__self__', None)
+    if owner is not None and hasattr(func, '__name__'):
+        return f"{type(owner).__name__}.{func.__name__}"
+    code = getattr(func, '__code__', None)
+    if code is not None and func.__name__ == '<lambda>':
+        return f"{func.__qualname__.replace('.<locals>.', ' ')}:{code.co_firstlineno}"
+    return getattr(func, '__qualname__', repr(slot))
+
+
+def slot_module(slot):
+    """Module that defines a slot, or None for a C++ method"""
+    if isinstance(slot, functools.partial):
+        return slot_module(slot.func)
+    return getattr(getattr(slot, '__func__', slot), '__module__', None)
+
+
+def positional_arg_count(slot):
+    """
+    Number of positional arguments a slot accepts, or None for any number.
+    PyQt drops signal arguments a slot does not take; the timing wrapper
+    takes *args, so it has to do the same.
+    """
+    try:
+        parameters = inspect.signature(slot).parameters.values()
+    except (TypeError, ValueError):
+        return None
+    count = 0
+    for parameter in parameters:
+        if parameter.kind == parameter.VAR_POSITIONAL:
+            return None
+        if parameter.kind in (parameter.POSITIONAL_ONLY, parameter.POSITIONAL_OR_KEYWORD):
+            count += 1
+    return count
+
+
+class SlotTiming:
+    """Call count and duration aggregates of one slot"""
+    __slots__ = ('name', 'count', 'total', 'max', 'histogram')
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.histogram = METRICS.histogram("palletizer_gui_slot_seconds",
+                                           "Time spent in a GUI slot (diagnostic mode)", {'slot': name})
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.histogram.record(seconds)
+
+
+class LoopMonitor:
+    """
+    Watches the GUI event loop. A heartbeat timer records how late it fires
+    (the time the loop was busy with something else). In diagnostic mode a
+    watchdog thread notices when the heartbeat stops for longer than the stall
+    threshold and captures the GUI thread's stack while it is still stuck, and
+    every application slot is timed.
+
+    Slots are timed in one place: enable_diagnostics() hooks signal.connect(),
+    so the panels keep their plain connect() calls. It has to be called before
+    the window is built, since slots are wrapped when they are connected.
+    Without diagnostic mode nothing is wrapped.
+    """
+
+    def __init__(self, diagnostics=LOOP_MONITOR_DIAGNOSTICS, stall_threshold_ms=LOOP_MONITOR_STALL_THRESHOLD_MS):
+        self.diagnostics = diagnostics
+        self.stall_threshold = stall_threshold_ms / 1000
+        self.interval = METRICS_LAG_INTERVAL_MS / 1000
+        self.timer = None
+        self.lag_metric = None
+        self.stall_metric = None
+        self.last_beat = None
+        self.gui_thread_id = None
+
+        self.slot_timings = {}  # slot name -> SlotTiming
+        self.slot_stack = []    # Names of the instrumented slots running on the GUI thread
+        self.timed_slots = {}   # slot -> its timing wrapper, so disconnect(slot) still finds it
+        self.plain_connect = None
+        self.plain_disconnect = None
+        self.stalls = collections.deque(maxlen=LOOP_MONITOR_STALL_HISTORY)
+        self.stall_count = 0
+        self.stall_listeners = []
+
+        self.lock = threading.Lock()
+        self.pending_stall = None  # Stall captured by the watchdog, completed by the next heartbeat
+        self.watchdog = None
+        self.watchdog_stop = threading.Event()
+
+    def enable_diagnostics(self, stall_threshold_ms=None):
+        """Turn on slot timing and stall capture; call before the panels are created"""
+        self.diagnostics = True
+        if stall_threshold_ms is not None:
+            self.stall_threshold = stall_threshold_ms / 1000
+        self.install_connect_hook()
+
+    def add_stall_listener(self, callback):
+        """callback(stall) is called on the GUI thread once a stall has ended"""
+        self.stall_listeners.append(callback)
+
+    # Slot instrumentation
+
+    def slot_timing(self, name):
+        timing = self.slot_timings.get(name)
+        if timing is None:
+            timing = self.slot_timings[name] = SlotTiming(name)
+        return timing
+
+    def wrap(self, slot, name=None):
+        """Wrap a slot so its calls are timed and show up in stall reports"""
+        timing = self.slot_timing(name or slot_name(slot))
+        arg_count = positional_arg_count(slot)
+        stack = self.slot_stack
+
+        def timed_slot(*args):
+            if arg_count is not None:
+                args = args[:arg_count]
+            stack.append(timing.name)
+            start = time.perf_counter()
+            try:
+                return slot(*args)
+            finally:
+                timing.record(time.perf_counter() - start)
+                stack.pop()
+
+        return timed_slot
+
+    def timed_slot(self, slot):
+        """
+        The wrapper to connect in place of slot, or slot itself when it is not
+        timed: signals, C++ methods, code outside the application, and slots of
+        objects on another thread, which a wrapper would move to the GUI thread.
+        """
+        from PyQt5.QtCore import QObject, QThread
+
+        if hasattr(slot, 'emit') or not (slot_module(slot) or "").startswith("palletizer"):
+            return slot
+        if threading.current_thread() is not threading.main_thread():
+            return slot
+        owner = getattr(slot, '__self__', None)
+        if owner is self:
+            return slot  # The heartbeat
+        if isinstance(owner, QObject) and owner.thread() is not QThread.currentThread():
+            return slot
+
+        try:
+            wrapper = self.timed_slots.get(slot)
+        except TypeError:
+            return slot  # Unhashable callable
+        if wrapper is None:
+            wrapper = self.timed_slots[slot] = self.wrap(slot)
+        return wrapper
+
+    def install_connect_hook(self):
+        """Replace pyqtBoundSignal.connect/disconnect so every slot connected from now on is timed"""
+        from PyQt5.QtCore import pyqtBoundSignal
+
+        if self.plain_connect is not None:
+            return
+        self.plain_connect = pyqtBoundSignal.connect
+        self.plain_disconnect = pyqtBoundSignal.disconnect
+        monitor = self
+
+        def connect(signal, slot, *args, **kwargs):
+            return monitor.plain_connect(signal, monitor.timed_slot(slot), *args, **kwargs)
+
+        def disconnect(signal, *args):
+            if args:
+                try:
+                    args = (monitor.timed_slots.get(args[0], args[0]),) + args[1:]
+                except TypeError:
+                    pass
+            return monitor.plain_disconnect(signal, *args)
+
+        pyqtBoundSignal.connect = connect
+        pyqtBoundSignal.disconnect = disconnect
+
+    def instrument_method(self, owner, attribute, name=None):
+        """Time every call of owner.attribute (e.g. MonitorPanel.add_log) in diagnostic mode"""
+        if not self.diagnostics:
+            return
+        method = getattr(owner, attribute)
+        if getattr(method, 'loop_monitor_wrapped', False):
+            return
+        timing = self.slot_timing(name or f"{owner.__name__}.{attribute}")
+        stack = self.slot_stack
+
+        @functools.wraps(method)
+        def timed_method(*args, **kwargs):
+            stack.append(timing.name)
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timing.record(time.perf_counter() - start)
+                stack.pop()
+
+        timed_method.loop_monitor_wrapped = True
+        setattr(owner, attribute, timed_method)
+
+    # Heartbeat and stall watchdog
+
+    def start(self, parent):
+        """Start the heartbeat on the GUI thread, and the watchdog in diagnostic mode"""
+        from PyQt5.QtCore import QTimer
+
+        if self.timer is not None:
+            return
+        self.lag_metric = METRICS.histogram(
+            "palletizer_gui_loop_lag_seconds", "Delay of a GUI timer beyond its interval")
+        self.stall_metric = METRICS.counter(
+            "palletizer_gui_stalls_total", "GUI event loop stalls longer than the stall threshold")
+        self.gui_thread_id = threading.get_ident()
+        self.last_beat = time.perf_counter()
+
+        # A timer that fires late measures how long the event loop was busy
+        self.timer = QTimer(parent)
+        self.timer.timeout.connect(self.on_heartbeat)
+        self.timer.start(int(self.interval * 1000))
+
+        if self.diagnostics:
+            self.watchdog_stop.clear()
+            self.watchdog = threading.Thread(target=self.run_watchdog, name="loop-monitor", daemon=True)
+            self.watchdog.start()
+
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+            self.timer = None
+        self.watchdog_stop.set()
+        if self.watchdog is not None:
+            self.watchdog.join(1.0)
+            self.watchdog = None
+
+    def on_heartbeat(self):
+        now = time.perf_counter()
+        lag = max(0.0, now - self.last_beat - self.interval)
+        self.lag_metric.record(lag)
+
+        with self.lock:
+            self.last_beat = now
+            stall, self.pending_stall = self.pending_stall, None
+
+        if stall is not None:
+            stall['duration_ms'] = lag * 1000
+            self.stalls.append(stall)
+            self.stall_count += 1
+            self.stall_metric.inc()
+            for callback in self.stall_listeners:
+                callback(stall)
+
+    def run_watchdog(self):
+        check_interval = min(self.interval, self.stall_threshold) / 4
+        captured_beat = None
+        while not self.watchdog_stop.wait(check_interval):
+            beat = self.last_beat
+            stalled = time.perf_counter() - beat - self.interval
+            if stalled < self.stall_threshold or beat == captured_beat:
+                continue
+            captured_beat = beat
+            stall = self.capture_stall(stalled)
+            with self.lock:
+                # The loop may have recovered while the stack was captured
+                if self.last_beat == beat:
+                    self.pending_stall = stall
+
+    def capture_stall(self, stalled):
+        """Snapshot of what the GUI thread is doing right now"""
+        frame = sys._current_frames().get(self.gui_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        return {
+            'time': time.time(),
+            'detected_after_ms': stalled * 1000,
+            'duration_ms': None,
+            'slots': list(self.slot_stack),
+            'location': innermost_location(frame),
+            'stack': [line.rstrip() for line in stack],
+        }
+
+    # Reports
+
+    def describe_stall(self, stall):
+        """One line summary of a stall, e.g. for the monitor log"""
+        slot = stall['slots'][-1] if stall['slots'] else "outside instrumented slots"
+        text = f"GUI stalled {stall['duration_ms']:.0f} ms in {slot}"
+        if stall['location']:
+            text += f" ({stall['location']})"
+        return text
+
+    def report(self):
+        return {
+            'stall_threshold_ms': self.stall_threshold * 1000,
+            'stall_count': self.stall_count,
+            'lag_p99_ms': self.lag_metric.quantile(0.99) * 1000 if self.lag_metric is not None else 0.0,
+            'slots': {
+                name: {'count': timing.count, 'total_ms': timing.total * 1000, 'max_ms': timing.max * 1000}
+                for name, timing in self.slot_timings.items()
+            },
+            'stalls': list(self.stalls),
+        }
+
+    def format_report(self, top_slots=25):
+        """Slowest slots by total time, then the recorded stalls with their stacks"""
+        called = [timing for timing in self.slot_timings.values() if timing.count]
+        slowest = sorted(called, key=lambda timing: timing.total, reverse=True)
+        lines = [f"GUI event loop report: {self.stall_count} stalls over {self.stall_threshold * 1000:.0f} ms", "",
+                 f"Slots by total time (top {top_slots} of {len(called)}):"]
+        for timing in slowest[:top_slots]:
+            lines.append(f"  {timing.name:<50} {timing.count:7d} calls  total {timing.total * 1000:9.1f} ms  "
+                         f"mean {timing.total / timing.count * 1000:7.2f} ms  max {timing.max * 1000:8.1f} ms")
+
+        for stall in self.stalls:
+            when = time.strftime("%H:%M:%S", time.localtime(stall['time']))
+            lines += ["", f"[{when}] {self.describe_stall(stall)}"]
+            if stall['slots']:
+                lines.append("  Slots: " + " > ".join(stall['slots']))
+            lines += ["  " + line for line in "\n".join(stall['stack']).splitlines()]
+
+        return "\n".join(lines)
+
+    def write_report(self, path):
+        """Write the JSON report to path and the text report next to it"""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+        text_path = path[:-5] + '.txt' if path.endswith('.json') else path + '.txt'
+        with open(text_path, 'w') as f:
+            f.write(self.format_report() + "\n")
+
+        return text_path
+
+
+def innermost_location(frame):
+    """function at file:line of the innermost frame in application code"""
+    package_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(package_dir) and filename != os.path.abspath(__file__):
+            return f"{frame.f_code.co_name} at {os.path.basename(filename)}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+# Shared monitor used by main.py and the panels
+LOOP_MONITOR = LoopMonitor()
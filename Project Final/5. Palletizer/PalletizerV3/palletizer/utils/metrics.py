@@ -0,0 +1,331 @@
+# Runtime metrics: counters, gauges and latency histograms for the link, the sequence and the GUI
+import json
+import os
+import threading
+import time
+
+from palletizer.utils.config import METRICS_ENABLED, METRICS_HISTOGRAM_SUB_BUCKET_BITS
+
+SUMMARY_QUANTILES = (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('p999', 0.999))
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in sorted(labels.items())) + "}"
+
+
+class Counter:
+    """
+    Monotonic counter. Updates are not locked; each counter is written from
+    one thread (the link thread or the GUI thread), readers only read.
+    With a function the value is read at collection time, so a hot loop can
+    count in a plain attribute instead of calling inc().
+    """
+    kind = 'counter'
+
+    def __init__(self, name, help_text, labels, function=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.function = function
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def collect(self):
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+
+class Gauge:
+    """Value that goes up and down; with a function the value is read at collection time"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, labels, function=None):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.function = function
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def collect(self):
+        if self.function is not None:
+            try:
+                return self.function()
+            except Exception:
+                return float('nan')
+        return self.value
+
+
+class Histogram:
+    """
+    HDR-style histogram of durations. Values are recorded in microseconds into
+    log-linear buckets: each power of two is split into 2^(bits-1) linear
+    sub-buckets, so the relative error is below 2^-(bits-1) over the whole range
+    while recording stays O(1) with no allocation.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels, sub_bucket_bits=METRICS_HISTOGRAM_SUB_BUCKET_BITS,
+                 highest_us=1 << 36):
+        self.name = name
+        self.help = help_text
+        self.labels = labels
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.highest_us = highest_us
+        self.counts = [0] * (self.bucket_index(highest_us) + 1)
+        self.count = 0
+        self.total = 0.0  # Sum of recorded values in seconds
+        self.min = None
+        self.max = None
+
+    def bucket_index(self, value_us):
+        if value_us < self.sub_bucket_count:
+            return value_us
+        shift = value_us.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.half_count + (value_us >> shift) - self.half_count
+
+    def bucket_range(self, index):
+        """(lowest, highest) value in microseconds that falls into a bucket"""
+        if index < self.sub_bucket_count:
+            return index, index
+        offset = index - self.sub_bucket_count
+        shift = offset // self.half_count + 1
+        lowest = (offset % self.half_count + self.half_count) << shift
+        return lowest, lowest + (1 << shift) - 1
+
+    def record(self, seconds):
+        value_us = int(seconds * 1e6)
+        if value_us < 0:
+            value_us = 0
+        elif value_us > self.highest_us:
+            value_us = self.highest_us
+        self.counts[self.bucket_index(value_us)] += 1
+        self.count += 1
+        self.total += seconds
+        if self.min is None or seconds < self.min:
+            self.min = seconds
+        if self.max is None or seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """Value (seconds) at quantile q, from the middle of its bucket"""
+        if self.count == 0:
+            return 0.0
+        rank = max(1, int(q * self.count + 0.5))
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                lowest, highest = self.bucket_range(index)
+                return min((lowest + highest) / 2e6, self.max)
+        return self.max
+
+    def reset(self):
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def collect(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min or 0.0,
+            'max': self.max or 0.0,
+            **{name: self.quantile(q) for name, q in SUMMARY_QUANTILES},
+        }
+
+
+class NullMetric:
+    """Stands in for every metric type when metrics are disabled"""
+    kind = 'null'
+    count = 0
+
+    def inc(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def record(self, seconds):
+        pass
+
+    def quantile(self, q):
+        return 0.0
+
+
+NULL_METRIC = NullMetric()
+
+
+class MetricsRegistry:
+    """
+    Named metrics, optionally with labels (e.g. machine="M1" in the fleet view).
+    Asking for a metric that already exists returns the same object, so modules
+    can fetch their metrics once and keep the reference on the hot path.
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.metrics = {}  # (name, sorted label items) -> metric
+        self.last_rate_sample = None  # (time, {key: counter value})
+        self.rates = {}
+
+    def _get(self, cls, name, help_text, labels, **kwargs):
+        if not self.enabled:
+            return NULL_METRIC
+        labels = labels or {}
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = cls(name, help_text, labels, **kwargs)
+                self.metrics[key] = metric
+            elif kwargs.get('function') is not None:
+                # A new link object replaces the gauge function of the one it replaces
+                metric.function = kwargs['function']
+            return metric
+
+    def counter(self, name, help_text="", labels=None, function=None):
+        return self._get(Counter, name, help_text, labels, function=function)
+
+    def gauge(self, name, help_text="", labels=None, function=None):
+        return self._get(Gauge, name, help_text, labels, function=function)
+
+    def histogram(self, name, help_text="", labels=None):
+        return self._get(Histogram, name, help_text, labels)
+
+    def find(self, name, labels=None):
+        return self.metrics.get((name, tuple(sorted((labels or {}).items()))))
+
+    def total(self, name):
+        """Sum of a counter over all its label sets"""
+        return sum(metric.collect() for (metric_name, _), metric in self.metrics.items()
+                   if metric_name == name and metric.kind == 'counter')
+
+    def sample_rates(self):
+        """Per-second rate of every counter since the previous call"""
+        now = time.monotonic()
+        with self.lock:
+            values = {key: metric.collect() for key, metric in self.metrics.items() if metric.kind == 'counter'}
+        if self.last_rate_sample is not None:
+            last_time, last_values = self.last_rate_sample
+            elapsed = now - last_time
+            if elapsed > 0:
+                self.rates = {key: (value - last_values.get(key, 0)) / elapsed for key, value in values.items()}
+        self.last_rate_sample = (now, values)
+        return self.rates
+
+    def rate(self, name, labels=None):
+        """Rate from the last sample_rates(), summed over label sets when labels is None"""
+        if labels is not None:
+            return self.rates.get((name, tuple(sorted(labels.items()))), 0.0)
+        return sum(rate for (metric_name, _), rate in self.rates.items() if metric_name == name)
+
+    def exposition(self):
+        """Metrics in the Prometheus text exposition format; histograms are exported as summaries"""
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {'summary' if metric.kind == 'histogram' else metric.kind}")
+
+            if metric.kind == 'histogram':
+                for _, q in SUMMARY_QUANTILES:
+                    labels = format_labels({**metric.labels, 'quantile': q})
+                    lines.append(f"{metric.name}{labels} {metric.quantile(q):.6g}")
+                labels = format_labels(metric.labels)
+                lines.append(f"{metric.name}_sum{labels} {metric.total:.6g}")
+                lines.append(f"{metric.name}_count{labels} {metric.count}")
+            else:
+                lines.append(f"{metric.name}{format_labels(metric.labels)} {metric.collect()}")
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        result = {'timestamp': time.time(), 'counters': {}, 'gauges': {}, 'histograms': {}, 'rates': {}}
+        for metric in metrics:
+            key = metric.name + format_labels(metric.labels)
+            result[metric.kind + 's'][key] = metric.collect()
+        for (name, labels), rate in self.rates.items():
+            result['rates'][name + format_labels(dict(labels))] = rate
+        return result
+
+    def dump_json(self, path):
+        """Write all metrics to a JSON file, replacing it atomically"""
+        temp_path = path + ".tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        os.replace(temp_path, path)
+
+
+# Shared registry used by the application
+METRICS = MetricsRegistry()
+
+
+class MetricsHttpServer:
+    """
+    Serves the registry for scraping: GET /metrics (text exposition) and
+    GET /metrics.json. Runs on an asyncio loop, e.g. the one started by
+    palletizer.aio_link.install_qt_event_loop. asyncio is imported here, not at
+    module level, so it stays off the startup path of every metrics user.
+    """
+
+    def __init__(self, registry=METRICS, host="127.0.0.1", port=0):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+
+    async def start(self):
+        import asyncio
+        self.server = await asyncio.start_server(self.handle_request, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.server
+
+    async def serve(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def handle_request(self, reader, writer):
+        import asyncio
+        try:
+            request = await reader.readuntil(b'\r\n\r\n')
+            path = request.split(b' ', 2)[1].decode('latin-1').split('?')[0]
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, IndexError, ConnectionError):
+            writer.close()
+            return
+
+        if path == '/metrics':
+            status, content_type = "200 OK", "text/plain; version=0.0.4"
+            body = self.registry.exposition().encode()
+        elif path == '/metrics.json':
+            status, content_type = "200 OK", "application/json"
+            body = json.dumps(self.registry.to_dict()).encode()
+        else:
+            status, content_type, body = "404 Not Found", "text/plain", b"Not found\n"
+
+        writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\n"
+                     f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
@@ -0,0 +1,151 @@
+# Startup trace mode: per-phase and per-module timings for application start
+import json
+import sys
+import time
+from contextlib import contextmanager
+
+
+class _TimingLoader:
+    """Loader proxy that measures how long a module takes to execute"""
+
+    def __init__(self, loader, profiler):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        self._profiler._module_started(module.__name__)
+        try:
+            self._loader.exec_module(module)
+        finally:
+            self._profiler._module_finished(module.__name__)
+
+    def __getattr__(self, name):
+        return getattr(self._loader, name)
+
+
+class _TimingFinder:
+    """Meta path finder that wraps the loaders found by the other finders"""
+
+    def __init__(self, profiler):
+        self._profiler = profiler
+
+    def find_spec(self, fullname, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, 'exec_module'):
+                    spec.loader = _TimingLoader(spec.loader, self._profiler)
+                return spec
+        return None
+
+
+class StartupProfiler:
+    """
+    Records named startup phases and the import time of every module.
+    Phases are cheap no-ops unless the profiler has been started.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.start_time = None
+        self.end_time = None
+        self.phases = []          # List of (name, depth, start_ms, duration_ms)
+        self.modules = {}         # module name -> {'total_ms', 'self_ms'}
+        self._phase_depth = 0
+        self._import_stack = []   # Stack of [module name, start time, child time]
+        self._finder = None
+
+    def start(self, start_time=None):
+        """Enable tracing; start_time lets the trace include work done before start()"""
+        self.enabled = True
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self._finder = _TimingFinder(self)
+        sys.meta_path.insert(0, self._finder)
+
+    def stop(self):
+        """Stop tracing and remove the import hook"""
+        if self._finder in sys.meta_path:
+            sys.meta_path.remove(self._finder)
+        self._finder = None
+        self.end_time = time.perf_counter()
+        self.enabled = False
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager that records the duration of a startup phase"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        entry = [name, self._phase_depth, (start - self.start_time) * 1000, 0.0]
+        self.phases.append(entry)
+        self._phase_depth += 1
+        try:
+            yield
+        finally:
+            self._phase_depth -= 1
+            entry[3] = (time.perf_counter() - start) * 1000
+
+    def _module_started(self, name):
+        self._import_stack.append([name, time.perf_counter(), 0.0])
+
+    def _module_finished(self, name):
+        module_name, start, child_time = self._import_stack.pop()
+        total = time.perf_counter() - start
+        self.modules[module_name] = {
+            'total_ms': total * 1000,
+            'self_ms': (total - child_time) * 1000,
+        }
+        if self._import_stack:
+            self._import_stack[-1][2] += total
+
+    def total_ms(self):
+        """Get the total traced startup time in milliseconds"""
+        end = self.end_time if self.end_time is not None else time.perf_counter()
+        return (end - self.start_time) * 1000
+
+    def report(self):
+        """Get the trace as a JSON-serialisable dictionary"""
+        return {
+            'total_ms': self.total_ms(),
+            'phases': [
+                {'name': name, 'depth': depth, 'start_ms': start_ms, 'duration_ms': duration_ms}
+                for name, depth, start_ms, duration_ms in self.phases
+            ],
+            'modules': self.modules,
+        }
+
+    def format_report(self, top_modules=25):
+        """Format the trace as a human readable text report"""
+        lines = [f"Startup trace: total {self.total_ms():.1f} ms", "", "Phases:"]
+        for name, depth, start_ms, duration_ms in self.phases:
+            indent = "  " * (depth + 1)
+            lines.append(f"{indent}{name:<{40 - len(indent)}} {duration_ms:9.1f} ms  (at {start_ms:.1f} ms)")
+
+        slowest = sorted(self.modules.items(), key=lambda item: item[1]['self_ms'], reverse=True)
+        lines += ["", f"Slowest modules by self time (top {top_modules} of {len(self.modules)}):"]
+        for name, timing in slowest[:top_modules]:
+            lines.append(f"  {name:<50} self {timing['self_ms']:8.1f} ms  total {timing['total_ms']:8.1f} ms")
+
+        return "\n".join(lines)
+
+    def write_report(self, path):
+        """Write the JSON trace to path and the text report next to it"""
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+        text_path = path[:-5] + '.txt' if path.endswith('.json') else path + '.txt'
+        with open(text_path, 'w') as f:
+            f.write(self.format_report() + "\n")
+
+        return text_path
+
+
+# Shared profiler instance used by main.py and the UI construction code
+PROFILER = StartupProfiler()